@@ -0,0 +1,9 @@
+# benchmarks/__init__.py
+"""
+Benchmarks y evaluaciones (bench_*, eval_*) como comandos de manage.py, fuera de la app
+smartcondominio: solo se instalan con BENCHMARKS=true (config/settings.py), así no quedan
+en los despliegues. Crean sus datos sintéticos y los borran al terminar; usar contra una
+base de desarrollo.
+
+  BENCHMARKS=true python manage.py bench_paginacion --filas 100000
+"""
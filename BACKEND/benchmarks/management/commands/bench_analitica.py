@@ -0,0 +1,101 @@
+# benchmarks/management/commands/bench_analitica.py
+import random
+import secrets
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractHour
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from smartcondominio.models import AccessEvent, AccessRollupHora
+from smartcondominio.services_rollups import compactar
+from smartcondominio.views_api import AccessAnalyticsView
+
+CAMARAS = [f"bench-analitica-{i}" for i in range(4)]
+USUARIO = "bench-analitica"
+DECISIONES = ["ALLOW_RESIDENT", "ALLOW_VISIT", "DENY_UNKNOWN", "ERROR_OCR"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mapa de calor cámara × hora del día × decisión de un año: GROUP BY sobre AccessEvent "
+        "contra GET /api/access/analytics/ (cubos AccessRollupHora). Crea --filas eventos "
+        "sintéticos (y un superusuario temporal), los compacta y borra todo al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=200_000)
+        parser.add_argument("--repeticiones", type=int, default=10)
+
+    def handle(self, *args, **opts):
+        user = get_user_model().objects.create_superuser(USUARIO, f"{USUARIO}@example.com", secrets.token_urlsafe(16))
+        try:
+            self._sembrar(opts["filas"])
+            t = time.perf_counter()
+            r = compactar()
+            self.stdout.write(
+                f"compactar: {r['eventos']} eventos en {r['celdas']} celdas, "
+                f"{(time.perf_counter() - t) * 1000:.0f} ms"
+            )
+
+            hasta = timezone.localdate()
+            desde = hasta - timedelta(days=365)
+            vista = AccessAnalyticsView.as_view()
+            factory = APIRequestFactory(HTTP_HOST="localhost")
+
+            def crudo():
+                inicio = timezone.now() - timedelta(days=366)
+                return list(
+                    AccessEvent.objects.filter(created_at__gte=inicio)
+                    .annotate(hora_del_dia=ExtractHour("created_at"))
+                    .values("camera_id", "hora_del_dia", "decision")
+                    .annotate(eventos=Count("id"), abiertos=Count("id", filter=Q(opened=True)))
+                    .order_by()
+                )
+
+            def api():
+                req = factory.get("/api/access/analytics/", {"from": desde.isoformat(), "to": hasta.isoformat()})
+                force_authenticate(req, user=user)
+                resp = vista(req)
+                resp.render()
+                return resp.data["filas"]
+
+            for nombre, fn in (("GROUP BY crudo", crudo), ("analytics (rollups)", api)):
+                fn()   # calentamiento
+                tiempos = []
+                for _ in range(opts["repeticiones"]):
+                    t = time.perf_counter()
+                    filas = fn()
+                    tiempos.append((time.perf_counter() - t) * 1000)
+                self.stdout.write(
+                    f"  {nombre:<20}: p50 {statistics.median(tiempos):8.1f} ms  "
+                    f"máx {max(tiempos):8.1f} ms  |  {len(filas)} filas"
+                )
+        finally:
+            AccessEvent.objects.filter(camera_id__in=CAMARAS).delete()
+            AccessRollupHora.objects.filter(camera_id__in=CAMARAS).delete()
+            user.delete()
+
+    def _sembrar(self, filas, lote=1000):
+        """Eventos sintéticos repartidos en el último año; created_at crece con el id, como en producción."""
+        rnd = random.Random(0)
+        inicio = timezone.now() - timedelta(days=365)
+        paso = timedelta(days=365) / filas
+        hechas = 0
+        while hechas < filas:
+            n = min(lote, filas - hechas)
+            creados = AccessEvent.objects.bulk_create([
+                AccessEvent(
+                    camera_id=rnd.choice(CAMARAS), direction=rnd.choice(["ENTRADA", "SALIDA"]),
+                    decision=rnd.choice(DECISIONES), opened=rnd.random() < 0.6, score=round(rnd.random(), 2),
+                )
+                for _ in range(n)
+            ])
+            # created_at es auto_now_add: se reparte después, por lote
+            AccessEvent.objects.filter(pk__in=[e.pk for e in creados]).update(created_at=inicio + paso * hechas)
+            hechas += n
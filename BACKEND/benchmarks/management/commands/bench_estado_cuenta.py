@@ -0,0 +1,77 @@
+# benchmarks/management/commands/bench_estado_cuenta.py
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from smartcondominio.models import Unidad, Cuota, Pago
+from smartcondominio.services_cuotas import generar_cuotas
+from smartcondominio.services_ledger import tocar_unidades
+
+BENCH_MANZANA = "__BENCH__"
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide /api/estado-cuenta/ sin cache (versión nueva), con cache y con If-None-Match (304): "
+        "latencia y consultas por request. No deja datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cuotas", type=int, default=36, help="Cuotas (meses) de la unidad.")
+        parser.add_argument("--repeticiones", type=int, default=30)
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                self._bench(opts["cuotas"], opts["repeticiones"])
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _bench(self, n_cuotas, reps):
+        user = get_user_model().objects.create(username=f"{BENCH_MANZANA}{time.time_ns()}")
+        unidad = Unidad.objects.create(manzana=BENCH_MANZANA, numero="1", coeficiente=Decimal("1.0000"), propietario=user)
+        base = date.today() - timedelta(days=30 * n_cuotas)
+        for i in range(n_cuotas):
+            generar_cuotas(
+                f"{2000 + i // 12}-{i % 12 + 1:02d}", "BENCH", Decimal("1000.00"), True,
+                base + timedelta(days=30 * i), unidades=Unidad.objects.filter(pk=unidad.pk),
+            )
+        for c in Cuota.objects.filter(unidad=unidad)[: n_cuotas // 2]:
+            Pago.objects.create(cuota=c, monto=c.total_a_pagar, medio="OTRO").aplicar()
+
+        client = APIClient(SERVER_NAME="localhost")
+        client.force_authenticate(user)
+        url = f"/api/estado-cuenta/?unidad={unidad.id}"
+
+        def medir(prep=None, **headers):
+            tiempos, consultas, status = [], 0, None
+            for _ in range(reps):
+                if prep:
+                    prep()
+                with CaptureQueriesContext(connection) as ctx:
+                    t0 = time.perf_counter()
+                    resp = client.get(url, **headers)
+                    tiempos.append((time.perf_counter() - t0) * 1000)
+                consultas, status = len(ctx.captured_queries), resp.status_code
+            return status, consultas, statistics.median(tiempos), max(tiempos), resp
+
+        self.stdout.write(f"unidad con {n_cuotas} cuotas y {n_cuotas // 2} pagos · {reps} repeticiones")
+        self.stdout.write(f"{'caso':>14} {'status':>7} {'consultas':>10} {'p50 ms':>8} {'max ms':>8}")
+        filas = [("sin cache", medir(prep=lambda: tocar_unidades([unidad.id])))]
+        filas.append(("cache", medir()))
+        etag = filas[-1][1][4]["ETag"]
+        filas.append(("If-None-Match", medir(HTTP_IF_NONE_MATCH=etag)))
+        for nombre, (status, q, p50, mx, _) in filas:
+            self.stdout.write(f"{nombre:>14} {status:>7} {q:>10} {p50:>8.2f} {mx:>8.2f}")
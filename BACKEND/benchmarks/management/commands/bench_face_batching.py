@@ -0,0 +1,145 @@
+# benchmarks/management/commands/bench_face_batching.py
+import os
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from smartcondominio.ai.batching import MicroBatcher
+from smartcondominio.management.commands.face_embed_server import embed_falso
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] if xs else float("nan")
+
+
+class Command(BaseCommand):
+    help = (
+        "Generador de carga para el micro-batching de embeddings: llegadas Poisson a --rps "
+        "durante --duracion s contra un MicroBatcher por configuración lote:espera_ms "
+        "(costo sintético por lote + por imagen, o el modelo real con --imagen). "
+        "Con --socket, carga de lazo cerrado contra un face_embed_server en marcha."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rps", type=float, default=150, help="Pedidos por segundo (llegadas Poisson).")
+        parser.add_argument("--duracion", type=float, default=5.0)
+        parser.add_argument("--configs", default="1:0,4:2,8:5,16:10",
+                            help="Lista de max_batch:max_wait_ms a comparar.")
+        parser.add_argument("--hilos", type=int, default=1, help="Hilos de inferencia del batcher.")
+        parser.add_argument("--lote-ms", type=float, default=15.0, help="Costo sintético fijo por lote.")
+        parser.add_argument("--imagen-ms", type=float, default=2.0, help="Costo sintético por imagen.")
+        parser.add_argument("--imagen", help="Usar el modelo real (ai/face.py) con esta imagen.")
+        parser.add_argument("--socket", help="Cargar un face_embed_server en este socket (lazo cerrado).")
+        parser.add_argument("--concurrencia", type=int, default=16, help="Con --socket: clientes simultáneos.")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **opts):
+        if opts["socket"]:
+            return self._socket(opts)
+
+        if opts["imagen"]:
+            from smartcondominio.ai import face
+            with open(opts["imagen"], "rb") as f:
+                imagen = f.read()
+            fn = face.embed_batch_local
+            item = lambda i: imagen
+            fn([imagen])   # carga el modelo fuera de la medición
+            costo = f"modelo real, {os.path.basename(opts['imagen'])}"
+        else:
+            fn = embed_falso(opts["lote_ms"], opts["imagen_ms"])
+            item = lambda i: f"img-{i}".encode()
+            costo = f"sintético {opts['lote_ms']} ms/lote + {opts['imagen_ms']} ms/imagen"
+
+        self.stdout.write(f"{opts['rps']:.0f} req/s Poisson durante {opts['duracion']} s, {opts['hilos']} hilo(s), {costo}")
+        for cfg in opts["configs"].split(","):
+            try:
+                lote, espera = cfg.split(":")
+                lote, espera = int(lote), float(espera)
+            except ValueError:
+                raise CommandError(f"Configuración inválida {cfg!r} (formato lote:espera_ms)")
+            self._abierto(fn, item, lote, espera, opts)
+
+    def _abierto(self, fn, item, lote, espera, opts):
+        rnd = random.Random(opts["seed"])
+        batcher = MicroBatcher(fn, max_batch=lote, max_wait_ms=espera, hilos=opts["hilos"], nombre="bench")
+        latencias, lock, futuros = [], threading.Lock(), []
+
+        def listo(t_llegada):
+            def cb(fut):
+                fin = time.perf_counter()
+                with lock:
+                    latencias.append((fin - t_llegada) * 1000)
+            return cb
+
+        inicio = time.perf_counter()
+        t, i = inicio, 0
+        while t - inicio < opts["duracion"]:
+            t += rnd.expovariate(opts["rps"])
+            pausa = t - time.perf_counter()
+            if pausa > 0:
+                time.sleep(pausa)
+            fut = batcher.submit(item(i))
+            fut.add_done_callback(listo(t))
+            futuros.append(fut)
+            i += 1
+        for fut in futuros:
+            try:
+                fut.result(timeout=120)
+            except Exception:
+                pass
+        total = time.perf_counter() - inicio
+        st = batcher.stats()
+        batcher.close()
+        self.stdout.write(
+            f"lote {lote:>3} / {espera:>5.1f} ms: {len(latencias) / total:7.1f} img/s  |  "
+            f"p50 {_pct(latencias, .5):8.1f} ms  p99 {_pct(latencias, .99):8.1f} ms  max {max(latencias):8.1f} ms  |  "
+            f"lote medio {st['lote_medio']:5.2f} (máx {st['max_lote']})  errores {st['errores']}"
+        )
+
+    def _socket(self, opts):
+        from smartcondominio.ai.embed_client import EmbedClient, EmbedServerError
+
+        client = EmbedClient(opts["socket"])
+        try:
+            antes = client.ping()
+        except EmbedServerError as e:
+            raise CommandError(str(e))
+        imagen = None
+        if opts["imagen"]:
+            with open(opts["imagen"], "rb") as f:
+                imagen = f.read()
+        latencias, errores, lock = [], [0], threading.Lock()
+        fin = time.perf_counter() + opts["duracion"]
+
+        def cliente(n):
+            i = 0
+            while time.perf_counter() < fin:
+                t = time.perf_counter()
+                try:
+                    client.embed(imagen or f"img-{n}-{i}".encode())
+                except EmbedServerError:
+                    with lock:
+                        errores[0] += 1
+                    continue
+                with lock:
+                    latencias.append((time.perf_counter() - t) * 1000)
+                i += 1
+
+        inicio = time.perf_counter()
+        hilos = [threading.Thread(target=cliente, args=(n,)) for n in range(opts["concurrencia"])]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        total = time.perf_counter() - inicio
+        despues = client.ping()
+        lotes = (despues.get("lotes", 0) - antes.get("lotes", 0)) or 1
+        pedidos = despues.get("pedidos", 0) - antes.get("pedidos", 0)
+        self.stdout.write(
+            f"{opts['concurrencia']} clientes contra {opts['socket']}: {len(latencias) / total:7.1f} img/s  |  "
+            f"p50 {_pct(latencias, .5):7.1f} ms  p99 {_pct(latencias, .99):7.1f} ms  |  "
+            f"lote medio {pedidos / lotes:5.2f}  errores {errores[0]}"
+        )
@@ -0,0 +1,94 @@
+# benchmarks/management/commands/bench_face_index.py
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from smartcondominio.ai.face_index import FaceIndex, DIM, normalizar, normalizar_filas
+
+
+def _legacy_scan(path, probe):
+    """Lo que hacía identify_bytes antes: json.loads de cada línea y una similitud por fila."""
+    sims = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            v = np.array(row["embedding"], dtype=np.float32)
+            sims.append((row["person_id"], float(probe @ v / (np.linalg.norm(probe) * np.linalg.norm(v)))))
+    sims.sort(key=lambda x: x[1], reverse=True)
+    return sims[:5]
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el índice de rostros (ai/face_index.py) con identidades sintéticas: carga, "
+        "altas incrementales, latencia de búsqueda top-k y acierto top-1; compara con el "
+        "escaneo de vectors.jsonl anterior hasta --legacy-max identidades. Usa un directorio temporal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tamanos", default="1000,10000,100000")
+        parser.add_argument("--consultas", type=int, default=200)
+        parser.add_argument("--altas", type=int, default=200, help="Altas de a una después de la carga.")
+        parser.add_argument("--legacy-max", type=int, default=10000)
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **opts):
+        rnd = np.random.default_rng(opts["seed"])
+        for n in [int(x) for x in opts["tamanos"].split(",") if x.strip()]:
+            with tempfile.TemporaryDirectory(prefix="face_idx_") as tmp:
+                self._bench(rnd, Path(tmp), n, opts)
+
+    def _bench(self, rnd, tmp, n, opts):
+        base = normalizar_filas(rnd.standard_normal((n, DIM), dtype=np.float32))
+        ids = [f"p{i}" for i in range(n)]
+        index = FaceIndex(tmp / "index")
+
+        t0 = time.perf_counter()
+        for i in range(0, n, 10000):
+            index.add_batch(ids[i:i + 10000], base[i:i + 10000])
+        carga = time.perf_counter() - t0
+
+        altas = []
+        for j in range(opts["altas"]):
+            v = normalizar(rnd.standard_normal(DIM, dtype=np.float32))
+            t = time.perf_counter()
+            index.add(f"nuevo{j}", v)
+            altas.append((time.perf_counter() - t) * 1000)
+
+        # consultas: una foto "nueva" de alguien enrolado = su vector con ruido
+        lecturas, aciertos = [], 0
+        for _ in range(opts["consultas"]):
+            i = int(rnd.integers(n))
+            probe = normalizar(base[i] + 0.05 * rnd.standard_normal(DIM, dtype=np.float32))
+            t = time.perf_counter()
+            top = index.search(probe, k=5)
+            lecturas.append((time.perf_counter() - t) * 1000)
+            aciertos += top[0][0] == ids[i]
+
+        self.stdout.write(
+            f"{n:>7} identidades: carga {carga:6.2f} s | alta p50 {_pct(altas, .5):6.2f} ms p99 {_pct(altas, .99):6.2f} ms | "
+            f"búsqueda top-5 p50 {_pct(lecturas, .5):7.2f} ms p99 {_pct(lecturas, .99):7.2f} ms | "
+            f"top-1 {aciertos / opts['consultas']:.1%} | {index.stats()['capacidad']} filas reservadas"
+        )
+
+        if n <= opts["legacy_max"]:
+            path = tmp / "vectors.jsonl"
+            with open(path, "w", encoding="utf-8") as f:
+                for pid, v in zip(ids, base):
+                    f.write(json.dumps({"person_id": pid, "embedding": v.tolist()}) + "\n")
+            tiempos = []
+            for _ in range(5):
+                probe = normalizar(base[int(rnd.integers(n))])
+                t = time.perf_counter()
+                _legacy_scan(path, probe)
+                tiempos.append((time.perf_counter() - t) * 1000)
+            self.stdout.write(f"{'':>7} vectors.jsonl anterior: búsqueda p50 {_pct(tiempos, .5):9.1f} ms")
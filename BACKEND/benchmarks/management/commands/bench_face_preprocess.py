@@ -0,0 +1,83 @@
+# benchmarks/management/commands/bench_face_preprocess.py
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from smartcondominio.ai import preprocess
+
+
+def _sintetica(ancho, alto, seed=0):
+    """Cuadro de cámara falso (gradiente, bloques y algo de ruido de sensor) codificado como JPEG."""
+    import cv2
+
+    rnd = np.random.default_rng(seed)
+    x = np.linspace(0, 255, ancho, dtype=np.float32)
+    y = np.linspace(0, 255, alto, dtype=np.float32)[:, None]
+    img = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=2)
+    for _ in range(40):
+        x0, y0 = int(rnd.integers(0, ancho)), int(rnd.integers(0, alto))
+        cv2.rectangle(img, (x0, y0), (x0 + int(rnd.integers(50, 600)), y0 + int(rnd.integers(50, 600))),
+                      tuple(float(c) for c in rnd.integers(0, 255, 3)), -1)
+    img = np.clip(img + rnd.normal(0, 3, img.shape), 0, 255).astype(np.uint8)
+    return preprocess.codificar_jpeg(cv2.GaussianBlur(img, (3, 3), 0), 92)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la decodificación completa de antes (cv2.imdecode a resolución nativa, "
+        "snapshot con los bytes originales) contra ai/preprocess.preparar: tiempo, memoria "
+        "de la imagen decodificada y bytes enviados/guardados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--imagen", action="append", help="Foto(s) reales de cámara; si no, un JPEG 4K sintético.")
+        parser.add_argument("--ancho", type=int, default=3840)
+        parser.add_argument("--alto", type=int, default=2160)
+        parser.add_argument("--repeticiones", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        import cv2
+
+        if opts["imagen"]:
+            fotos = []
+            for ruta in opts["imagen"]:
+                with open(ruta, "rb") as f:
+                    fotos.append((ruta, f.read()))
+        else:
+            fotos = [(f"sintética {opts['ancho']}x{opts['alto']}", _sintetica(opts["ancho"], opts["alto"]))]
+
+        for nombre, data in fotos:
+            info = preprocess.info_jpeg(data)
+            self.stdout.write(f"{nombre}: {len(data) / 1024:.0f} KB, encabezado {info}")
+
+            antes, img = [], None
+            for _ in range(opts["repeticiones"]):
+                t = time.perf_counter()
+                img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                antes.append((time.perf_counter() - t) * 1000)
+            if img is None:
+                raise CommandError(f"{nombre}: no se pudo decodificar")
+
+            decodificar, despues, prep = [], [], None
+            for _ in range(opts["repeticiones"]):
+                t = time.perf_counter()
+                preprocess.decodificar(data)
+                decodificar.append((time.perf_counter() - t) * 1000)
+                t = time.perf_counter()
+                prep = preprocess.preparar(data)
+                prep.jpeg()
+                despues.append((time.perf_counter() - t) * 1000)
+
+            r = prep.resumen()
+            self.stdout.write(
+                f"  antes:   {statistics.median(antes):7.1f} ms  decodificada {img.shape[1]}x{img.shape[0]} "
+                f"({img.nbytes / 2**20:5.1f} MB)  enviado/snapshot {len(data) / 1024:7.0f} KB"
+            )
+            self.stdout.write(
+                f"  después: {statistics.median(despues):7.1f} ms (decodificación {statistics.median(decodificar):.1f} ms, "
+                f"el resto es el recorte y el JPEG)  decodificada {r['decodificada'][0]}x{r['decodificada'][1]} "
+                f"({prep.img.nbytes / 2**20:5.1f} MB)  enviado/snapshot {r['enviado_bytes'] / 1024:7.0f} KB  "
+                f"recorte {r['recorte'] or 'sin rostro (cuadro completo)'}"
+            )
@@ -0,0 +1,183 @@
+# benchmarks/management/commands/bench_gate_async.py
+import asyncio
+import io
+import json
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from smartcondominio.circuit import circuito
+from smartcondominio.models import AccessEvent
+
+CAMARA = "bench-async"
+USUARIO = "bench-garita-async"
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] if xs else float("nan")
+
+
+def _jpeg():
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (320, 240), (90, 90, 90)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+class _OCRFalso(BaseHTTPRequestHandler):
+    """Plate Recognizer de mentira: espera ocr_ms y devuelve una placa (keep-alive)."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True   # cabeceras y cuerpo van en dos send(): sin esto, 40 ms de delayed ACK
+    ocr_ms = 300.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.ocr_ms / 1000)
+        placa = "BNC" + "".join(random.choice("0123456789") for _ in range(3))
+        cuerpo = json.dumps({"results": [{"plate": placa.lower(), "score": 0.9, "candidates": []}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Throughput de la garita por placa con muchas cámaras a la vez: SnapshotCheckView por WSGI "
+        "(--hilos-wsgi workers sync, un cuadro por worker) contra SnapshotCheckAsyncView por ASGI "
+        "(un solo event loop, como un worker de uvicorn). Ambos entran por config.wsgi / config.asgi "
+        "(middleware, Token, multipart) y llaman por HTTP a un OCR falso local que tarda --ocr-ms. "
+        "Borra los eventos y el usuario que crea."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--camaras", type=int, default=32, help="Cámaras enviando a la vez.")
+        parser.add_argument("--pedidos", type=int, default=256)
+        parser.add_argument("--ocr-ms", type=float, default=300.0, help="Latencia del OCR falso.")
+        parser.add_argument("--hilos-wsgi", type=int, default=4, help="Workers sync (gunicorn -w N).")
+        parser.add_argument("--modo", choices=["wsgi", "asgi", "ambos"], default="ambos")
+
+    def handle(self, *args, **opts):
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            raise CommandError("Las vistas async necesitan httpx (requirements.txt).")
+
+        _OCRFalso.ocr_ms = opts["ocr_ms"]
+        ThreadingHTTPServer.request_queue_size = 256
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), _OCRFalso)
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{servidor.server_address[1]}/v1/plate-reader/"
+
+        User = get_user_model()
+        user = User.objects.create_superuser(USUARIO, f"{USUARIO}@example.com", secrets.token_urlsafe(16))
+        token = Token.objects.create(user=user).key
+        imagen = _jpeg()
+        modos = ["wsgi", "asgi"] if opts["modo"] == "ambos" else [opts["modo"]]
+        self.stdout.write(
+            f"{opts['pedidos']} pedidos, {opts['camaras']} cámaras, OCR {opts['ocr_ms']:.0f} ms, "
+            f"WSGI con {opts['hilos_wsgi']} workers sync, ASGI con 1 event loop"
+        )
+        try:
+            with override_settings(PLATE_RECOG_URL=url, PLATE_RECOG_TOKEN="bench", CIRCUIT_LENTO_MS=None):
+                circuito("platerecognizer").reset()
+                for modo in modos:
+                    correr = self._wsgi if modo == "wsgi" else self._asgi
+                    latencias, estados, total = correr(token, imagen, opts)
+                    self._reportar(modo, latencias, estados, total)
+        finally:
+            servidor.shutdown()
+            AccessEvent.objects.filter(camera_id=CAMARA).delete()
+            user.delete()
+
+    def _archivos(self, imagen):
+        return {"image": ("cuadro.jpg", imagen, "image/jpeg")}
+
+    # ---------- WSGI: N workers, cada uno atiende un cuadro por vez ----------
+    def _wsgi(self, token, imagen, opts):
+        import httpx
+        from config.wsgi import application
+
+        pendientes = list(range(opts["pedidos"]))
+        lock = threading.Lock()
+        latencias, estados = [], []
+
+        def worker():
+            client = httpx.Client(
+                transport=httpx.WSGITransport(app=application), base_url="http://localhost",
+                headers={"Authorization": f"Token {token}"},
+            )
+            while True:
+                with lock:
+                    if not pendientes:
+                        break
+                    pendientes.pop()
+                t = time.perf_counter()
+                r = client.post("/api/access/snapshot-check/", files=self._archivos(imagen), data={"camera_id": CAMARA})
+                with lock:
+                    latencias.append((time.perf_counter() - t) * 1000)
+                    estados.append((r.status_code, r.content[-400:]))
+            connections.close_all()
+
+        hilos = [threading.Thread(target=worker) for _ in range(opts["hilos_wsgi"])]
+        t0 = time.perf_counter()
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        return latencias, estados, time.perf_counter() - t0
+
+    # ---------- ASGI: un event loop, todas las cámaras a la vez ----------
+    def _asgi(self, token, imagen, opts):
+        import httpx
+        from config.asgi import application
+
+        latencias, estados = [], []
+
+        async def camaras():
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=application), base_url="http://localhost",
+                headers={"Authorization": f"Token {token}"}, timeout=60,
+            )
+            pendientes = list(range(opts["pedidos"]))
+
+            async def camara():
+                while pendientes:
+                    pendientes.pop()
+                    t = time.perf_counter()
+                    r = await client.post(
+                        "/api/access/async/snapshot-check/", files=self._archivos(imagen), data={"camera_id": CAMARA},
+                    )
+                    latencias.append((time.perf_counter() - t) * 1000)
+                    estados.append((r.status_code, r.content[-400:]))
+
+            async with client:
+                await asyncio.gather(*(camara() for _ in range(opts["camaras"])))
+
+        t0 = time.perf_counter()
+        asyncio.run(camaras())
+        return latencias, estados, time.perf_counter() - t0
+
+    def _reportar(self, modo, latencias, estados, total):
+        errores = [(s, cuerpo) for s, cuerpo in estados if s >= 400]
+        self.stdout.write(
+            f"  {modo:<5} {len(latencias) / total:6.1f} req/s  p50 {_pct(latencias, .5):6.0f} ms  "
+            f"p99 {_pct(latencias, .99):6.0f} ms  |  errores {len(errores)}"
+        )
+        if errores:
+            self.stdout.write(f"        primer error: {errores[0][0]} {errores[0][1].decode(errors='replace')}")
@@ -0,0 +1,122 @@
+# benchmarks/management/commands/bench_gate_connections.py
+import random
+import statistics
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from smartcondominio.models import AccessEvent
+from smartcondominio.services_gate import procesar_snapshot
+
+CAMARA = "bench-gate"
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] if xs else float("nan")
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga de la garita por placa con un OCR sintético de --ocr-ms: compara el flujo de antes "
+        "(todo el POST dentro de transaction.atomic) con el de services_gate (OCR fuera de "
+        "transacción, INSERT en una transacción corta) y mide cuántas conexiones quedan con "
+        "una transacción abierta mientras tanto. Borra los eventos que crea."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrencia", type=int, default=16, help="Garitas/hilos simultáneos.")
+        parser.add_argument("--pedidos", type=int, default=160)
+        parser.add_argument("--ocr-ms", type=float, default=300.0, help="Latencia del OCR sintético.")
+        parser.add_argument("--modo", choices=["antes", "despues", "ambos"], default="ambos")
+        parser.add_argument("--muestreo-ms", type=float, default=5.0)
+
+    def handle(self, *args, **opts):
+        user = get_user_model().objects.filter(is_superuser=True).first() or get_user_model().objects.first()
+        modos = ["antes", "despues"] if opts["modo"] == "ambos" else [opts["modo"]]
+        self.stdout.write(
+            f"{opts['pedidos']} pedidos, {opts['concurrencia']} garitas, OCR {opts['ocr_ms']:.0f} ms"
+        )
+        try:
+            for modo in modos:
+                self._correr(modo, user, opts)
+        finally:
+            AccessEvent.objects.filter(camera_id=CAMARA).delete()
+
+    def _lector(self, ocr_ms):
+        def leer(fileobj=None, regions=None, camera_id=None):
+            time.sleep(ocr_ms / 1000)
+            placa = "BNC" + "".join(random.choice("0123456789") for _ in range(3))
+            return {"results": [{"plate": placa.lower(), "score": 0.9, "candidates": []}]}
+        return leer
+
+    def _correr(self, modo, user, opts):
+        lector = self._lector(opts["ocr_ms"])
+        pendientes = list(range(opts["pedidos"]))
+        lock = threading.Lock()
+        latencias, conexiones, errores = [], [], []
+        listos = threading.Barrier(opts["concurrencia"] + 1)
+        fin = threading.Event()
+
+        def pedido():
+            # como TokenAuthentication: una consulta antes de llegar a la vista
+            get_user_model().objects.filter(pk=getattr(user, "pk", None)).exists()
+            if modo == "antes":
+                with transaction.atomic():
+                    return procesar_snapshot(b"", CAMARA, user=user, lector=lector)
+            return procesar_snapshot(b"", CAMARA, user=user, lector=lector)
+
+        def garita():
+            with lock:
+                conexiones.append(connections["default"])
+            listos.wait()
+            while True:
+                with lock:
+                    if not pendientes:
+                        break
+                    pendientes.pop()
+                t = time.perf_counter()
+                try:
+                    pedido()
+                except Exception as e:   # p.ej. "database is locked" en SQLite con transacciones largas
+                    with lock:
+                        errores.append(f"{type(e).__name__}: {e}")
+                    continue
+                with lock:
+                    latencias.append((time.perf_counter() - t) * 1000)
+            connections["default"].close()
+
+        muestras = []
+
+        def muestrear():
+            while not fin.is_set():
+                abiertas = sum(1 for c in conexiones if c.connection is not None)
+                en_tx = sum(1 for c in conexiones if c.in_atomic_block)
+                muestras.append((abiertas, en_tx))
+                time.sleep(opts["muestreo_ms"] / 1000)
+
+        hilos = [threading.Thread(target=garita) for _ in range(opts["concurrencia"])]
+        for h in hilos:
+            h.start()
+        sampler = threading.Thread(target=muestrear)
+        listos.wait()
+        t0 = time.perf_counter()
+        sampler.start()
+        for h in hilos:
+            h.join()
+        total = time.perf_counter() - t0
+        fin.set()
+        sampler.join()
+
+        en_tx = [m[1] for m in muestras] or [0]
+        abiertas = [m[0] for m in muestras] or [0]
+        self.stdout.write(
+            f"  {modo:<8} {len(latencias) / total:6.1f} req/s  p50 {_pct(latencias, .5):6.0f} ms  "
+            f"p99 {_pct(latencias, .99):6.0f} ms  |  transacciones abiertas: media {statistics.mean(en_tx):5.2f}  "
+            f"pico {max(en_tx):3d}  |  conexiones abiertas: media {statistics.mean(abiertas):5.2f}  |  errores {len(errores)}"
+        )
+        if errores:
+            self.stdout.write(f"           primer error: {errores[0][:120]}")
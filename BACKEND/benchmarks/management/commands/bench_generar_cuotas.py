@@ -0,0 +1,103 @@
+# benchmarks/management/commands/bench_generar_cuotas.py
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from smartcondominio.models import Unidad, Cuota
+from smartcondominio.services_cuotas import generar_cuotas
+
+BENCH_MANZANA = "__BENCH__"
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _generar_por_unidad(periodo, concepto, monto_base, usa_coef, venc, unidades):
+    """Camino anterior de CuotaViewSet.generar (get_or_create + save por unidad)."""
+    afectadas = []
+    for u in unidades.only("id", "coeficiente"):
+        c, _ = Cuota.objects.get_or_create(
+            unidad=u, periodo=periodo, concepto=concepto, is_active=True,
+            defaults={
+                "monto_base": monto_base,
+                "usa_coeficiente": usa_coef,
+                "coeficiente_snapshot": u.coeficiente or 0,
+                "vencimiento": venc,
+            }
+        )
+        c.monto_base = monto_base
+        c.usa_coeficiente = usa_coef
+        if usa_coef:
+            c.coeficiente_snapshot = u.coeficiente or 0
+        c.vencimiento = venc
+        c.recalc_importes()
+        c.recalc_estado()
+        c.save(update_fields=[
+            "monto_base", "usa_coeficiente", "coeficiente_snapshot",
+            "vencimiento", "monto_calculado", "total_a_pagar", "estado", "updated_at"
+        ])
+        afectadas.append(c.id)
+    return afectadas
+
+
+class Command(BaseCommand):
+    help = "Mide consultas y tiempo de la generación de cuotas (por unidad vs. en bloque). No deja datos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000,10000", help="Cantidades de unidades, separadas por coma.")
+        parser.add_argument("--skip-legacy", action="store_true", help="No medir el camino por unidad.")
+        parser.add_argument(
+            "--coeficientes-distintos", action="store_true",
+            help="Un coeficiente distinto por unidad (peor caso para la actualización agrupada).",
+        )
+
+    def handle(self, *args, **opts):
+        sizes = [int(s) for s in opts["sizes"].split(",") if s.strip()]
+        self.stdout.write(
+            f"{'unidades':>9} {'camino':>10} {'q 1ra':>7} {'1ra (s)':>9} {'q 2da':>7} {'2da (s)':>9}"
+        )
+        for n in sizes:
+            caminos = [("bloque", generar_cuotas)]
+            if not opts["skip_legacy"]:
+                caminos.insert(0, ("por_unidad", _generar_por_unidad))
+            for nombre, fn in caminos:
+                q1, t1, q2, t2 = self._medir(n, fn, opts["coeficientes_distintos"])
+                self.stdout.write(f"{n:>9} {nombre:>10} {q1:>7} {t1:>9.3f} {q2:>7} {t2:>9.3f}")
+
+    def _medir(self, n, fn, distintos=False):
+        """
+        Crea n unidades temporales y corre la generación dos veces:
+        la 1ra crea las cuotas y la 2da las actualiza. Todo se revierte al final.
+        """
+        resultado = None
+        try:
+            with transaction.atomic():
+                Unidad.objects.bulk_create(
+                    [
+                        Unidad(
+                            manzana=BENCH_MANZANA, numero=str(i),
+                            coeficiente=Decimal(i % 10000 + 1) / Decimal("10000") if distintos else Decimal("0.0100"),
+                        )
+                        for i in range(n)
+                    ],
+                    batch_size=1000,
+                )
+                unidades = Unidad.objects.filter(manzana=BENCH_MANZANA, is_active=True)
+                args = ("2099-01", "BENCH", Decimal("1000.00"), True, date.today() + timedelta(days=10))
+
+                medidas = []
+                for _ in range(2):
+                    with CaptureQueriesContext(connection) as ctx:
+                        t0 = time.perf_counter()
+                        fn(*args, unidades=unidades)
+                        medidas += [len(ctx.captured_queries), time.perf_counter() - t0]
+                resultado = tuple(medidas)
+                raise _Rollback()
+        except _Rollback:
+            pass
+        return resultado
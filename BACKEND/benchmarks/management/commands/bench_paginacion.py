@@ -0,0 +1,97 @@
+# benchmarks/management/commands/bench_paginacion.py
+import secrets
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from smartcondominio.models import AccessEvent
+from smartcondominio.pagination import KeysetPagination
+from smartcondominio.views_api import AccessEventViewSet
+
+CAMARA = "bench-paginacion"
+USUARIO = "bench-paginacion"
+
+
+class Command(BaseCommand):
+    help = (
+        "Latencia de GET /api/access/events/ en la página 1 y en una página profunda: "
+        "?page=N (OFFSET + COUNT(*)) contra ?cursor= (keyset por created_at, id). Crea "
+        "--filas eventos sintéticos (y un superusuario temporal) y los borra al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=100_000)
+        parser.add_argument("--pagina", type=int, default=10_000, help="Página profunda a medir.")
+        parser.add_argument("--repeticiones", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        tam = KeysetPagination.page_size or 10
+        pagina = min(opts["pagina"], max(1, opts["filas"] // tam))
+        user = get_user_model().objects.create_superuser(USUARIO, f"{USUARIO}@example.com", secrets.token_urlsafe(16))
+        try:
+            self._sembrar(opts["filas"])
+            vista = AccessEventViewSet.as_view({"get": "list"})
+            factory = APIRequestFactory(HTTP_HOST="localhost")
+
+            def pedir(params):
+                req = factory.get("/api/access/events/", params)
+                force_authenticate(req, user=user)
+                with CaptureQueriesContext(connection) as q:
+                    t = time.perf_counter()
+                    resp = vista(req)
+                    resp.render()
+                    ms = (time.perf_counter() - t) * 1000
+                return ms, len(q.captured_queries), resp
+
+            # cursor que apunta justo antes de la página profunda (lo mismo que dejaría "next")
+            orden = AccessEvent.objects.order_by("-created_at", "-id").values_list("created_at", "id")
+            t_prev, id_prev = orden[(pagina - 1) * tam - 1] if pagina > 1 else (None, None)
+            cursor = KeysetPagination.codificar(t_prev, id_prev) if t_prev else ""
+
+            casos = [
+                ("page", 1, {"page": 1}),
+                ("page", pagina, {"page": pagina}),
+                ("cursor", 1, {"cursor": ""}),
+                ("cursor", pagina, {"cursor": cursor}),
+            ]
+            self.stdout.write(f"{AccessEvent.objects.count()} eventos, page_size {tam}, {opts['repeticiones']} repeticiones")
+            ids = {}
+            for modo, n, params in casos:
+                pedir(params)   # calentamiento
+                tiempos = []
+                for _ in range(opts["repeticiones"]):
+                    ms, consultas, resp = pedir(params)
+                    tiempos.append(ms)
+                ids[(modo, n)] = [r["id"] for r in resp.data["results"]]
+                self.stdout.write(
+                    f"  {modo:<6} página {n:>6}: p50 {statistics.median(tiempos):7.1f} ms  "
+                    f"máx {max(tiempos):7.1f} ms  |  {consultas} consultas"
+                )
+            iguales = ids[("page", pagina)] == ids[("cursor", pagina)]
+            self.stdout.write(f"  misma página {pagina} en ambos modos: {'sí' if iguales else 'NO'}")
+        finally:
+            AccessEvent.objects.filter(camera_id=CAMARA).delete()
+            user.delete()
+
+    def _sembrar(self, filas, lote=1000):
+        """Eventos sintéticos; created_at repartido en el último año (con empates por lote)."""
+        ahora = timezone.now()
+        hechas = 0
+        while hechas < filas:
+            n = min(lote, filas - hechas)
+            creados = AccessEvent.objects.bulk_create([
+                AccessEvent(camera_id=CAMARA, plate_norm=f"BNC{(hechas + i) % 1000:03d}", decision="DENY_UNKNOWN")
+                for i in range(n)
+            ])
+            # created_at es auto_now_add: se reparte después, por lote
+            AccessEvent.objects.filter(pk__in=[e.pk for e in creados]).update(
+                created_at=ahora - timedelta(minutes=(filas - hechas) * 5)
+            )
+            hechas += n
@@ -0,0 +1,111 @@
+# benchmarks/management/commands/bench_plate_match.py
+import random
+import statistics
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from smartcondominio.plate_index import PlateIndex, CLASES_CONFUSION, mejor_coincidencia
+
+LETRAS = string.ascii_uppercase
+DIGITOS = string.digits
+_CLASE = {c: clase for clase in CLASES_CONFUSION for c in clase}
+
+
+def _placa(rnd):
+    # formato boliviano: 3-4 dígitos + 3 letras
+    return "".join(rnd.choices(DIGITOS, k=rnd.choice((3, 4)))) + "".join(rnd.choices(LETRAS, k=3))
+
+
+def _confundir(rnd, placa):
+    pos = [i for i, c in enumerate(placa) if c in _CLASE]
+    if not pos:
+        return placa
+    i = rnd.choice(pos)
+    return placa[:i] + rnd.choice([x for x in _CLASE[placa[i]] if x != placa[i]]) + placa[i + 1:]
+
+
+def _editar(rnd, placa):
+    i = rnd.randrange(len(placa))
+    pool = DIGITOS if placa[i].isdigit() else LETRAS
+    opciones = [x for x in pool if x != placa[i] and _CLASE.get(x) != _CLASE.get(placa[i], placa[i])]
+    return placa[:i] + rnd.choice(opciones) + placa[i + 1:]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la coincidencia aproximada de placas (plate_index) con N placas autorizadas "
+        "sintéticas: latencia por lectura y aciertos/falsos positivos por tipo de error del OCR "
+        "(decisión con los umbrales PLATE_FUZZY_* y si la placa real queda primera en el ranking). "
+        "No toca la BD."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--placas", type=int, default=50000)
+        parser.add_argument("--consultas", type=int, default=2000, help="Consultas por escenario.")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(opts["seed"])
+        n, q = opts["placas"], opts["consultas"]
+
+        placas = set()
+        while len(placas) < n:
+            placas.add(_placa(rnd))
+        placas = sorted(placas)
+
+        idx = PlateIndex(ttl=3600)
+        t0 = time.perf_counter()
+        idx.reemplazar({p: (i, i) for i, p in enumerate(placas)}, {})
+        self.stdout.write(f"Índice: {n} placas, {idx.stats()['canonicas']} formas canónicas, "
+                          f"armado en {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+        escenarios = {
+            "exacta": lambda p: p,
+            "1 confusión": lambda p: _confundir(rnd, p),
+            "2 confusiones": lambda p: _confundir(rnd, _confundir(rnd, p)),
+            "1 edición": lambda p: _editar(rnd, p),
+            "desconocida": None,
+        }
+
+        with override_settings(PLATE_FUZZY_BUDGET_MS=1000):
+            for nombre, perturbar in escenarios.items():
+                self._escenario(rnd, idx, nombre, perturbar, placas, q)
+
+    def _escenario(self, rnd, idx, nombre, perturbar, placas, q):
+        registradas = set(placas)
+        tiempos, aciertos, errores, sin_decision, top1 = [], 0, 0, 0, 0
+        for _ in range(q):
+            if perturbar is None:
+                verdad = None
+                leida = _placa(rnd)
+                while leida in registradas:
+                    leida = _placa(rnd)
+            else:
+                verdad = rnd.choice(placas)
+                leida = perturbar(verdad)
+            # como Plate Recognizer: la lectura principal y un par de alternativas con menos score
+            score = round(rnd.uniform(0.80, 0.95), 3)
+            candidatos = [(leida, score), (_editar(rnd, leida), score * 0.5), (_confundir(rnd, leida), score * 0.4)]
+
+            t = time.perf_counter()
+            match, ranking = mejor_coincidencia(candidatos, idx=idx)
+            tiempos.append((time.perf_counter() - t) * 1e6)
+            if verdad and ranking and ranking[0]["placa"] == verdad:
+                top1 += 1
+            if match is None:
+                sin_decision += 1
+            elif match["placa"] == verdad:
+                aciertos += 1
+            else:
+                errores += 1
+
+        tiempos.sort()
+        p = lambda x: tiempos[min(len(tiempos) - 1, int(len(tiempos) * x))]
+        self.stdout.write(
+            f"{nombre:>14}: aciertos {aciertos / q:6.1%}  errores {errores / q:6.1%}  "
+            f"sin decisión {sin_decision / q:6.1%}  top-1 ranking {top1 / q:6.1%}  |  p50 {p(0.5):6.0f} µs  p95 {p(0.95):6.0f} µs  "
+            f"p99 {p(0.99):6.0f} µs  max {tiempos[-1]:6.0f} µs  media {statistics.mean(tiempos):6.0f} µs"
+        )
@@ -0,0 +1,106 @@
+# benchmarks/management/commands/eval_face_ann.py
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from smartcondominio.ai.face_index import IVFFaceIndex, DIM, normalizar_filas
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+def galeria_sintetica(rng, identidades, fotos=2, grupos=64):
+    """
+    Embeddings con estructura parecida a ArcFace: identidades alrededor de unos
+    pocos "grupos" (coseno ~0.25 entre identidades del mismo grupo) y fotos de una
+    misma identidad con coseno ~0.7 entre sí. Devuelve (ids, matriz, base_por_identidad).
+    """
+    centros = normalizar_filas(rng.standard_normal((grupos, DIM), dtype=np.float32))
+    grupo = rng.integers(grupos, size=identidades)
+    base = normalizar_filas(0.5 * centros[grupo] + normalizar_filas(rng.standard_normal((identidades, DIM), dtype=np.float32)))
+    ids, filas = [], []
+    for f in range(fotos):
+        filas.append(foto(rng, base))
+        ids.extend(f"p{i}" for i in range(identidades))
+    return ids, np.concatenate(filas), base
+
+
+def foto(rng, base):
+    return normalizar_filas(base + 0.6 * normalizar_filas(rng.standard_normal(base.shape, dtype=np.float32)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Evalúa el índice IVF contra la búsqueda exacta: recall@1 y recall@k (personas del "
+        "top-k exacto que también devuelve el IVF) y latencia, para varios nprobe. "
+        "Por defecto con una galería sintética en un directorio temporal; con --dir, sobre un índice real "
+        "(las consultas son fotos del índice con ruido)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--identidades", type=int, default=50000)
+        parser.add_argument("--fotos", type=int, default=2, help="Fotos por identidad.")
+        parser.add_argument("--consultas", type=int, default=300)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--nprobe", default="1,4,8,16,32,64")
+        parser.add_argument("--nlist", type=int)
+        parser.add_argument("--dir", help="Evaluar un índice existente (no lo modifica salvo que falte entrenarlo).")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(opts["seed"])
+        if opts["dir"]:
+            index = IVFFaceIndex(Path(opts["dir"]), min_filas=0)
+            n, arr, _ = index._snapshot()
+            if not n:
+                raise CommandError("El índice está vacío")
+            if not (index.stats()["entrenamiento"]):
+                index.entrenar(nlist=opts["nlist"])
+            muestras = np.asarray(arr["embeddings"][np.sort(rng.integers(n, size=opts["consultas"]))])
+            self._evaluar(index, foto(rng, muestras), opts)
+            return
+
+        with tempfile.TemporaryDirectory(prefix="face_ann_") as tmp:
+            index = IVFFaceIndex(Path(tmp), min_filas=0)
+            ids, X, base = galeria_sintetica(rng, opts["identidades"], opts["fotos"])
+            t0 = time.perf_counter()
+            for i in range(0, len(ids), 20000):
+                index.add_batch(ids[i:i + 20000], X[i:i + 20000])
+            t1 = time.perf_counter()
+            st = index.entrenar(nlist=opts["nlist"])
+            self.stdout.write(
+                f"Galería: {len(ids)} fotos de {opts['identidades']} identidades | carga {t1 - t0:.1f} s | "
+                f"entrenamiento {time.perf_counter() - t1:.1f} s (nlist={st['entrenamiento']['nlist']})"
+            )
+            consultas = foto(rng, base[rng.integers(opts["identidades"], size=opts["consultas"])])
+            self._evaluar(index, consultas, opts)
+
+    def _evaluar(self, index, consultas, opts):
+        k = opts["k"]
+        exactos, t_exacto = [], []
+        for q in consultas:
+            t = time.perf_counter()
+            exactos.append([pid for pid, _ in index.search_exact(q, k)])
+            t_exacto.append((time.perf_counter() - t) * 1000)
+        self.stdout.write(f"{'exacto':>12}: p50 {_pct(t_exacto, .5):7.2f} ms  p99 {_pct(t_exacto, .99):7.2f} ms")
+
+        for nprobe in [int(x) for x in opts["nprobe"].split(",") if x.strip()]:
+            r1 = rk = 0.0
+            tiempos = []
+            for q, exacto in zip(consultas, exactos):
+                t = time.perf_counter()
+                aprox = [pid for pid, _ in index.search(q, k, nprobe=nprobe)]
+                tiempos.append((time.perf_counter() - t) * 1000)
+                r1 += bool(aprox) and aprox[0] == exacto[0]
+                rk += len(set(aprox) & set(exacto)) / max(1, len(exacto))
+            m = len(consultas)
+            self.stdout.write(
+                f"{'nprobe=' + str(nprobe):>12}: recall@1 {r1 / m:6.1%}  recall@{k} {rk / m:6.1%}  |  "
+                f"p50 {_pct(tiempos, .5):7.2f} ms  p99 {_pct(tiempos, .99):7.2f} ms  "
+                f"(x{_pct(t_exacto, .5) / max(_pct(tiempos, .5), 1e-6):.1f} vs exacto)"
+            )
@@ -6,3 +6,4 @@ set -o errexit
 # pip install -r requirements.txt
 python manage.py collectstatic --no-input
 python manage.py migrate
+python manage.py createcachetable
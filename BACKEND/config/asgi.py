@@ -5,6 +5,18 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Garita async (smartcondominio/views_async.py, rutas .../async/...): servir con workers
+de uvicorn detrás de gunicorn, que sigue leyendo gunicorn.conf.py (warm-up incluido):
+
+    gunicorn config.asgi:application -k uvicorn_worker.UvicornWorker -w 2
+
+o solo uvicorn: ``uvicorn config.asgi:application --workers 2``. Con ASGI usar
+DB_CONN_MAX_AGE=0 (y un pooler como pgbouncer) porque sync_to_async abre conexiones
+por hilo. Las vistas sync siguen funcionando en este modo (Django las corre en hilos).
+
+El stream de eventos para las consolas de guardia (access/events/stream/, SSE) solo
+funciona acá: cada consola es una conexión abierta en el event loop, no un worker.
 """
 
 import os
@@ -49,6 +49,9 @@ INSTALLED_APPS = [
 
     "smartcondominio.apps.SmartCondominioConfig",
 ]
+# Benchmarks (benchmarks/): comandos bench_* / eval_* solo para desarrollo
+if os.getenv("BENCHMARKS", "false").lower() == "true":
+    INSTALLED_APPS.append("benchmarks")
 
 # --- Middleware ---
 MIDDLEWARE = [
@@ -85,13 +88,15 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"   # uvicorn (vistas async de garita, ver config/asgi.py)
 
 # --- Base de datos ---
 # Usa DATABASE_URL si está definido, si no, cae a SQLite.
 DATABASES = {
     "default": dj_database_url.config(
         default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
-        conn_max_age=600,
+        # con uvicorn (ASGI) conviene DB_CONN_MAX_AGE=0 y un pooler: las conexiones son por hilo
+        conn_max_age=int(os.getenv("DB_CONN_MAX_AGE", "600")),
         ssl_require=os.getenv("DATABASE_URL", "").startswith(("postgres://", "postgresql://")),
     )
 }
@@ -173,6 +178,31 @@ if STORAGE_BACKEND == "s3":
 STRIPE_API_KEY = os.getenv("STRIPE_API_KEY", "")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
 
+# --- Cobranza: mora fija que carga el barrido diario (manage.py barrer_mora) ---
+MORA_FIJA = os.getenv("MORA_FIJA", "0.00")
+
+# --- Cache ---
+# "estado_cuenta": respuestas de /api/estado-cuenta/ por unidad+versión.
+# ESTADO_CUENTA_CACHE = "locmem" (por proceso) | "file" | "db" (requiere createcachetable) | "dummy"
+ESTADO_CUENTA_CACHE = os.getenv("ESTADO_CUENTA_CACHE", "locmem")
+_EC_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "estado-cuenta"),
+    "file": ("django.core.cache.backends.filebased.FileBasedCache",
+             os.getenv("ESTADO_CUENTA_CACHE_DIR", str(BASE_DIR / ".cache" / "estado_cuenta"))),
+    "db": ("django.core.cache.backends.db.DatabaseCache", "estado_cuenta_cache"),
+    "dummy": ("django.core.cache.backends.dummy.DummyCache", ""),
+}
+_ec_backend, _ec_location = _EC_BACKENDS.get(ESTADO_CUENTA_CACHE, _EC_BACKENDS["locmem"])
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "estado_cuenta": {
+        "BACKEND": _ec_backend,
+        "LOCATION": _ec_location,
+        "TIMEOUT": int(os.getenv("ESTADO_CUENTA_CACHE_TIMEOUT", "86400")),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("ESTADO_CUENTA_CACHE_MAX", "5000"))},
+    },
+}
+
 # --- Base URL pública del sitio (para armar links absolutos en pagos/mock) ---
 SITE_URL = os.environ.get("SITE_URL", "http://localhost:8000")
 
@@ -183,12 +213,93 @@ SITE_URL = os.environ.get("SITE_URL", "http://localhost:8000")
 
 PLATE_RECOG_TOKEN = os.getenv("PLATE_RECOG_TOKEN", "")
 PLATE_REGIONS = os.getenv("PLATE_REGIONS", "bo")
+PLATE_RECOG_TIMEOUT = float(os.getenv("PLATE_RECOG_TIMEOUT", "4"))                  # s, lectura
+PLATE_RECOG_CONNECT_TIMEOUT = float(os.getenv("PLATE_RECOG_CONNECT_TIMEOUT", "2"))  # s, conexión
+PLATE_RECOG_URL = os.getenv("PLATE_RECOG_URL", "https://api.platerecognizer.com/v1/plate-reader/")
+PLATE_RECOG_MAX_CONEXIONES = int(os.getenv("PLATE_RECOG_MAX_CONEXIONES", "20"))  # pool httpx por worker (vistas async)
+GATE_ASYNC_HILOS = int(os.getenv("GATE_ASYNC_HILOS", "32"))  # hilos para boto3/OpenCV en las vistas async
+# Con el OCR caído: "deny" (ERROR_OCR) | "recientes" (plate_hint autorizada y vista con ALLOW_* hace poco)
+PLATE_DEGRADED_MODE = os.getenv("PLATE_DEGRADED_MODE", "deny")
+PLATE_DEGRADED_HORAS = float(os.getenv("PLATE_DEGRADED_HORAS", "24"))
+# Circuit breakers de reconocedores externos (circuit.py); por servicio: CIRCUIT_PLATERECOGNIZER_FALLOS, etc.
+CIRCUIT_FALLOS = int(os.getenv("CIRCUIT_FALLOS", "5"))            # fallos en la ventana para abrir
+CIRCUIT_VENTANA_S = float(os.getenv("CIRCUIT_VENTANA_S", "30"))
+CIRCUIT_ABIERTO_S = float(os.getenv("CIRCUIT_ABIERTO_S", "30"))   # luego pasa a medio abierto (sondas)
+CIRCUIT_LENTO_MS = float(os.getenv("CIRCUIT_LENTO_MS", "0")) or None  # llamadas más lentas cuentan como fallo
+CIRCUIT_SONDAS = int(os.getenv("CIRCUIT_SONDAS", "1"))
+# Bitácora de garita: particiones y retención (manage.py archivar_eventos, services_archivo.py)
+EVENTOS_PARTICIONES_ADELANTE = int(os.getenv("EVENTOS_PARTICIONES_ADELANTE", "3"))  # meses (Postgres)
+# sin particiones: luego a *Archivo (0 = no). La API no lee *Archivo: activarlo acorta la bitácora visible
+EVENTOS_ACTIVOS_DIAS = int(os.getenv("EVENTOS_ACTIVOS_DIAS", "0"))
+EVENTOS_PAYLOAD_DIAS = int(os.getenv("EVENTOS_PAYLOAD_DIAS", "0"))         # payload a frío (0 = no)
+EVENTOS_RETENCION_DIAS = int(os.getenv("EVENTOS_RETENCION_DIAS", "0"))     # fuera de la BD (0 = nunca)
+EVENTOS_ARCHIVO_PREFIJO = os.getenv("EVENTOS_ARCHIVO_PREFIJO", "archivo/eventos")
+# JSON de los reconocedores más grande que esto va comprimido a PayloadBlob (payloads.py)
+PAYLOAD_INLINE_BYTES = int(os.getenv("PAYLOAD_INLINE_BYTES", "1024"))
+# Eventos de garita en vivo (SSE, stream_garita.py): backlog del hub por proceso, latido
+GATE_STREAM_ACTIVO = os.getenv("GATE_STREAM_ACTIVO", "true").lower() == "true"
+GATE_STREAM_BACKLOG = int(os.getenv("GATE_STREAM_BACKLOG", "1000"))
+# al reanudar desde la BD se repiten estos ids bajo la marca (un id menor puede confirmarse después)
+GATE_STREAM_VENTANA_IDS = int(os.getenv("GATE_STREAM_VENTANA_IDS", "200"))
+GATE_STREAM_HEARTBEAT_S = float(os.getenv("GATE_STREAM_HEARTBEAT_S", "15"))
+# Cubos de analítica de garita (services_rollups.py): el compactador deja fuera los eventos más nuevos que esto
+ROLLUP_DEMORA_S = float(os.getenv("ROLLUP_DEMORA_S", "60"))
+# ...y la API suma en vivo lo no compactado solo de esta ventana (más atrás: al_dia=false)
+ROLLUP_VIVO_MAX_S = float(os.getenv("ROLLUP_VIVO_MAX_S", "900"))
 OCR_CONFIDENCE_THRESHOLD = float(os.getenv("OCR_CONFIDENCE_THRESHOLD", "0.60"))
 VISITOR_TIME_TOLERANCE_MIN = int(os.getenv("VISITOR_TIME_TOLERANCE_MIN", "10"))
 
 OPEN_ON_ALLOW = os.getenv("OPEN_ON_ALLOW", "false").lower() == "true"
 
+# Índice en memoria de placas autorizadas (plate_index.py)
+PLATE_INDEX_TTL = int(os.getenv("PLATE_INDEX_TTL", "60"))   # seg. entre recargas completas
+# cada cuánto un worker compara su índice con PlacasVersion (cambios hechos en otros workers);
+# 0 = en cada decisión. Es lo más que una baja hecha en otro proceso tarda en dejar de abrir
+PLATE_INDEX_VERSION_MS = float(os.getenv("PLATE_INDEX_VERSION_MS", "500"))
+# true: una placa que no está en el índice se consulta igual en la BD (dos queries por rechazo)
+PLATE_INDEX_MISS_FALLBACK = os.getenv("PLATE_INDEX_MISS_FALLBACK", "false").lower() == "true"
+# Coincidencia aproximada de placas (lecturas del OCR vs. placas autorizadas): el ranking queda
+# siempre en el payload; solo con PLATE_FUZZY_ENABLED abre el portón (reason con "[APROX]")
+PLATE_FUZZY_ENABLED = os.getenv("PLATE_FUZZY_ENABLED", "false").lower() == "true"
+PLATE_FUZZY_MIN_CONF = float(os.getenv("PLATE_FUZZY_MIN_CONF", "0.70"))      # score_ocr * (1 - PENALIZACION * distancia)
+PLATE_FUZZY_PENALIZACION = float(os.getenv("PLATE_FUZZY_PENALIZACION", "0.30"))
+PLATE_FUZZY_MAX_DIST = float(os.getenv("PLATE_FUZZY_MAX_DIST", "1.0"))       # confusión = 0.25, otra edición = 1
+PLATE_FUZZY_MARGEN = float(os.getenv("PLATE_FUZZY_MARGEN", "0.05"))          # ventaja mínima sobre la segunda
+PLATE_FUZZY_MAX_CANDIDATOS = int(os.getenv("PLATE_FUZZY_MAX_CANDIDATOS", "10"))
+PLATE_FUZZY_BUDGET_MS = float(os.getenv("PLATE_FUZZY_BUDGET_MS", "5"))
+
+# Motor de las vistas de rostros (face_backends.py): aws (Rekognition) | local (ai/face.py) | fake (pruebas)
+FACE_BACKEND = os.environ.get("FACE_BACKEND", "aws")
 FACE_THRESHOLD = float(os.environ.get("FACE_THRESHOLD", "0.40"))
+# Similarity (0..100) que le corresponde a FACE_THRESHOLD en el backend local (como FaceMatchThreshold)
+FACE_LOCAL_MATCH_THRESHOLD = float(os.environ.get("REKOG_MATCH_THRESHOLD", "90"))
+# Con el circuito de Rekognition abierto, responder con otro backend ("local") o fallar rápido ("")
+FACE_DEGRADED_BACKEND = os.environ.get("FACE_DEGRADED_BACKEND", "")
+# Índice de rostros de ai/face.py: "ivf" (aproximado, exacto mientras no se entrene) | "exact"
+FACE_INDEX_BACKEND = os.environ.get("FACE_INDEX_BACKEND", "ivf")
+FACE_IVF_NPROBE = int(os.environ.get("FACE_IVF_NPROBE", "16"))          # listas revisadas por búsqueda
+FACE_IVF_MIN_FILAS = int(os.environ.get("FACE_IVF_MIN_FILAS", "20000"))  # debajo, búsqueda exacta
+# Precarga del modelo de rostros por worker (ai/warmup.py): off | post_worker_init | ready
+FACE_WARMUP = os.environ.get("FACE_WARMUP", "off")
+# Servidor local de embeddings (manage.py face_embed_server); vacío = cada worker carga el modelo
+FACE_EMBED_SOCKET = os.environ.get("FACE_EMBED_SOCKET", "")
+FACE_EMBED_TIMEOUT = float(os.environ.get("FACE_EMBED_TIMEOUT", "10"))
+FACE_EMBED_FALLBACK_LOCAL = os.environ.get("FACE_EMBED_FALLBACK_LOCAL", "false").lower() == "true"
+# Micro-batching de embeddings en el worker (ai/batching.py): lote de hasta N imágenes o N ms de
+# espera. Opt-in: con 1 cada pedido infiere solo, sin esperar (ver bench_face_batching antes de subirlo)
+FACE_BATCH_MAX = int(os.environ.get("FACE_BATCH_MAX", "1"))            # 1 = sin lotes
+FACE_BATCH_WAIT_MS = float(os.environ.get("FACE_BATCH_WAIT_MS", "5"))
+FACE_BATCH_HILOS = int(os.environ.get("FACE_BATCH_HILOS", "1"))
+# Lote del servidor de embeddings (face_embed_server): ya es un proceso aparte con varios hilos
+FACE_EMBED_BATCH_MAX = int(os.environ.get("FACE_EMBED_BATCH_MAX", "8"))
+# Preprocesado de fotos de cámara (ai/preprocess.py): decodificación reducida, orientación y recorte del rostro
+FACE_PREPROCESS = os.environ.get("FACE_PREPROCESS", "true").lower() == "true"
+FACE_PREPROCESS_LADO_MAX = int(os.environ.get("FACE_PREPROCESS_LADO_MAX", "1280"))      # px, lado largo tras decodificar
+FACE_PREPROCESS_RECORTE = os.environ.get("FACE_PREPROCESS_RECORTE", "true").lower() == "true"
+FACE_PREPROCESS_MARGEN = float(os.environ.get("FACE_PREPROCESS_MARGEN", "0.4"))        # fracción de la caja por lado
+FACE_PREPROCESS_RECORTE_LADO = int(os.environ.get("FACE_PREPROCESS_RECORTE_LADO", "480"))
+FACE_PREPROCESS_DETECCION_LADO = int(os.environ.get("FACE_PREPROCESS_DETECCION_LADO", "360"))
+FACE_PREPROCESS_CALIDAD = int(os.environ.get("FACE_PREPROCESS_CALIDAD", "90"))         # JPEG enviado/snapshot
 
 CAMERA_DIRECTIONS = {
     "gate-entrada": "ENTRADA",
@@ -0,0 +1,12 @@
+# gunicorn.conf.py
+# gunicorn lo lee solo si arranca desde BACKEND/ (Procfile: gunicorn config.wsgi).
+# También con workers de uvicorn (-k uvicorn_worker.UvicornWorker, ver config/asgi.py).
+
+
+def post_worker_init(worker):
+    # La app Django ya está cargada en el worker; con FACE_WARMUP=post_worker_init
+    # se precarga el modelo de rostros en un hilo (ver /api/health/face/).
+    from smartcondominio.ai import warmup
+
+    if warmup.modo() == "post_worker_init":
+        warmup.iniciar()
@@ -6,7 +6,9 @@ from .models import (
     Tarea, TareaComentario,
     AreaComun, AreaDisponibilidad, ReservaArea,
     Visitor, Visit,
-    Vehiculo, SolicitudVehiculo, AccessEvent
+    Vehiculo, SolicitudVehiculo, AccessEvent,
+    BillingJob, BarridoMora, MovimientoCuenta, UnidadSaldo,
+    AccessRollupHora,
 )
 
 # --- Profile ---
@@ -135,3 +137,50 @@ class AccessEventAdmin(admin.ModelAdmin):
     list_display = ("created_at", "camera_id", "plate_norm", "score", "decision", "opened")
     search_fields = ("plate_norm", "plate_raw", "reason")
     list_filter = ("decision", "opened", "camera_id")
+    readonly_fields = ("resumen", "payload_blob")
+
+@admin.register(BillingJob)
+class BillingJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "processed", "total", "cuotas_afectadas", "worker_id", "heartbeat_at", "created_at")
+    list_filter = ("status",)
+    readonly_fields = ("cursor_item", "cursor_unidad", "heartbeat_at", "started_at", "finished_at")
+
+@admin.register(BarridoMora)
+class BarridoMoraAdmin(admin.ModelAdmin):
+    list_display = ("fecha", "terminado", "mora_fija", "cuotas_con_mora", "duracion_ms", "finished_at")
+    readonly_fields = ("transiciones",)
+
+@admin.register(MovimientoCuenta)
+class MovimientoCuentaAdmin(admin.ModelAdmin):
+    list_display = ("id", "unidad", "tipo", "cargo", "abono", "cuota_id", "pago_id", "created_at")   # pueden ya no existir
+    list_filter = ("tipo",)
+    search_fields = ("unidad__manzana", "unidad__numero", "detalle")
+    raw_id_fields = ("unidad", "cuota", "pago")
+
+    # append-only: solo lectura desde el admin
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(UnidadSaldo)
+class UnidadSaldoAdmin(admin.ModelAdmin):
+    list_display = ("unidad", "total_cargado", "total_abonado", "saldo", "updated_at")
+    readonly_fields = ("total_cargado", "total_abonado", "saldo", "updated_at")
+
+@admin.register(AccessRollupHora)
+class AccessRollupHoraAdmin(admin.ModelAdmin):
+    list_display = ("hora", "camera_id", "direction", "decision", "eventos", "abiertos")
+    list_filter = ("decision", "direction", "camera_id")
+    date_hierarchy = "hora"
+
+    # lo escriben compactar_rollups / reconstruir_rollups
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
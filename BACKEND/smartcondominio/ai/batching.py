@@ -0,0 +1,107 @@
+# BACKEND/smartcondominio/ai/batching.py
+"""
+Micro-batching: junta pedidos concurrentes y llama una sola vez a una función
+que procesa listas (p.ej. face.embed_batch_local).
+
+El lote se cierra cuando llega a max_batch elementos o cuando pasaron
+max_wait_ms desde que entró el primero, lo que ocurra antes. Con un solo
+pedido en vuelo la espera extra es como mucho max_wait_ms; bajo carga los
+lotes se llenan solos y la espera desaparece.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+log = logging.getLogger(__name__)
+
+_FIN = object()
+
+
+class MicroBatcher:
+    def __init__(self, fn, max_batch=8, max_wait_ms=5.0, hilos=1, nombre="batcher"):
+        """fn(lista) -> lista de resultados del mismo largo y orden."""
+        self.fn = fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self._cola = queue.Queue()
+        self._cerrado = False
+        self._stats_lock = threading.Lock()
+        self._stats = {"pedidos": 0, "lotes": 0, "errores": 0, "max_lote": 0}
+        self._hilos = [
+            threading.Thread(target=self._loop, name=f"{nombre}-{i}", daemon=True) for i in range(max(1, hilos))
+        ]
+        for h in self._hilos:
+            h.start()
+
+    # ---------- API ----------
+    def submit(self, item) -> Future:
+        if self._cerrado:
+            raise RuntimeError("MicroBatcher cerrado")
+        fut = Future()
+        self._cola.put((item, fut))
+        return fut
+
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            out = dict(self._stats)
+        out["lote_medio"] = round(out["pedidos"] / out["lotes"], 2) if out["lotes"] else 0
+        out.update({"cola": self._cola.qsize(), "max_batch": self.max_batch,
+                    "max_wait_ms": self.max_wait * 1000, "hilos": len(self._hilos)})
+        return out
+
+    def close(self, timeout=None):
+        self._cerrado = True
+        for _ in self._hilos:
+            self._cola.put(_FIN)
+        for h in self._hilos:
+            h.join(timeout)
+
+    # ---------- hilos ----------
+    def _juntar(self):
+        primero = self._cola.get()
+        if primero is _FIN:
+            return None
+        lote = [primero]
+        limite = time.monotonic() + self.max_wait
+        while len(lote) < self.max_batch:
+            resto = limite - time.monotonic()
+            try:
+                item = self._cola.get(timeout=resto) if resto > 0 else self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if item is _FIN:
+                self._cola.put(_FIN)   # que lo vea el próximo ciclo
+                break
+            lote.append(item)
+        return lote
+
+    def _loop(self):
+        while True:
+            lote = self._juntar()
+            if lote is None:
+                return
+            lote = [(item, fut) for item, fut in lote if fut.set_running_or_notify_cancel()]
+            if not lote:
+                continue
+            with self._stats_lock:
+                self._stats["lotes"] += 1
+                self._stats["pedidos"] += len(lote)
+                self._stats["max_lote"] = max(self._stats["max_lote"], len(lote))
+            try:
+                resultados = self.fn([item for item, _ in lote])
+                if len(resultados) != len(lote):
+                    raise ValueError(f"fn devolvió {len(resultados)} resultados para {len(lote)} pedidos")
+            except Exception as e:
+                log.exception("MicroBatcher: falló un lote de %d", len(lote))
+                with self._stats_lock:
+                    self._stats["errores"] += len(lote)
+                for _, fut in lote:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), res in zip(lote, resultados):
+                fut.set_result(res)
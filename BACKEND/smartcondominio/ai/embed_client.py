@@ -0,0 +1,155 @@
+# BACKEND/smartcondominio/ai/embed_client.py
+"""
+Cliente del servidor local de embeddings (manage.py face_embed_server).
+
+Un solo proceso tiene el modelo cargado; los workers le mandan la imagen por un
+socket Unix y reciben el embedding en memoria compartida (SharedMemory con
+`slots` ranuras de [seq uint64 | dim float32]). Por el socket solo viajan la
+imagen y una respuesta de 21 bytes con la ranura y su número de secuencia.
+
+Protocolo (big endian):
+  pedido:    REQ = (tipo, req_id, largo) + largo bytes de imagen
+  respuesta: RES = (estado, req_id, ranura, seq, largo) + largo bytes (JSON/errores)
+Al conectar, el servidor manda un RES con estado HOLA y en el cuerpo el JSON
+{"shm", "slots", "dim", "slot_bytes", "pid"}.
+
+No importa numpy ni el modelo hasta usarse: los workers que solo consultan al
+servidor no cargan InsightFace.
+"""
+import json
+import socket
+import struct
+import threading
+
+REQ = struct.Struct("!BII")
+RES = struct.Struct("!BIIQI")
+SEQ = struct.Struct("<Q")
+
+PEDIDO_EMBED, PEDIDO_PING = 1, 2
+OK, SIN_ROSTRO, ERROR, HOLA = 0, 1, 2, 3
+
+
+class EmbedServerError(Exception):
+    """El servidor de embeddings no está disponible o respondió con error."""
+
+
+def recv_exact(sock, n) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        parte = sock.recv(n - len(buf))
+        if not parte:
+            raise ConnectionError("conexión cerrada")
+        buf += parte
+    return bytes(buf)
+
+
+_shm_lock = threading.Lock()
+_shm_abiertas = {}
+
+
+def adjuntar_shm(nombre):
+    """
+    Abre (una vez por proceso) la memoria compartida del servidor, sin que este
+    proceso la borre al salir.
+    """
+    from multiprocessing import shared_memory, resource_tracker
+
+    with _shm_lock:
+        shm = _shm_abiertas.get(nombre)
+        if shm is None:
+            shm = shared_memory.SharedMemory(name=nombre, create=False)
+            try:
+                # en Python < 3.13 abrirla la registra en el resource_tracker, que la
+                # eliminaría cuando termine el worker aunque el servidor la siga usando
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except Exception:
+                pass
+            _shm_abiertas[nombre] = shm
+        return shm
+
+
+class _Conexion:
+    def __init__(self, path, timeout):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(str(path))
+        estado, _, _, _, largo = RES.unpack(recv_exact(self.sock, RES.size))
+        if estado != HOLA:
+            raise EmbedServerError("saludo inesperado del servidor de embeddings")
+        self.info = json.loads(recv_exact(self.sock, largo))
+        self.shm = adjuntar_shm(self.info["shm"])
+        self.req_id = 0
+
+    def cerrar(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def pedir(self, tipo, cuerpo=b""):
+        self.req_id = (self.req_id + 1) & 0xFFFFFFFF
+        self.sock.sendall(REQ.pack(tipo, self.req_id, len(cuerpo)) + cuerpo)
+        estado, req_id, ranura, seq, largo = RES.unpack(recv_exact(self.sock, RES.size))
+        extra = recv_exact(self.sock, largo) if largo else b""
+        if req_id != self.req_id:
+            raise EmbedServerError("respuesta fuera de orden")
+        return estado, ranura, seq, extra
+
+    def leer_ranura(self, ranura, seq):
+        import numpy as np
+
+        dim, off = self.info["dim"], ranura * self.info["slot_bytes"]
+        buf = self.shm.buf
+        antes = SEQ.unpack_from(buf, off)[0]
+        vec = np.frombuffer(buf, dtype=np.float32, count=dim, offset=off + SEQ.size).copy()
+        despues = SEQ.unpack_from(buf, off)[0]
+        if not (antes == despues == seq):
+            raise EmbedServerError("la ranura de memoria compartida se reutilizó antes de leerla")
+        return vec
+
+
+class EmbedClient:
+    """Una conexión por hilo (cada hilo tiene a lo sumo un pedido en curso)."""
+
+    def __init__(self, socket_path, timeout=10.0):
+        self.path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conexion(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            try:
+                con = _Conexion(self.path, self.timeout)
+            except (OSError, ValueError) as e:
+                raise EmbedServerError(f"No se pudo conectar a {self.path}: {e}") from e
+            self._local.con = con
+        return con
+
+    def _pedir(self, tipo, cuerpo=b""):
+        con = self._conexion()
+        try:
+            return con, con.pedir(tipo, cuerpo)
+        except (OSError, ConnectionError, struct.error) as e:
+            con.cerrar()
+            self._local.con = None
+            raise EmbedServerError(f"Servidor de embeddings: {e}") from e
+
+    def embed(self, file_bytes: bytes):
+        """Embedding normalizado (np.float32) del rostro más grande, o None si no hay rostro."""
+        con, (estado, ranura, seq, extra) = self._pedir(PEDIDO_EMBED, file_bytes)
+        if estado == SIN_ROSTRO:
+            return None
+        if estado != OK:
+            raise EmbedServerError(extra.decode("utf-8", "replace") or "error del servidor")
+        return con.leer_ranura(ranura, seq)
+
+    def ping(self) -> dict:
+        _, (estado, _, _, extra) = self._pedir(PEDIDO_PING)
+        return json.loads(extra or b"{}")
+
+    def close(self):
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            con.cerrar()
+            self._local.con = None
@@ -0,0 +1,170 @@
+# BACKEND/smartcondominio/ai/embed_server.py
+"""
+Servidor local de embeddings (lo corre manage.py face_embed_server).
+
+Dueño único del modelo: los workers se conectan por socket Unix (embed_client.py),
+cada conexión tiene un hilo lector que pasa los pedidos a un MicroBatcher
+(ai/batching.py) y `hilos` hilos de modelo procesan lotes de hasta max_batch
+imágenes o max_wait_ms de espera: la detección va imagen por imagen y el modelo
+de reconocimiento corre una sola vez para todos los rostros del lote. Los
+embeddings se escriben en una ranura de la memoria compartida y la respuesta
+solo lleva (ranura, seq).
+
+Con varios hilos de modelo se comparte la misma sesión ONNX (run() es
+thread-safe): la memoria queda en una copia del modelo y el throughput sube con
+los núcleos.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .batching import MicroBatcher
+from .embed_client import REQ, RES, SEQ, PEDIDO_EMBED, PEDIDO_PING, OK, SIN_ROSTRO, ERROR, HOLA, recv_exact
+
+log = logging.getLogger(__name__)
+
+MAX_IMAGEN = 32 * 1024 * 1024
+
+
+class EmbedServer:
+    def __init__(self, socket_path, embed_batch, dim=512, slots=1024, max_batch=16, max_wait_ms=5.0, hilos=1,
+                 shm_name=None):
+        """embed_batch(lista de bytes) -> lista de np.ndarray (dim,) normalizados o None (sin rostro)."""
+        self.path = str(socket_path)
+        self.embed_batch = embed_batch
+        self.dim = dim
+        self.slots = slots
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.hilos = hilos
+        self.slot_bytes = SEQ.size + dim * 4
+        self.shm_name = shm_name or f"smartcondo_emb_{os.getpid()}"
+        self.batcher = None
+        self._ranura_lock = threading.Lock()
+        self._seq = 0
+        self._cerrando = threading.Event()
+        self._cierre_lock = threading.Lock()
+        self._stats = {"sin_rostro": 0, "conexiones": 0, "desde": time.time()}
+        self.shm = None
+        self.sock = None
+
+    # ---------- ciclo de vida ----------
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)   # socket viejo de una ejecución anterior
+        self.shm = shared_memory.SharedMemory(name=self.shm_name, create=True, size=self.slots * self.slot_bytes)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        os.chmod(self.path, 0o660)
+        self.sock.listen(128)
+        self.batcher = MicroBatcher(self.embed_batch, self.max_batch, self.max_wait_ms, self.hilos, "embed-modelo")
+        log.info("face_embed_server en %s (shm %s, %d ranuras, lote %d / %.1f ms, %d hilos)",
+                 self.path, self.shm_name, self.slots, self.max_batch, self.max_wait_ms, self.hilos)
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while not self._cerrando.is_set():
+                try:
+                    conn, _ = self.sock.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._conexion, args=(conn,), daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        self._cerrando.set()
+        with self._cierre_lock:
+            self._cerrar()
+
+    def _cerrar(self):
+        if self.batcher is not None:
+            self.batcher.close(timeout=5)
+            self.batcher = None
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+                if os.path.exists(self.path):
+                    os.unlink(self.path)
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def stats(self):
+        return {**self._stats, **(self.batcher.stats() if self.batcher else {}), "pid": os.getpid()}
+
+    # ---------- conexiones ----------
+    def _responder(self, conn, wlock, estado, req_id, ranura=0, seq=0, extra=b""):
+        with wlock:
+            conn.sendall(RES.pack(estado, req_id, ranura, seq, len(extra)) + extra)
+
+    def _conexion(self, conn):
+        wlock = threading.Lock()
+        self._stats["conexiones"] += 1
+        try:
+            hola = json.dumps({
+                "shm": self.shm_name, "slots": self.slots, "dim": self.dim,
+                "slot_bytes": self.slot_bytes, "pid": os.getpid(),
+            }).encode()
+            self._responder(conn, wlock, HOLA, 0, extra=hola)
+            while True:
+                tipo, req_id, largo = REQ.unpack(recv_exact(conn, REQ.size))
+                if largo > MAX_IMAGEN:
+                    self._responder(conn, wlock, ERROR, req_id, extra=b"imagen demasiado grande")
+                    break
+                cuerpo = recv_exact(conn, largo) if largo else b""
+                if tipo == PEDIDO_PING:
+                    self._responder(conn, wlock, OK, req_id, extra=json.dumps(self.stats()).encode())
+                elif tipo == PEDIDO_EMBED:
+                    fut = self.batcher.submit(cuerpo)
+                    fut.add_done_callback(lambda f, req_id=req_id: self._completar(conn, wlock, req_id, f))
+                else:
+                    self._responder(conn, wlock, ERROR, req_id, extra=b"pedido desconocido")
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._stats["conexiones"] -= 1
+            conn.close()
+
+    # ---------- modelo ----------
+    def _escribir(self, vec):
+        with self._ranura_lock:
+            self._seq += 1
+            seq = self._seq
+            ranura = seq % self.slots
+        off = ranura * self.slot_bytes
+        buf = self.shm.buf
+        SEQ.pack_into(buf, off, 0)   # 0 = escribiendo
+        np.frombuffer(buf, dtype=np.float32, count=self.dim, offset=off + SEQ.size)[:] = vec
+        SEQ.pack_into(buf, off, seq)
+        return ranura, seq
+
+    def _completar(self, conn, wlock, req_id, fut):
+        """Callback del MicroBatcher (corre en el hilo de modelo que procesó el lote)."""
+        e = fut.exception()
+        if e is not None:
+            self._enviar(conn, wlock, ERROR, req_id, extra=str(e).encode()[:500])
+            return
+        vec = fut.result()
+        if vec is None:
+            self._stats["sin_rostro"] += 1
+            self._enviar(conn, wlock, SIN_ROSTRO, req_id)
+        else:
+            ranura, seq = self._escribir(np.asarray(vec, dtype=np.float32))
+            self._enviar(conn, wlock, OK, req_id, ranura, seq)
+
+    def _enviar(self, *args, **kwargs):
+        try:
+            self._responder(*args, **kwargs)
+        except OSError:
+            pass   # el cliente se fue; su hilo lector cierra la conexión
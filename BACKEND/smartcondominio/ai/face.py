@@ -1,19 +1,19 @@
 # BACKEND/smartcondominio/ai/face.py
-import os, json
 from pathlib import Path
 import numpy as np
-import cv2
 from functools import lru_cache
-from sklearn.metrics.pairwise import cosine_similarity
 
 from django.conf import settings
 
-# InsightFace
-from insightface.app import FaceAnalysis
+from .face_index import FaceIndex, crear_indice
+from .embed_client import EmbedClient, EmbedServerError
+from .batching import MicroBatcher
+from . import preprocess
 
 DATA_DIR = Path(settings.MEDIA_ROOT) / "face_data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
-VECTORS_PATH = DATA_DIR / "vectors.jsonl"
+VECTORS_PATH = DATA_DIR / "vectors.jsonl"       # formato anterior (solo se importa)
+INDEX_DIR = DATA_DIR / "index"
 
 THRESHOLD = float(getattr(settings, "FACE_THRESHOLD", 0.40))
 
@@ -22,17 +22,69 @@ def _get_face_app():
     """
     Carga única del modelo ArcFace (CPU).
     Se mantiene en memoria durante el proceso de Django.
+    (Import diferido: con FACE_EMBED_SOCKET los workers no cargan InsightFace.)
     """
+    from insightface.app import FaceAnalysis
+
     app = FaceAnalysis(name="buffalo_l")
     app.prepare(ctx_id=-1, det_size=(640, 640))  # CPU
     return app
 
+@lru_cache(maxsize=1)
+def get_index() -> FaceIndex:
+    """
+    Índice de embeddings (ai/face_index.py, backend FACE_INDEX_BACKEND). Si todavía
+    no existe y hay un vectors.jsonl de antes, lo importa una vez y lo deja
+    renombrado como .imported.
+    """
+    index = crear_indice(
+        INDEX_DIR,
+        backend=getattr(settings, "FACE_INDEX_BACKEND", "ivf"),
+        nprobe=getattr(settings, "FACE_IVF_NPROBE", 16),
+        min_filas=getattr(settings, "FACE_IVF_MIN_FILAS", 20000),
+    )
+    index.import_legacy(VECTORS_PATH)
+    return index
+
 def _read_image(file_bytes: bytes):
-    arr = np.frombuffer(file_bytes, np.uint8)
-    img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-    return img
+    # decodificación reducida + orientación EXIF; el detector trabaja a 640 igual
+    return preprocess.decodificar(file_bytes)
+
+@lru_cache(maxsize=1)
+def get_client():
+    """Cliente del servidor de embeddings (manage.py face_embed_server) o None si no está configurado."""
+    path = getattr(settings, "FACE_EMBED_SOCKET", "")
+    if not path:
+        return None
+    return EmbedClient(path, timeout=getattr(settings, "FACE_EMBED_TIMEOUT", 10.0))
+
+@lru_cache(maxsize=1)
+def _get_batcher():
+    """
+    Lotes en este proceso: pedidos concurrentes (gates + app de guardia) comparten una inferencia.
+    Solo con FACE_BATCH_MAX > 1; con el default (1) embed_from_bytes no pasa por aquí.
+    """
+    return MicroBatcher(
+        embed_batch_local,
+        max_batch=getattr(settings, "FACE_BATCH_MAX", 1),
+        max_wait_ms=getattr(settings, "FACE_BATCH_WAIT_MS", 5.0),
+        hilos=getattr(settings, "FACE_BATCH_HILOS", 1),
+        nombre="face-batch",
+    )
 
 def embed_from_bytes(file_bytes: bytes):
+    client = get_client()
+    if client is not None:
+        try:
+            return client.embed(file_bytes)
+        except EmbedServerError:
+            if not getattr(settings, "FACE_EMBED_FALLBACK_LOCAL", False):
+                raise
+    if getattr(settings, "FACE_BATCH_MAX", 1) > 1:
+        return _get_batcher()(file_bytes, timeout=getattr(settings, "FACE_EMBED_TIMEOUT", 10.0))
+    return embed_local(file_bytes)
+
+def embed_local(file_bytes: bytes):
     app = _get_face_app()
     img = _read_image(file_bytes)
     if img is None:
@@ -43,46 +95,64 @@ def embed_from_bytes(file_bytes: bytes):
     face = max(faces, key=lambda f: (f.bbox[2]-f.bbox[0])*(f.bbox[3]-f.bbox[1]))
     return face.normed_embedding.astype(np.float32)
 
+def embed_batch_local(images: list[bytes]) -> list:
+    """
+    Como embed_local para varias imágenes: detección una por una y un solo paso del
+    modelo de reconocimiento para todos los rostros (mismo recorte alineado y
+    normalización que FaceAnalysis.get). Lo usa face_embed_server.
+    """
+    from insightface.utils import face_align
+
+    app = _get_face_app()
+    det, rec = app.det_model, app.models["recognition"]
+    out, crops, pos = [None] * len(images), [], []
+    for i, data in enumerate(images):
+        img = _read_image(data)
+        if img is None:
+            continue
+        bboxes, kpss = det.detect(img, max_num=0, metric="default")
+        if bboxes.shape[0] == 0 or kpss is None:
+            continue
+        j = int(np.argmax((bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])))
+        crops.append(face_align.norm_crop(img, landmark=kpss[j], image_size=rec.input_size[0]))
+        pos.append(i)
+    if crops:
+        feats = np.asarray(rec.get_feat(crops), dtype=np.float32).reshape(len(crops), -1)
+        feats /= np.linalg.norm(feats, axis=1, keepdims=True)
+        for i, f in zip(pos, feats):
+            out[i] = f
+    return out
+
 def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
-    return float(cosine_similarity([a], [b])[0][0])
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    return float(a @ b / ((np.linalg.norm(a) * np.linalg.norm(b)) or 1.0))
 
 def register_embedding(person_id: str, file_bytes: bytes) -> dict:
     emb = embed_from_bytes(file_bytes)
     if emb is None:
         return {"ok": False, "detail": "No face detected"}
-    item = {"person_id": person_id, "embedding": emb.tolist()}
-    with open(VECTORS_PATH, "a", encoding="utf-8") as f:
-        f.write(json.dumps(item) + "\n")
+    get_index().add(person_id, emb)
     return {"ok": True, "person_id": person_id}
 
+def delete_person(person_id: str) -> dict:
+    borradas = get_index().delete(person_id)
+    return {"ok": True, "person_id": person_id, "deleted": borradas}
+
 def identify_bytes(file_bytes: bytes, threshold: float | None = None, top_k: int = 5) -> dict:
     thr = threshold if threshold is not None else THRESHOLD
     probe = embed_from_bytes(file_bytes)
     if probe is None:
         return {"ok": False, "detail": "No face detected"}
 
-    if not VECTORS_PATH.exists():
-        return {"ok": True, "match": False, "best_id": None, "best_similarity": None, "candidates": []}
-
-    sims = []
-    with open(VECTORS_PATH, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            row = json.loads(line)
-            v = np.array(row["embedding"], dtype=np.float32)
-            sims.append((row["person_id"], cosine_sim(probe, v)))
-
+    sims = get_index().search(probe, k=top_k)
     if not sims:
         return {"ok": True, "match": False, "best_id": None, "best_similarity": None, "candidates": []}
 
-    sims.sort(key=lambda x: x[1], reverse=True)
     best_id, best_sim = sims[0]
     return {
         "ok": True,
         "match": best_sim >= thr,
         "best_id": best_id,
         "best_similarity": float(best_sim),
-        "candidates": [{"person_id": pid, "similarity": float(s)} for pid, s in sims[:top_k]],
+        "candidates": [{"person_id": pid, "similarity": float(s)} for pid, s in sims],
     }
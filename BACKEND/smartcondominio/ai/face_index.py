@@ -0,0 +1,524 @@
+# BACKEND/smartcondominio/ai/face_index.py
+"""
+Índice de rostros en disco para identify_bytes: todos los embeddings normalizados
+en una sola matriz float32 (embeddings.npy, abierta con memmap) + arreglos
+paralelos por fila (ids.npy, activos.npy, listas.npy) y meta.json con cuántas
+filas son válidas.
+
+- FaceIndex busca exacto: un producto matriz·vector (similitud coseno = producto
+  punto, los vectores ya están normalizados) y argpartition para el top-k.
+- IVFFaceIndex (ANN) agrupa las filas en nlist listas con k-means esférico y en
+  cada búsqueda solo compara contra las nprobe listas más cercanas a la consulta.
+  Mientras no esté entrenado o haya pocas filas busca exacto.
+- Enrolar escribe solo las filas nuevas en la matriz preasignada y luego publica
+  el nuevo count en meta.json (os.replace). Cuando se llena se copia a archivos
+  con el doble de capacidad (costo amortizado constante por alta).
+- Borrar marca las filas como inactivas (activos=0); compactar() las elimina.
+- Varios procesos (workers de gunicorn) comparten los archivos: las escrituras se
+  serializan con flock y cada lector vuelve a leer meta.json cuando cambia
+  (inodo/mtime).
+- ai/face.py importa el vectors.jsonl anterior la primera vez que abre el índice.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows (desarrollo): solo el lock del proceso
+    fcntl = None
+
+DIM = 512                 # ArcFace (buffalo_l)
+ID_DTYPE = "<U64"
+CAPACIDAD_INICIAL = 1024
+SOBREMUESTREO = 4         # filas extra del top-k para deduplicar por persona
+CHUNK_FILAS = 16384       # filas por producto al asignar/entrenar (acota la memoria temporal)
+
+
+def normalizar(v) -> np.ndarray:
+    v = np.asarray(v, dtype=np.float32).reshape(-1)
+    n = float(np.linalg.norm(v))
+    return v / n if n > 0 else v
+
+
+def normalizar_filas(m) -> np.ndarray:
+    m = np.asarray(m, dtype=np.float32)
+    n = np.linalg.norm(m, axis=1, keepdims=True)
+    n[n == 0] = 1.0
+    return m / n
+
+
+@contextmanager
+def _flock(path):
+    with open(path, "a") as lf:
+        if fcntl:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+
+
+class FaceIndex:
+    """
+    Búsqueda exacta; también es la interfaz común de los índices:
+    add / add_batch / delete / search / count / compactar / stats.
+    """
+    backend = "exact"
+
+    def __init__(self, directory, dim=DIM):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self._meta_path = self.dir / "meta.json"
+        self._lock_path = self.dir / "index.lock"
+        self._lock = threading.RLock()
+        self._arr = {}            # nombre -> memmap de solo lectura (None si falta el archivo)
+        self._meta = None
+        self._meta_firma = None
+
+    # ---------- archivos ----------
+    def _spec(self):
+        # nombre -> (dtype, forma de cada fila, valor de relleno)
+        return {
+            "embeddings": (np.float32, (self.dim,), 0),
+            "ids": (ID_DTYPE, (), ""),
+            "activos": (np.uint8, (), 0),
+            "listas": (np.int32, (), -1),
+        }
+
+    def _path(self, nombre):
+        return self.dir / f"{nombre}.npy"
+
+    @property
+    def _count(self):
+        return self._meta["count"] if self._meta else 0
+
+    @property
+    def _capacidad(self):
+        return self._meta["capacidad"] if self._meta else 0
+
+    @contextmanager
+    def _escritura(self):
+        with self._lock, _flock(self._lock_path):
+            self._refrescar(forzar=True)
+            yield
+
+    def _escribir_meta(self, **cambios):
+        meta = dict(self._meta or {
+            "dim": self.dim, "count": 0, "capacidad": 0, "generacion": 0, "borrados": 0, "entrenamiento": None,
+        })
+        meta.update(cambios)
+        tmp = self._meta_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._meta_path)
+        st = self._meta_path.stat()
+        self._meta, self._meta_firma = meta, (st.st_ino, st.st_mtime_ns)
+
+    def _abrir(self):
+        self._arr = {
+            nombre: np.load(self._path(nombre), mmap_mode="r") if self._path(nombre).exists() else None
+            for nombre in self._spec()
+        }
+
+    def _refrescar(self, forzar=False):
+        """Relee meta.json si otro proceso lo cambió (o si no se abrió todavía)."""
+        try:
+            st = self._meta_path.stat()
+            firma = (st.st_ino, st.st_mtime_ns)   # os.replace => inodo nuevo en cada escritura
+        except FileNotFoundError:
+            firma = None
+        if not forzar and firma == self._meta_firma:
+            return
+        if firma is None:
+            self._arr, self._meta, self._meta_firma = {}, None, None
+            return
+        with open(self._meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["dim"] != self.dim:
+            raise ValueError(f"El índice en {self.dir} es de dimensión {meta['dim']}, no {self.dim}")
+        meta.setdefault("generacion", 0)
+        meta.setdefault("borrados", 0)
+        meta.setdefault("entrenamiento", None)
+        anterior = self._meta
+        self._meta, self._meta_firma = meta, firma
+        if not self._arr or anterior is None or (meta["capacidad"], meta["generacion"]) != (
+                anterior["capacidad"], anterior["generacion"]):
+            self._abrir()
+        self._al_refrescar()
+
+    def _al_refrescar(self):
+        """Hook para que las subclases invaliden lo que derivan de los arreglos."""
+
+    def _reescribir(self, capacidad, filas=None, **meta):
+        """
+        Escribe arreglos nuevos de la capacidad pedida con las filas indicadas (todas
+        las válidas si filas es None) y los reemplaza de una vez. También completa
+        archivos que falten (índices de una versión anterior).
+        """
+        n = self._count
+        total = n if filas is None else len(filas)
+        tmps = {}
+        for nombre, (dtype, forma, relleno) in self._spec().items():
+            tmp = self.dir / f"{nombre}.tmp.npy"
+            nuevo = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=(capacidad,) + forma)
+            if relleno:
+                nuevo[:] = relleno
+            actual = self._arr.get(nombre)
+            if actual is not None:
+                nuevo[:total] = actual[:n] if filas is None else actual[filas]
+            elif nombre == "activos":
+                nuevo[:total] = 1
+            nuevo.flush()
+            del nuevo
+            tmps[nombre] = tmp
+        for nombre, tmp in tmps.items():
+            os.replace(tmp, self._path(nombre))
+        self._escribir_meta(
+            count=total, capacidad=capacidad, generacion=(self._meta or {}).get("generacion", 0) + 1, **meta,
+        )
+        self._abrir()
+
+    def _crecer(self, necesarias):
+        capacidad = max(CAPACIDAD_INICIAL, self._capacidad)
+        while capacidad < necesarias:
+            capacidad *= 2
+        if capacidad != self._capacidad or any(self._arr.get(n) is None for n in self._spec()):
+            self._reescribir(capacidad)
+
+    # ---------- altas / bajas ----------
+    def add(self, person_id, embedding):
+        return self.add_batch([person_id], [embedding])
+
+    def add_batch(self, person_ids, embeddings):
+        """Agrega filas al final (sin reescribir las existentes). Devuelve el total de filas."""
+        person_ids = [str(p) for p in person_ids]
+        if not person_ids:
+            return self.count()
+        m = normalizar_filas(np.asarray(embeddings, dtype=np.float32).reshape(len(person_ids), -1))
+        if m.shape[1] != self.dim:
+            raise ValueError(f"Embedding de dimensión {m.shape[1]}, se esperaba {self.dim}")
+        if any(len(p) > 64 for p in person_ids):
+            raise ValueError("person_id de más de 64 caracteres")
+
+        with self._escritura():
+            inicio, fin = self._count, self._count + len(person_ids)
+            self._crecer(fin)
+            listas = self._asignar(m)
+            for nombre, valores in (("embeddings", m), ("ids", person_ids), ("activos", 1), ("listas", listas)):
+                arr = np.load(self._path(nombre), mmap_mode="r+")
+                arr[inicio:fin] = valores
+                arr.flush()
+                del arr
+            # las filas quedan visibles recién al publicar el nuevo count
+            self._escribir_meta(count=fin)
+            return fin
+
+    def _asignar(self, m):
+        """Lista de cada fila nueva (-1 = sin lista; el índice exacto no usa listas)."""
+        return -1
+
+    def delete(self, person_id) -> int:
+        """Da de baja todas las filas de la persona. Devuelve cuántas filas borró."""
+        person_id = str(person_id)
+        with self._escritura():
+            n = self._count
+            if not n:
+                return 0
+            self._crecer(n)   # índices de una versión anterior: crea activos.npy
+            ids = self._arr["ids"][:n]
+            filas = np.flatnonzero((ids == person_id) & (self._arr["activos"][:n] == 1))
+            if len(filas):
+                activos = np.load(self._path("activos"), mmap_mode="r+")
+                activos[filas] = 0
+                activos.flush()
+                del activos
+                self._escribir_meta(borrados=self._meta["borrados"] + len(filas))
+            return len(filas)
+
+    def compactar(self):
+        """Reescribe los arreglos sin las filas borradas. Devuelve cuántas se quitaron."""
+        with self._escritura():
+            n = self._count
+            if not n or not self._meta["borrados"]:
+                return 0
+            vivas = np.flatnonzero(self._arr["activos"][:n] == 1)
+            capacidad = CAPACIDAD_INICIAL
+            while capacidad < len(vivas):
+                capacidad *= 2
+            self._reescribir(capacidad, filas=vivas, borrados=0)
+            return n - len(vivas)
+
+    def import_jsonl(self, path, batch=5000):
+        """Carga un vectors.jsonl ({"person_id", "embedding"} por línea). Devuelve filas importadas."""
+        total, ids, vecs = 0, [], []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                ids.append(row["person_id"])
+                vecs.append(row["embedding"])
+                if len(ids) >= batch:
+                    self.add_batch(ids, vecs)
+                    total, ids, vecs = total + len(ids), [], []
+        if ids:
+            self.add_batch(ids, vecs)
+            total += len(ids)
+        return total
+
+    def import_legacy(self, path):
+        """
+        Importa un vectors.jsonl una sola vez (si el índice está vacío) y lo renombra
+        a .imported. Con su propio lock: si arrancan varios workers importa uno solo.
+        """
+        path = Path(path)
+        with _flock(self.dir / "import.lock"):
+            if self.count() or not path.exists():
+                return 0
+            n = self.import_jsonl(path)
+            path.rename(path.with_name(path.name + ".imported"))
+            return n
+
+    # ---------- consulta ----------
+    def count(self) -> int:
+        """Filas activas."""
+        with self._lock:
+            self._refrescar()
+            return self._count - (self._meta["borrados"] if self._meta else 0)
+
+    def _snapshot(self):
+        with self._lock:
+            self._refrescar()
+            return self._count, self._arr, (self._meta or {}).get("borrados", 0)
+
+    def _probe(self, probe):
+        q = normalizar(probe)
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Embedding de dimensión {q.shape[0]}, se esperaba {self.dim}")
+        return q
+
+    def search(self, probe, k=5):
+        """
+        Top-k personas más parecidas: [(person_id, similitud), ...] de mayor a menor.
+        Si una persona tiene varias fotos enroladas cuenta la mejor.
+        """
+        return self.search_exact(probe, k)
+
+    def search_exact(self, probe, k=5):
+        n, arr, borrados = self._snapshot()
+        if not n or k <= 0:
+            return []
+        q = self._probe(probe)
+        sims = arr["embeddings"][:n] @ q
+        if borrados:
+            sims[arr["activos"][:n] == 0] = -np.inf
+        return self._top(sims, None, arr["ids"], k)
+
+    @staticmethod
+    def _top(sims, filas, ids, k):
+        """top-k de sims (filas[i] = fila del índice de sims[i]; None = identidad), una entrada por persona."""
+        n = len(sims)
+        kk = min(n, k * SOBREMUESTREO)
+        top = np.argpartition(sims, n - kk)[n - kk:] if kk < n else np.arange(n)
+        top = top[np.argsort(-sims[top], kind="stable")]
+
+        out, vistos = [], set()
+        for i in top:
+            if sims[i] == -np.inf:
+                break
+            pid = str(ids[i if filas is None else filas[i]])
+            if pid in vistos:
+                continue
+            vistos.add(pid)
+            out.append((pid, float(sims[i])))
+            if len(out) == k:
+                break
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refrescar()
+            meta = self._meta or {}
+            return {
+                "backend": self.backend, "filas": self._count, "borradas": meta.get("borrados", 0),
+                "capacidad": self._capacidad, "dim": self.dim, "dir": str(self.dir),
+            }
+
+
+# ---------------------------
+# IVF (inverted file): k-means esférico + nprobe listas por consulta
+# ---------------------------
+
+def asignar_listas(X, centroides, chunk=CHUNK_FILAS) -> np.ndarray:
+    """Centroide más parecido de cada fila de X."""
+    out = np.empty(len(X), dtype=np.int32)
+    for i in range(0, len(X), chunk):
+        out[i:i + chunk] = np.argmax(np.asarray(X[i:i + chunk]) @ centroides.T, axis=1)
+    return out
+
+
+def kmeans_esferico(X, k, iteraciones=10, seed=0) -> np.ndarray:
+    """Centroides (k, dim) normalizados; las listas vacías se vuelven a sembrar con filas al azar."""
+    rng = np.random.default_rng(seed)
+    X = np.asarray(X, dtype=np.float32)
+    C = X[rng.choice(len(X), size=k, replace=False)].copy()
+    for _ in range(iteraciones):
+        asign = asignar_listas(X, C)
+        orden = np.argsort(asign, kind="stable")
+        conteo = np.bincount(asign, minlength=k)
+        inicios = np.concatenate(([0], np.cumsum(conteo)[:-1]))
+        no_vacias = conteo > 0
+        sumas = np.zeros_like(C)
+        sumas[no_vacias] = np.add.reduceat(X[orden], inicios[no_vacias], axis=0)
+        vacias = np.flatnonzero(~no_vacias)
+        if len(vacias):
+            sumas[vacias] = X[rng.choice(len(X), size=len(vacias), replace=False)]
+        C = normalizar_filas(sumas)
+    return C
+
+
+class IVFFaceIndex(FaceIndex):
+    """
+    Las filas se reparten en nlist listas (centroides.npy, entrenados con
+    entrenar()); una búsqueda compara la consulta con los centroides y después
+    solo con las filas de las nprobe listas más cercanas (y las que todavía no
+    tienen lista). Las altas posteriores al entrenamiento se asignan al centroide
+    más cercano al agregarse; si la galería crece mucho conviene re-entrenar
+    (necesita_entrenar()).
+    """
+    backend = "ivf"
+
+    def __init__(self, directory, dim=DIM, nprobe=16, min_filas=20000):
+        super().__init__(directory, dim)
+        self.nprobe = nprobe
+        self.min_filas = min_filas     # debajo de esto la búsqueda exacta ya es barata
+        self._centroides = None
+        self._invertidas = None        # (firma, orden, limites)
+
+    def _centroides_path(self):
+        return self.dir / "centroides.npy"
+
+    def _al_refrescar(self):
+        entrenamiento = self._meta.get("entrenamiento") if self._meta else None
+        version = entrenamiento["version"] if entrenamiento else None
+        if version is None:
+            self._centroides = None
+        elif self._centroides is None or self._centroides[0] != version:
+            self._centroides = (version, np.load(self._centroides_path()))
+
+    def _asignar(self, m):
+        if self._centroides is None:
+            return -1
+        return asignar_listas(m, self._centroides[1])
+
+    def _listas_invertidas(self, n, arr):
+        """Filas agrupadas por lista: orden[limites[l + 1]:limites[l + 2]] (l = -1 => sin lista)."""
+        firma = (self._meta["generacion"], n, self._centroides[0])
+        cache = self._invertidas
+        if cache is not None and cache[0] == firma:
+            return cache[1], cache[2]
+        nlist = len(self._centroides[1])
+        listas = np.asarray(arr["listas"][:n])
+        orden = np.argsort(listas, kind="stable")
+        limites = np.searchsorted(listas[orden], np.arange(-1, nlist + 1))
+        self._invertidas = (firma, orden, limites)
+        return orden, limites
+
+    def search(self, probe, k=5, nprobe=None):
+        with self._lock:
+            self._refrescar()
+            n, arr, borrados = self._count, self._arr, (self._meta or {}).get("borrados", 0)
+            centroides = self._centroides
+            if not n or k <= 0:
+                return []
+            if centroides is None or n < self.min_filas:
+                return self.search_exact(probe, k)
+            orden, limites = self._listas_invertidas(n, arr)
+
+        C = centroides[1]
+        nprobe = min(nprobe or self.nprobe, len(C))
+        q = self._probe(probe)
+        cerca = np.argpartition(C @ q, len(C) - nprobe)[len(C) - nprobe:]
+        partes = [orden[limites[0]:limites[1]]] + [orden[limites[l + 1]:limites[l + 2]] for l in cerca]
+        filas = np.sort(np.concatenate(partes))     # lectura secuencial del memmap
+        if not len(filas):
+            return []
+        sims = arr["embeddings"][filas] @ q
+        if borrados:
+            sims[arr["activos"][filas] == 0] = -np.inf
+        return self._top(sims, filas, arr["ids"], k)
+
+    def entrenar(self, nlist=None, iteraciones=10, muestra=65536, seed=0):
+        """
+        Entrena los centroides con una muestra de las filas activas y reasigna todas.
+        El k-means corre sin el lock de escritura (las altas siguen); la reasignación
+        final sí lo toma. Devuelve stats().
+        """
+        with self._escritura():
+            self._crecer(self._count)   # índices de una versión anterior: crea activos/listas
+        n, arr, _ = self._snapshot()
+        vivas = np.flatnonzero(np.asarray(arr["activos"][:n]) == 1) if n else np.array([], dtype=np.int64)
+        if not len(vivas):
+            raise ValueError("El índice está vacío")
+        nlist = int(nlist or max(16, min(4096, round(np.sqrt(len(vivas))))))
+        nlist = min(nlist, len(vivas))
+        rng = np.random.default_rng(seed)
+        if len(vivas) > muestra:
+            vivas = np.sort(rng.choice(vivas, size=muestra, replace=False))
+        t0 = time.perf_counter()
+        C = kmeans_esferico(arr["embeddings"][vivas], nlist, iteraciones=iteraciones, seed=seed)
+
+        with self._escritura():
+            np.save(self.dir / "centroides.tmp.npy", C)
+            os.replace(self.dir / "centroides.tmp.npy", self._centroides_path())
+            n = self._count
+            listas = np.load(self._path("listas"), mmap_mode="r+")
+            listas[:n] = asignar_listas(self._arr["embeddings"][:n], C)
+            listas.flush()
+            del listas
+            anterior = self._meta.get("entrenamiento") or {}
+            self._escribir_meta(entrenamiento={
+                "version": anterior.get("version", 0) + 1, "nlist": nlist,
+                "filas": n - self._meta["borrados"], "segundos": round(time.perf_counter() - t0, 2),
+            })
+            self._al_refrescar()
+        return self.stats()
+
+    def necesita_entrenar(self) -> bool:
+        """Sin entrenar con suficientes filas, o la galería se duplicó desde el último entrenamiento."""
+        filas = self.count()
+        entrenamiento = (self._meta or {}).get("entrenamiento")
+        if not entrenamiento:
+            return filas >= self.min_filas
+        return filas > 2 * entrenamiento["filas"]
+
+    def stats(self) -> dict:
+        out = super().stats()
+        out.update({
+            "entrenamiento": (self._meta or {}).get("entrenamiento"),
+            "nprobe": self.nprobe, "min_filas": self.min_filas,
+        })
+        return out
+
+
+BACKENDS = {"exact": FaceIndex, "ivf": IVFFaceIndex}
+
+
+def crear_indice(directory, backend="ivf", dim=DIM, **opciones) -> FaceIndex:
+    """Índice del backend pedido ("exact" | "ivf"); las opciones van al constructor (nprobe, min_filas)."""
+    try:
+        cls = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Backend de índice de rostros desconocido: {backend!r} (opciones: {', '.join(BACKENDS)})")
+    return cls(directory, dim=dim, **(opciones if cls is not FaceIndex else {}))
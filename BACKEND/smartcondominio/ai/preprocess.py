@@ -0,0 +1,258 @@
+# BACKEND/smartcondominio/ai/preprocess.py
+"""
+Preprocesado de las fotos de cámara antes de la inferencia: se decodifican una sola vez.
+
+Las cámaras de las garitas suben JPEG 4K (2-4 MB, ~25 MB decodificados) y el detector
+trabaja a 640x640. Acá:
+  1) del encabezado JPEG se leen el tamaño y la orientación EXIF, sin decodificar;
+  2) se decodifica con IMREAD_REDUCED_COLOR_{2,4,8} (libjpeg escala en el IDCT) con la
+     mayor reducción que deja el lado largo >= lado_max, y se termina con INTER_AREA;
+  3) se aplica la orientación EXIF (con IMREAD_IGNORE_ORIENTATION, para no depender
+     de la versión de OpenCV);
+  4) se recorta el rostro más grande (cascada Haar de OpenCV sobre una copia chica en
+     grises) con margen. Ese recorte es lo que se manda a comparar y lo que se guarda
+     como snapshot.
+"""
+import struct
+import threading
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_REDUCIDO = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def _cfg(nombre, default):
+    return getattr(settings, nombre, default)
+
+
+# ---------------------------
+# Encabezado JPEG
+# ---------------------------
+def _orientacion_exif(tiff: bytes):
+    """Tag 0x0112 del IFD0 de un bloque TIFF (APP1 'Exif'), o None."""
+    orden = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if orden is None or len(tiff) < 8:
+        return None
+    ifd = struct.unpack(orden + "I", tiff[4:8])[0]
+    if ifd + 2 > len(tiff):
+        return None
+    for k in range(struct.unpack(orden + "H", tiff[ifd:ifd + 2])[0]):
+        e = ifd + 2 + 12 * k
+        if e + 12 > len(tiff):
+            break
+        tag = struct.unpack(orden + "H", tiff[e:e + 2])[0]
+        if tag == 0x0112:
+            valor = struct.unpack(orden + "H", tiff[e + 8:e + 10])[0]
+            return valor if 1 <= valor <= 8 else None
+    return None
+
+
+def info_jpeg(data: bytes):
+    """(ancho, alto, orientación EXIF) leídos de los marcadores, o None si no es un JPEG."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    i, n, orientacion = 2, len(data), 1
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            return None
+        marca = data[i + 1]
+        if marca == 0xFF:            # relleno
+            i += 1
+            continue
+        if marca == 0x01 or 0xD0 <= marca <= 0xD8:   # marcadores sin largo
+            i += 2
+            continue
+        largo = int.from_bytes(data[i + 2:i + 4], "big")
+        segmento = data[i + 4:i + 2 + largo]
+        if marca == 0xE1 and segmento[:6] == b"Exif\x00\x00":
+            orientacion = _orientacion_exif(segmento[6:]) or orientacion
+        elif marca in _SOF:
+            if len(segmento) < 5:
+                return None
+            alto, ancho = struct.unpack(">HH", segmento[1:5])
+            return ancho, alto, orientacion
+        elif marca == 0xDA:          # empieza la imagen sin haber visto SOF
+            return None
+        i += 2 + largo
+    return None
+
+
+def orientar(img, orientacion: int):
+    """Aplica la orientación EXIF (1..8) para que la imagen quede derecha."""
+    if orientacion == 2:
+        return cv2.flip(img, 1)
+    if orientacion == 3:
+        return cv2.rotate(img, cv2.ROTATE_180)
+    if orientacion == 4:
+        return cv2.flip(img, 0)
+    if orientacion == 5:
+        return cv2.transpose(img)
+    if orientacion == 6:
+        return cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE)
+    if orientacion == 7:
+        return cv2.flip(cv2.transpose(img), -1)
+    if orientacion == 8:
+        return cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return img
+
+
+# ---------------------------
+# Decodificación
+# ---------------------------
+def achicar(img, lado_max: int):
+    h, w = img.shape[:2]
+    largo = max(h, w)
+    if not lado_max or largo <= lado_max:
+        return img
+    f = lado_max / largo
+    # INTER_AREA promedia bien al reducir mucho; para menos de 2x, lineal alcanza y es varias veces más barato
+    interp = cv2.INTER_AREA if f <= 0.5 else cv2.INTER_LINEAR
+    return cv2.resize(img, (max(1, round(w * f)), max(1, round(h * f))), interpolation=interp)
+
+
+def decodificar(file_bytes: bytes, lado_max: int | None = None):
+    """
+    BGR uint8 derecho (orientación EXIF aplicada) con el lado largo <= lado_max,
+    o None si no se puede decodificar. Los JPEG grandes se decodifican reducidos.
+    """
+    lado_max = _cfg("FACE_PREPROCESS_LADO_MAX", 1280) if lado_max is None else lado_max
+    arr = np.frombuffer(file_bytes, np.uint8)
+    info = info_jpeg(file_bytes)
+    if info is None:
+        img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+    else:
+        ancho, alto, orientacion = info
+        factor = 1
+        for f in (8, 4, 2):
+            if lado_max and max(ancho, alto) // f >= lado_max:
+                factor = f
+                break
+        flags = (_REDUCIDO[factor] if factor > 1 else cv2.IMREAD_COLOR) | cv2.IMREAD_IGNORE_ORIENTATION
+        img = cv2.imdecode(arr, flags)
+        if img is not None:
+            img = orientar(img, orientacion)
+    if img is None:
+        return None
+    return achicar(img, lado_max)
+
+
+def codificar_jpeg(img, calidad: int | None = None) -> bytes:
+    calidad = _cfg("FACE_PREPROCESS_CALIDAD", 90) if calidad is None else calidad
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, int(calidad)])
+    if not ok:
+        raise ValueError("no se pudo codificar el JPEG")
+    return buf.tobytes()
+
+
+# ---------------------------
+# Recorte del rostro
+# ---------------------------
+_local = threading.local()
+
+
+def _cascada():
+    """Clasificador Haar por hilo (detectMultiScale no es reentrante); None si este OpenCV no lo trae."""
+    if not hasattr(_local, "cascada"):
+        cascada = None
+        ruta = getattr(getattr(cv2, "data", None), "haarcascades", "")
+        if ruta and hasattr(cv2, "CascadeClassifier"):   # OpenCV 5 lo pasó a contrib
+            cascada = cv2.CascadeClassifier(ruta + "haarcascade_frontalface_default.xml")
+            if cascada.empty():
+                cascada = None
+        _local.cascada = cascada
+    return _local.cascada
+
+
+def detectar_rostro(img, lado: int | None = None):
+    """(x, y, w, h) del rostro más grande en coordenadas de img, o None."""
+    cascada = _cascada()
+    if cascada is None:
+        return None
+    lado = _cfg("FACE_PREPROCESS_DETECCION_LADO", 360) if lado is None else lado
+    chica = achicar(img, lado)
+    escala = img.shape[1] / chica.shape[1]
+    gris = cv2.equalizeHist(cv2.cvtColor(chica, cv2.COLOR_BGR2GRAY))
+    # en la garita el rostro ocupa buena parte del cuadro: escalas gruesas (1.2) alcanzan y cuestan la mitad
+    rostros = cascada.detectMultiScale(gris, scaleFactor=1.2, minNeighbors=5, minSize=(24, 24))
+    if len(rostros) == 0:
+        return None
+    x, y, w, h = max(rostros, key=lambda r: r[2] * r[3])
+    return tuple(int(round(v * escala)) for v in (x, y, w, h))
+
+
+def recortar(img, caja, margen: float | None = None, lado_max: int | None = None):
+    """Recorte de caja (x, y, w, h) agrandada `margen` por lado, limitado a la imagen y a lado_max."""
+    margen = _cfg("FACE_PREPROCESS_MARGEN", 0.4) if margen is None else margen
+    lado_max = _cfg("FACE_PREPROCESS_RECORTE_LADO", 480) if lado_max is None else lado_max
+    alto, ancho = img.shape[:2]
+    x, y, w, h = caja
+    mx, my = int(w * margen), int(h * margen)
+    x0, y0 = max(0, x - mx), max(0, y - my)
+    x1, y1 = min(ancho, x + w + mx), min(alto, y + h + my)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return achicar(img[y0:y1, x0:x1], lado_max)
+
+
+def caja_relativa(img, bbox: dict):
+    """BoundingBox relativo (Left/Top/Width/Height en 0..1, como Rekognition) -> (x, y, w, h)."""
+    alto, ancho = img.shape[:2]
+    return (int(bbox["Left"] * ancho), int(bbox["Top"] * alto), int(bbox["Width"] * ancho), int(bbox["Height"] * alto))
+
+
+class Preparada:
+    """
+    Resultado de preparar(): la imagen ya decodificada y achicada, y el JPEG que se
+    manda a comparar (el recorte del rostro si se encontró, si no el cuadro entero
+    achicado). El mismo JPEG sirve de snapshot.
+    """
+
+    def __init__(self, img, original_bytes: int, caja=None, recorte=None):
+        self.img = img
+        self.original_bytes = original_bytes
+        self.caja = caja
+        self.recorte = recorte
+        self._jpeg = None
+
+    @property
+    def recortada(self) -> bool:
+        return self.recorte is not None
+
+    def jpeg(self) -> bytes:
+        if self._jpeg is None:
+            self._jpeg = codificar_jpeg(self.recorte if self.recorte is not None else self.img)
+        return self._jpeg
+
+    def sin_recorte(self) -> "Preparada":
+        """Cuadro completo (para reintentar si el comparador no ve rostro en el recorte)."""
+        return Preparada(self.img, self.original_bytes)
+
+    def recortar_con(self, bbox: dict) -> "Preparada":
+        """Recorte a partir del BoundingBox relativo que devolvió el comparador (para el snapshot)."""
+        caja = caja_relativa(self.img, bbox)
+        recorte = recortar(self.img, caja)
+        return Preparada(self.img, self.original_bytes, caja, recorte) if recorte is not None else self
+
+    def resumen(self) -> dict:
+        alto, ancho = self.img.shape[:2]
+        return {
+            "entrada_bytes": self.original_bytes,
+            "enviado_bytes": len(self.jpeg()),
+            "decodificada": [ancho, alto],
+            "recorte": list(self.caja) if self.caja is not None else None,
+        }
+
+
+def preparar(file_bytes: bytes, recortar_rostro: bool | None = None):
+    """Decodifica una vez, achica, orienta y (si se pide) recorta el rostro. None si la imagen no se puede leer."""
+    img = decodificar(file_bytes)
+    if img is None:
+        return None
+    if recortar_rostro is None:
+        recortar_rostro = _cfg("FACE_PREPROCESS_RECORTE", True)
+    caja = detectar_rostro(img) if recortar_rostro else None
+    recorte = recortar(img, caja) if caja is not None else None
+    return Preparada(img, len(file_bytes), caja if recorte is not None else None, recorte)
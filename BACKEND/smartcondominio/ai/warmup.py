@@ -0,0 +1,109 @@
+# BACKEND/smartcondominio/ai/warmup.py
+"""
+Precarga del pipeline InsightFace (ai/face.py) al arrancar cada worker, para que la
+primera identificación no pague los segundos de carga de buffalo_l.
+
+FACE_WARMUP elige cuándo se dispara:
+  - "off" (default): nada; el modelo se carga en la primera identificación.
+  - "post_worker_init": hook de gunicorn (gunicorn.conf.py), una vez por worker.
+  - "ready": SmartCondominioConfig.ready() (runserver, o gunicorn sin config).
+La carga corre en un hilo; /api/health/face/ responde 503 hasta que termina, así
+el balanceador solo manda tráfico a workers calientes.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_estado = {
+    "estado": "frio",          # frio | cargando | listo | error
+    "pid": os.getpid(),
+    "inicio": None,            # epoch de inicio del calentamiento
+    "carga_ms": None,          # FaceAnalysis + prepare
+    "inferencia_ms": None,     # primera inferencia (imagen en negro)
+    "indice_ms": None,         # apertura del índice + búsqueda de prueba
+    "servidor": "",            # socket de face_embed_server si el modelo está ahí
+    "total_ms": None,
+    "error": "",
+}
+
+
+def modo() -> str:
+    return (getattr(settings, "FACE_WARMUP", "off") or "off").lower()
+
+
+def estado() -> dict:
+    with _lock:
+        out = dict(_estado)
+    out["pid"] = os.getpid()
+    out["modo"] = modo()
+    out["listo"] = out["estado"] == "listo"
+    return out
+
+
+def _set(**cambios):
+    with _lock:
+        _estado.update(cambios)
+
+
+def calentar():
+    """Carga el modelo (o pinguea al servidor), corre una inferencia de prueba y abre el índice. Síncrono."""
+    _set(estado="cargando", inicio=time.time(), pid=os.getpid(), error="")
+    t0 = time.perf_counter()
+    try:
+        import numpy as np
+        from . import face   # importa cv2 (e InsightFace al cargar el modelo): puede faltar
+
+        client = face.get_client()
+        if client is not None:
+            # el modelo vive en face_embed_server: alcanza con que responda
+            t = time.perf_counter()
+            client.ping()
+            _set(carga_ms=None, inferencia_ms=round((time.perf_counter() - t) * 1000, 1), servidor=client.path)
+        else:
+            t = time.perf_counter()
+            app = face._get_face_app()
+            _set(carga_ms=round((time.perf_counter() - t) * 1000, 1))
+
+            t = time.perf_counter()
+            lado = getattr(settings, "FACE_WARMUP_IMAGE_SIZE", 640)
+            app.get(np.zeros((lado, lado, 3), dtype=np.uint8))
+            _set(inferencia_ms=round((time.perf_counter() - t) * 1000, 1))
+
+        t = time.perf_counter()
+        index = face.get_index()
+        if index.count():
+            index.search(np.ones(index.dim, dtype=np.float32), k=1)   # trae las páginas del memmap
+        _set(indice_ms=round((time.perf_counter() - t) * 1000, 1))
+    except Exception as e:
+        log.exception("warm-up de rostros falló")
+        _set(estado="error", error=f"{type(e).__name__}: {e}", total_ms=round((time.perf_counter() - t0) * 1000, 1))
+        return estado()
+
+    _set(estado="listo", total_ms=round((time.perf_counter() - t0) * 1000, 1))
+    log.info("warm-up de rostros listo en %.0f ms (pid %s)", _estado["total_ms"], os.getpid())
+    return estado()
+
+
+def iniciar():
+    """Dispara calentar() en un hilo (una sola vez por proceso)."""
+    with _lock:
+        if _estado["estado"] in ("cargando", "listo") and _estado["pid"] == os.getpid():
+            return False
+        _estado.update(estado="cargando", pid=os.getpid())
+    threading.Thread(target=calentar, name="face-warmup", daemon=True).start()
+    return True
+
+
+def _es_servidor() -> bool:
+    """ready() también corre en migrate, shell, etc.: solo se calienta al servir."""
+    argv = [os.path.basename(a) for a in sys.argv[:2]]
+    if argv and argv[0] == "manage.py":
+        return len(argv) > 1 and argv[1] == "runserver" and os.environ.get("RUN_MAIN") == "true"
+    return True
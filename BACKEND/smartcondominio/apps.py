@@ -5,3 +5,14 @@ class SmartCondominioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'smartcondominio'
 
+    def ready(self):
+        from .plate_index import conectar_senales
+        conectar_senales()
+
+        from . import stream_garita
+        stream_garita.conectar_senales()
+
+        from .ai import warmup
+        if warmup.modo() == "ready" and warmup._es_servidor():
+            warmup.iniciar()
+
@@ -0,0 +1,222 @@
+# smartcondominio/circuit.py
+"""
+Circuit breaker para los reconocedores externos (Plate Recognizer, Rekognition).
+
+Estados:
+  - cerrado:       las llamadas pasan; se cuentan los fallos (errores o llamadas más
+                   lentas que `lento_ms`) dentro de una ventana de `ventana_s`.
+  - abierto:       al llegar a `fallos` en la ventana se abre por `abierto_s` segundos y
+                   las llamadas fallan al instante con CircuitoAbierto (sin red).
+  - medio_abierto: vencido ese plazo pasan hasta `sondas` llamadas de prueba; si salen
+                   bien se cierra, si fallan se vuelve a abrir.
+
+El estado es por proceso (cada worker de gunicorn tiene el suyo): no necesita
+coordinación y cada worker deja de esperar al servicio caído después de pocos fallos.
+llamar() envuelve funciones; allamar() corrutinas (vistas async, views_async.py).
+Se configura con CIRCUIT_<NOMBRE>_{FALLOS,VENTANA_S,ABIERTO_S,LENTO_MS,SONDAS} o los
+CIRCUIT_* generales. estados() alimenta /api/metrics/.
+"""
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+
+from . import metrics
+
+CERRADO, ABIERTO, MEDIO_ABIERTO = "cerrado", "abierto", "medio_abierto"
+
+
+class CircuitoAbierto(Exception):
+    """El servicio está marcado como caído: no se lo llama hasta `reintentar_en`."""
+
+    def __init__(self, nombre, reintentar_en):
+        self.nombre = nombre
+        self.reintentar_en = reintentar_en
+        super().__init__(f"{nombre}: circuito abierto, reintento en {max(0.0, reintentar_en - time.time()):.0f} s")
+
+
+class Circuito:
+    def __init__(self, nombre, fallos=5, ventana_s=30.0, abierto_s=30.0, lento_ms=None, sondas=1):
+        self.nombre = nombre
+        self.umbral = max(1, int(fallos))
+        self.ventana_s = float(ventana_s)
+        self.abierto_s = float(abierto_s)
+        self.lento_ms = float(lento_ms) if lento_ms else None
+        self.sondas = max(1, int(sondas))
+        self._lock = threading.Lock()
+        self._estado = CERRADO
+        self._fallos = []            # timestamps de fallos recientes (estado cerrado)
+        self._abierto_hasta = 0.0
+        self._sondas_en_vuelo = 0
+        self._stats = {"llamadas": 0, "exitos": 0, "fallos": 0, "lentas": 0, "rechazadas": 0, "aperturas": 0}
+        self._ultimo_error = ""
+        self._cambio = time.time()
+
+    # ---------- API ----------
+    def llamar(self, fn, *args, es_fallo=None, **kwargs):
+        """
+        fn(*args, **kwargs) protegida. es_fallo(exc) -> bool decide qué excepciones cuentan
+        (p.ej. un 400 por imagen inválida no es culpa del servicio); por defecto todas.
+        """
+        sonda = self._antes()
+        t0 = time.perf_counter()
+        try:
+            resultado = fn(*args, **kwargs)
+        except Exception as e:
+            self._error(sonda, e, es_fallo)
+            raise
+        self._terminada(sonda, t0)
+        return resultado
+
+    async def allamar(self, fn, *args, es_fallo=None, **kwargs):
+        """Como llamar(), para una corrutina: `await circuito(n).allamar(cliente.post, url, ...)`."""
+        sonda = self._antes()
+        t0 = time.perf_counter()
+        try:
+            resultado = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            # el cliente cortó: no es culpa del servicio, pero la sonda se libera
+            self._cancelada(sonda)
+            raise
+        except Exception as e:
+            self._error(sonda, e, es_fallo)
+            raise
+        self._terminada(sonda, t0)
+        return resultado
+
+    def estado(self) -> dict:
+        with self._lock:
+            self._vencer()
+            return {
+                "estado": self._estado,
+                "desde": self._cambio,
+                "abierto_hasta": self._abierto_hasta if self._estado == ABIERTO else None,
+                "fallos_en_ventana": len(self._fallos),
+                "umbral": self.umbral,
+                "ultimo_error": self._ultimo_error,
+                **self._stats,
+            }
+
+    def abierto(self) -> bool:
+        return self.estado()["estado"] == ABIERTO
+
+    def reset(self):
+        with self._lock:
+            self._pasar(CERRADO)
+            self._fallos.clear()
+            self._sondas_en_vuelo = 0
+
+    # ---------- internos ----------
+    def _error(self, sonda, e, es_fallo):
+        if es_fallo is None or es_fallo(e):
+            self._fallo(sonda, f"{type(e).__name__}: {e}")
+        else:
+            self._exito(sonda)
+
+    def _terminada(self, sonda, t0):
+        ms = (time.perf_counter() - t0) * 1000
+        if self.lento_ms and ms > self.lento_ms:
+            self._fallo(sonda, f"lenta: {ms:.0f} ms", lenta=True)
+        else:
+            self._exito(sonda)
+
+    def _cancelada(self, sonda):
+        if sonda:
+            with self._lock:
+                self._sondas_en_vuelo -= 1
+
+    # ---------- internos (con _lock) ----------
+    def _pasar(self, estado):
+        if estado != self._estado:
+            self._estado = estado
+            self._cambio = time.time()
+            metrics.incr("circuito_transiciones", circuito=self.nombre, a=estado)
+
+    def _vencer(self):
+        if self._estado == ABIERTO and time.time() >= self._abierto_hasta:
+            self._pasar(MEDIO_ABIERTO)
+            self._sondas_en_vuelo = 0
+
+    def _abrir(self):
+        self._abierto_hasta = time.time() + self.abierto_s
+        self._stats["aperturas"] += 1
+        self._fallos.clear()
+        self._pasar(ABIERTO)
+
+    def _antes(self) -> bool:
+        """True si la llamada es una sonda del estado medio abierto."""
+        with self._lock:
+            self._vencer()
+            self._stats["llamadas"] += 1
+            if self._estado == CERRADO:
+                return False
+            if self._estado == MEDIO_ABIERTO and self._sondas_en_vuelo < self.sondas:
+                self._sondas_en_vuelo += 1
+                return True
+            self._stats["rechazadas"] += 1
+            hasta = self._abierto_hasta if self._estado == ABIERTO else time.time() + 1
+        metrics.incr("circuito_rechazadas", circuito=self.nombre)
+        raise CircuitoAbierto(self.nombre, hasta)
+
+    def _exito(self, sonda):
+        with self._lock:
+            self._stats["exitos"] += 1
+            if sonda:
+                self._sondas_en_vuelo -= 1
+                if self._estado == MEDIO_ABIERTO:
+                    self._fallos.clear()
+                    self._pasar(CERRADO)
+
+    def _fallo(self, sonda, error, lenta=False):
+        ahora = time.time()
+        with self._lock:
+            self._stats["fallos"] += 1
+            self._stats["lentas"] += int(lenta)
+            self._ultimo_error = error[:300]
+            if sonda:
+                self._sondas_en_vuelo -= 1
+                if self._estado == MEDIO_ABIERTO:
+                    self._abrir()
+                return
+            if self._estado != CERRADO:
+                return
+            self._fallos = [t for t in self._fallos if ahora - t <= self.ventana_s]
+            self._fallos.append(ahora)
+            if len(self._fallos) >= self.umbral:
+                self._abrir()
+        metrics.incr("circuito_fallos", circuito=self.nombre)
+
+
+# ---------------------------
+# Registro
+# ---------------------------
+_lock = threading.Lock()
+_circuitos = {}
+
+
+def _opcion(nombre, clave, default):
+    especifica = getattr(settings, f"CIRCUIT_{nombre.upper()}_{clave}", None)
+    return especifica if especifica is not None else getattr(settings, f"CIRCUIT_{clave}", default)
+
+
+def circuito(nombre) -> Circuito:
+    """El Circuito del proceso para `nombre` (se crea con la config de settings la primera vez)."""
+    with _lock:
+        c = _circuitos.get(nombre)
+        if c is None:
+            c = _circuitos[nombre] = Circuito(
+                nombre,
+                fallos=_opcion(nombre, "FALLOS", 5),
+                ventana_s=_opcion(nombre, "VENTANA_S", 30),
+                abierto_s=_opcion(nombre, "ABIERTO_S", 30),
+                lento_ms=_opcion(nombre, "LENTO_MS", None),
+                sondas=_opcion(nombre, "SONDAS", 1),
+            )
+        return c
+
+
+def estados() -> dict:
+    with _lock:
+        circuitos = list(_circuitos.values())
+    return {c.nombre: c.estado() for c in circuitos}
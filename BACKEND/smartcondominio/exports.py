@@ -0,0 +1,278 @@
+# exports.py
+"""
+Exportaciones en streaming (CSV o XLSX, opcionalmente .gz) para reportes grandes.
+Las filas llegan de generadores (idealmente values_list(...).iterator(chunk_size=...))
+y se escriben por bloques a un StreamingHttpResponse: la memoria no depende de la
+cantidad de filas.
+
+Una exportación es una lista de secciones (titulo, encabezado, filas):
+- CSV: se escriben una tras otra (titulo y encabezado opcionales, línea en blanco entre secciones);
+  con una sola sección el título no se escribe (queda como nombre de hoja en XLSX).
+- XLSX: cada sección con título es una hoja; las secciones sin título van en la hoja anterior.
+
+Query params comunes: ?formato=csv|xlsx (default csv) y ?gzip=1.
+(No se usa ?format= porque DRF lo reserva para elegir renderer.)
+"""
+import csv
+import re
+import zipfile
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+
+CHUNK_BYTES = 64 * 1024
+ITER_CHUNK = 2000   # filas por ida a la BD en .iterator(chunk_size=...)
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _valor(v):
+    if v is None:
+        return ""
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    return v
+
+
+# ---------------------------
+# CSV
+# ---------------------------
+
+class _Echo:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+    def write(self, value):
+        return value
+
+
+def csv_chunks(secciones):
+    writer = csv.writer(_Echo())
+    buf, size = [], 0
+    secciones = list(secciones)
+    for i, (titulo, encabezado, filas) in enumerate(secciones):
+        lineas = []
+        if i and (titulo or encabezado):
+            lineas.append(writer.writerow([]))
+        if titulo and len(secciones) > 1:
+            lineas.append(writer.writerow([titulo]))
+        if encabezado:
+            lineas.append(writer.writerow(encabezado))
+        for linea in _chain(lineas, (writer.writerow([_valor(v) for v in fila]) for fila in filas)):
+            buf.append(linea)
+            size += len(linea)
+            if size >= CHUNK_BYTES:
+                yield "".join(buf).encode("utf-8")
+                buf, size = [], 0
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+def _chain(primero, segundo):
+    yield from primero
+    yield from segundo
+
+
+# ---------------------------
+# XLSX (zip escrito en streaming, hojas con inlineStr)
+# ---------------------------
+
+_XML_INVALIDO = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+_SHEET_CT = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+    '<cellXfs count="2"><xf/><xf fontId="1" applyFont="1"/></cellXfs>'
+    '</styleSheet>'
+)
+
+
+def _col(n):
+    letras = ""
+    n += 1
+    while n:
+        n, r = divmod(n - 1, 26)
+        letras = chr(65 + r) + letras
+    return letras
+
+
+def _celda(ref, v, estilo=""):
+    if v is None or v == "":
+        return ""
+    if isinstance(v, bool):
+        return f'<c r="{ref}" t="b"{estilo}><v>{int(v)}</v></c>'
+    if isinstance(v, (int, float, Decimal)):
+        return f'<c r="{ref}"{estilo}><v>{v}</v></c>'
+    texto = escape(_XML_INVALIDO.sub("", str(_valor(v))))
+    return f'<c r="{ref}" t="inlineStr"{estilo}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _hoja_xml(bloques):
+    """Genera el XML de una hoja; bloques = [(titulo, encabezado, filas), ...]."""
+    yield (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+    )
+    r = 0
+    cols = []
+    for j, (_, encabezado, filas) in enumerate(bloques):
+        if j and encabezado:
+            r += 1   # fila en blanco entre bloques de una misma hoja
+        if encabezado:
+            r += 1
+            cols = [_col(i) for i in range(len(encabezado))]
+            yield f'<row r="{r}">' + "".join(
+                _celda(f"{c}{r}", v, ' s="1"') for c, v in zip(cols, encabezado)) + "</row>"
+        for fila in filas:
+            r += 1
+            if len(fila) > len(cols):
+                cols = [_col(i) for i in range(len(fila))]
+            yield f'<row r="{r}">' + "".join(_celda(f"{c}{r}", v) for c, v in zip(cols, fila)) + "</row>"
+    yield "</sheetData></worksheet>"
+
+
+class _Sumidero:
+    """Destino no buscable para ZipFile: acumula lo escrito hasta que se drena."""
+    def __init__(self):
+        self._partes = []
+
+    def write(self, b):
+        self._partes.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def drenar(self):
+        out = b"".join(self._partes)
+        self._partes.clear()
+        return out
+
+
+def _nombre_hoja(titulo, usados):
+    base = re.sub(r"[\[\]:*?/\\]", "", titulo or "Hoja")[:31] or "Hoja"
+    nombre, n = base, 2
+    while nombre in usados:
+        sufijo = f" ({n})"
+        nombre, n = base[:31 - len(sufijo)] + sufijo, n + 1
+    usados.add(nombre)
+    return nombre
+
+
+def xlsx_chunks(secciones):
+    hojas = []
+    for seccion in secciones:
+        if seccion[0] or not hojas:
+            hojas.append([seccion])
+        else:
+            hojas[-1].append(seccion)
+
+    usados = set()
+    nombres = [_nombre_hoja(h[0][0], usados) for h in hojas]
+    sink = _Sumidero()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES.format(
+            sheets="".join(_SHEET_CT.format(n=i + 1) for i in range(len(hojas)))))
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + "".join(f'<sheet name="{escape(n)}" sheetId="{i + 1}" r:id="rId{i + 1}"/>' for i, n in enumerate(nombres))
+            + "</sheets></workbook>"
+        ))
+        zf.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{i + 1}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{i + 1}.xml"/>' for i in range(len(hojas)))
+            + f'<Relationship Id="rId{len(hojas) + 1}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+            + "</Relationships>"
+        ))
+        zf.writestr("xl/styles.xml", _STYLES)
+        yield sink.drenar()
+
+        for i, bloques in enumerate(hojas):
+            with zf.open(f"xl/worksheets/sheet{i + 1}.xml", "w", force_zip64=True) as f:
+                pendiente = 0
+                for parte in _hoja_xml(bloques):
+                    data = parte.encode("utf-8")
+                    f.write(data)
+                    pendiente += len(data)
+                    if pendiente >= CHUNK_BYTES:
+                        pendiente = 0
+                        trozo = sink.drenar()
+                        if trozo:
+                            yield trozo
+            trozo = sink.drenar()
+            if trozo:
+                yield trozo
+    yield sink.drenar()
+
+
+# ---------------------------
+# gzip / respuesta
+# ---------------------------
+
+def gzip_chunks(chunks, level=6):
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)   # wbits=31 => formato gzip
+    for c in chunks:
+        out = z.compress(c)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def _es_verdadero(v):
+    return str(v or "").lower() in {"1", "true", "yes", "si", "sí"}
+
+
+def streaming_export(request, nombre, secciones):
+    """
+    StreamingHttpResponse con las secciones en el formato pedido.
+    nombre: nombre de archivo sin extensión.
+    """
+    formato = (request.GET.get("formato") or "csv").lower()
+    if formato not in FORMATOS:
+        formato = "csv"
+    chunks = xlsx_chunks(secciones) if formato == "xlsx" else csv_chunks(secciones)
+    content_type = FORMATOS[formato]
+    filename = f"{nombre}.{formato}"
+    if _es_verdadero(request.GET.get("gzip")):
+        chunks = gzip_chunks(chunks)
+        content_type = "application/gzip"
+        filename += ".gz"
+
+    resp = StreamingHttpResponse(chunks, content_type=content_type)
+    resp["Content-Disposition"] = f'attachment; filename="{filename}"'
+    resp["Cache-Control"] = "no-store"
+    resp["X-Accel-Buffering"] = "no"   # nginx/proxies: no acumular la respuesta
+    return resp
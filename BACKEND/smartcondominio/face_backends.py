@@ -0,0 +1,180 @@
+# face_backends.py
+"""
+Motor de reconocimiento facial de las vistas de views_face.py / views_face_dry.py,
+elegido con settings.FACE_BACKEND:
+
+  - "aws":   Amazon Rekognition (rekognition_client.py), como hasta ahora.
+  - "local": modelo propio (ai/face.py + índice de embeddings): sin red ni costo por llamada.
+  - "fake":  reemplazo en memoria de Rekognition para pruebas y desarrollo (sin modelo ni AWS):
+             la misma imagen (bytes) que se registró vuelve con Similarity 100.
+
+Todos respetan el contrato de rekognition_client:
+  index_face(bytes, external_id)  -> {"FaceRecords": [{"FaceId", "ExternalImageId"}]}
+  search_by_image(bytes, max_faces) -> {"Matches": [{"FaceId", "ExternalImageId", "Similarity" (0..100)}],
+                                        "SearchedFaceBoundingBox": {...} | None}
+y si la imagen no tiene rostro levantan SinRostro, con el mismo código de error que
+Rekognition (InvalidParameterException). `preprocesar` indica si conviene mandarles el
+recorte de ai/preprocess.py en lugar de los bytes originales.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+
+from .circuit import CircuitoAbierto
+
+
+class SinRostro(Exception):
+    """No se encontró un rostro en la imagen (equivalente a InvalidParameterException de Rekognition)."""
+
+    def __init__(self, msg="There are no faces in the image."):
+        super().__init__(msg)
+        self.response = {"Error": {"Code": "InvalidParameterException", "Message": msg}}
+
+
+# ---------------------------
+# AWS Rekognition
+# ---------------------------
+class AWSBackend:
+    nombre = "aws"
+    preprocesar = True
+
+    def __init__(self):
+        # import diferido: boto3 solo si se usa AWS
+        from . import rekognition_client
+        self._rk = rekognition_client
+
+    def index_face(self, image_bytes, external_id):
+        return self._rk.index_face(image_bytes, external_id=external_id)
+
+    def search_by_image(self, image_bytes, max_faces=5):
+        try:
+            return self._rk.search_by_image(image_bytes, max_faces=max_faces)
+        except CircuitoAbierto:
+            # modo degradado: con Rekognition caído se puede responder con el modelo local
+            respaldo = getattr(settings, "FACE_DEGRADED_BACKEND", "")
+            if not respaldo or respaldo == self.nombre:
+                raise
+            result = get_backend(respaldo).search_by_image(image_bytes, max_faces=max_faces)
+            return {**result, "Degradado": respaldo}
+
+
+# ---------------------------
+# Modelo local (ai/face.py)
+# ---------------------------
+def similitud_local(coseno: float, umbral: float, piso: float) -> float:
+    """
+    Coseno de ArcFace -> Similarity 0..100 comparable con la de Rekognition: el umbral
+    del modelo (FACE_THRESHOLD, ~0.4) cae en `piso` (REKOG_MATCH_THRESHOLD, 90) y 1.0 en 100.
+    Así FACE_ALLOW_THRESHOLD significa lo mismo con cualquier backend.
+    """
+    coseno = max(-1.0, min(1.0, float(coseno)))
+    if coseno >= umbral:
+        return piso + (100.0 - piso) * (coseno - umbral) / ((1.0 - umbral) or 1.0)
+    return max(0.0, piso * coseno / umbral) if umbral > 0 else 0.0
+
+
+class LocalBackend:
+    nombre = "local"
+    preprocesar = True
+
+    def __init__(self):
+        from .ai import face   # import diferido: numpy/OpenCV/InsightFace solo si se usa
+        self._face = face
+
+    def _umbrales(self):
+        umbral = float(getattr(settings, "FACE_THRESHOLD", 0.40))
+        piso = float(getattr(settings, "FACE_LOCAL_MATCH_THRESHOLD", 90.0))
+        return umbral, piso
+
+    def index_face(self, image_bytes, external_id):
+        emb = self._face.embed_from_bytes(image_bytes)
+        if emb is None:
+            # Rekognition con QualityFilter=AUTO tampoco indexa nada si no hay rostro
+            return {"FaceRecords": []}
+        self._face.get_index().add(external_id, emb)
+        # el índice se consulta por persona (la mejor de sus fotos): ese es el "FaceId"
+        return {"FaceRecords": [{"FaceId": f"local-{external_id}", "ExternalImageId": external_id}]}
+
+    def search_by_image(self, image_bytes, max_faces=5):
+        probe = self._face.embed_from_bytes(image_bytes)
+        if probe is None:
+            raise SinRostro()
+        umbral, piso = self._umbrales()
+        matches = [
+            {
+                "FaceId": f"local-{person_id}",
+                "ExternalImageId": person_id,
+                "Similarity": round(similitud_local(sim, umbral, piso), 4),
+                "Cosine": round(float(sim), 6),
+            }
+            for person_id, sim in self._face.get_index().search(probe, k=max_faces)
+            if sim >= umbral   # como FaceMatchThreshold: solo coincidencias
+        ]
+        return {"Matches": matches, "SearchedFaceBoundingBox": None}
+
+
+# ---------------------------
+# Reemplazo en memoria (pruebas)
+# ---------------------------
+class FakeBackend:
+    """
+    Colección en memoria del proceso: la "cara" es el sha256 de los bytes. Imagen vacía
+    = sin rostro. Sirve para probar las vistas sin AWS ni modelo (FACE_BACKEND=fake).
+    """
+    nombre = "fake"
+    preprocesar = False   # compara bytes: tiene que ver los mismos que se registraron
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._caras = {}   # sha256 -> [(face_id, external_id)]
+        self._n = 0
+
+    def reset(self):
+        with self._lock:
+            self._caras.clear()
+            self._n = 0
+
+    @staticmethod
+    def _clave(image_bytes):
+        if not image_bytes:
+            raise SinRostro()
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    def index_face(self, image_bytes, external_id):
+        clave = self._clave(image_bytes)
+        with self._lock:
+            self._n += 1
+            face_id = f"fake-{self._n}"
+            self._caras.setdefault(clave, []).append((face_id, external_id))
+        return {"FaceRecords": [{"FaceId": face_id, "ExternalImageId": external_id}]}
+
+    def search_by_image(self, image_bytes, max_faces=5):
+        clave = self._clave(image_bytes)
+        with self._lock:
+            caras = list(self._caras.get(clave, []))
+        matches = [
+            {"FaceId": face_id, "ExternalImageId": external_id, "Similarity": 100.0}
+            for face_id, external_id in caras[:max_faces]
+        ]
+        return {"Matches": matches, "SearchedFaceBoundingBox": {"Left": 0.0, "Top": 0.0, "Width": 1.0, "Height": 1.0}}
+
+
+# ---------------------------
+# Selección
+# ---------------------------
+BACKENDS = {"aws": AWSBackend, "local": LocalBackend, "fake": FakeBackend}
+
+_lock = threading.Lock()
+_instancias = {}
+
+
+def get_backend(nombre=None):
+    """Instancia (una por proceso y nombre) del backend de settings.FACE_BACKEND."""
+    nombre = (nombre or getattr(settings, "FACE_BACKEND", "aws") or "aws").lower()
+    if nombre not in BACKENDS:
+        raise ValueError(f"FACE_BACKEND desconocido: {nombre!r} (opciones: {', '.join(BACKENDS)})")
+    with _lock:
+        if nombre not in _instancias:
+            _instancias[nombre] = BACKENDS[nombre]()
+        return _instancias[nombre]
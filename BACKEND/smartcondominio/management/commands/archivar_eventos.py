@@ -0,0 +1,48 @@
+# management/commands/archivar_eventos.py
+from django.core.management.base import BaseCommand
+
+from smartcondominio.services_archivo import TABLAS, archivar
+
+
+class Command(BaseCommand):
+    help = (
+        "Retención de AccessEvent / FaceAccessEvent (services_archivo.py): crea las particiones de "
+        "los próximos meses (Postgres), opcionalmente pasa lo viejo a las tablas *Archivo (otras bases), manda "
+        "payloads y filas vencidas a archivos fríos (JSON Lines + gzip en el storage), las borra y "
+        "purga los PayloadBlob que quedan sin eventos. Pensado para cron diario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tabla", choices=[*TABLAS, "todas"], default="todas")
+        parser.add_argument("--retencion-dias", type=int, help="Filas más viejas salen de la BD (EVENTOS_RETENCION_DIAS; 0 = nunca).")
+        parser.add_argument("--payload-dias", type=int, help="Payloads más viejos van a frío (EVENTOS_PAYLOAD_DIAS; 0 = no).")
+        parser.add_argument("--activos-dias", type=int, help="Sin particiones: filas más viejas van a *Archivo y salen de la API (EVENTOS_ACTIVOS_DIAS; 0 = no).")
+        parser.add_argument("--meses-adelante", type=int, help="Particiones a crear por adelantado (EVENTOS_PARTICIONES_ADELANTE).")
+        parser.add_argument("--lote", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true", help="Solo cuenta; no escribe ni borra.")
+
+    def handle(self, *args, **opts):
+        tablas = list(TABLAS) if opts["tabla"] == "todas" else [opts["tabla"]]
+        resumen = archivar(
+            tablas=tablas,
+            retencion_dias=opts["retencion_dias"],
+            payload_dias=opts["payload_dias"],
+            activos_dias=opts["activos_dias"],
+            meses_adelante=opts["meses_adelante"],
+            lote=opts["lote"],
+            dry_run=opts["dry_run"],
+        )
+        for tabla, creadas in resumen["particiones"].items():
+            if creadas:
+                self.stdout.write(f"{tabla}: particiones nuevas {', '.join(creadas)}")
+        prefijo = "[dry-run] " if opts["dry_run"] else ""
+        for clave in tablas:
+            r = resumen[clave]
+            self.stdout.write(f"{prefijo}{clave}: {r['a_archivo']} filas a la tabla de archivo")
+            for tipo in ("payloads", "retencion"):
+                for m in r[tipo]:
+                    destino = m["archivo"] or "-"
+                    drop = f" (DROP {m['drop']})" if m.get("drop") else ""
+                    self.stdout.write(f"{prefijo}{clave} {tipo} {m['mes']}: {m['filas']} filas -> {destino}{drop}")
+        self.stdout.write(f"{prefijo}PayloadBlob sin eventos borrados: {resumen['blobs_purgados']}")
+        self.stdout.write(self.style.SUCCESS(f"{prefijo}Archivo de eventos terminado."))
@@ -0,0 +1,38 @@
+# management/commands/barrer_mora.py
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from smartcondominio.services_cuotas import barrido_diario
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula estados (VENCIDA, etc.) y aplica la mora fija a todas las cuotas con UPDATE masivos. "
+        "Idempotente por día: pensado para cron (o billing_worker --barrido-a HH:MM)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fecha", help="Fecha de corte YYYY-MM-DD (por defecto hoy).")
+        parser.add_argument("--mora", help="Mora fija por cuota vencida (por defecto settings.MORA_FIJA).")
+        parser.add_argument("--batch", type=int, default=5000, help="Cuotas por lote (rango de ids).")
+        parser.add_argument("--force", action="store_true", help="Re-ejecuta aunque ya haya barrido del día.")
+
+    def handle(self, *args, **opts):
+        fecha = None
+        if opts["fecha"]:
+            fecha = parse_date(opts["fecha"])
+            if not fecha:
+                raise CommandError("--fecha debe tener formato YYYY-MM-DD.")
+
+        barrido, ejecutado = barrido_diario(
+            fecha=fecha, mora_fija=opts["mora"], batch_size=opts["batch"], force=opts["force"]
+        )
+        if not ejecutado:
+            self.stdout.write(f"Barrido {barrido.fecha} ya realizado ({barrido.finished_at:%H:%M:%S}); use --force.")
+            return
+        for t, n in sorted(barrido.transiciones.items()):
+            self.stdout.write(f"  {t}: {n}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Barrido {barrido.fecha}: mora {barrido.mora_fija} en {barrido.cuotas_con_mora} cuotas, "
+            f"{barrido.duracion_ms} ms"
+        ))
@@ -0,0 +1,60 @@
+# management/commands/billing_worker.py
+import os
+import socket
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from smartcondominio.services_billing import claim_next_job, run_job
+from smartcondominio.services_cuotas import barrido_diario
+
+
+class Command(BaseCommand):
+    help = "Worker de jobs de facturación (BillingJob). Usa la base de datos como cola."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Procesa los jobs pendientes y termina.")
+        parser.add_argument("--poll", type=float, default=2.0, help="Segundos entre consultas a la cola.")
+        parser.add_argument("--stale", type=int, default=60, help="Segundos sin heartbeat para retomar un job.")
+        parser.add_argument("--worker-id", default="", help="Identificador del worker (por defecto host:pid).")
+        parser.add_argument(
+            "--barrido-a", default="",
+            help="HH:MM: corre también el barrido diario de mora (barrer_mora) una vez al día desde esa hora.",
+        )
+
+    def handle(self, *args, **opts):
+        worker_id = opts["worker_id"] or f"{socket.gethostname()}:{os.getpid()}"
+        stale = timedelta(seconds=opts["stale"])
+        hora_barrido = None
+        if opts["barrido_a"]:
+            try:
+                hora_barrido = datetime.strptime(opts["barrido_a"], "%H:%M").time()
+            except ValueError:
+                raise CommandError("--barrido-a debe tener formato HH:MM.")
+        ultimo_barrido = None
+
+        self.stdout.write(f"billing_worker {worker_id} iniciado")
+        try:
+            while True:
+                if hora_barrido and ultimo_barrido != date.today() and datetime.now().time() >= hora_barrido:
+                    # barrido_diario es idempotente por fecha: si otro worker ya lo hizo, no repite
+                    barrido, ejecutado = barrido_diario()
+                    ultimo_barrido = barrido.fecha
+                    if ejecutado:
+                        self.stdout.write(f"Barrido {barrido.fecha}: {barrido.transiciones} ({barrido.duracion_ms} ms)")
+
+                job = claim_next_job(worker_id, stale_after=stale)
+                if job is None:
+                    if opts["once"]:
+                        return
+                    time.sleep(opts["poll"])
+                    continue
+                self.stdout.write(f"BillingJob #{job.id}: desde item {job.cursor_item}, unidad > {job.cursor_unidad}")
+                job = run_job(job, worker_id)
+                self.stdout.write(
+                    f"BillingJob #{job.id}: {job.status} ({job.processed}/{job.total}, "
+                    f"{job.cuotas_afectadas} cuotas)"
+                )
+        except KeyboardInterrupt:
+            self.stdout.write("billing_worker detenido")
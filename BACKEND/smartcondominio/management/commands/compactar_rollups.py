@@ -0,0 +1,29 @@
+# management/commands/compactar_rollups.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from smartcondominio.services_rollups import compactar
+
+
+class Command(BaseCommand):
+    help = (
+        "Suma a los cubos de analítica (AccessRollupHora) los AccessEvent nuevos desde la última "
+        "marca (services_rollups.py). Una pasada para cron, o --cada N segundos como proceso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=50_000, help="Ids de eventos por transacción.")
+        parser.add_argument("--cada", type=float, default=0, help="Segundos entre pasadas (0 = una sola).")
+
+    def handle(self, *args, **opts):
+        try:
+            while True:
+                r = compactar(lote=opts["lote"])
+                if r["eventos"] or not opts["cada"]:
+                    self.stdout.write(f"{r['eventos']} eventos en {r['celdas']} celdas; marca en id {r['ultimo_id']}")
+                if not opts["cada"]:
+                    return
+                time.sleep(opts["cada"])
+        except KeyboardInterrupt:
+            self.stdout.write("compactar_rollups detenido")
@@ -0,0 +1,24 @@
+# management/commands/comprimir_payloads.py
+from django.core.management.base import BaseCommand
+
+from smartcondominio.payloads import MODELOS, comprimir_existentes
+
+
+class Command(BaseCommand):
+    help = (
+        "Pasa los eventos de garita anteriores a PayloadBlob (payloads.py) al esquema nuevo: "
+        "payloads de más de PAYLOAD_INLINE_BYTES a blobs comprimidos y resumen inline para las "
+        "listas. Por lotes de ids; se puede cortar y volver a correr."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Solo cuenta las filas pendientes.")
+
+    def handle(self, *args, **opts):
+        prefijo = "[dry-run] " if opts["dry_run"] else ""
+        for modelo in MODELOS:
+            r = comprimir_existentes(modelo, lote=opts["lote"], dry_run=opts["dry_run"])
+            a_blob = "" if r["a_blob"] is None else f", {r['a_blob']} a PayloadBlob"
+            self.stdout.write(f"{prefijo}{modelo._meta.db_table}: {r['filas']} filas{a_blob}")
+        self.stdout.write(self.style.SUCCESS(f"{prefijo}Payloads comprimidos."))
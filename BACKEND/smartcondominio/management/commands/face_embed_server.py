@@ -0,0 +1,80 @@
+# management/commands/face_embed_server.py
+import hashlib
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from smartcondominio.ai.embed_server import EmbedServer
+
+
+def embed_falso(demora_ms, por_imagen_ms=0.0, dim=512):
+    """
+    Embedder sintético (sin modelo) para probar IPC/lotes: vector fijo por imagen y
+    una demora fija por lote + otra por imagen (sleep: libera el GIL como ONNX).
+    """
+    def embed_batch(images):
+        time.sleep((demora_ms + por_imagen_ms * len(images)) / 1000)
+        out = []
+        for data in images:
+            if not data:
+                out.append(None)
+                continue
+            seed = int.from_bytes(hashlib.sha256(data).digest()[:8], "big")
+            v = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+            out.append(v / np.linalg.norm(v))
+        return out
+    return embed_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Servidor local de embeddings de rostros: carga el modelo una vez y atiende a los "
+        "workers por socket Unix (FACE_EMBED_SOCKET); los embeddings vuelven por memoria compartida."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", help="Ruta del socket (default FACE_EMBED_SOCKET o MEDIA_ROOT/face_data/embed.sock).")
+        parser.add_argument("--hilos", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                            help="Hilos de inferencia sobre el mismo modelo.")
+        parser.add_argument("--max-batch", type=int, default=getattr(settings, "FACE_EMBED_BATCH_MAX", 8),
+                            help="Imágenes por lote (default FACE_EMBED_BATCH_MAX).")
+        parser.add_argument("--max-wait-ms", type=float, default=getattr(settings, "FACE_BATCH_WAIT_MS", 5.0),
+                            help="Espera máxima para completar un lote.")
+        parser.add_argument("--slots", type=int, default=1024, help="Ranuras de memoria compartida.")
+        parser.add_argument("--fake-ms", type=float,
+                            help="Sin modelo: embeddings sintéticos con esta demora por lote (pruebas de carga).")
+
+    def handle(self, *args, **opts):
+        path = opts["socket"] or getattr(settings, "FACE_EMBED_SOCKET", "") or \
+            str(Path(settings.MEDIA_ROOT) / "face_data" / "embed.sock")
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        if opts["fake_ms"] is not None:
+            embed_batch = embed_falso(opts["fake_ms"])
+        else:
+            import cv2
+            from smartcondominio.ai import face
+
+            t0 = time.perf_counter()
+            vacia = cv2.imencode(".jpg", np.zeros((640, 640, 3), dtype=np.uint8))[1].tobytes()
+            face.embed_batch_local([vacia])   # carga el modelo antes de aceptar conexiones
+            self.stdout.write(f"Modelo cargado en {(time.perf_counter() - t0):.1f} s")
+            embed_batch = face.embed_batch_local
+
+        server = EmbedServer(path, embed_batch, slots=opts["slots"], max_batch=opts["max_batch"],
+                             max_wait_ms=opts["max_wait_ms"], hilos=opts["hilos"])
+
+        def terminar(*_):
+            threading.Thread(target=server.close, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, terminar)
+        signal.signal(signal.SIGINT, terminar)
+        self.stdout.write(self.style.SUCCESS(
+            f"Escuchando en {path} ({opts['hilos']} hilos, lote máx. {opts['max_batch']} / {opts['max_wait_ms']} ms)"))
+        server.serve_forever()
@@ -0,0 +1,50 @@
+# management/commands/face_index.py
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from smartcondominio.ai.face_index import crear_indice
+
+
+class Command(BaseCommand):
+    help = (
+        "Mantenimiento del índice de rostros de ai/face.py: estado, re-entrenamiento "
+        "del IVF, compactación de bajas y baja de una persona."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="Directorio del índice (default MEDIA_ROOT/face_data/index).")
+        parser.add_argument("--entrenar", action="store_true", help="(Re)entrena los centroides del IVF.")
+        parser.add_argument("--si-hace-falta", action="store_true",
+                            help="Con --entrenar: solo si no está entrenado o la galería se duplicó (para cron).")
+        parser.add_argument("--nlist", type=int, help="Listas del IVF (default ~sqrt(filas)).")
+        parser.add_argument("--compactar", action="store_true", help="Quita físicamente las filas borradas.")
+        parser.add_argument("--borrar", metavar="PERSON_ID", help="Da de baja todas las fotos de la persona.")
+
+    def handle(self, *args, **opts):
+        directorio = Path(opts["dir"]) if opts["dir"] else Path(settings.MEDIA_ROOT) / "face_data" / "index"
+        index = crear_indice(
+            directorio,
+            backend=getattr(settings, "FACE_INDEX_BACKEND", "ivf"),
+            nprobe=getattr(settings, "FACE_IVF_NPROBE", 16),
+            min_filas=getattr(settings, "FACE_IVF_MIN_FILAS", 20000),
+        )
+
+        if opts["borrar"]:
+            self.stdout.write(f"{opts['borrar']}: {index.delete(opts['borrar'])} filas dadas de baja")
+        if opts["compactar"]:
+            self.stdout.write(f"Compactado: {index.compactar()} filas quitadas")
+        if opts["entrenar"]:
+            if not hasattr(index, "entrenar"):
+                raise CommandError(f"El backend {index.backend!r} no se entrena")
+            if opts["si_hace_falta"] and not index.necesita_entrenar():
+                self.stdout.write("No hace falta re-entrenar")
+            else:
+                try:
+                    index.entrenar(nlist=opts["nlist"])
+                except ValueError as e:
+                    raise CommandError(str(e))
+                self.stdout.write(self.style.SUCCESS("Entrenado"))
+        self.stdout.write(json.dumps(index.stats(), indent=2, ensure_ascii=False))
@@ -0,0 +1,34 @@
+# management/commands/particionar_eventos.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from smartcondominio import particiones
+
+
+class Command(BaseCommand):
+    help = (
+        "Postgres: convierte AccessEvent y FaceAccessEvent en tablas particionadas por mes "
+        "(particiones.py). Renombra las tablas actuales a *_legacy y las adjunta como partición: "
+        "correrlo una vez, con la app detenida y después de probarlo en una copia de la base. "
+        "No hay vuelta atrás automática."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--confirmar", action="store_true", help="Sin esto solo muestra el estado.")
+        parser.add_argument("--meses-adelante", type=int, help="Particiones a crear (EVENTOS_PARTICIONES_ADELANTE).")
+
+    def handle(self, *args, **opts):
+        if not particiones.soportado(connection):
+            raise CommandError(f"Solo Postgres (esta base es {connection.vendor}): aquí se usan las tablas *Archivo.")
+        meses = opts["meses_adelante"] or getattr(settings, "EVENTOS_PARTICIONES_ADELANTE", 3)
+        for tabla in particiones.TABLAS:
+            if particiones.es_particionada(connection, tabla):
+                self.stdout.write(f"{tabla}: ya particionada ({len(particiones.particiones(connection, tabla))} particiones)")
+            elif not opts["confirmar"]:
+                self.stdout.write(f"{tabla}: sin particionar (--confirmar para convertirla)")
+            else:
+                with transaction.atomic():   # todo o nada por tabla
+                    particiones.particionar(connection, tabla, meses=meses)
+                nombres = [p["nombre"] for p in particiones.particiones(connection, tabla)]
+                self.stdout.write(self.style.SUCCESS(f"{tabla}: particionada -> {', '.join(nombres)}"))
@@ -0,0 +1,49 @@
+# management/commands/reconciliar_saldos.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from smartcondominio.services_ledger import asiento, diferencias, reconstruir_saldos, registrar
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica por unidad que UnidadSaldo = suma del libro de movimientos = suma de sus cuotas. "
+        "Con --fix registra asientos AJUSTE por lo que el libro no refleja y reconstruye los saldos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Corrige las diferencias encontradas.")
+        parser.add_argument("--rebuild", action="store_true", help="Reconstruye todos los saldos desde el libro.")
+        parser.add_argument("--batch", type=int, default=2000)
+        parser.add_argument("--verbose-max", type=int, default=20, help="Máximo de diferencias a listar.")
+
+    def handle(self, *args, **opts):
+        if opts["rebuild"]:
+            n = reconstruir_saldos(batch_size=opts["batch"])
+            self.stdout.write(f"Saldos reconstruidos desde el libro: {n} unidades.")
+
+        difs = diferencias(batch_size=opts["batch"])
+        for d in difs[:opts["verbose_max"]]:
+            self.stdout.write(
+                f"  unidad {d['unidad_id']}: saldo={d['saldo']} libro={d['libro']} cuotas={d['cuotas']}"
+            )
+        if not difs:
+            self.stdout.write(self.style.SUCCESS("Saldos, libro y cuotas cuadran."))
+            return
+        if not opts["fix"]:
+            raise CommandError(f"{len(difs)} unidades no cuadran (use --fix para corregir).")
+
+        with transaction.atomic():
+            # lo que el libro no refleja de las cuotas entra como ajuste (el libro no se edita)
+            registrar([
+                asiento(d["unidad_id"], "AJUSTE",
+                        cargo=d["cuotas"][0] - d["libro"][0], abono=d["cuotas"][1] - d["libro"][1],
+                        detalle="Reconciliación")
+                for d in difs if d["libro"] != d["cuotas"]
+            ])
+            reconstruir_saldos([d["unidad_id"] for d in difs], batch_size=opts["batch"])
+
+        restantes = diferencias(batch_size=opts["batch"])
+        if restantes:
+            raise CommandError(f"Quedan {len(restantes)} unidades sin cuadrar tras corregir.")
+        self.stdout.write(self.style.SUCCESS(f"{len(difs)} unidades corregidas."))
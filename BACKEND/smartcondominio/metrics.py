@@ -0,0 +1,134 @@
+# smartcondominio/metrics.py
+"""
+Métricas en memoria del proceso (cada worker de gunicorn lleva las suyas) que expone
+/api/metrics/.
+
+- incr(nombre, n, **etiquetas): contador.
+- observar(nombre, valor, **etiquetas): cuenta / suma / máximo / último.
+- evento(tipo) / por_evento(tipo): delimita un "evento" (p.ej. un paso por la garita) y
+  cuenta las llamadas a AWS hechas mientras dura; al cerrar lo registra en
+  aws_llamadas_por_evento{tipo}. Usa contextvars, así que sirve con hilos y async.
+- instrumentar_boto3(client): engancha los eventos de botocore para contar llamadas
+  (before-call, una por operación) e intentos (before-send, incluye reintentos).
+"""
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_contadores = {}
+_observaciones = {}
+_desde = time.time()
+
+_evento = contextvars.ContextVar("metrics_evento", default=None)
+
+
+def _clave(nombre, etiquetas):
+    if not etiquetas:
+        return nombre
+    return nombre + "{" + ",".join(f"{k}={v}" for k, v in sorted(etiquetas.items())) + "}"
+
+
+def incr(nombre, n=1, **etiquetas):
+    k = _clave(nombre, etiquetas)
+    with _lock:
+        _contadores[k] = _contadores.get(k, 0) + n
+
+
+def observar(nombre, valor, **etiquetas):
+    k = _clave(nombre, etiquetas)
+    with _lock:
+        o = _observaciones.get(k)
+        if o is None:
+            o = _observaciones[k] = {"cuenta": 0, "suma": 0.0, "max": None, "ultimo": None}
+        o["cuenta"] += 1
+        o["suma"] += valor
+        o["max"] = valor if o["max"] is None else max(o["max"], valor)
+        o["ultimo"] = valor
+
+
+def snapshot() -> dict:
+    with _lock:
+        obs = {
+            k: {**o, "media": round(o["suma"] / o["cuenta"], 4) if o["cuenta"] else None}
+            for k, o in _observaciones.items()
+        }
+        return {"pid": os.getpid(), "desde": _desde, "contadores": dict(_contadores), "observaciones": obs}
+
+
+def reset():
+    global _desde
+    with _lock:
+        _contadores.clear()
+        _observaciones.clear()
+        _desde = time.time()
+
+
+# ---------------------------
+# Eventos
+# ---------------------------
+@contextmanager
+def evento(tipo):
+    """Cuenta las llamadas a AWS hechas dentro del bloque: `with evento("face_gate") as ev: ... ev["aws"]`."""
+    ev = {"tipo": tipo, "aws": 0, "aws_intentos": 0, "ops": {}}
+    token = _evento.set(ev)
+    try:
+        yield ev
+    finally:
+        _evento.reset(token)
+        incr("eventos", tipo=tipo)
+        observar("aws_llamadas_por_evento", ev["aws"], tipo=tipo)
+        observar("aws_intentos_por_evento", ev["aws_intentos"], tipo=tipo)
+
+
+def por_evento(tipo):
+    """Decorador: cada llamada a la función (o corrutina) es un evento (ver evento())."""
+    def deco(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                with evento(tipo):
+                    return await fn(*args, **kwargs)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with evento(tipo):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def evento_actual():
+    """El dict del evento en curso (o None)."""
+    return _evento.get()
+
+
+# ---------------------------
+# boto3
+# ---------------------------
+def instrumentar_boto3(client):
+    servicio = client.meta.service_model.service_id.hyphenize()
+
+    def antes_de_llamar(model=None, **kwargs):
+        op = getattr(model, "name", "?")
+        incr("aws_llamadas", servicio=servicio, op=op)
+        ev = _evento.get()
+        if ev is not None:
+            ev["aws"] += 1
+            ev["ops"][op] = ev["ops"].get(op, 0) + 1
+
+    def antes_de_enviar(**kwargs):
+        incr("aws_intentos", servicio=servicio)
+        ev = _evento.get()
+        if ev is not None:
+            ev["aws_intentos"] += 1
+
+    # primero: otros handlers de before-call (Stubber, cachés) pueden cortar la cadena
+    client.meta.events.register_first(f"before-call.{servicio}", antes_de_llamar)
+    client.meta.events.register_first(f"before-send.{servicio}", antes_de_enviar)
+    return client
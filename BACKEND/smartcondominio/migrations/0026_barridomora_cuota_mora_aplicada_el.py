@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:56
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcondominio', '0025_billingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarridoMora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('mora_fija', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('terminado', models.BooleanField(default=False)),
+                ('transiciones', models.JSONField(blank=True, default=dict)),
+                ('cuotas_con_mora', models.PositiveIntegerField(default=0)),
+                ('duracion_ms', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddField(
+            model_name='cuota',
+            name='mora_aplicada_el',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:02
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def abrir_saldos(apps, schema_editor):
+    """Asiento APERTURA por unidad con lo que ya suman sus cuotas, y su fila de saldo."""
+    Unidad = apps.get_model('smartcondominio', 'Unidad')
+    Cuota = apps.get_model('smartcondominio', 'Cuota')
+    MovimientoCuenta = apps.get_model('smartcondominio', 'MovimientoCuenta')
+    UnidadSaldo = apps.get_model('smartcondominio', 'UnidadSaldo')
+
+    q = lambda x: Decimal(x or 0).quantize(Decimal('0.01'))
+    sumas = {
+        r['unidad_id']: (q(r['c']), q(r['a']))
+        for r in Cuota.objects.values('unidad_id').annotate(c=Sum('total_a_pagar'), a=Sum('pagado')).order_by()
+    }
+    movimientos, saldos = [], []
+    for unidad_id in Unidad.objects.values_list('id', flat=True):
+        cargado, abonado = sumas.get(unidad_id, (Decimal('0.00'), Decimal('0.00')))
+        if cargado or abonado:
+            movimientos.append(MovimientoCuenta(
+                unidad_id=unidad_id, tipo='APERTURA', cargo=cargado, abono=abonado,
+                detalle='Saldo inicial desde cuotas',
+            ))
+        saldos.append(UnidadSaldo(
+            unidad_id=unidad_id, total_cargado=cargado, total_abonado=abonado, saldo=cargado - abonado,
+        ))
+    MovimientoCuenta.objects.bulk_create(movimientos, batch_size=1000)
+    UnidadSaldo.objects.bulk_create(saldos, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcondominio', '0026_barridomora_cuota_mora_aplicada_el'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnidadSaldo',
+            fields=[
+                ('unidad', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo_cuenta', serialize=False, to='smartcondominio.unidad')),
+                ('total_cargado', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_abonado', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('saldo', models.DecimalField(db_index=True, decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-saldo'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoCuenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('APERTURA', 'Saldo de apertura'), ('CARGO', 'Cargo'), ('AJUSTE', 'Ajuste'), ('MORA', 'Mora'), ('PAGO', 'Pago'), ('REVERSION', 'Reversión de pago')], max_length=10)),
+                ('cargo', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('abono', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('operacion', models.UUIDField(blank=True, db_index=True, null=True)),
+                ('detalle', models.CharField(blank=True, max_length=120)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cuota', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='smartcondominio.cuota')),
+                ('pago', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='smartcondominio.pago')),
+                ('unidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='smartcondominio.unidad')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['unidad', 'id'], name='smartcondom_unidad__05a880_idx')],
+            },
+        ),
+        migrations.RunPython(abrir_saldos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcondominio', '0027_movimientocuenta_unidadsaldo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unidadsaldo',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:48
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcondominio', '0028_unidadsaldo_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessEventArchivo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('camera_id', models.CharField(blank=True, max_length=60)),
+                ('plate_raw', models.CharField(blank=True, max_length=30)),
+                ('plate_norm', models.CharField(blank=True, max_length=30)),
+                ('score', models.FloatField(blank=True, null=True)),
+                ('decision', models.CharField(max_length=32)),
+                ('reason', models.CharField(blank=True, max_length=200)),
+                ('opened', models.BooleanField(default=False)),
+                ('vehicle_id', models.BigIntegerField(blank=True, null=True)),
+                ('visit_id', models.BigIntegerField(blank=True, null=True)),
+                ('direction', models.CharField(blank=True, max_length=10)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('triggered_by_id', models.BigIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FaceAccessEventArchivo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('camera_id', models.CharField(blank=True, default='', max_length=100)),
+                ('direction', models.CharField(blank=True, default='', max_length=10)),
+                ('decision', models.CharField(max_length=20)),
+                ('score', models.DecimalField(blank=True, decimal_places=4, max_digits=6, null=True)),
+                ('opened', models.BooleanField(default=False)),
+                ('matched_user_id', models.BigIntegerField(blank=True, null=True)),
+                ('triggered_by_id', models.BigIntegerField(blank=True, null=True)),
+                ('snapshot', models.CharField(blank=True, default='', max_length=255)),
+                ('reason', models.TextField(blank=True, default='')),
+                ('payload', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='accessevent',
+            index=models.Index(fields=['created_at'], name='smartcondom_created_bb78bf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accessevent',
+            index=models.Index(fields=['decision', 'created_at'], name='smartcondom_decisio_5bb0b1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accessevent',
+            index=models.Index(fields=['plate_norm', 'created_at'], name='smartcondom_plate_n_88dc9e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accessevent',
+            index=models.Index(django.db.models.functions.text.Upper('camera_id'), models.F('created_at'), name='accessevent_cam_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='faceaccessevent',
+            index=models.Index(fields=['decision', 'created_at'], name='smartcondom_decisio_f97497_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='faceaccessevent',
+            index=models.Index(fields=['matched_user', 'created_at'], name='smartcondom_matched_febc45_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='faceaccessevent',
+            index=models.Index(django.db.models.functions.text.Upper('camera_id'), models.F('created_at'), name='faceevent_cam_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accesseventarchivo',
+            index=models.Index(fields=['created_at'], name='smartcondom_created_11ddef_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accesseventarchivo',
+            index=models.Index(fields=['plate_norm', 'created_at'], name='smartcondom_plate_n_e39eac_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='faceaccesseventarchivo',
+            index=models.Index(fields=['created_at'], name='smartcondom_created_236e10_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcondominio', '0030_payload_blob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accessevent',
+            index=models.Index(fields=['created_at', 'id'], name='smartcondom_created_f5dc20_idx'),
+        ),
+        # el nuevo (created_at, id) cubre lo que usaba el de created_at solo
+        migrations.RemoveIndex(
+            model_name='accessevent',
+            name='smartcondom_created_bb78bf_idx',
+        ),
+        migrations.AddIndex(
+            model_name='faceaccessevent',
+            index=models.Index(fields=['created_at', 'id'], name='smartcondom_created_0ce47d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='onlinepaymentintent',
+            index=models.Index(fields=['provider', 'created_at', 'id'], name='smartcondom_provide_8f82ce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['created_at', 'id'], name='smartcondom_created_e5c960_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcondominio', '0031_indices_keyset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupMarca',
+            fields=[
+                ('nombre', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('ultimo_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AccessRollupHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField()),
+                ('camera_id', models.CharField(blank=True, max_length=60)),
+                ('direction', models.CharField(blank=True, max_length=10)),
+                ('decision', models.CharField(max_length=32)),
+                ('eventos', models.PositiveIntegerField(default=0)),
+                ('abiertos', models.PositiveIntegerField(default=0)),
+                ('score_suma', models.FloatField(default=0)),
+                ('score_n', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['camera_id', 'hora'], name='smartcondom_camera__b53526_idx')],
+                'constraints': [models.UniqueConstraint(fields=('hora', 'camera_id', 'direction', 'decision'), name='accessrollup_celda_uniq')],
+            },
+        ),
+    ]
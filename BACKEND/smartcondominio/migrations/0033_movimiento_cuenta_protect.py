@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcondominio', '0032_rollups_garita'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimientocuenta',
+            name='cuota',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='smartcondominio.cuota'),
+        ),
+        migrations.AlterField(
+            model_name='movimientocuenta',
+            name='pago',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='smartcondominio.pago'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcondominio', '0033_movimiento_cuenta_protect'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlacasVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
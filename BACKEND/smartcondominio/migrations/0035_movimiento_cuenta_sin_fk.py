@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcondominio', '0034_placas_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimientocuenta',
+            name='cuota',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movimientos', to='smartcondominio.cuota'),
+        ),
+        migrations.AlterField(
+            model_name='movimientocuenta',
+            name='pago',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movimientos', to='smartcondominio.pago'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Relleno de `resumen` para los eventos anteriores a 0030 (las listas, el export y el SSE
+# sirven `resumen`). Sin tocar `payload`: pasarlos a PayloadBlob sigue siendo
+# `manage.py comprimir_payloads`. Lotes por id en transacciones cortas (se puede cortar y
+# volver a correr). La regla de payloads.separar/resumir va copiada: la migración no cambia
+# si después cambia ese módulo.
+
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, transaction
+
+LOTE = 1000
+TEXTO_MAX = 200
+MODELOS = ('AccessEvent', 'FaceAccessEvent', 'AccessEventArchivo', 'FaceAccessEventArchivo')
+
+
+def resumir(valor, profundidad=2):
+    if isinstance(valor, str):
+        return valor[:TEXTO_MAX]
+    if valor is None or isinstance(valor, (bool, int, float)):
+        return valor
+    if isinstance(valor, (list, tuple)):
+        return {'n': len(valor)}
+    if isinstance(valor, dict):
+        if profundidad <= 0:
+            return {'n': len(valor)}
+        return {str(k): resumir(v, profundidad - 1) for k, v in valor.items()}
+    return str(valor)[:TEXTO_MAX]
+
+
+def resumen_de(payload):
+    crudo = json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    if len(crudo.encode()) <= int(getattr(settings, 'PAYLOAD_INLINE_BYTES', 1024)):
+        return payload
+    return resumir(payload)
+
+
+def rellenar_resumen(apps, schema_editor):
+    for nombre in MODELOS:
+        modelo = apps.get_model('smartcondominio', nombre)
+        pendientes = (
+            modelo.objects.filter(resumen={}, payload_blob_id__isnull=True)
+            .exclude(payload={}).exclude(payload__has_key='archivado')
+            .order_by('id')
+        )
+        ultimo = 0
+        while True:
+            bloque = list(pendientes.filter(id__gt=ultimo).only('id', 'payload')[:LOTE])
+            if not bloque:
+                break
+            for obj in bloque:
+                obj.resumen = resumen_de(obj.payload)
+            with transaction.atomic():
+                modelo.objects.bulk_update(bloque, ['resumen'], batch_size=500)
+            ultimo = bloque[-1].id
+
+
+class Migration(migrations.Migration):
+    atomic = False   # un commit por lote
+
+    dependencies = [
+        ('smartcondominio', '0035_movimiento_cuenta_sin_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar_resumen, migrations.RunPython.noop, elidable=True),
+    ]
@@ -5,9 +5,11 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission, User  # User para FKs directas en algunos modelos
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
-from django.db.models import Q, F
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models import Q, F, Case, When, Value
+from django.db.models.functions import Greatest, Round, Upper
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual, LessThan
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
@@ -178,6 +180,7 @@ class Cuota(models.Model):
     vencimiento = models.DateField()
     estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default="PENDIENTE")
     is_active = models.BooleanField(default=True)
+    mora_aplicada_el = models.DateField(null=True, blank=True)  # último día en que el barrido cargó mora
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -228,6 +231,24 @@ class Cuota(models.Model):
             else:
                 self.estado = "PENDIENTE"
 
+    @staticmethod
+    def estado_sql(today=None, pagado=None, total=None):
+        """
+        Misma regla que recalc_estado, como expresión SQL (para UPDATE masivos).
+        pagado/total permiten pasar expresiones, p.ej. F("pagado") + monto.
+        """
+        today = today or date.today()
+        pagado = pagado if pagado is not None else F("pagado")
+        total = total if total is not None else F("total_a_pagar")
+        return Case(
+            When(is_active=False, then=Value("ANULADA")),
+            When(GreaterThan(total, 0) & GreaterThanOrEqual(pagado, total), then=Value("PAGADA")),
+            When(GreaterThan(pagado, 0) & LessThan(pagado, total), then=Value("PARCIAL")),
+            When(GreaterThan(total, 0) & LessThan(F("vencimiento"), today), then=Value("VENCIDA")),
+            default=Value("PENDIENTE"),
+            output_field=models.CharField(),
+        )
+
     def apply_simple_mora(self, mora_fija=Decimal("0.00")):
         """Ejemplo simple de mora fija si está vencida y tiene saldo."""
         if date.today() > self.vencimiento and self.saldo > 0 and mora_fija > 0:
@@ -254,27 +275,163 @@ class Pago(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["created_at", "id"])]   # ?cursor= (pagination.py)
 
     def __str__(self):
         return f"Pago {self.id} · Cuota {self.cuota_id} · {self.monto}"
 
     def aplicar(self):
+        """
+        Suma el monto a la cuota con un único UPDATE (pagado = pagado + monto) y
+        recalcula el estado en el mismo statement: dos pagos simultáneos sobre la
+        misma cuota no se pisan.
+        """
         if not self.valido:
             return
-        self.cuota.pagado = (Decimal(self.cuota.pagado) + Decimal(self.monto)).quantize(Decimal("0.01"))
-        self.cuota.recalc_estado()
-        self.cuota.save(update_fields=["pagado", "estado", "updated_at"])
+        from .services_ledger import registrar_pago
+        with transaction.atomic():
+            self._mover_pagado(Round(F("pagado") + Decimal(self.monto), 2))
+            registrar_pago(self, "PAGO", Decimal(self.monto))
 
     def revertir(self):
         if not self.valido:
             return
-        self.valido = False
-        self.save(update_fields=["valido"])
-        self.cuota.pagado = (Decimal(self.cuota.pagado) - Decimal(self.monto))
-        if self.cuota.pagado < 0:
-            self.cuota.pagado = Decimal("0.00")
-        self.cuota.recalc_estado()
-        self.cuota.save(update_fields=["pagado", "estado", "updated_at"])
+        from .services_ledger import registrar_pago
+        with transaction.atomic():
+            # solo el primero que lo invalida descuenta: dos reversiones no restan dos veces
+            if not Pago.objects.filter(pk=self.pk, valido=True).update(valido=False):
+                self.valido = False
+                return
+            self.valido = False
+            # fila bloqueada: lo realmente descontado (pagado no baja de 0) es lo que va al libro
+            antes = Cuota.objects.select_for_update().values_list("pagado", flat=True).get(pk=self.cuota_id)
+            self._mover_pagado(Greatest(
+                Round(F("pagado") - Decimal(self.monto), 2), Value(Decimal("0.00")),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ))
+            registrar_pago(self, "REVERSION", self.cuota.pagado - antes)
+
+    def _mover_pagado(self, nuevo_pagado):
+        Cuota.objects.filter(pk=self.cuota_id).update(
+            pagado=nuevo_pagado,
+            estado=Cuota.estado_sql(pagado=nuevo_pagado),
+            updated_at=timezone.now(),
+        )
+        self.cuota.refresh_from_db(fields=["pagado", "estado", "updated_at"])
+
+
+# ---------------------------
+# Libro de movimientos / saldos por unidad
+# ---------------------------
+
+class MovimientoCuenta(models.Model):
+    """
+    Libro append-only de la cuenta de cada unidad. Cada asiento es la variación
+    que produjo una operación sobre sus cuotas: cargo = cambio en total_a_pagar,
+    abono = cambio en pagado (ambos con signo). Se escribe con services_ledger.
+    Nunca se edita ni se borra: una corrección es un asiento nuevo.
+    """
+    TIPO_CHOICES = [
+        ("APERTURA", "Saldo de apertura"),
+        ("CARGO", "Cargo"),
+        ("AJUSTE", "Ajuste"),
+        ("MORA", "Mora"),
+        ("PAGO", "Pago"),
+        ("REVERSION", "Reversión de pago"),
+    ]
+
+    unidad = models.ForeignKey(Unidad, on_delete=models.CASCADE, related_name="movimientos")
+    # sin FK en la BD: los asientos sobreviven a la cuota/pago borrados (el libro no se edita);
+    # el borrado deja su propio asiento (cerrar_cuota_en_libro / revertir_pago_borrado)
+    cuota = models.ForeignKey(
+        Cuota, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name="movimientos",
+    )
+    pago = models.ForeignKey(
+        Pago, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name="movimientos",
+    )
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    cargo = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    abono = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    operacion = models.UUIDField(null=True, blank=True, db_index=True)  # asientos escritos juntos
+    detalle = models.CharField(max_length=120, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [models.Index(fields=["unidad", "id"])]
+
+    def __str__(self):
+        return f"{self.tipo} · Unidad {self.unidad_id} · cargo {self.cargo} · abono {self.abono}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None and not kwargs.get("force_insert"):
+            raise ValueError("MovimientoCuenta es append-only: registre un asiento de ajuste.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("MovimientoCuenta es append-only: registre un asiento de ajuste.")
+
+
+class UnidadSaldo(models.Model):
+    """
+    Saldo materializado de la unidad = suma de sus MovimientoCuenta.
+    total_cargado/total_abonado equivalen a Sum(total_a_pagar)/Sum(pagado) de sus cuotas.
+    Se mueve con UPDATE incrementales (F) en la misma transacción que el asiento;
+    `manage.py reconciliar_saldos` lo verifica contra el libro y las cuotas.
+    """
+    unidad = models.OneToOneField(Unidad, on_delete=models.CASCADE, primary_key=True, related_name="saldo_cuenta")
+    total_cargado = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    total_abonado = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    saldo = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"), db_index=True)
+    # sube con cualquier cambio de cuotas/pagos/comprobantes de la unidad (cache del estado de cuenta)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-saldo"]
+
+    def __str__(self):
+        return f"Saldo {self.unidad_id}: {self.saldo}"
+
+
+@receiver(post_save, sender=Unidad)
+def ensure_saldo(sender, instance, created, **kwargs):
+    if created:
+        UnidadSaldo.objects.get_or_create(unidad=instance)
+
+
+@receiver(post_delete, sender=Cuota)
+def cerrar_cuota_en_libro(sender, instance, **kwargs):
+    # Cuota borrada (sin pagos, por PROTECT): su cargo sale del saldo con un ajuste
+    from .services_ledger import registrar, asiento, tocar_unidades
+    registrar([asiento(instance.unidad_id, "AJUSTE", cargo=-Decimal(instance.total_a_pagar),
+                       abono=-Decimal(instance.pagado), cuota_id=instance.pk,
+                       detalle=f"Cuota {instance.pk} eliminada")])
+    tocar_unidades([instance.unidad_id])
+
+
+@receiver(pre_delete, sender=Pago)
+def revertir_pago_borrado(sender, instance, **kwargs):
+    # Pago válido borrado: antes de que desaparezca se descuenta de la cuota (asiento REVERSION)
+    instance.revertir()
+
+
+@receiver(post_save, sender=Cuota)
+def version_por_cuota(sender, instance, **kwargs):
+    from .services_ledger import tocar_unidades
+    tocar_unidades([instance.unidad_id])
+
+
+@receiver(post_save, sender="smartcondominio.Pago")
+@receiver(post_delete, sender="smartcondominio.Pago")
+@receiver(post_save, sender="smartcondominio.PagoComprobante")
+@receiver(post_delete, sender="smartcondominio.PagoComprobante")
+def version_por_pago(sender, instance, **kwargs):
+    # los UPDATE masivos no disparan señales: esos caminos llaman a tocar_unidades por su cuenta
+    from .services_ledger import tocar_unidades
+    unidad_id = Cuota.objects.filter(pk=instance.cuota_id).values_list("unidad_id", flat=True).first()
+    if unidad_id:
+        tocar_unidades([unidad_id])
 
 
 # =========================
@@ -742,6 +899,19 @@ class Vehiculo(models.Model):
         return f"{self.placa} ({self.marca} {self.modelo})"
 
 
+class PlacasVersion(models.Model):
+    """
+    Contador de cambios de Vehiculo/Visit para el índice de placas en memoria
+    (plate_index): sube en la misma transacción que el cambio y cada worker lo compara
+    con el de su índice para saber si otro proceso escribió. Una sola fila (pk=1).
+    """
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"placas v{self.version}"
+
+
 class SolicitudVehiculo(models.Model):
     solicitante = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -856,6 +1026,7 @@ class OnlinePaymentIntent(models.Model):
             models.Index(fields=["status"]),
             models.Index(fields=["created_at"]),
             models.Index(fields=["provider_id"]),
+            models.Index(fields=["provider", "created_at", "id"]),   # dashboard de intents, ?cursor=
         ]
 
     def __str__(self):
@@ -921,10 +1092,21 @@ class AccessEvent(models.Model):
         db_index=True,
     )
     payload      = models.JSONField(default=dict, blank=True)   # respuesta completa de Plate Recognizer (opcional)
+    # respuestas grandes: comprimidas en PayloadBlob y `payload` vacío; `resumen` es lo que sirven las listas (payloads.py)
+    resumen      = models.JSONField(default=dict, blank=True)
+    payload_blob = models.ForeignKey("smartcondominio.PayloadBlob", null=True, blank=True, on_delete=models.DO_NOTHING,
+                                     db_constraint=False, related_name="+")
     triggered_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
 
     class Meta:
         ordering = ["-created_at"]
+        # en Postgres la tabla está particionada por mes sobre created_at (particiones.py)
+        indexes = [
+            models.Index(fields=["created_at", "id"]),                  # orden de la lista, ?cursor= (pagination.py)
+            models.Index(fields=["decision", "created_at"]),
+            models.Index(fields=["plate_norm", "created_at"]),          # modo degradado, ?plate=
+            models.Index(Upper("camera_id"), "created_at", name="accessevent_cam_created_idx"),  # camera_id__iexact
+        ]
 
 
 # =========================
@@ -992,9 +1174,205 @@ class FaceAccessEvent(models.Model):
     snapshot = models.FileField(upload_to="face_snapshots/", blank=True, null=True)  # opcional
     reason = models.TextField(blank=True, default="")
     payload = models.JSONField(blank=True, default=dict)
+    resumen = models.JSONField(blank=True, default=dict)   # como en AccessEvent (payloads.py)
+    payload_blob = models.ForeignKey("smartcondominio.PayloadBlob", null=True, blank=True, on_delete=models.DO_NOTHING,
+                                     db_constraint=False, related_name="+")
+
+    class Meta:
+        ordering = ["-created_at"]
+        # en Postgres la tabla está particionada por mes sobre created_at (particiones.py)
+        indexes = [
+            models.Index(fields=["created_at", "id"]),                  # ?cursor= (pagination.py)
+            models.Index(fields=["decision", "created_at"]),
+            models.Index(fields=["matched_user", "created_at"]),        # residente: sus eventos
+            models.Index(Upper("camera_id"), "created_at", name="faceevent_cam_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"[{self.created_at:%Y-%m-%d %H:%M}] {self.camera_id} {self.direction} {self.decision} user={getattr(self.matched_user,'id',None)}"
+
+
+# =========================
+# Archivo de la bitácora de garita (bases sin particiones)
+# =========================
+class AccessEventArchivo(models.Model):
+    """
+    Filas viejas de AccessEvent en bases sin particiones nativas (SQLite): si se activa
+    EVENTOS_ACTIVOS_DIAS, archivar_eventos las mueve acá para que la tabla activa no crezca
+    (la API no lee esta tabla), y de acá salen a archivos fríos (services_archivo.py).
+    Mismo id y columnas; sin FKs.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    created_at = models.DateTimeField()
+    camera_id = models.CharField(max_length=60, blank=True)
+    plate_raw = models.CharField(max_length=30, blank=True)
+    plate_norm = models.CharField(max_length=30, blank=True)
+    score = models.FloatField(null=True, blank=True)
+    decision = models.CharField(max_length=32)
+    reason = models.CharField(max_length=200, blank=True)
+    opened = models.BooleanField(default=False)
+    vehicle_id = models.BigIntegerField(null=True, blank=True)
+    visit_id = models.BigIntegerField(null=True, blank=True)
+    direction = models.CharField(max_length=10, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    resumen = models.JSONField(default=dict, blank=True)
+    payload_blob_id = models.CharField(max_length=64, null=True, blank=True)
+    triggered_by_id = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["created_at"]), models.Index(fields=["plate_norm", "created_at"])]
+
+
+class FaceAccessEventArchivo(models.Model):
+    """Como AccessEventArchivo, para FaceAccessEvent (snapshot queda como ruta en el storage)."""
+    id = models.BigIntegerField(primary_key=True)
+    created_at = models.DateTimeField()
+    camera_id = models.CharField(max_length=100, blank=True, default="")
+    direction = models.CharField(max_length=10, blank=True, default="")
+    decision = models.CharField(max_length=20)
+    score = models.DecimalField(max_digits=6, decimal_places=4, null=True, blank=True)
+    opened = models.BooleanField(default=False)
+    matched_user_id = models.BigIntegerField(null=True, blank=True)
+    triggered_by_id = models.BigIntegerField(null=True, blank=True)
+    snapshot = models.CharField(max_length=255, blank=True, default="")
+    reason = models.TextField(blank=True, default="")
+    payload = models.JSONField(blank=True, default=dict)
+    resumen = models.JSONField(blank=True, default=dict)
+    payload_blob_id = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["created_at"])]
+
+
+class PayloadBlob(models.Model):
+    """
+    Respuesta completa de un reconocedor (Plate Recognizer, Rekognition) fuera de la fila del
+    evento: JSON canónico comprimido con zlib, direccionado por su sha256 (respuestas iguales
+    se guardan una vez). Sin FKs reales desde los eventos: los huérfanos los borra
+    payloads.purgar_huerfanos().
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(default=0)   # bytes del JSON sin comprimir
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} · {self.size} B"
+
+
+# =========================
+# Analítica de garita (cubos pre-agregados, services_rollups.py)
+# =========================
+class AccessRollupHora(models.Model):
+    """
+    Conteo de AccessEvent por cámara × dirección × decisión × hora. Lo llena
+    `manage.py compactar_rollups` (incremental, por id) y se rehace con
+    `manage.py reconstruir_rollups`; /api/access/analytics/ consulta solo esta tabla.
+    Sobrevive a la retención de la bitácora: las horas ya sin eventos crudos se conservan.
+    """
+    hora = models.DateTimeField()   # inicio de la hora
+    camera_id = models.CharField(max_length=60, blank=True)
+    direction = models.CharField(max_length=10, blank=True)
+    decision = models.CharField(max_length=32)
+    eventos = models.PositiveIntegerField(default=0)
+    abiertos = models.PositiveIntegerField(default=0)     # opened=True
+    score_suma = models.FloatField(default=0)             # promedio = score_suma / score_n
+    score_n = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["hora", "camera_id", "direction", "decision"], name="accessrollup_celda_uniq"),
+        ]
+        indexes = [models.Index(fields=["camera_id", "hora"])]
+
+    def __str__(self):
+        return f"{self.hora:%Y-%m-%d %H}h {self.camera_id or '-'} {self.direction or '-'} {self.decision}: {self.eventos}"
+
+
+class RollupMarca(models.Model):
+    """Hasta qué id de la tabla fuente está sumado en los rollups (una fila por cubo)."""
+    nombre = models.CharField(max_length=40, primary_key=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre} ≤ {self.ultimo_id}"
+
+# =========================
+# Jobs de facturación (generación de cuotas en segundo plano)
+# =========================
+class BillingJob(models.Model):
+    """
+    Generación de cuotas procesada por `manage.py billing_worker` (sin broker externo).
+    items: [{"periodo", "concepto", "monto_base", "usa_coeficiente", "vencimiento"}, ...]
+    El avance se guarda por lotes de unidades (cursor_item/cursor_unidad), así un
+    worker caído se retoma donde quedó.
+    """
+    STATUS = [
+        ("QUEUED", "En cola"),
+        ("RUNNING", "En proceso"),
+        ("DONE", "Terminado"),
+        ("FAILED", "Fallido"),
+        ("CANCELLED", "Cancelado"),
+    ]
+
+    status = models.CharField(max_length=10, choices=STATUS, default="QUEUED", db_index=True)
+    items = models.JSONField(default=list)
+    chunk_size = models.PositiveIntegerField(default=500)
+
+    # progreso / checkpoint
+    total = models.PositiveIntegerField(default=0)          # unidades × items
+    processed = models.PositiveIntegerField(default=0)
+    cuotas_afectadas = models.PositiveIntegerField(default=0)
+    cursor_item = models.PositiveIntegerField(default=0)    # item en curso
+    cursor_unidad = models.BigIntegerField(default=0)       # último id de unidad procesado en ese item
+
+    cancel_requested = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+
+    worker_id = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="billing_jobs")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ["-created_at"]
 
     def __str__(self):
-        return f"[{self.created_at:%Y-%m-%d %H:%M}] {self.camera_id} {self.direction} {self.decision} user={getattr(self.matched_user,'id',None)}"
\ No newline at end of file
+        return f"BillingJob #{self.id} · {self.status} · {self.processed}/{self.total}"
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in {"DONE", "FAILED", "CANCELLED"}
+
+    @property
+    def progress(self) -> float:
+        if not self.total:
+            return 100.0 if self.status == "DONE" else 0.0
+        return min(100.0, round(100.0 * self.processed / self.total, 1))
+
+
+class BarridoMora(models.Model):
+    """
+    Registro del barrido diario de estados/mora (manage.py barrer_mora).
+    Uno por fecha: es lo que hace al barrido idempotente por día.
+    """
+    fecha = models.DateField(unique=True)
+    mora_fija = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    terminado = models.BooleanField(default=False)
+    transiciones = models.JSONField(default=dict, blank=True)   # {"PENDIENTE->VENCIDA": 120, ...}
+    cuotas_con_mora = models.PositiveIntegerField(default=0)
+    duracion_ms = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-fecha"]
+
+    def __str__(self):
+        return f"Barrido {self.fecha} ({'ok' if self.terminado else 'incompleto'})"
@@ -0,0 +1,115 @@
+# smartcondominio/pagination.py
+"""
+Paginación de los listados grandes (bitácoras de garita, pagos, intents de pago).
+
+Sin parámetros nuevos se comporta como la global (PageNumberPagination: ?page=N, con
+count). Con ?cursor= pasa a keyset sobre (created_at, id):
+
+  GET /api/access/events/?cursor=              primera página
+  GET /api/access/events/?cursor=<token>       la que indique "next" / "previous"
+  &page_size=50                                (solo en este modo, hasta max_page_size)
+
+Cada página filtra `(created_at, id) < (último visto)` y lee page_size + 1 filas por el
+índice (created_at, id): sin OFFSET ni COUNT(*), la página 10.000 tarda lo mismo que la 1.
+Respuesta: {"next", "previous", "results"} (sin count). El orden es -created_at, o
+created_at si el queryset viene ordenado así (?ordering=created_at); desempata id.
+Cualquier otro ?ordering= junto con ?cursor= es 400: el keyset no puede respetarlo.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"   # solo modo cursor (ver get_page_size)
+    max_page_size = 500
+    campo = "created_at"
+    invalid_cursor_message = "Cursor inválido."
+    invalid_ordering_message = "Con cursor solo se admite ordering=created_at o -created_at."
+
+    def es_keyset(self, request) -> bool:
+        return self.cursor_query_param in request.query_params
+
+    def get_page_size(self, request):
+        if not self.es_keyset(request):
+            return self.page_size   # modo página: igual que la paginación global
+        return super().get_page_size(request)
+
+    # ---------- token ----------
+    @classmethod
+    def codificar(cls, valor, pk, atras=False) -> str:
+        crudo = json.dumps({"t": valor.isoformat(), "id": pk, "a": int(atras)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+    def decodificar(self, token):
+        """(valor, id, atras) o None para la primera página."""
+        if not token:
+            return None
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            return datetime.fromisoformat(datos["t"]), int(datos["id"]), bool(datos.get("a"))
+        except (ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    # ---------- paginación ----------
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.es_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        tam = self.get_page_size(request)
+        orden = list(queryset.query.order_by or queryset.model._meta.ordering)
+        campos = [o for o in orden if o not in ("id", "-id", "pk", "-pk")]   # el desempate lo pone el keyset
+        if campos not in ([], [self.campo], ["-" + self.campo]):
+            raise ParseError(self.invalid_ordering_message)
+        asc = campos == [self.campo]
+        pos = self.decodificar(request.query_params.get(self.cursor_query_param))
+        atras = bool(pos and pos[2])
+
+        qs = queryset.order_by(*((self.campo, "pk") if asc else ("-" + self.campo, "-pk")))
+        if pos:
+            valor, pk, _ = pos
+            if asc != atras:   # las que siguen hacia "adelante" en orden ascendente (o atrás en descendente)
+                qs = qs.filter(Q(**{f"{self.campo}__gte": valor}) & (Q(**{f"{self.campo}__gt": valor}) | Q(pk__gt=pk)))
+            else:
+                qs = qs.filter(Q(**{f"{self.campo}__lte": valor}) & (Q(**{f"{self.campo}__lt": valor}) | Q(pk__lt=pk)))
+            if atras:
+                qs = qs.reverse()
+
+        filas = list(qs[:tam + 1])
+        hay_mas = len(filas) > tam
+        filas = filas[:tam]
+        if atras:
+            filas.reverse()
+
+        self.siguiente = self.anterior = None
+        if filas:
+            primera, ultima = filas[0], filas[-1]
+            if hay_mas or atras:
+                self.siguiente = self.codificar(getattr(ultima, self.campo), ultima.pk)
+            if pos and (hay_mas or not atras):
+                self.anterior = self.codificar(getattr(primera, self.campo), primera.pk, atras=True)
+        return filas
+
+    def _link(self, token):
+        if token is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            "next": self._link(self.siguiente),
+            "previous": self._link(self.anterior),
+            "results": data,
+        })
@@ -0,0 +1,201 @@
+# smartcondominio/particiones.py
+"""
+Particiones mensuales (Postgres) de la bitácora de garita: AccessEvent y FaceAccessEvent,
+por RANGE (created_at). Con 20+ cámaras son millones de filas por mes; particionado, un
+filtro por fecha solo lee los meses del rango y la retención borra un mes con un DROP.
+
+particionar() convierte una tabla existente sin copiar datos. No es una migración: se corre
+a mano una vez (`manage.py particionar_eventos --confirmar`, con la app detenida y después
+de probarlo en una copia; tests/test_particiones.py corre contra Postgres). Sin convertir,
+todo lo demás (asegurar_particiones, la retención por DROP) no hace nada:
+  1) la tabla pasa a <tabla>_legacy (sus índices con sufijo _legacy);
+  2) se crea <tabla> particionada con las mismas columnas, PK (id, created_at), los mismos
+     índices / FKs / CHECKs y su propia secuencia para id (arranca en el MAX(id) actual);
+  3) <tabla>_legacy se adjunta como partición de todo lo anterior al mes siguiente (la
+     retención la va vaciando; vacía se puede borrar);
+  4) particiones de los próximos meses (<tabla>_pAAAA_MM) y una DEFAULT de resguardo.
+
+Django sigue viendo `id` como PK: las consultas por id funcionan (índice por partición).
+asegurar_particiones() crea las de los meses siguientes (la corre archivar_eventos a diario).
+En SQLite y otras bases no hace nada: ahí se usan las tablas *Archivo (services_archivo.py).
+"""
+import re
+from datetime import datetime
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+TABLAS = ("smartcondominio_accessevent", "smartcondominio_faceaccessevent")
+COLUMNA = "created_at"
+
+
+def soportado(connection) -> bool:
+    return connection.vendor == "postgresql"
+
+
+# ---------------------------
+# Meses
+# ---------------------------
+def mes_de(dt) -> datetime:
+    """Primer instante del mes de `dt` en la zona del proyecto."""
+    dt = timezone.localtime(dt, timezone.get_default_timezone())
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def sumar_meses(mes: datetime, n: int) -> datetime:
+    total = mes.year * 12 + (mes.month - 1) + n
+    return mes.replace(year=total // 12, month=total % 12 + 1)
+
+
+def nombre_particion(tabla, mes) -> str:
+    return f"{tabla}_p{mes:%Y_%m}"
+
+
+def _lit(dt) -> str:
+    # los límites de partición van como literal (valores nuestros, no del usuario)
+    return "'" + dt.isoformat() + "'"
+
+
+def _recortar(nombre) -> str:
+    return nombre[:63]   # NAMEDATALEN de Postgres
+
+
+# ---------------------------
+# Consulta
+# ---------------------------
+def es_particionada(connection, tabla) -> bool:
+    if not soportado(connection):
+        return False
+    with connection.cursor() as cur:
+        cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [tabla])
+        fila = cur.fetchone()
+    return bool(fila and fila[0] == "p")
+
+
+_LIMITES = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def _limite(texto):
+    texto = texto.strip()
+    if texto.upper() in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(texto.strip("'"))
+
+
+def particiones(connection, tabla) -> list:
+    """[{"nombre", "desde", "hasta", "default"}] ordenadas; desde/hasta None = sin límite."""
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            """,
+            [tabla],
+        )
+        filas = cur.fetchall()
+    out = []
+    for nombre, limites in filas:
+        m = _LIMITES.search(limites or "")
+        if m:
+            out.append({"nombre": nombre, "desde": _limite(m.group(1)), "hasta": _limite(m.group(2)), "default": False})
+        else:
+            out.append({"nombre": nombre, "desde": None, "hasta": None, "default": True})
+    minimo = datetime.min.replace(tzinfo=timezone.get_default_timezone())
+    return sorted(out, key=lambda p: (p["default"], p["desde"] or minimo))
+
+
+# ---------------------------
+# DDL
+# ---------------------------
+def asegurar_particiones(connection, tabla, meses=3, desde=None) -> list:
+    """
+    Crea (si faltan) las particiones de `meses` meses a partir de `desde` (por defecto el mes
+    actual). Devuelve los nombres creados. Si la DEFAULT ya tiene filas de ese mes, Postgres
+    no deja crearla: se saltea (quedan en la DEFAULT) y sigue con las demás.
+    """
+    if not es_particionada(connection, tabla):
+        return []
+    q = connection.ops.quote_name
+    mes = mes_de(desde or timezone.now())
+    existentes = {p["nombre"] for p in particiones(connection, tabla)}
+    creadas = []
+    for i in range(meses):
+        inicio = sumar_meses(mes, i)
+        nombre = nombre_particion(tabla, inicio)
+        if nombre in existentes:
+            continue
+        try:
+            with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+                cur.execute(
+                    f"CREATE TABLE {q(nombre)} PARTITION OF {q(tabla)} "
+                    f"FOR VALUES FROM ({_lit(inicio)}) TO ({_lit(sumar_meses(inicio, 1))})"
+                )
+        except DatabaseError:
+            continue
+        creadas.append(nombre)
+    return creadas
+
+
+def particionar(connection, tabla, meses=3) -> bool:
+    """Convierte `tabla` en particionada por mes (ver docstring del módulo). False si ya lo está."""
+    if not soportado(connection) or es_particionada(connection, tabla):
+        return False
+    q = connection.ops.quote_name
+    legacy = f"{tabla}_legacy"
+    secuencia = f"{tabla}_pid_seq"   # {tabla}_id_seq puede seguir existiendo (serial viejo)
+    col = q(COLUMNA)
+
+    with connection.cursor() as cur:
+        cur.execute(f"SELECT MAX({col}), COALESCE(MAX(id), 0) FROM {q(tabla)}")
+        ultimo, max_id = cur.fetchone()
+        # lo existente (y el mes en curso) queda en legacy; las particiones nuevas, de ahí en adelante
+        hasta = sumar_meses(mes_de(max(timezone.now(), ultimo or timezone.now())), 1)
+
+        cur.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+            [tabla],
+        )
+        indices = cur.fetchall()
+        cur.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('f', 'c')",
+            [tabla],
+        )
+        restricciones = cur.fetchall()
+
+        # 1) la tabla actual pasa a legacy (los nombres de índice son únicos por esquema)
+        cur.execute(f"ALTER TABLE {q(tabla)} RENAME TO {q(legacy)}")
+        for nombre, _ in indices:
+            cur.execute(f"ALTER INDEX {q(nombre)} RENAME TO {q(_recortar(nombre + '_legacy'))}")
+        # una partición no puede tener identity propia: el id lo da la secuencia de la tabla padre
+        cur.execute(f"ALTER TABLE {q(legacy)} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cur.execute(f"ALTER TABLE {q(legacy)} ALTER COLUMN id DROP DEFAULT")
+
+        # 2) tabla particionada con las mismas columnas, índices y restricciones
+        cur.execute(
+            f"CREATE TABLE {q(tabla)} (LIKE {q(legacy)} INCLUDING DEFAULTS INCLUDING STORAGE) "
+            f"PARTITION BY RANGE ({col})"
+        )
+        cur.execute(f"CREATE SEQUENCE {q(secuencia)} AS bigint OWNED BY {q(tabla)}.id")
+        cur.execute(f"ALTER TABLE {q(tabla)} ALTER COLUMN id SET DEFAULT nextval('{secuencia}'::regclass)")
+        cur.execute("SELECT setval(%s, %s, false)", [secuencia, max_id + 1])
+        cur.execute(f"ALTER TABLE {q(tabla)} ADD CONSTRAINT {q(tabla + '_pkey')} PRIMARY KEY (id, {col})")
+        for nombre, definicion in indices:
+            # la PK ya está; un UNIQUE sin created_at no se puede en una particionada
+            if nombre.endswith("_pkey") or definicion.startswith("CREATE UNIQUE"):
+                continue
+            cur.execute(definicion)   # CREATE INDEX <nombre> ON <tabla> ...: ahora es la particionada
+        for nombre, definicion in restricciones:
+            cur.execute(f"ALTER TABLE {q(tabla)} ADD CONSTRAINT {q(nombre)} {definicion}")
+
+        # 3) legacy = partición de todo lo anterior a `hasta` (el CHECK evita otro escaneo al adjuntar)
+        cur.execute(f"ALTER TABLE {q(legacy)} ADD CONSTRAINT {q(legacy + '_rango')} CHECK ({col} < {_lit(hasta)})")
+        cur.execute(f"ALTER TABLE {q(tabla)} ATTACH PARTITION {q(legacy)} FOR VALUES FROM (MINVALUE) TO ({_lit(hasta)})")
+        cur.execute(f"ALTER TABLE {q(legacy)} DROP CONSTRAINT {q(legacy + '_rango')}")
+
+    # 4) meses siguientes y DEFAULT (la DEFAULT al final: crear un mes nuevo la revisa)
+    asegurar_particiones(connection, tabla, meses=meses, desde=hasta)
+    with connection.cursor() as cur:
+        cur.execute(f"CREATE TABLE {q(tabla + '_default')} PARTITION OF {q(tabla)} DEFAULT")
+    return True
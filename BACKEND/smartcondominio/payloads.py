@@ -0,0 +1,200 @@
+# smartcondominio/payloads.py
+"""
+Respuestas de los reconocedores (Plate Recognizer, Rekognition) fuera de la fila del evento.
+
+El JSON completo trae todos los candidatos y bounding boxes: varios KB por evento que la
+lista de la bitácora no usa. Al registrar un evento (crear()):
+  - hasta PAYLOAD_INLINE_BYTES, el JSON queda en `payload` como siempre;
+  - más grande, va comprimido (zlib) a PayloadBlob, direccionado por el sha256 del JSON
+    canónico, y `payload` queda vacío;
+  - en ambos casos `resumen` guarda una versión chica (escalares; listas como {"n": len}),
+    que es lo que sirven las listas de la API (con `payload` diferido).
+El detalle lee la respuesta completa con completo().
+
+Mantenimiento: purgar_huerfanos() borra los blobs que ya no usa ningún evento (lo corre
+archivar_eventos); comprimir_existentes() pasa al esquema nuevo los eventos anteriores
+(`manage.py comprimir_payloads`).
+"""
+import hashlib
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import AccessEvent, AccessEventArchivo, FaceAccessEvent, FaceAccessEventArchivo, PayloadBlob
+
+# tablas que guardan payload / resumen / payload_blob_id
+MODELOS = (AccessEvent, FaceAccessEvent, AccessEventArchivo, FaceAccessEventArchivo)
+
+_TEXTO_MAX = 200
+
+
+def _canonico(payload) -> bytes:
+    return json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True, separators=(",", ":"),
+                      ensure_ascii=False).encode()
+
+
+def _inline_max() -> int:
+    return int(getattr(settings, "PAYLOAD_INLINE_BYTES", 1024))
+
+
+# ---------------------------
+# Resumen
+# ---------------------------
+def resumir(valor, profundidad=2):
+    """
+    Versión chica del JSON: escalares (textos recortados), dicts hasta `profundidad` niveles y
+    listas como {"n": len}. Conserva las claves que lee el front (rekognition, external_id,
+    matched_user_id, error, degradado, ...).
+    """
+    if isinstance(valor, str):
+        return valor[:_TEXTO_MAX]
+    if valor is None or isinstance(valor, (bool, int, float)):
+        return valor
+    if isinstance(valor, (list, tuple)):
+        return {"n": len(valor)}
+    if isinstance(valor, dict):
+        if profundidad <= 0:
+            return {"n": len(valor)}
+        return {str(k): resumir(v, profundidad - 1) for k, v in valor.items()}
+    return str(valor)[:_TEXTO_MAX]
+
+
+# ---------------------------
+# Escritura
+# ---------------------------
+def guardar_blob(crudo: bytes) -> str:
+    """Guarda el JSON canónico comprimido; si ya existe (mismo sha256) no hace nada. Devuelve el sha256."""
+    sha = hashlib.sha256(crudo).hexdigest()
+    # INSERT ... ON CONFLICT DO NOTHING: una sola sentencia, sin SELECT previo
+    PayloadBlob.objects.bulk_create(
+        [PayloadBlob(sha256=sha, data=zlib.compress(crudo, 6), size=len(crudo))],
+        ignore_conflicts=True,
+    )
+    return sha
+
+
+def separar(payload) -> dict:
+    """Campos payload / resumen / payload_blob_id para guardar `payload` (escribe el blob si hace falta)."""
+    payload = payload or {}
+    if not payload:
+        return {"payload": {}, "resumen": {}, "payload_blob_id": None}
+    crudo = _canonico(payload)
+    if len(crudo) <= _inline_max():
+        return {"payload": payload, "resumen": payload, "payload_blob_id": None}
+    return {"payload": {}, "resumen": resumir(payload), "payload_blob_id": guardar_blob(crudo)}
+
+
+def crear(modelo, **campos):
+    """modelo.objects.create(**campos) guardando `payload` con separar(). La instancia recuerda el JSON completo."""
+    completo_ = campos.pop("payload", None) or {}
+    with transaction.atomic():
+        obj = modelo.objects.create(**campos, **separar(completo_))
+    obj._payload_completo = completo_
+    return obj
+
+
+# ---------------------------
+# Lectura
+# ---------------------------
+def cargar(sha):
+    """JSON completo de un blob, o None si ya no está."""
+    blob = PayloadBlob.objects.filter(sha256=sha).values_list("data", flat=True).first()
+    if blob is None:
+        return None
+    return json.loads(zlib.decompress(bytes(blob)))
+
+
+def completo(obj):
+    """Respuesta completa del reconocedor para un evento (una consulta extra si está en un blob)."""
+    cache = getattr(obj, "_payload_completo", None)
+    if cache is not None:
+        return cache
+    if obj.payload_blob_id:
+        datos = cargar(obj.payload_blob_id)
+        obj._payload_completo = datos if datos is not None else obj.resumen
+        return obj._payload_completo
+    return obj.payload
+
+
+def expandir(filas, lote=500):
+    """
+    Filas (dicts de .values()) con `payload` completo: trae los blobs por lotes. Para los
+    archivos fríos de services_archivo, que deben quedar autocontenidos.
+    """
+    pendientes = []
+
+    def vaciar():
+        shas = {f["payload_blob_id"] for f in pendientes if f.get("payload_blob_id")}
+        datos = {
+            sha: json.loads(zlib.decompress(bytes(data)))
+            for sha, data in PayloadBlob.objects.filter(sha256__in=shas).values_list("sha256", "data")
+        } if shas else {}
+        for f in pendientes:
+            if f.get("payload_blob_id") in datos:
+                f["payload"] = datos[f["payload_blob_id"]]
+            yield f
+        pendientes.clear()
+
+    for fila in filas:
+        pendientes.append(fila)
+        if len(pendientes) >= lote:
+            yield from vaciar()
+    yield from vaciar()
+
+
+# ---------------------------
+# Mantenimiento
+# ---------------------------
+def purgar_huerfanos(gracia_horas=24, lote=1000, dry_run=False) -> int:
+    """
+    Borra los blobs que no referencia ningún evento (retención, payloads a frío). Solo los
+    creados hace más de `gracia_horas`, para no pisar un evento que se está escribiendo.
+    """
+    qs = PayloadBlob.objects.filter(created_at__lt=timezone.now() - timedelta(hours=gracia_horas))
+    for modelo in MODELOS:
+        qs = qs.filter(~Exists(modelo.objects.filter(payload_blob_id=OuterRef("sha256"))))
+    if dry_run:
+        return qs.count()
+    total = 0
+    while True:
+        shas = list(qs.values_list("sha256", flat=True)[:lote])
+        if not shas:
+            return total
+        total += PayloadBlob.objects.filter(sha256__in=shas).delete()[0]
+
+
+def comprimir_existentes(modelo, lote=1000, dry_run=False) -> dict:
+    """
+    Eventos anteriores a este esquema: separar() por lotes de ids. La migración 0036 ya les
+    llenó `resumen`; aquí se pasan a PayloadBlob los payloads grandes que siguen inline (en los
+    chicos resumen == payload y no hay nada que hacer). Idempotente.
+    """
+    pendientes = (
+        modelo.objects.filter(payload_blob_id__isnull=True)
+        .exclude(payload={}).exclude(payload__has_key="archivado")
+        .exclude(resumen=F("payload"))
+    )
+    if dry_run:
+        return {"filas": pendientes.count(), "a_blob": None}
+    filas = a_blob = 0
+    ultimo = None
+    while True:
+        qs = pendientes.order_by("id")
+        if ultimo is not None:
+            qs = qs.filter(id__gt=ultimo)
+        bloque = list(qs.values_list("id", "payload")[:lote])
+        if not bloque:
+            return {"filas": filas, "a_blob": a_blob}
+        with transaction.atomic():
+            for id_, payload in bloque:
+                campos = separar(payload)
+                modelo.objects.filter(id=id_).update(**campos)
+                a_blob += bool(campos["payload_blob_id"])
+        filas += len(bloque)
+        ultimo = bloque[-1][0]
@@ -0,0 +1,451 @@
+# plate_index.py
+"""
+Índice en memoria (por proceso) de placas autorizadas para las decisiones del portón:
+placa normalizada -> vehículo residente activo / visitas aprobadas con su vencimiento.
+
+- Se carga la primera vez que se usa (en un hilo aparte: mientras tanto responde la BD)
+  y se recarga completo cada PLATE_INDEX_TTL segundos.
+- Señales post_save/post_delete de Vehiculo y Visit lo actualizan al confirmar la
+  transacción (approve/deny terminan en save()) y además suben PlacasVersion dentro de
+  ella. Cada PLATE_INDEX_VERSION_MS el índice lee esa versión (una fila por PK); si otro
+  worker escribió, deja de responder y se recarga: mientras tanto decide la BD. Con el
+  índice al día las decisiones no tocan la BD, ni los aciertos ni los rechazos
+  (PLATE_INDEX_MISS_FALLBACK=true vuelve a consultar la BD en cada rechazo).
+  Los queryset.update() no disparan señales: quedan hasta la recarga por TTL.
+- Coincidencia aproximada (coincidencias()): las lecturas del OCR se comparan contra
+  las placas autorizadas tolerando confusiones típicas (0/O/D/Q, 1/I/L, 8/B, 5/S,
+  2/Z, 6/G) y a lo sumo una edición real; ver "Coincidencia aproximada" más abajo.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
+
+log = logging.getLogger(__name__)
+
+VISIT_STATUS_VIGENTES = ("REGISTRADO", "INGRESADO")
+
+
+def normalizar_placa(placa) -> str:
+    return (placa or "").strip().upper().replace(" ", "")
+
+
+# ---------------------------
+# Coincidencia aproximada
+# ---------------------------
+# Prefijo del reason de los eventos que abrieron por coincidencia aproximada (auditoría:
+# ?aproximada=true en /api/access/events/)
+REASON_APROXIMADA = "[APROX]"
+
+# Cada clase agrupa caracteres que el OCR confunde entre sí; la forma canónica
+# reemplaza cada uno por el primero de su clase ("B0L1VIA" y "BOLIVIA" son iguales).
+CLASES_CONFUSION = ("0ODQ", "1IL", "2Z", "5S", "6G", "8B")
+_CANON = {c: clase[0] for clase in CLASES_CONFUSION for c in clase}
+ALFABETO_CANONICO = sorted({_CANON.get(c, c) for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-"})
+
+COSTO_CONFUSION = 0.25   # sustituir por un caracter de la misma clase
+COSTO_EDICION = 1.0      # sustituir por otro caracter, agregar o quitar uno
+
+
+def canonica(placa) -> str:
+    return "".join(_CANON.get(c, c) for c in normalizar_placa(placa))
+
+
+def distancia_ponderada(a: str, b: str) -> float:
+    """Levenshtein con sustituciones dentro de una clase de confusión a COSTO_CONFUSION."""
+    if a == b:
+        return 0.0
+    previa = [j * COSTO_EDICION for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        fila = [i * COSTO_EDICION]
+        for j, cb in enumerate(b, 1):
+            if ca == cb:
+                sust = 0.0
+            elif _CANON.get(ca, ca) == _CANON.get(cb, cb):
+                sust = COSTO_CONFUSION
+            else:
+                sust = COSTO_EDICION
+            fila.append(min(previa[j] + COSTO_EDICION, fila[j - 1] + COSTO_EDICION, previa[j - 1] + sust))
+        previa = fila
+    return previa[-1]
+
+
+def vecinos_canonicos(c: str):
+    """La forma canónica y todas las que están a una edición (sustitución, borrado o inserción)."""
+    yield c
+    for i in range(len(c) + 1):
+        if i < len(c):
+            yield c[:i] + c[i + 1:]
+            for x in ALFABETO_CANONICO:
+                if x != c[i]:
+                    yield c[:i] + x + c[i + 1:]
+        for x in ALFABETO_CANONICO:
+            yield c[:i] + x + c[i:]
+
+
+def version_actual() -> int:
+    from .models import PlacasVersion
+    return PlacasVersion.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+
+def incrementar_version():
+    """Sube PlacasVersion en la transacción en curso (la fila queda bloqueada hasta el commit)."""
+    from .models import PlacasVersion
+    if not PlacasVersion.objects.filter(pk=1).update(version=F("version") + 1, updated_at=timezone.now()):
+        PlacasVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+
+
+def _visita_autorizable(v) -> bool:
+    return v.approval_status == "APR" and v.status in VISIT_STATUS_VIGENTES and bool(v.vehicle_plate)
+
+
+class PlateIndex:
+    """
+    vehiculos: placa -> (vehiculo_id, propietario_id)
+    visitas:   placa -> {visit_id: (approval_expires_at | None, created_at)}
+    (+ índices inversos id -> placa para las actualizaciones por señal)
+    canonicas: forma canónica -> placas (de vehículos o visitas) que la comparten
+
+    La búsqueda aproximada no recorre las placas: expande cada lectura del OCR a
+    sus vecinas canónicas (una edición: ~60 claves por caracter) y las busca en el dict,
+    así el costo depende del largo de la lectura y no de cuántas placas haya.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vehiculos = {}
+        self._visitas = {}
+        self._placa_vehiculo = {}
+        self._placa_visita = {}
+        self._canonicas = {}
+        self._cargado_en = None       # monotonic de la última carga completa
+        self._cargando = False
+        self._version = None          # PlacasVersion con que se cargó (None: datos sin BD, no se compara)
+        self._chequeado_en = 0.0      # monotonic de la última comparación con la BD
+
+    # ---------- estado ----------
+    def _ttl(self):
+        return self.ttl if self.ttl is not None else getattr(settings, "PLATE_INDEX_TTL", 60)
+
+    def listo(self) -> bool:
+        return self._cargado_en is not None and (time.monotonic() - self._cargado_en) < self._ttl()
+
+    def al_dia(self) -> bool:
+        """
+        listo() y, cada PLATE_INDEX_VERSION_MS, misma PlacasVersion que la BD. Si otro
+        worker cambió algo el índice se da por vencido (decide la BD hasta la recarga).
+        """
+        if not self.listo():
+            return False
+        if self._version is None:
+            return True
+        ahora = time.monotonic()
+        if (ahora - self._chequeado_en) * 1000 < getattr(settings, "PLATE_INDEX_VERSION_MS", 500):
+            return True
+        version = version_actual()
+        self._chequeado_en = ahora
+        if version != self._version:
+            with self._lock:
+                self._cargado_en = None
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "listo": self.listo(),
+            "version": self._version,
+            "vehiculos": len(self._vehiculos),
+            "placas_visita": len(self._visitas),
+            "canonicas": len(self._canonicas),
+            "edad_s": round(time.monotonic() - self._cargado_en, 1) if self._cargado_en else None,
+        }
+
+    # ---------- carga ----------
+    def cargar(self):
+        """Reconstruye el índice completo desde la BD y lo reemplaza de una vez."""
+        from .models import Vehiculo, Visit
+
+        t0 = time.perf_counter()
+        inicio = time.monotonic()
+        version = version_actual()   # antes de leer: un cambio que entre durante la carga fuerza otra
+        vehiculos = {}
+        for placa, vid, prop_id in (
+            Vehiculo.objects.filter(activo=True).order_by("placa")
+            .values_list("placa", "id", "propietario_id").iterator(chunk_size=5000)
+        ):
+            vehiculos.setdefault(normalizar_placa(placa), (vid, prop_id))
+
+        visitas = {}
+        now = timezone.now()
+        for placa, vid, expira, creada in (
+            Visit.objects.filter(approval_status="APR", status__in=VISIT_STATUS_VIGENTES)
+            .exclude(vehicle_plate="")
+            .filter(Q(approval_expires_at__isnull=True) | Q(approval_expires_at__gte=now))
+            .values_list("vehicle_plate", "id", "approval_expires_at", "created_at").iterator(chunk_size=5000)
+        ):
+            visitas.setdefault(normalizar_placa(placa), {})[vid] = (expira, creada)
+
+        self.reemplazar(vehiculos, visitas, inicio, version=version)
+        log.info(
+            "plate_index: %d vehículos, %d placas de visita en %.0f ms",
+            len(vehiculos), len(visitas), (time.perf_counter() - t0) * 1000,
+        )
+
+    def reemplazar(self, vehiculos, visitas, cargado_en=None, version=None):
+        """Instala un índice completo ya armado (cargar() o datos sintéticos del benchmark)."""
+        placa_vehiculo = {vid: p for p, (vid, _) in vehiculos.items()}
+        placa_visita = {vid: p for p, vs in visitas.items() for vid in vs}
+        canonicas = {}
+        for placa in set(vehiculos) | set(visitas):
+            canonicas.setdefault(canonica(placa), set()).add(placa)
+        with self._lock:
+            self._vehiculos, self._visitas = vehiculos, visitas
+            self._placa_vehiculo, self._placa_visita = placa_vehiculo, placa_visita
+            self._canonicas = canonicas
+            self._cargado_en = cargado_en if cargado_en is not None else time.monotonic()
+            self._version, self._chequeado_en = version, time.monotonic()
+            self._cargando = False
+
+    def _cargar_en_segundo_plano(self):
+        with self._lock:
+            if self._cargando:
+                return
+            self._cargando = True
+
+        def run():
+            from django.db import connection
+            try:
+                self.cargar()
+            except Exception:
+                log.exception("plate_index: falló la carga")
+                with self._lock:
+                    self._cargando = False
+            finally:
+                connection.close()
+
+        threading.Thread(target=run, name="plate-index-load", daemon=True).start()
+
+    # ---------- consulta ----------
+    def buscar(self, placa, now=None):
+        """
+        Devuelve (vehiculo, visit_id) desde memoria; vehiculo = (id, propietario_id).
+        None si el índice está frío, vencido o atrasado respecto de PlacasVersion (el
+        llamador consulta la BD); en ese caso dispara la recarga en segundo plano.
+        """
+        if not self.al_dia():
+            self._cargar_en_segundo_plano()
+            return None
+        placa = normalizar_placa(placa)
+        now = now or timezone.now()
+        veh = self._vehiculos.get(placa)
+        visit_id = None
+        vigentes = [
+            (creada, vid) for vid, (expira, creada) in (self._visitas.get(placa) or {}).items()
+            if expira is None or expira >= now
+        ]
+        if vigentes:
+            visit_id = max(vigentes)[1]   # la más reciente, como order_by("-created_at").first()
+        return veh, visit_id
+
+    def coincidencias(self, candidatos, now=None, limite=3):
+        """
+        Ranking de placas autorizadas para las lecturas del OCR.
+        candidatos: [(placa_leida, score_ocr), ...] ordenados por score (plate_candidates_from_result).
+        Devuelve (ranking, completo) o None si el índice está frío. ranking es una lista de
+        dicts {placa, leida, score_ocr, distancia, confianza} (mejor primero, una entrada
+        por placa) con confianza = score_ocr * (1 - PENALIZACION * distancia).
+        completo=False si se cortó por PLATE_FUZZY_BUDGET_MS o PLATE_FUZZY_MAX_CANDIDATOS.
+        """
+        if not self.al_dia():
+            self._cargar_en_segundo_plano()
+            return None
+        now = now or timezone.now()
+        max_dist = getattr(settings, "PLATE_FUZZY_MAX_DIST", 1.0)
+        penalizacion = getattr(settings, "PLATE_FUZZY_PENALIZACION", 0.3)
+        max_candidatos = getattr(settings, "PLATE_FUZZY_MAX_CANDIDATOS", 10)
+        limite_t = time.perf_counter() + getattr(settings, "PLATE_FUZZY_BUDGET_MS", 5) / 1000
+
+        canonicas = self._canonicas
+        mejores = {}
+        completo = len(candidatos) <= max_candidatos
+        for n, (leida, score) in enumerate(candidatos[:max_candidatos]):
+            if n and time.perf_counter() > limite_t:
+                completo = False
+                break
+            leida = normalizar_placa(leida)
+            if not leida:
+                continue
+            score = float(score if score is not None else 0)
+            vistas = set()
+            for vecina in vecinos_canonicos(canonica(leida)):
+                placas = canonicas.get(vecina)
+                if not placas:
+                    continue
+                for placa in tuple(placas):   # las señales pueden tocar el set en otro hilo
+                    if placa in vistas:
+                        continue
+                    vistas.add(placa)
+                    d = distancia_ponderada(leida, placa)
+                    if d > max_dist:
+                        continue
+                    conf = round(score * max(0.0, 1 - penalizacion * d), 4)
+                    previa = mejores.get(placa)
+                    if previa is None or conf > previa["confianza"]:
+                        mejores[placa] = {
+                            "placa": placa, "leida": leida, "score_ocr": score,
+                            "distancia": d, "confianza": conf,
+                        }
+
+        ranking = [m for m in mejores.values() if self._autoriza(m["placa"], now)]
+        ranking.sort(key=lambda m: (-m["confianza"], m["distancia"], m["placa"]))
+        return ranking[:limite], completo
+
+    def _autoriza(self, placa, now):
+        if placa in self._vehiculos:
+            return True
+        return any(expira is None or expira >= now for expira, _ in (self._visitas.get(placa) or {}).values())
+
+    # ---------- mantenimiento incremental (señales) ----------
+    def _sincronizar_canonica(self, placa):
+        """Alta/baja de la placa en canonicas según siga o no en vehículos/visitas (con _lock tomado)."""
+        if not placa:
+            return
+        c = canonica(placa)
+        if placa in self._vehiculos or placa in self._visitas:
+            self._canonicas.setdefault(c, set()).add(placa)
+        else:
+            placas = self._canonicas.get(c)
+            if placas is not None:
+                placas.discard(placa)
+                if not placas:
+                    del self._canonicas[c]
+
+    def actualizar_vehiculo(self, veh, borrado=False):
+        placa = normalizar_placa(veh.placa)
+        with self._lock:
+            anterior = self._placa_vehiculo.pop(veh.pk, None)
+            if anterior is not None and self._vehiculos.get(anterior, (None,))[0] == veh.pk:
+                del self._vehiculos[anterior]
+            if not borrado and veh.activo and placa:
+                self._vehiculos[placa] = (veh.pk, veh.propietario_id)
+                self._placa_vehiculo[veh.pk] = placa
+            self._sincronizar_canonica(anterior)
+            self._sincronizar_canonica(placa)
+
+    def actualizar_visita(self, visit, borrado=False):
+        placa = normalizar_placa(visit.vehicle_plate)
+        with self._lock:
+            anterior = self._placa_visita.pop(visit.pk, None)
+            visitas = self._visitas.get(anterior)
+            if visitas is not None:
+                visitas.pop(visit.pk, None)
+                if not visitas:
+                    del self._visitas[anterior]
+            if not borrado and _visita_autorizable(visit):
+                self._visitas.setdefault(placa, {})[visit.pk] = (visit.approval_expires_at, visit.created_at)
+                self._placa_visita[visit.pk] = placa
+            self._sincronizar_canonica(anterior)
+            self._sincronizar_canonica(placa)
+
+    def limpiar(self):
+        with self._lock:
+            self._vehiculos, self._visitas, self._cargado_en = {}, {}, None
+            self._placa_vehiculo, self._placa_visita = {}, {}
+            self._canonicas = {}
+            self._version = None
+
+
+indice = PlateIndex()
+
+
+def buscar_autorizacion(placa, now=None):
+    """
+    Decide con el índice si está al día (sin tocar la BD); si está frío o atrasado, con
+    la BD (misma regla que antes en SnapshotCheckView). Con PLATE_INDEX_MISS_FALLBACK una
+    placa que no está en el índice también se consulta en la BD.
+    Devuelve (vehiculo_id, propietario_id, visit_id).
+    """
+    from .models import Vehiculo, Visit
+
+    now = now or timezone.now()
+    placa = normalizar_placa(placa)
+    hit = indice.buscar(placa, now)
+    if hit is not None:
+        veh, visit_id = hit
+        if veh or visit_id or not getattr(settings, "PLATE_INDEX_MISS_FALLBACK", False):
+            return (veh[0], veh[1], visit_id) if veh else (None, None, visit_id)
+
+    veh = Vehiculo.objects.filter(placa__iexact=placa, activo=True).values_list("id", "propietario_id").first()
+    visit_id = (
+        Visit.objects.filter(
+            vehicle_plate__iexact=placa,
+            approval_status="APR",
+            status__in=VISIT_STATUS_VIGENTES,
+        )
+        .filter(Q(approval_expires_at__isnull=True) | Q(approval_expires_at__gte=now))
+        .order_by("-created_at")
+        .values_list("id", flat=True)
+        .first()
+    )
+    return (veh[0], veh[1], visit_id) if veh else (None, None, visit_id)
+
+
+def mejor_coincidencia(candidatos, now=None, idx=None):
+    """
+    Coincidencia aproximada que alcanza para decidir: la primera del ranking si su
+    confianza llega a PLATE_FUZZY_MIN_CONF y le saca PLATE_FUZZY_MARGEN a la segunda
+    (dos placas autorizadas parecidas a la misma lectura => no se decide).
+    Devuelve (coincidencia | None, ranking); ranking es None con el índice frío.
+    Solo rankea: si la coincidencia abre el portón lo decide services_gate (PLATE_FUZZY_ENABLED).
+    """
+    if not candidatos:
+        return None, []
+    res = (idx or indice).coincidencias(candidatos, now=now)
+    if res is None:
+        return None, None
+    ranking, _ = res
+    if not ranking or ranking[0]["confianza"] < getattr(settings, "PLATE_FUZZY_MIN_CONF", 0.7):
+        return None, ranking
+    if len(ranking) > 1 and ranking[0]["confianza"] - ranking[1]["confianza"] < getattr(settings, "PLATE_FUZZY_MARGEN", 0.05):
+        return None, ranking
+    return ranking[0], ranking
+
+
+# ---------------------------
+# Señales (se conectan en SmartCondominioConfig.ready)
+# ---------------------------
+
+# La versión sube dentro de la transacción del cambio (los otros workers la ven con él);
+# el índice de este proceso se actualiza al confirmar.
+
+def _on_vehiculo_save(sender, instance, **kwargs):
+    incrementar_version()
+    transaction.on_commit(lambda: indice.actualizar_vehiculo(instance))
+
+
+def _on_vehiculo_delete(sender, instance, **kwargs):
+    incrementar_version()
+    transaction.on_commit(lambda: indice.actualizar_vehiculo(instance, borrado=True))
+
+
+def _on_visit_save(sender, instance, **kwargs):
+    incrementar_version()
+    transaction.on_commit(lambda: indice.actualizar_visita(instance))
+
+
+def _on_visit_delete(sender, instance, **kwargs):
+    incrementar_version()
+    transaction.on_commit(lambda: indice.actualizar_visita(instance, borrado=True))
+
+
+def conectar_senales():
+    post_save.connect(_on_vehiculo_save, sender="smartcondominio.Vehiculo", dispatch_uid="plate_index_veh_save")
+    post_delete.connect(_on_vehiculo_delete, sender="smartcondominio.Vehiculo", dispatch_uid="plate_index_veh_del")
+    post_save.connect(_on_visit_save, sender="smartcondominio.Visit", dispatch_uid="plate_index_visit_save")
+    post_delete.connect(_on_visit_delete, sender="smartcondominio.Visit", dispatch_uid="plate_index_visit_del")
@@ -1,32 +1,128 @@
-import os, io, boto3
+import os, io, threading, boto3
+from functools import lru_cache
 from typing import List, Dict, Any
 
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from . import metrics
+from .circuit import circuito
+
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 COLLECTION_ID = os.getenv("REKOG_COLLECTION_ID", "smartcondo-faces")
 MATCH_THRESHOLD = float(os.getenv("REKOG_MATCH_THRESHOLD", "90"))  # 0–100
 
-_client = boto3.client("rekognition", region_name=AWS_REGION)
+# Conexiones: un pool por worker, reutilizado entre requests (keep-alive) y con timeouts cortos:
+# en la garita es mejor fallar rápido que dejar la barrera esperando
+MAX_POOL = int(os.getenv("REKOG_MAX_POOL", "20"))
+CONNECT_TIMEOUT = float(os.getenv("REKOG_CONNECT_TIMEOUT", "2"))
+READ_TIMEOUT = float(os.getenv("REKOG_READ_TIMEOUT", "3"))
+MAX_ATTEMPTS = int(os.getenv("REKOG_MAX_ATTEMPTS", "2"))        # incluye el primer intento
+RETRY_MODE = os.getenv("REKOG_RETRY_MODE", "standard")          # standard | adaptive | legacy
+
+
+@lru_cache(maxsize=1)
+def get_client():
+    """
+    Cliente boto3 del proceso (thread-safe), creado en el primer uso: así cada worker de
+    gunicorn arma su propio pool en lugar de heredar sockets del proceso maestro.
+    """
+    config = Config(
+        region_name=AWS_REGION,
+        max_pool_connections=MAX_POOL,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        retries={"max_attempts": MAX_ATTEMPTS, "mode": RETRY_MODE},
+        tcp_keepalive=True,
+    )
+    return metrics.instrumentar_boto3(boto3.client("rekognition", config=config))
+
+
+def _codigo(e: ClientError) -> str:
+    return e.response.get("Error", {}).get("Code", "")
+
+
+_coleccion_lock = threading.Lock()
+_coleccion_ok = False
+
+
+def invalidar_coleccion():
+    global _coleccion_ok
+    _coleccion_ok = False
+
 
 def ensure_collection():
-    # Idempotente: crea si no existe
-    cols = _client.list_collections().get("CollectionIds", [])
-    if COLLECTION_ID not in cols:
-        _client.create_collection(CollectionId=COLLECTION_ID)
+    """
+    Idempotente: crea la colección si no existe. Se verifica una vez por proceso
+    (describe_collection, no el list_collections paginado); si después AWS responde
+    ResourceNotFoundException, _con_coleccion invalida y se vuelve a verificar.
+    """
+    global _coleccion_ok
+    if _coleccion_ok:
+        return COLLECTION_ID
+    with _coleccion_lock:
+        if _coleccion_ok:
+            return COLLECTION_ID
+        client = get_client()
+        try:
+            client.describe_collection(CollectionId=COLLECTION_ID)
+        except ClientError as e:
+            if _codigo(e) != "ResourceNotFoundException":
+                raise
+            try:
+                client.create_collection(CollectionId=COLLECTION_ID)
+            except ClientError as e2:
+                if _codigo(e2) != "ResourceAlreadyExistsException":   # otro worker la creó
+                    raise
+        _coleccion_ok = True
     return COLLECTION_ID
 
+
+_ERRORES_DEL_SERVICIO = {
+    "ThrottlingException", "ProvisionedThroughputExceededException",
+    "ServiceUnavailableException", "InternalServerError",
+}
+
+
+def _falla_de_aws(e) -> bool:
+    """Para el circuit breaker: red/timeouts, 5xx y throttling cuentan; sin rostro o imagen inválida no."""
+    if isinstance(e, ClientError):
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+        return status >= 500 or _codigo(e) in _ERRORES_DEL_SERVICIO
+    return isinstance(e, BotoCoreError)
+
+
+def _con_coleccion(llamada):
+    """
+    Ejecuta llamada() con la colección verificada; si la borraron, la recrea y reintenta
+    una vez. Todo pasa por el circuit breaker "rekognition" (CircuitoAbierto si está caído).
+    """
+    def _llamar():
+        ensure_collection()
+        try:
+            return llamada()
+        except ClientError as e:
+            if _codigo(e) != "ResourceNotFoundException":
+                raise
+            invalidar_coleccion()
+            ensure_collection()
+            return llamada()
+
+    return circuito("rekognition").llamar(_llamar, es_fallo=_falla_de_aws)
+
+
 def index_face(image_bytes: bytes, external_id: str) -> Dict[str, Any]:
     """
     Registra una cara en la colección con un external_image_id = external_id.
     Si hay varias caras, indexa todas (puedes filtrar si quieres solo la mayor).
     """
-    ensure_collection()
-    resp = _client.index_faces(
+    resp = _con_coleccion(lambda: get_client().index_faces(
         CollectionId=COLLECTION_ID,
         Image={"Bytes": image_bytes},
         ExternalImageId=external_id,      # guarda tu person_id
         DetectionAttributes=[],            # atributos si quieres (AgeRange, etc.)
         QualityFilter="AUTO"               # filtra caras de baja calidad
-    )
+    ))
     # Devuelve faceIds creados
     return {
         "FaceRecords": [
@@ -38,16 +134,16 @@ def index_face(image_bytes: bytes, external_id: str) -> Dict[str, Any]:
 def search_by_image(image_bytes: bytes, max_faces: int = 5) -> Dict[str, Any]:
     """
     Busca en la colección por la cara más grande de la imagen.
-    Devuelve matches con Similarity (%) y datos de la cara (ExternalImageId).
+    Devuelve matches con Similarity (%) y datos de la cara (ExternalImageId), y la
+    caja (relativa) de la cara que se buscó.
     """
-    ensure_collection()
-    resp = _client.search_faces_by_image(
+    resp = _con_coleccion(lambda: get_client().search_faces_by_image(
         CollectionId=COLLECTION_ID,
         Image={"Bytes": image_bytes},
         FaceMatchThreshold=MATCH_THRESHOLD,  # % mínimo
         MaxFaces=max_faces,
         QualityFilter="AUTO"
-    )
+    ))
     matches = []
     for m in resp.get("FaceMatches", []):
         face = m["Face"]
@@ -56,4 +152,4 @@ def search_by_image(image_bytes: bytes, max_faces: int = 5) -> Dict[str, Any]:
             "ExternalImageId": face.get("ExternalImageId"),
             "Similarity": float(m["Similarity"])  # 0..100
         })
-    return {"Matches": matches}
+    return {"Matches": matches, "SearchedFaceBoundingBox": resp.get("SearchedFaceBoundingBox")}
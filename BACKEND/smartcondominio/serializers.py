@@ -18,8 +18,11 @@ from .models import (
     Tarea, TareaComentario,
     Vehiculo, SolicitudVehiculo,
     Aviso,
-    MockReceipt, OnlinePaymentIntent, AccessEvent, PagoComprobante, FaceAccessEvent
+    MockReceipt, OnlinePaymentIntent, AccessEvent, PagoComprobante, FaceAccessEvent,
+    BillingJob, UnidadSaldo,
 )
+from . import payloads
+from .services_ledger import registrar_cambio_cuota
 
 User = get_user_model()
 PERIODO_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
@@ -442,15 +445,20 @@ class CuotaSerializer(serializers.ModelSerializer):
                 attrs[k] = Decimal("0.00")
         return attrs
 
-    def _recalc_and_save(self, instance):
+    def _recalc_and_save(self, instance, tipo="AJUSTE"):
         instance.recalc_importes()
         instance.recalc_estado()
-        instance.save()
+        with transaction.atomic():
+            # importes vigentes en la BD (fila bloqueada): el asiento es lo que realmente cambia
+            antes = Cuota.objects.select_for_update().values_list("total_a_pagar", "pagado").get(pk=instance.pk)
+            instance.save()
+            registrar_cambio_cuota(instance, total_antes=antes[0], pagado_antes=antes[1], tipo=tipo)
         return instance
 
     def create(self, validated):
-        instance = super().create(validated)
-        return self._recalc_and_save(instance)
+        with transaction.atomic():
+            instance = super().create(validated)
+            return self._recalc_and_save(instance, tipo="CARGO")
 
     def update(self, instance, validated):
         for k, v in validated.items():
@@ -505,6 +513,45 @@ class GenerarCuotasSerializer(serializers.Serializer):
     monto_base = serializers.DecimalField(max_digits=12, decimal_places=2)
     usa_coeficiente = serializers.BooleanField()
     vencimiento = serializers.DateField(input_formats=["%Y-%m-%d"])
+    # true => se encola un BillingJob y se responde 202 sin esperar
+    async_job = serializers.BooleanField(required=False, default=False)
+
+
+class BillingJobCreateSerializer(serializers.Serializer):
+    items = GenerarCuotasSerializer(many=True)
+    chunk_size = serializers.IntegerField(required=False, min_value=50, max_value=5000, default=500)
+
+    def validate_items(self, v):
+        if not v:
+            raise serializers.ValidationError("Debe indicar al menos un periodo/concepto.")
+        return v
+
+
+class BillingJobSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = BillingJob
+        fields = [
+            "id", "status", "items", "chunk_size",
+            "total", "processed", "progress", "cuotas_afectadas",
+            "cursor_item", "cursor_unidad", "cancel_requested", "error",
+            "worker_id", "heartbeat_at", "created_by", "created_at", "started_at", "finished_at",
+        ]
+        read_only_fields = fields
+
+
+class UnidadSaldoSerializer(serializers.ModelSerializer):
+    unidad_id = serializers.IntegerField(read_only=True)
+    unidad = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UnidadSaldo
+        fields = ["unidad_id", "unidad", "total_cargado", "total_abonado", "saldo", "updated_at"]
+        read_only_fields = fields
+
+    def get_unidad(self, obj):
+        return str(obj.unidad)
 
 
 # ------------------------------ Infracciones ------------------------------
@@ -966,13 +1013,32 @@ class SnapshotInSerializer(serializers.Serializer):
     camera_id = serializers.CharField(required=False, allow_blank=True)
     direction = serializers.ChoiceField(choices=["ENTRADA", "SALIDA", "UNKWN"], required=False)  # ⬅️ nuevo
     image = serializers.ImageField(required=True)
+    plate_hint = serializers.CharField(required=False, allow_blank=True, max_length=30)  # placa tipeada (modo degradado)
     
-class AccessEventSerializer(serializers.ModelSerializer):
+class _PayloadEventoMixin(serializers.Serializer):
+    """
+    payload: en listas (context["solo_resumen"]) el resumen inline, sin leer el JSON completo;
+    en el detalle y al registrar, la respuesta completa del reconocedor (payloads.py).
+    payload_resumido: hay una respuesta más completa en el detalle.
+    """
+    payload = serializers.SerializerMethodField()
+    payload_resumido = serializers.SerializerMethodField()
+
+    def get_payload(self, obj):
+        if self.context.get("solo_resumen"):
+            return obj.resumen or {}
+        return payloads.completo(obj)
+
+    def get_payload_resumido(self, obj):
+        return bool(obj.payload_blob_id)
+
+
+class AccessEventSerializer(_PayloadEventoMixin, serializers.ModelSerializer):
     class Meta:
         model = AccessEvent
         fields = [
             "id","created_at","camera_id","plate_raw","plate_norm","score",
-            "decision","reason","opened","vehicle","visit","payload","triggered_by",
+            "decision","reason","opened","vehicle","visit","payload","payload_resumido","triggered_by",
             "direction",           # ⬅️ añade esto
         ]
         read_only_fields = ["id","created_at"]
@@ -1100,7 +1166,7 @@ class PagoComprobanteReviewSerializer(serializers.Serializer):
         comp.save(update_fields=["estado", "pago", "revisado_por", "revisado_en"])
         return comp
 
-class FaceAccessEventSerializer(serializers.ModelSerializer):
+class FaceAccessEventSerializer(_PayloadEventoMixin, serializers.ModelSerializer):
     matched_user_display = serializers.SerializerMethodField()
     triggered_by_display = serializers.SerializerMethodField()
 
@@ -1111,7 +1177,7 @@ class FaceAccessEventSerializer(serializers.ModelSerializer):
             "decision", "score", "opened",
             "matched_user", "matched_user_display",
             "triggered_by", "triggered_by_display",
-            "snapshot", "reason", "payload",
+            "snapshot", "reason", "payload", "payload_resumido",
         ]
 
     def get_matched_user_display(self, obj):
@@ -0,0 +1,232 @@
+# services_archivo.py
+"""
+Retención de la bitácora de garita (AccessEvent, FaceAccessEvent). Lo corre
+`manage.py archivar_eventos`, pensado para cron diario:
+
+  1) particiones: en Postgres crea las de los próximos EVENTOS_PARTICIONES_ADELANTE meses;
+  2) tabla activa -> archivo (opcional, bases sin particiones, p.ej. SQLite): las filas de
+     más de EVENTOS_ACTIVOS_DIAS pasan a *Archivo para que la tabla activa no crezca. Apagado
+     por defecto: las listas, el detalle y el export no leen *Archivo, así que esas filas
+     dejan de verse en la API (en Postgres las particiones las mantienen visibles hasta la
+     retención);
+  3) payloads (opcional): el JSON de más de EVENTOS_PAYLOAD_DIAS (inline o PayloadBlob) va a
+     un archivo frío y en la fila queda {"archivado": <ruta>} (el resumen no se toca);
+  4) retención (opcional): las filas de más de EVENTOS_RETENCION_DIAS van a archivos fríos y
+     salen de la BD. En Postgres, un mes completo se borra con DROP de su partición;
+  5) PayloadBlob que ya no usa ningún evento (payloads.purgar_huerfanos).
+
+Archivos fríos: JSON Lines con gzip, por tabla y mes, en el storage por defecto (S3 en
+producción) bajo EVENTOS_ARCHIVO_PREFIJO, con el payload completo (payloads.expandir). Siempre se escribe el archivo antes de borrar:
+si algo se corta a mitad, lo peor es una fila repetida en frío, nunca una perdida.
+Los snapshots de FaceAccessEvent no se tocan (la fila archivada guarda su ruta).
+"""
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from . import particiones, payloads
+from .models import AccessEvent, AccessEventArchivo, FaceAccessEvent, FaceAccessEventArchivo
+
+TABLAS = {
+    "access": (AccessEvent, AccessEventArchivo),
+    "face": (FaceAccessEvent, FaceAccessEventArchivo),
+}
+# la tabla activa y su *Archivo comparten carpeta en frío: mismas columnas, mismos ids
+_CARPETA = {archivo: modelo._meta.db_table for modelo, archivo in TABLAS.values()}
+
+
+# ---------------------------
+# Archivos fríos
+# ---------------------------
+def _ruta(modelo, tipo, mes) -> str:
+    tabla = _CARPETA.get(modelo, modelo._meta.db_table)
+    prefijo = getattr(settings, "EVENTOS_ARCHIVO_PREFIJO", "archivo/eventos").strip("/")
+    return f"{prefijo}/{tabla}/{mes:%Y-%m}/{tipo}-{timezone.now():%Y%m%dT%H%M%S}.jsonl.gz"
+
+
+def escribir_frio(ruta, filas) -> tuple[str | None, int]:
+    """Filas (dicts) a JSON Lines + gzip en el storage. Devuelve (ruta guardada, n); sin filas no escribe."""
+    n = 0
+    with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024) as tmp:
+        with gzip.GzipFile(fileobj=tmp, mode="wb") as gz:
+            for fila in filas:
+                gz.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False).encode() + b"\n")
+                n += 1
+        if not n:
+            return None, 0
+        tmp.seek(0)
+        return default_storage.save(ruta, File(tmp)), n
+
+
+def leer_frio(ruta):
+    """Itera las filas de un archivo frío (para restaurar o auditar)."""
+    with default_storage.open(ruta, "rb") as f, gzip.GzipFile(fileobj=f) as gz:
+        for linea in gz:
+            yield json.loads(linea)
+
+
+# ---------------------------
+# Utilidades
+# ---------------------------
+def _meses(qs, antes_de):
+    """Meses (inicio, fin) con filas en qs, del más viejo hasta `antes_de` (el último recortado)."""
+    primero = qs.aggregate(m=Min("created_at"))["m"]
+    if primero is None:
+        return
+    mes = particiones.mes_de(primero)
+    while mes < antes_de:
+        fin = particiones.sumar_meses(mes, 1)
+        yield mes, min(fin, antes_de)
+        mes = fin
+
+
+def _borrar_por_lotes(qs, lote) -> int:
+    """DELETE por rangos de ids: transacciones cortas aunque sean millones de filas."""
+    total = 0
+    while True:
+        ids = list(qs.order_by("id").values_list("id", flat=True)[:lote])
+        if not ids:
+            return total
+        total += qs.model.objects.filter(id__in=ids).delete()[0]
+
+
+def _congelar(qs, tipo, mes, lote, dry_run) -> dict:
+    """Escribe las filas de qs en frío y las borra de la BD."""
+    if dry_run:
+        return {"mes": f"{mes:%Y-%m}", "filas": qs.count(), "archivo": None}
+    filas = payloads.expandir(qs.order_by("id").values().iterator(chunk_size=lote))
+    ruta, n = escribir_frio(_ruta(qs.model, tipo, mes), filas)
+    if n:
+        _borrar_por_lotes(qs, lote)
+    return {"mes": f"{mes:%Y-%m}", "filas": n, "archivo": ruta}
+
+
+# ---------------------------
+# 1) Particiones
+# ---------------------------
+def asegurar_particiones(meses=None) -> dict:
+    meses = meses if meses is not None else getattr(settings, "EVENTOS_PARTICIONES_ADELANTE", 3)
+    return {
+        modelo._meta.db_table: particiones.asegurar_particiones(connection, modelo._meta.db_table, meses=meses)
+        for modelo, _ in TABLAS.values()
+    }
+
+
+# ---------------------------
+# 2) Tabla activa -> archivo (sin particiones)
+# ---------------------------
+def mover_a_archivo(modelo, archivo, antes_de, lote=5000, dry_run=False) -> int:
+    """Copia a `archivo` y borra de `modelo` las filas anteriores a `antes_de`, por lotes."""
+    qs = modelo.objects.filter(created_at__lt=antes_de)
+    if dry_run:
+        return qs.count()
+    movidas = 0
+    while True:
+        filas = list(qs.order_by("id").values()[:lote])
+        if not filas:
+            return movidas
+        with transaction.atomic():
+            archivo.objects.bulk_create([archivo(**f) for f in filas], ignore_conflicts=True)
+            modelo.objects.filter(id__in=[f["id"] for f in filas]).delete()
+        movidas += len(filas)
+
+
+# ---------------------------
+# 3) Payloads
+# ---------------------------
+def archivar_payloads(modelo, antes_de, lote=5000, dry_run=False) -> list:
+    """El payload de las filas anteriores a `antes_de` va a frío; en la fila queda la ruta."""
+    pendientes = (
+        modelo.objects.filter(created_at__lt=antes_de)
+        .filter(Q(payload_blob_id__isnull=False) | ~Q(payload={}))
+        .exclude(payload__has_key="archivado")
+    )
+    out = []
+    for inicio, fin in _meses(pendientes, antes_de):
+        qs = pendientes.filter(created_at__gte=inicio, created_at__lt=fin)
+        if dry_run:
+            n = qs.count()
+            if n:
+                out.append({"mes": f"{inicio:%Y-%m}", "filas": n, "archivo": None})
+            continue
+        ruta, n = escribir_frio(
+            _ruta(modelo, "payloads", inicio),
+            payloads.expandir(
+                qs.order_by("id").values("id", "created_at", "payload", "payload_blob_id").iterator(chunk_size=lote)
+            ),
+        )
+        if n:
+            while True:
+                ids = list(qs.order_by("id").values_list("id", flat=True)[:lote])
+                if not ids:
+                    break
+                modelo.objects.filter(id__in=ids).update(payload={"archivado": ruta}, payload_blob_id=None)
+            out.append({"mes": f"{inicio:%Y-%m}", "filas": n, "archivo": ruta})
+    return out
+
+
+# ---------------------------
+# 4) Retención
+# ---------------------------
+def aplicar_retencion(modelo, archivo, antes_de, lote=5000, dry_run=False) -> list:
+    """Filas anteriores a `antes_de` -> archivos fríos, y fuera de la BD."""
+    out = []
+    tabla = modelo._meta.db_table
+    if particiones.es_particionada(connection, tabla):
+        # meses enteros: archivo + DROP de la partición (sin DELETE fila por fila)
+        for p in particiones.particiones(connection, tabla):
+            if p["default"] or p["desde"] is None or p["hasta"] is None or p["hasta"] > antes_de:
+                continue
+            qs = modelo.objects.filter(created_at__gte=p["desde"], created_at__lt=p["hasta"])
+            if dry_run:
+                out.append({"mes": f"{p['desde']:%Y-%m}", "filas": qs.count(), "archivo": None, "drop": p["nombre"]})
+                continue
+            filas = payloads.expandir(qs.order_by("id").values().iterator(chunk_size=lote))
+            ruta, n = escribir_frio(_ruta(modelo, "filas", p["desde"]), filas)
+            with connection.cursor() as cur:
+                cur.execute(f"DROP TABLE {connection.ops.quote_name(p['nombre'])}")
+            out.append({"mes": f"{p['desde']:%Y-%m}", "filas": n, "archivo": ruta, "drop": p["nombre"]})
+    # el resto (legacy, DEFAULT, mes a medias, o sin particiones): por lotes
+    for m in (modelo, archivo):
+        viejas = m.objects.filter(created_at__lt=antes_de)
+        for inicio, fin in _meses(viejas, antes_de):
+            r = _congelar(viejas.filter(created_at__gte=inicio, created_at__lt=fin), "filas", inicio, lote, dry_run)
+            if r["filas"]:
+                out.append(r)
+    return out
+
+
+def archivar(tablas=("access", "face"), retencion_dias=None, payload_dias=None, activos_dias=None,
+             meses_adelante=None, lote=5000, dry_run=False) -> dict:
+    """Los pasos 1-4 para cada tabla y al final el 5. Días en None = settings.EVENTOS_*; 0 = paso apagado."""
+    def dias(valor, clave, default):
+        return int(valor if valor is not None else getattr(settings, clave, default))
+
+    retencion = dias(retencion_dias, "EVENTOS_RETENCION_DIAS", 0)
+    payload = dias(payload_dias, "EVENTOS_PAYLOAD_DIAS", 0)
+    activos = dias(activos_dias, "EVENTOS_ACTIVOS_DIAS", 0)
+    ahora = timezone.now()
+
+    resumen = {"particiones": {} if dry_run else asegurar_particiones(meses_adelante)}
+    for clave in tablas:
+        modelo, archivo = TABLAS[clave]
+        r = {"a_archivo": 0, "payloads": [], "retencion": []}
+        if activos and not particiones.es_particionada(connection, modelo._meta.db_table):
+            r["a_archivo"] = mover_a_archivo(modelo, archivo, ahora - timedelta(days=activos), lote, dry_run)
+        if payload:
+            for m in (modelo, archivo):
+                r["payloads"] += archivar_payloads(m, ahora - timedelta(days=payload), lote, dry_run)
+        if retencion:
+            r["retencion"] = aplicar_retencion(modelo, archivo, ahora - timedelta(days=retencion), lote, dry_run)
+        resumen[clave] = r
+    resumen["blobs_purgados"] = payloads.purgar_huerfanos(lote=lote, dry_run=dry_run)
+    return resumen
@@ -0,0 +1,145 @@
+# services_billing.py
+"""
+Jobs de facturación: cola en base de datos (BillingJob) procesada por
+`manage.py billing_worker`. Funciona igual en SQLite y Postgres: la toma de un
+job y cada checkpoint son UPDATE condicionales, sin broker ni locks de fila.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import BillingJob, Unidad
+from .services_cuotas import generar_cuotas
+
+log = logging.getLogger(__name__)
+
+STALE_AFTER = timedelta(seconds=60)   # sin heartbeat por más de esto => worker caído
+
+
+class LeaseLost(Exception):
+    """Otro worker tomó el job (este se consideró caído)."""
+
+
+def submit_job(items, user=None, chunk_size=500) -> BillingJob:
+    """
+    Encola la generación de uno o varios periodo/concepto.
+    items: dicts validados por GenerarCuotasSerializer.
+    """
+    return BillingJob.objects.create(
+        items=[
+            {
+                "periodo": it["periodo"],
+                "concepto": it["concepto"],
+                "monto_base": str(it["monto_base"]),
+                "usa_coeficiente": bool(it["usa_coeficiente"]),
+                "vencimiento": it["vencimiento"].isoformat(),
+            }
+            for it in items
+        ],
+        chunk_size=chunk_size,
+        total=len(items) * Unidad.objects.filter(is_active=True).count(),
+        created_by=user if user and getattr(user, "is_authenticated", False) else None,
+    )
+
+
+def cancel_job(job: BillingJob) -> BillingJob:
+    """En cola => se cancela ya; en proceso => el worker corta al terminar el lote actual."""
+    BillingJob.objects.filter(pk=job.pk, status="QUEUED").update(
+        status="CANCELLED", cancel_requested=True, finished_at=timezone.now()
+    )
+    BillingJob.objects.filter(pk=job.pk, status="RUNNING").update(cancel_requested=True)
+    job.refresh_from_db()
+    return job
+
+
+def claim_next_job(worker_id: str, stale_after=STALE_AFTER):
+    """
+    Toma el job más antiguo en cola, o uno RUNNING cuyo worker dejó de latir.
+    La toma es un UPDATE condicional: si dos workers compiten, solo uno lo gana.
+    """
+    now = timezone.now()
+    disponibles = BillingJob.objects.filter(
+        Q(status="QUEUED") | Q(status="RUNNING", heartbeat_at__lt=now - stale_after)
+    ).order_by("created_at")
+    for job in disponibles.only("id", "status", "heartbeat_at")[:10]:
+        tomado = BillingJob.objects.filter(
+            pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at,
+        ).update(status="RUNNING", worker_id=worker_id, heartbeat_at=now)
+        if tomado:
+            BillingJob.objects.filter(pk=job.pk, started_at__isnull=True).update(started_at=now)
+            if job.status == "RUNNING":
+                log.warning("BillingJob %s retomado por %s desde el checkpoint", job.pk, worker_id)
+            return BillingJob.objects.get(pk=job.pk)
+    return None
+
+
+def run_job(job: BillingJob, worker_id: str) -> BillingJob:
+    """
+    Procesa el job por lotes de unidades desde su checkpoint. Cada lote y su
+    checkpoint se confirman en la misma transacción, así un corte no duplica
+    ni pierde trabajo.
+    """
+    try:
+        while job.cursor_item < len(job.items):
+            if _cancel_requested(job):
+                return _finish(job, worker_id, "CANCELLED")
+
+            item = job.items[job.cursor_item]
+            chunk = list(
+                Unidad.objects.filter(is_active=True, id__gt=job.cursor_unidad)
+                .order_by("id").values_list("id", flat=True)[:job.chunk_size]
+            )
+            if not chunk:
+                _checkpoint(job, worker_id, cursor_item=job.cursor_item + 1, cursor_unidad=0)
+                continue
+
+            with transaction.atomic():
+                ids = generar_cuotas(
+                    item["periodo"], item["concepto"], Decimal(item["monto_base"]),
+                    item["usa_coeficiente"], parse_date(item["vencimiento"]),
+                    unidades=Unidad.objects.filter(pk__in=chunk),
+                )
+                _checkpoint(
+                    job, worker_id,
+                    cursor_unidad=chunk[-1],
+                    processed=F("processed") + len(chunk),
+                    cuotas_afectadas=F("cuotas_afectadas") + len(ids),
+                )
+        return _finish(job, worker_id, "DONE")
+    except LeaseLost:
+        log.warning("BillingJob %s: %s perdió el job, lo continúa otro worker", job.pk, worker_id)
+        return job
+    except Exception as e:
+        log.exception("BillingJob %s falló", job.pk)
+        BillingJob.objects.filter(pk=job.pk, worker_id=worker_id).update(
+            status="FAILED", error=f"{e.__class__.__name__}: {e}", finished_at=timezone.now()
+        )
+        job.refresh_from_db()
+        return job
+
+
+def _checkpoint(job, worker_id, **campos):
+    """Guarda el avance solo si este worker sigue siendo el dueño del job."""
+    ok = BillingJob.objects.filter(pk=job.pk, worker_id=worker_id, status="RUNNING").update(
+        heartbeat_at=timezone.now(), **campos
+    )
+    if not ok:
+        raise LeaseLost()
+    job.refresh_from_db(fields=["cursor_item", "cursor_unidad", "processed", "cuotas_afectadas", "heartbeat_at"])
+
+
+def _cancel_requested(job) -> bool:
+    return BillingJob.objects.filter(pk=job.pk, cancel_requested=True).exists()
+
+
+def _finish(job, worker_id, status):
+    BillingJob.objects.filter(pk=job.pk, worker_id=worker_id).update(
+        status=status, finished_at=timezone.now(), heartbeat_at=timezone.now()
+    )
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,197 @@
+# services_cuotas.py
+import logging
+import time
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Count, Min, Max, Value, DecimalField
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from .models import Unidad, Cuota, BarridoMora, UnidadSaldo
+from .services_ledger import asiento, registrar, tocar_unidades
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# Campos que reescribe la generación sobre una cuota ya existente
+CAMPOS_GENERACION = [
+    "monto_base", "usa_coeficiente", "coeficiente_snapshot",
+    "vencimiento", "monto_calculado", "total_a_pagar", "estado", "updated_at",
+]
+
+
+def generar_cuotas(periodo, concepto, monto_base, usa_coeficiente, vencimiento,
+                   unidades=None, batch_size=BATCH_SIZE):
+    """
+    Genera (o actualiza) la cuota periodo/concepto de cada unidad activa.
+    Importes y estado se calculan en memoria con Cuota.recalc_importes/recalc_estado
+    y se escriben por lotes (bulk_create + UPDATE agrupados), sin ida y vuelta por unidad.
+    Cargos y ajustes quedan en el libro de la unidad (services_ledger) en la misma transacción.
+    Devuelve la lista de ids afectados en el orden de las unidades.
+    """
+    if unidades is None:
+        unidades = Unidad.objects.filter(is_active=True)
+    unidades = list(unidades.only("id", "coeficiente"))
+    if not unidades:
+        return []
+
+    # Una sola lectura de las cuotas activas que ya existen para periodo/concepto.
+    # Con muchas unidades sale más barato traer todo el periodo que un IN gigante.
+    existentes_qs = Cuota.objects.filter(periodo=periodo, concepto=concepto, is_active=True)
+    if len(unidades) <= batch_size:
+        existentes_qs = existentes_qs.filter(unidad_id__in=[u.id for u in unidades])
+    existentes = {c.unidad_id: c for c in existentes_qs}
+
+    ahora = timezone.now()
+    nuevas, actualizadas, afectadas = [], [], []
+    total_antes = {}
+    for u in unidades:
+        c = existentes.get(u.id)
+        if c is None:
+            c = Cuota(
+                unidad_id=u.id, periodo=periodo, concepto=concepto, is_active=True,
+                coeficiente_snapshot=u.coeficiente or 0,
+            )
+            nuevas.append(c)
+        else:
+            if usa_coeficiente:
+                c.coeficiente_snapshot = u.coeficiente or 0
+            total_antes[c.pk] = c.total_a_pagar
+            actualizadas.append(c)
+        c.monto_base = monto_base
+        c.usa_coeficiente = usa_coeficiente
+        c.vencimiento = vencimiento
+        c.recalc_importes()
+        c.recalc_estado()
+        c.updated_at = ahora
+        afectadas.append(c)
+
+    with transaction.atomic():
+        # bulk_create devuelve los ids en SQLite (>= 3.35) y Postgres
+        Cuota.objects.bulk_create(nuevas, batch_size=batch_size)
+        _actualizar_agrupadas(actualizadas, batch_size)
+        registrar(
+            [asiento(c.unidad_id, "CARGO", cargo=c.total_a_pagar, cuota_id=c.pk) for c in nuevas]
+            + [asiento(c.unidad_id, "AJUSTE", cargo=c.total_a_pagar - total_antes[c.pk], cuota_id=c.pk,
+                       detalle=f"Regeneración {periodo} {concepto}") for c in actualizadas],
+            batch_size=batch_size,
+        )
+        # también cambian vencimiento/estado aunque el importe no se mueva
+        tocar_unidades(sorted({c.unidad_id for c in actualizadas}), batch_size)
+
+    return [c.id for c in afectadas]
+
+
+def _actualizar_agrupadas(cuotas, batch_size=BATCH_SIZE):
+    """
+    Escribe las cuotas existentes agrupando las que quedan con los mismos valores:
+    un UPDATE ... WHERE id IN (...) por grupo. En la generación casi todo es
+    uniforme (base, vencimiento) y solo varía el coeficiente, así que salen pocos
+    grupos; bulk_update arma un CASE por fila y escala mucho peor.
+    """
+    grupos = {}
+    for c in cuotas:
+        valores = tuple(getattr(c, f) for f in CAMPOS_GENERACION)
+        grupos.setdefault(valores, []).append(c.pk)
+    for valores, ids in grupos.items():
+        cambios = dict(zip(CAMPOS_GENERACION, valores))
+        for i in range(0, len(ids), batch_size):
+            Cuota.objects.filter(pk__in=ids[i:i + batch_size]).update(**cambios)
+
+
+# ---------------------------
+# Barrido diario de estado / mora
+# ---------------------------
+
+def barrer_cuotas(today=None, mora_fija=None, batch_size=5000):
+    """
+    Recalcula estado y aplica mora fija a todas las cuotas con UPDATE masivos,
+    por rangos de id (sin instanciar modelos). Misma regla que
+    Cuota.apply_simple_mora/recalc_estado. La mora se carga como mucho una vez
+    por cuota y por día (mora_aplicada_el), así que re-ejecutar es seguro; cada
+    cargo de mora queda como asiento MORA en el libro de la unidad.
+    Devuelve (transiciones, cuotas_con_mora).
+    """
+    today = today or date.today()
+    mora = Decimal(mora_fija if mora_fija is not None else getattr(settings, "MORA_FIJA", "0.00"))
+    transiciones = Counter()
+    con_mora = 0
+
+    rango_ids = Cuota.objects.aggregate(lo=Min("id"), hi=Max("id"))
+    if rango_ids["lo"] is None:
+        return {}, 0
+
+    nuevo_estado = Cuota.estado_sql(today)
+    for inicio in range(rango_ids["lo"], rango_ids["hi"] + 1, batch_size):
+        lote = Cuota.objects.filter(pk__gte=inicio, pk__lt=inicio + batch_size)
+        with transaction.atomic():
+            if mora > 0:
+                # filas bloqueadas: el asiento MORA es la diferencia real de total_a_pagar
+                antes = {
+                    pk: (unidad_id, total)
+                    for pk, unidad_id, total in (
+                        lote.filter(is_active=True, vencimiento__lt=today, total_a_pagar__gt=F("pagado"))
+                        .filter(Q(mora_aplicada_el__isnull=True) | Q(mora_aplicada_el__lt=today))
+                        .select_for_update().values_list("id", "unidad_id", "total_a_pagar")
+                    )
+                }
+                con_mora += (
+                    Cuota.objects.filter(pk__in=list(antes))
+                    .update(
+                        mora_aplicada=F("mora_aplicada") + mora,
+                        total_a_pagar=Greatest(
+                            Round(F("monto_calculado") - F("descuento_aplicado") + F("mora_aplicada") + mora, 2),
+                            Value(Decimal("0.00")),
+                            output_field=DecimalField(max_digits=10, decimal_places=2),
+                        ),
+                        mora_aplicada_el=today,
+                        updated_at=timezone.now(),
+                    )
+                )
+                despues = Cuota.objects.filter(pk__in=list(antes)).values_list("id", "total_a_pagar")
+                registrar([
+                    asiento(antes[pk][0], "MORA", cargo=total - antes[pk][1], cuota_id=pk, detalle=f"Mora {today}")
+                    for pk, total in despues
+                ])
+
+            cambian = lote.exclude(estado=nuevo_estado)
+            for row in cambian.values("estado").annotate(nuevo=nuevo_estado, n=Count("id")).order_by():
+                transiciones[f"{row['estado']}->{row['nuevo']}"] += row["n"]
+            UnidadSaldo.objects.filter(unidad_id__in=cambian.values("unidad_id")).update(version=F("version") + 1)
+            cambian.update(estado=nuevo_estado, updated_at=timezone.now())
+
+    for t, n in sorted(transiciones.items()):
+        log.info("barrido %s: %s = %d", today, t, n)
+    log.info("barrido %s: mora %s aplicada a %d cuotas", today, mora, con_mora)
+    return dict(transiciones), con_mora
+
+
+def barrido_diario(fecha=None, mora_fija=None, batch_size=5000, force=False):
+    """
+    Corre barrer_cuotas una vez por fecha y deja el registro en BarridoMora.
+    Si ya hay un barrido terminado para la fecha no hace nada (salvo force=True).
+    Devuelve (barrido, ejecutado).
+    """
+    fecha = fecha or date.today()
+    mora = Decimal(mora_fija if mora_fija is not None else getattr(settings, "MORA_FIJA", "0.00"))
+    barrido, _ = BarridoMora.objects.get_or_create(fecha=fecha, defaults={"mora_fija": mora})
+    if barrido.terminado and not force:
+        return barrido, False
+
+    t0 = time.perf_counter()
+    transiciones, con_mora = barrer_cuotas(today=fecha, mora_fija=mora, batch_size=batch_size)
+    acumuladas = Counter(barrido.transiciones if force else {})
+    acumuladas.update(transiciones)
+    barrido.mora_fija = mora
+    barrido.transiciones = dict(acumuladas)
+    barrido.cuotas_con_mora = (barrido.cuotas_con_mora if force else 0) + con_mora
+    barrido.duracion_ms = int((time.perf_counter() - t0) * 1000)
+    barrido.terminado = True
+    barrido.finished_at = timezone.now()
+    barrido.save()
+    return barrido, True
@@ -0,0 +1,189 @@
+# services_gate.py
+"""
+Pipeline de la garita por placa (SnapshotCheckView), en etapas para que la transacción
+de BD dure solo el INSERT del evento y no los segundos del OCR externo:
+
+  1) validar:    SnapshotInSerializer (en la vista).
+  2) leer_placa: Plate Recognizer, FUERA de toda transacción (circuit breaker + timeouts).
+  3) decidir:    índice de autorizaciones en memoria (plate_index) + coincidencia aproximada;
+                 si el índice está frío lee la BD en autocommit (consultas cortas).
+  4) registrar:  AccessEvent en una transacción corta.
+
+Con conn_max_age la conexión del worker sigue abierta entre etapas, pero ya no queda
+"idle in transaction" (ni con locks) mientras se espera a la red; detrás de un pooler en
+modo transacción (pgbouncer) la conexión del servidor se libera en ese lapso.
+
+aprocesar_snapshot() es la versión async (views_async.py): el OCR con httpx en el event
+loop y las etapas 3-4 (cerrar_snapshot) en sync_to_async, que solo tocan la BD.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from . import payloads
+from .circuit import CircuitoAbierto, circuito
+from .models import AccessEvent
+from .plate_index import REASON_APROXIMADA, buscar_autorizacion, mejor_coincidencia
+from .services_snapshot import (
+    PlateRecognizerSnapshot, best_plate_from_result, plate_candidates_from_result, decision_degradada,
+)
+
+
+def direccion_de(camera_id, direction=None):
+    """Dirección pedida o la de settings.CAMERA_DIRECTIONS para la cámara ("" si no está mapeada)."""
+    return direction or (getattr(settings, "CAMERA_DIRECTIONS", {}) or {}).get(camera_id, "")
+
+
+# ---------------------------
+# 2) OCR
+# ---------------------------
+def leer_placa(img, camera_id="", lector=None):
+    """Respuesta del OCR. No abre transacción; levanta la excepción del lector (o CircuitoAbierto)."""
+    lector = lector or PlateRecognizerSnapshot.read_image
+    return lector(
+        fileobj=img,
+        regions=getattr(settings, "PLATE_REGIONS", None),
+        camera_id=camera_id or None,
+    )
+
+
+async def aleer_placa(img, camera_id="", lector=None):
+    """leer_placa() con un lector async (por defecto PlateRecognizerSnapshot.aread_image)."""
+    lector = lector or PlateRecognizerSnapshot.aread_image
+    return await lector(
+        fileobj=img,
+        regions=getattr(settings, "PLATE_REGIONS", None),
+        camera_id=camera_id or None,
+    )
+
+
+# ---------------------------
+# 3) Decisión
+# ---------------------------
+def decidir(payload) -> dict:
+    """Campos del AccessEvent a partir de la respuesta del OCR (sin escribir nada)."""
+    plate_raw, score = best_plate_from_result(payload)
+    plate_norm = (plate_raw or "").strip().upper().replace(" ", "")
+
+    if not plate_norm:
+        return {
+            "plate_raw": plate_raw or "", "plate_norm": "", "score": score,
+            "decision": "DENY_UNKNOWN", "reason": "Sin placa confiable", "opened": False,
+            "payload": payload,
+        }
+
+    # índice en memoria; BD si está frío o no aparece
+    veh_id, propietario_id, visit_id = buscar_autorizacion(plate_norm)
+
+    # sin coincidencia exacta: todas las lecturas del OCR contra el índice,
+    # tolerando confusiones (0/O, 8/B, ...) y una edición. El ranking queda en el
+    # payload; abrir con él es opcional (PLATE_FUZZY_ENABLED, apagado por defecto)
+    match = None
+    if not (veh_id or visit_id):
+        match, ranking = mejor_coincidencia(plate_candidates_from_result(payload))
+        aplica = bool(match) and getattr(settings, "PLATE_FUZZY_ENABLED", False)
+        if ranking:
+            payload = {**payload, "match": {"elegida": match, "aplicada": aplica, "ranking": ranking}}
+        if not aplica:
+            match = None
+        if match:
+            veh_id, propietario_id, visit_id = buscar_autorizacion(match["placa"])
+            if veh_id or visit_id:
+                plate_norm, score = match["placa"], match["score_ocr"]
+
+    decision, reason, opened = (
+        "DENY_UNKNOWN",
+        "No coincide con vehículo autorizado ni visita aprobada.",
+        False,
+    )
+    if veh_id:
+        decision, reason, opened = (
+            "ALLOW_RESIDENT",
+            f"Vehículo autorizado para usuario {propietario_id}.",
+            True,
+        )
+    elif visit_id:
+        decision, reason, opened = (
+            "ALLOW_VISIT",
+            f"Visita aprobada (id={visit_id}).",
+            True,
+        )
+    if opened and match:
+        # adelante, para que el recorte a 200 no se lleve la marca
+        reason = (
+            f"{REASON_APROXIMADA} OCR '{match['leida']}' ≈ '{match['placa']}' "
+            f"(confianza {match['confianza']:.2f}). {reason}"
+        )
+
+    return {
+        "plate_raw": plate_raw or "", "plate_norm": plate_norm, "score": score,
+        "decision": decision, "reason": reason[:200], "opened": opened,
+        "vehicle_id": veh_id, "visit_id": visit_id, "payload": payload,
+    }
+
+
+def decidir_error(e, plate_hint=None) -> tuple[dict, int]:
+    """OCR caído o circuito abierto: modo degradado (PLATE_DEGRADED_MODE) o ERROR_OCR. Devuelve (campos, status)."""
+    error = {
+        "error": str(e),
+        "circuito": circuito("platerecognizer").estado(),
+        "circuito_abierto": isinstance(e, CircuitoAbierto),
+    }
+    degradada = decision_degradada(plate_hint)
+    if degradada:
+        decision, reason, veh_id, visit_id, previo_id = degradada
+        plate_norm = (plate_hint or "").strip().upper().replace(" ", "")
+        return {
+            "plate_raw": plate_norm, "plate_norm": plate_norm,
+            "decision": decision, "reason": reason[:200], "opened": True,
+            "vehicle_id": veh_id, "visit_id": visit_id,
+            "payload": {**error, "degradado": True, "evento_previo": previo_id},
+        }, 200
+    return {
+        "decision": "ERROR_OCR", "reason": f"OCR error: {e}"[:200], "opened": False, "payload": error,
+    }, 502
+
+
+# ---------------------------
+# 4) Registro
+# ---------------------------
+def registrar(campos, camera_id="", direction="", user=None) -> AccessEvent:
+    """INSERT del evento en una transacción corta (lo único que toca la BD para escribir)."""
+    with transaction.atomic():
+        # payload grande -> PayloadBlob comprimido + resumen inline (payloads.py)
+        return payloads.crear(
+            AccessEvent,
+            camera_id=camera_id,
+            direction=direction,
+            triggered_by=user,
+            **campos,
+        )
+
+
+def cerrar_snapshot(payload, error=None, camera_id="", direction="", plate_hint=None, user=None):
+    """Etapas 3-4 (sin red): decide con la respuesta del OCR o su error y registra. Devuelve (AccessEvent, status)."""
+    if error is not None:
+        campos, status = decidir_error(error, plate_hint)
+    else:
+        campos, status = decidir(payload), 200
+    return registrar(campos, camera_id, direction, user), status
+
+
+def procesar_snapshot(img, camera_id="", direction=None, plate_hint=None, user=None, lector=None):
+    """Etapas 2-4 para una foto ya validada. Devuelve (AccessEvent, status HTTP)."""
+    direction = direccion_de(camera_id, direction)
+    try:
+        payload = leer_placa(img, camera_id, lector=lector)
+    except Exception as e:
+        return cerrar_snapshot(None, e, camera_id, direction, plate_hint, user)
+    return cerrar_snapshot(payload, None, camera_id, direction, plate_hint, user)
+
+
+async def aprocesar_snapshot(img, camera_id="", direction=None, plate_hint=None, user=None, lector=None):
+    """procesar_snapshot() async: espera al OCR sin ocupar un hilo; la BD va por sync_to_async."""
+    direction = direccion_de(camera_id, direction)
+    try:
+        payload = await aleer_placa(img, camera_id, lector=lector)
+    except Exception as e:
+        return await sync_to_async(cerrar_snapshot)(None, e, camera_id, direction, plate_hint, user)
+    return await sync_to_async(cerrar_snapshot)(payload, None, camera_id, direction, plate_hint, user)
@@ -0,0 +1,186 @@
+# services_ledger.py
+"""
+Libro de movimientos (MovimientoCuenta) y saldos materializados (UnidadSaldo).
+Toda operación que cambia total_a_pagar o pagado de una cuota registra aquí su
+variación en la misma transacción, así el saldo de la unidad se lee en O(1) y se
+puede reconstruir/verificar desde el libro (manage.py reconciliar_saldos).
+"""
+import uuid
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum, OuterRef, Subquery, DecimalField
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import Unidad, Cuota, MovimientoCuenta, UnidadSaldo
+
+BATCH_SIZE = 500
+CERO = Decimal("0.00")
+IMPORTE = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _q(x) -> Decimal:
+    return Decimal(x or 0).quantize(Decimal("0.01"))
+
+
+def asiento(unidad_id, tipo, cargo=CERO, abono=CERO, cuota_id=None, pago_id=None, detalle=""):
+    """Arma (sin guardar) un asiento; se persiste con registrar()."""
+    return MovimientoCuenta(
+        unidad_id=unidad_id, cuota_id=cuota_id, pago_id=pago_id, tipo=tipo,
+        cargo=_q(cargo), abono=_q(abono), detalle=detalle[:120],
+    )
+
+
+def registrar(movimientos, batch_size=BATCH_SIZE):
+    """
+    Inserta los asientos y suma sus importes a UnidadSaldo en una transacción.
+    Los asientos en cero se omiten. Con un solo asiento es un UPDATE con F();
+    con varios, un UPDATE por lote de unidades que suma por subconsulta solo los
+    asientos de esta operación (incremental: no pisa lo que sume otra transacción).
+    """
+    movs = [m for m in movimientos if m.cargo or m.abono or m.tipo == "APERTURA"]
+    if not movs:
+        return []
+    op = uuid.uuid4()
+    for m in movs:
+        m.operacion = op
+
+    with transaction.atomic():
+        MovimientoCuenta.objects.bulk_create(movs, batch_size=batch_size)
+        if len(movs) == 1:
+            _sumar_a_saldo(movs[0].unidad_id, movs[0].cargo, movs[0].abono)
+        else:
+            _sumar_operacion(op, sorted({m.unidad_id for m in movs}), batch_size)
+    return movs
+
+
+def registrar_pago(pago, tipo, abono):
+    """Asiento PAGO/REVERSION de un pago (abono con signo: lo que cambió pagado)."""
+    return registrar([asiento(pago.cuota.unidad_id, tipo, abono=abono, cuota_id=pago.cuota_id, pago_id=pago.pk)])
+
+
+def registrar_cambio_cuota(cuota, total_antes=CERO, pagado_antes=CERO, tipo="AJUSTE", detalle=""):
+    """Asiento por la diferencia entre los importes previos de la cuota y los actuales."""
+    return registrar([asiento(
+        cuota.unidad_id, tipo,
+        cargo=_q(cuota.total_a_pagar) - _q(total_antes),
+        abono=_q(cuota.pagado) - _q(pagado_antes),
+        cuota_id=cuota.pk, detalle=detalle,
+    )])
+
+
+def _sumar_a_saldo(unidad_id, cargo, abono):
+    actualizado = UnidadSaldo.objects.filter(unidad_id=unidad_id).update(
+        total_cargado=Round(F("total_cargado") + cargo, 2),
+        total_abonado=Round(F("total_abonado") + abono, 2),
+        saldo=Round(F("saldo") + (cargo - abono), 2),
+        version=F("version") + 1,
+        updated_at=timezone.now(),
+    )
+    if not actualizado:
+        # unidad sin fila de saldo (p.ej. creada con bulk_create): se arma desde el libro
+        reconstruir_saldos([unidad_id])
+
+
+def _sumar_operacion(op, unidad_ids, batch_size):
+    asientos = (
+        MovimientoCuenta.objects.filter(operacion=op, unidad_id=OuterRef("unidad_id"))
+        .order_by().values("unidad_id")
+    )
+    cargo = Subquery(asientos.annotate(s=Sum("cargo")).values("s"), output_field=IMPORTE)
+    abono = Subquery(asientos.annotate(s=Sum("abono")).values("s"), output_field=IMPORTE)
+    for i in range(0, len(unidad_ids), batch_size):
+        chunk = unidad_ids[i:i + batch_size]
+        actualizados = UnidadSaldo.objects.filter(unidad_id__in=chunk).update(
+            total_cargado=Round(F("total_cargado") + cargo, 2),
+            total_abonado=Round(F("total_abonado") + abono, 2),
+            saldo=Round(F("saldo") + cargo - abono, 2),
+            version=F("version") + 1,
+            updated_at=timezone.now(),
+        )
+        if actualizados < len(chunk):
+            con_fila = set(UnidadSaldo.objects.filter(unidad_id__in=chunk).values_list("unidad_id", flat=True))
+            reconstruir_saldos([u for u in chunk if u not in con_fila])
+
+
+# ---------------------------
+# Reconstrucción / verificación
+# ---------------------------
+
+def _sumas_libro(unidad_ids):
+    filas = (
+        MovimientoCuenta.objects.filter(unidad_id__in=unidad_ids)
+        .values("unidad_id").annotate(c=Sum("cargo"), a=Sum("abono")).order_by()
+    )
+    return {r["unidad_id"]: (_q(r["c"]), _q(r["a"])) for r in filas}
+
+
+def _sumas_cuotas(unidad_ids):
+    filas = (
+        Cuota.objects.filter(unidad_id__in=unidad_ids)
+        .values("unidad_id").annotate(c=Sum("total_a_pagar"), a=Sum("pagado")).order_by()
+    )
+    return {r["unidad_id"]: (_q(r["c"]), _q(r["a"])) for r in filas}
+
+
+def _todas_las_unidades():
+    return list(Unidad.objects.order_by("id").values_list("id", flat=True))
+
+
+def reconstruir_saldos(unidad_ids=None, batch_size=2000):
+    """Reescribe UnidadSaldo con la suma del libro (todas las unidades si no se indican)."""
+    ids = sorted(unidad_ids) if unidad_ids is not None else _todas_las_unidades()
+    for i in range(0, len(ids), batch_size):
+        chunk = ids[i:i + batch_size]
+        libro = _sumas_libro(chunk)
+        filas = []
+        for u in chunk:
+            c, a = libro.get(u, (CERO, CERO))
+            filas.append(UnidadSaldo(unidad_id=u, total_cargado=c, total_abonado=a, saldo=c - a))
+        UnidadSaldo.objects.bulk_create(
+            filas, update_conflicts=True, unique_fields=["unidad"],
+            update_fields=["total_cargado", "total_abonado", "saldo", "updated_at"],
+        )
+        tocar_unidades(chunk)
+    return len(ids)
+
+
+def tocar_unidades(unidad_ids, batch_size=BATCH_SIZE):
+    """Sube la versión de las unidades (invalida su estado de cuenta en cache)."""
+    ids = list(unidad_ids)
+    for i in range(0, len(ids), batch_size):
+        UnidadSaldo.objects.filter(unidad_id__in=ids[i:i + batch_size]).update(version=F("version") + 1)
+
+
+def diferencias(batch_size=2000):
+    """
+    Recorre las unidades comparando saldo materializado, libro y cuotas.
+    Devuelve dicts de las que no cuadran: {"unidad_id", "saldo", "libro", "cuotas"}
+    con tuplas (cargado, abonado); "saldo" es None si la unidad no tiene fila.
+    """
+    ids = _todas_las_unidades()
+    out = []
+    for i in range(0, len(ids), batch_size):
+        chunk = ids[i:i + batch_size]
+        libro = _sumas_libro(chunk)
+        cuotas = _sumas_cuotas(chunk)
+        saldos = {
+            s.unidad_id: (_q(s.total_cargado), _q(s.total_abonado), _q(s.saldo))
+            for s in UnidadSaldo.objects.filter(unidad_id__in=chunk)
+        }
+        for u in chunk:
+            l = libro.get(u, (CERO, CERO))
+            c = cuotas.get(u, (CERO, CERO))
+            s = saldos.get(u)
+            if s is None or s != (l[0], l[1], l[0] - l[1]) or l != c:
+                out.append({"unidad_id": u, "saldo": s, "libro": l, "cuotas": c})
+    return out
+
+
+def obtener_saldo(unidad_id) -> UnidadSaldo:
+    saldo = UnidadSaldo.objects.filter(unidad_id=unidad_id).first()
+    if saldo is None:
+        reconstruir_saldos([unidad_id])
+        saldo = UnidadSaldo.objects.get(unidad_id=unidad_id)
+    return saldo
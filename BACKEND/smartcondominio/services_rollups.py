@@ -0,0 +1,273 @@
+# services_rollups.py
+"""
+Cubos pre-agregados de la bitácora de garita (AccessRollupHora): conteos por
+cámara × dirección × decisión × hora, para los mapas de calor de gerencia.
+
+- compactar(): suma a los rollups los AccessEvent nuevos, por rangos de id desde la
+  marca (RollupMarca). No toca la transacción de la garita; corre en
+  `manage.py compactar_rollups` (cron o --cada N). Se detiene antes del primer evento
+  de los últimos ROLLUP_DEMORA_S, así no se salta ids de transacciones aún sin commit.
+- reconstruir(): rehace un rango de horas desde AccessEvent + AccessEventArchivo
+  (`manage.py reconstruir_rollups`), una transacción por ventana: el compactador sigue
+  corriendo entre ventanas. Las horas cuyos eventos ya salieron de la BD por retención no
+  se tocan.
+- consultar(): lo que sirve /api/access/analytics/. Lee los rollups del rango y suma
+  en vivo la cola aún no compactada de los últimos ROLLUP_VIVO_MAX_S (id > marca, pocos
+  minutos de eventos). Si el compactador quedó más atrás (recién instalado, cron caído)
+  no agrupa la bitácora: lo informa con al_dia=False.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import AccessEvent, AccessEventArchivo, AccessRollupHora, RollupMarca
+
+MARCA = "access_hora"
+CLAVE = ("hora", "camera_id", "direction", "decision")
+MEDIDAS = ("eventos", "abiertos", "score_suma", "score_n")
+BATCH_SIZE = 2000
+
+# ?agrupar= de la API: columnas del cubo o derivadas de la hora
+DIMENSIONES = {
+    "camera_id": None,
+    "direction": None,
+    "decision": None,
+    "hora": None,
+    "dia": lambda: TruncDate("hora"),
+    "hora_del_dia": lambda: ExtractHour("hora"),
+    "dia_semana": lambda: ExtractIsoWeekDay("hora"),   # 1 = lunes
+}
+
+
+def _demora():
+    return timedelta(seconds=getattr(settings, "ROLLUP_DEMORA_S", 60))
+
+
+def _vivo_max():
+    return timedelta(seconds=getattr(settings, "ROLLUP_VIVO_MAX_S", 900))
+
+
+def _agregar_crudos(qs):
+    """GROUP BY de eventos crudos a celdas del cubo: {clave: [eventos, abiertos, score_suma, score_n]}."""
+    filas = (
+        qs.annotate(hora=TruncHour("created_at"))
+        .values(*CLAVE)
+        .annotate(
+            eventos=Count("id"),
+            abiertos=Count("id", filter=Q(opened=True)),
+            score_suma=Sum("score"),
+            score_n=Count("score"),
+        )
+        .order_by()
+    )
+    return {tuple(f[c] for c in CLAVE): [f[m] or 0 for m in MEDIDAS] for f in filas}
+
+
+def _sumar(destino, origen):
+    for clave, medidas in origen.items():
+        actual = destino.setdefault(clave, [0, 0, 0, 0])
+        for i, v in enumerate(medidas):
+            actual[i] += v
+    return destino
+
+
+def _celdas(grupos):
+    return [AccessRollupHora(**dict(zip(CLAVE, clave)), **dict(zip(MEDIDAS, medidas))) for clave, medidas in grupos.items()]
+
+
+def _marca_bloqueada():
+    """Fila de la marca con FOR UPDATE: un solo compactador/reconstrucción a la vez."""
+    RollupMarca.objects.get_or_create(nombre=MARCA)
+    return RollupMarca.objects.select_for_update().get(nombre=MARCA)
+
+
+def _tope():
+    """
+    Hasta qué id se puede compactar: el anterior al primer evento de los últimos
+    ROLLUP_DEMORA_S (rango corto del índice created_at, id), o el último id si no hay
+    recientes. Los ids menores se asignaron antes y sus transacciones ya cerraron.
+    """
+    reciente = (
+        AccessEvent.objects.filter(created_at__gte=timezone.now() - _demora())
+        .aggregate(m=Min("id"))["m"]
+    )
+    if reciente is not None:
+        return reciente - 1
+    return AccessEvent.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+# ---------------------------
+# Compactación incremental
+# ---------------------------
+def _fusionar(grupos):
+    """Suma `grupos` a las celdas existentes (se llama con la marca bloqueada: nadie más escribe)."""
+    if not grupos:
+        return 0
+    horas = [c[0] for c in grupos]
+    existentes = AccessRollupHora.objects.filter(hora__gte=min(horas), hora__lte=max(horas))
+    actuales = {
+        tuple(f[c] for c in CLAVE): [f[m] for m in MEDIDAS]
+        for f in existentes.values(*CLAVE, *MEDIDAS).iterator(chunk_size=BATCH_SIZE)
+        if tuple(f[c] for c in CLAVE) in grupos
+    }
+    _sumar(actuales, grupos)
+    AccessRollupHora.objects.bulk_create(
+        _celdas(actuales), batch_size=BATCH_SIZE, update_conflicts=True,
+        unique_fields=list(CLAVE), update_fields=list(MEDIDAS),
+    )
+    return len(grupos)
+
+
+def compactar(lote=50_000):
+    """
+    Suma a los rollups los eventos con id > marca, de a `lote` ids por transacción
+    (se puede cortar y volver a correr). Devuelve {"eventos", "celdas", "ultimo_id"}.
+    """
+    tope = _tope()
+    eventos = celdas = 0
+    while True:
+        with transaction.atomic():
+            marca = _marca_bloqueada()
+            desde = marca.ultimo_id
+            if desde >= tope:
+                return {"eventos": eventos, "celdas": celdas, "ultimo_id": desde}
+            pendientes = AccessEvent.objects.filter(id__gt=desde, id__lte=tope).order_by("id")
+            hasta = pendientes.values_list("id", flat=True)[lote - 1:lote].first() or tope
+            grupos = _agregar_crudos(AccessEvent.objects.filter(id__gt=desde, id__lte=hasta))
+            eventos += sum(m[0] for m in grupos.values())
+            celdas += _fusionar(grupos)
+            marca.ultimo_id = hasta
+            marca.save(update_fields=["ultimo_id", "updated_at"])
+
+
+# ---------------------------
+# Reconstrucción
+# ---------------------------
+def _a_hora(dt, arriba=False):
+    base = dt.replace(minute=0, second=0, microsecond=0)
+    return base + timedelta(hours=1) if arriba and base != dt else base
+
+
+def _primer_evento():
+    fechas = [m.objects.aggregate(t=Min("created_at"))["t"] for m in (AccessEvent, AccessEventArchivo)]
+    fechas = [f for f in fechas if f]
+    return min(fechas) if fechas else None
+
+
+def reconstruir(desde=None, hasta=None, ventana_dias=31):
+    """
+    Rehace los rollups de [desde, hasta) (redondeado a horas) desde los eventos crudos, una
+    transacción por `ventana_dias`. Cada ventana bloquea la marca solo mientras se rehace y
+    cuenta los eventos hasta la marca de ese momento: queda igual que lo incremental y lo
+    posterior lo suma compactar(). Sin desde: desde el primer evento que queda en la BD (lo
+    anterior se conserva). Sin ninguno de los dos: reconstrucción completa, que al final
+    compacta lo pendiente (la marca queda al día).
+    Devuelve {"desde", "hasta", "eventos", "celdas", "ultimo_id"}.
+    """
+    completa = desde is None and hasta is None
+    eventos = celdas = 0
+    desde = desde or _primer_evento()
+    hasta = hasta or timezone.now()
+    if desde is not None:
+        desde, hasta = _a_hora(desde), _a_hora(hasta, arriba=True)
+        inicio = desde
+        while inicio < hasta:
+            fin = min(inicio + timedelta(days=ventana_dias), hasta)
+            rango = {"created_at__gte": inicio, "created_at__lt": fin}
+            with transaction.atomic():
+                tope = _marca_bloqueada().ultimo_id
+                # los archivados ya no vuelven a AccessEvent: cuentan aunque su id pase la marca
+                grupos = _sumar(
+                    _agregar_crudos(AccessEvent.objects.filter(id__lte=tope, **rango)),
+                    _agregar_crudos(AccessEventArchivo.objects.filter(**rango)),
+                )
+                AccessRollupHora.objects.filter(hora__gte=inicio, hora__lt=fin).delete()
+                AccessRollupHora.objects.bulk_create(_celdas(grupos), batch_size=BATCH_SIZE)
+            eventos += sum(m[0] for m in grupos.values())
+            celdas += len(grupos)
+            inicio = fin
+    if completa:
+        ultimo_id = compactar()["ultimo_id"]
+    else:
+        ultimo_id = RollupMarca.objects.filter(nombre=MARCA).values_list("ultimo_id", flat=True).first() or 0
+    return {"desde": desde, "hasta": hasta, "eventos": eventos, "celdas": celdas, "ultimo_id": ultimo_id}
+
+
+# ---------------------------
+# Consulta
+# ---------------------------
+def _agrupado(qs, agrupar, medidas):
+    """{dimensiones: [eventos, abiertos, score_suma, score_n]}; sin dimensiones, un solo total."""
+    if not agrupar:
+        filas = [qs.aggregate(**medidas)]
+    else:
+        derivadas = {d: DIMENSIONES[d]() for d in agrupar if DIMENSIONES[d]}
+        filas = qs.annotate(**derivadas).values(*agrupar).annotate(**medidas).order_by()
+    return {tuple(f[d] for d in agrupar): [f[m] or 0 for m in MEDIDAS] for f in filas if f["eventos"]}
+
+
+def consultar(desde, hasta, agrupar=(), camera_id=None, direction=None, decision=None, recientes=True):
+    """
+    Conteos de [desde, hasta) agrupados por `agrupar` (claves de DIMENSIONES). El rango se
+    amplía a horas completas (la resolución del cubo), igual para los rollups y para la cola
+    en vivo. Devuelve (filas, totales, estado): cada fila trae las dimensiones más eventos,
+    abiertos y score_promedio. La cola sin compactar se suma en vivo solo dentro de los
+    últimos ROLLUP_VIVO_MAX_S (acotada por el índice created_at, id: nunca un GROUP BY de
+    toda la bitácora). estado = {"pendientes": sumados en vivo, "al_dia": False si el
+    compactador quedó más atrás que eso, "sin_compactar_desde": primer evento sin compactar}.
+    """
+    agrupar = list(agrupar)
+    filtros = Q()
+    if camera_id:
+        filtros &= Q(camera_id__iexact=camera_id)
+    if direction:
+        filtros &= Q(direction__iexact=direction)
+    if decision:
+        filtros &= Q(decision__iexact=decision)
+
+    desde = _a_hora(desde) if desde else None
+    hasta = _a_hora(hasta, arriba=True) if hasta else None
+    rollups = AccessRollupHora.objects.filter(filtros)
+    if desde:
+        rollups = rollups.filter(hora__gte=desde)
+    if hasta:
+        rollups = rollups.filter(hora__lt=hasta)
+    grupos = _agrupado(rollups, agrupar, {m: Sum(m) for m in MEDIDAS})
+
+    estado = {"pendientes": 0, "al_dia": True, "sin_compactar_desde": None}
+    if recientes:
+        marca = RollupMarca.objects.filter(nombre=MARCA).values_list("ultimo_id", flat=True).first() or 0
+        corte = timezone.now() - _vivo_max()
+        # por PK: el primer evento que los rollups todavía no tienen
+        primero = AccessEvent.objects.filter(id__gt=marca).order_by("id").values_list("created_at", flat=True).first()
+        estado["sin_compactar_desde"] = primero
+        estado["al_dia"] = primero is None or primero >= corte
+        cola = AccessEvent.objects.filter(filtros, id__gt=marca, created_at__gte=corte)
+        if desde:
+            cola = cola.filter(created_at__gte=desde)
+        if hasta:
+            cola = cola.filter(created_at__lt=hasta)
+        vivos = _agrupado(cola.annotate(hora=TruncHour("created_at")), agrupar, {
+            "eventos": Count("id"), "abiertos": Count("id", filter=Q(opened=True)),
+            "score_suma": Sum("score"), "score_n": Count("score"),
+        })
+        estado["pendientes"] = sum(m[0] for m in vivos.values())
+        _sumar(grupos, vivos)
+
+    def fila(dims, medidas):
+        eventos, abiertos, score_suma, score_n = medidas
+        return {
+            **dict(zip(agrupar, dims)),
+            "eventos": eventos,
+            "abiertos": abiertos,
+            "score_promedio": round(score_suma / score_n, 4) if score_n else None,
+        }
+
+    orden = sorted(grupos, key=lambda k: tuple((v is None, v if v is not None else "") for v in k))
+    filas = [fila(k, grupos[k]) for k in orden]
+    total = [sum(g[i] for g in grupos.values()) for i in range(len(MEDIDAS))]
+    return filas, fila((), total), estado
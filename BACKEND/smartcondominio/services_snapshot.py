@@ -1,7 +1,12 @@
 # services_snapshot.py
+import asyncio
+import weakref
+
 import requests
 from django.conf import settings
 
+from .circuit import circuito
+
 SNAPSHOT_URL = "https://api.platerecognizer.com/v1/plate-reader/"
 
 def _normalize_regions(regions):
@@ -11,22 +16,110 @@ def _normalize_regions(regions):
         return [str(r).strip() for r in regions if str(r).strip()]
     return [r.strip() for r in str(regions).split(",") if r.strip()]
 
+def _url():
+    return getattr(settings, "PLATE_RECOG_URL", None) or SNAPSHOT_URL
+
+def _form(regions, camera_id):
+    data = []
+    for r in _normalize_regions(regions or settings.PLATE_REGIONS):
+        data.append(("regions", r))
+    if camera_id:
+        data.append(("camera_id", camera_id))
+    return data
+
+def _headers():
+    # sin token no se manda el header (httpx rechaza "Token " con el valor vacío)
+    token = getattr(settings, "PLATE_RECOG_TOKEN", "")
+    return {"Authorization": f"Token {token}"} if token else {}
+
+def _timeouts(timeout):
+    if timeout is None:
+        timeout = getattr(settings, "PLATE_RECOG_TIMEOUT", 4.0)
+    return min(timeout, getattr(settings, "PLATE_RECOG_CONNECT_TIMEOUT", 2.0)), timeout
+
+def _falla_del_servicio(e) -> bool:
+    """Para el circuit breaker: red, timeouts, 5xx y 429 cuentan; un 4xx es problema del pedido."""
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return e.response.status_code >= 500 or e.response.status_code == 429
+    return isinstance(e, requests.RequestException)
+
+def _falla_del_servicio_async(e) -> bool:
+    """Lo mismo con los errores de httpx (cliente async)."""
+    import httpx
+
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500 or e.response.status_code == 429
+    return isinstance(e, httpx.TransportError)
+
+# Un httpx.AsyncClient (pool keep-alive) por event loop: uvicorn usa un loop por worker,
+# pero async_to_sync (vista async servida por WSGI, tests) crea uno por llamada
+_clientes_async = weakref.WeakKeyDictionary()
+
+def _cliente_async():
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    cliente = _clientes_async.get(loop)
+    if cliente is None:
+        maximo = int(getattr(settings, "PLATE_RECOG_MAX_CONEXIONES", 20))
+        cliente = _clientes_async[loop] = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=maximo, max_keepalive_connections=maximo),
+        )
+    return cliente
+
 class PlateRecognizerSnapshot:
     @staticmethod
-    def read_image(fileobj, regions=None, camera_id=None, timeout=12):
-        headers = {"Authorization": f"Token {settings.PLATE_RECOG_TOKEN}"}
-        data = []
-        for r in _normalize_regions(regions or settings.PLATE_REGIONS):
-            data.append(("regions", r))
-        if camera_id:
-            data.append(("camera_id", camera_id))
+    def read_image(fileobj, regions=None, camera_id=None, timeout=None):
+        """
+        OCR de la placa. Pasa por el circuit breaker "platerecognizer": con el servicio
+        caído levanta CircuitoAbierto al instante en lugar de esperar el timeout.
+        """
+        return circuito("platerecognizer").llamar(
+            PlateRecognizerSnapshot._post, fileobj, regions, camera_id, timeout,
+            es_fallo=_falla_del_servicio,
+        )
 
+    @staticmethod
+    def _post(fileobj, regions, camera_id, timeout):
         resp = requests.post(
-            SNAPSHOT_URL,
-            headers=headers,
+            _url(),
+            headers=_headers(),
             files={"upload": fileobj},
-            data=data,  # lista de tuplas => múltiples 'regions'
-            timeout=timeout,
+            data=_form(regions, camera_id),  # lista de tuplas => múltiples 'regions'
+            timeout=_timeouts(timeout),
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    @staticmethod
+    async def aread_image(fileobj, regions=None, camera_id=None, timeout=None):
+        """
+        read_image() para las vistas async: httpx.AsyncClient, así el worker sigue
+        atendiendo otras cámaras mientras espera al OCR. Mismo circuit breaker.
+        """
+        return await circuito("platerecognizer").allamar(
+            PlateRecognizerSnapshot._apost, fileobj, regions, camera_id, timeout,
+            es_fallo=_falla_del_servicio_async,
+        )
+
+    @staticmethod
+    async def _apost(fileobj, regions, camera_id, timeout):
+        import httpx
+
+        # el archivo ya está en memoria (o en un temporal chico): leerlo no bloquea el loop
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(0)
+        upload = (getattr(fileobj, "name", None) or "upload.jpg", fileobj.read())
+        data = {}
+        for k, v in _form(regions, camera_id):
+            data.setdefault(k, []).append(v)
+        conexion, lectura = _timeouts(timeout)
+        resp = await _cliente_async().post(
+            _url(),
+            headers=_headers(),
+            files={"upload": upload},
+            data=data,
+            timeout=httpx.Timeout(lectura, connect=conexion),
         )
         resp.raise_for_status()
         return resp.json()
@@ -37,3 +130,64 @@ def best_plate_from_result(payload: dict):
         return "", None
     best = results[0]
     return (best.get("plate") or "").upper(), best.get("score")
+
+def plate_candidates_from_result(payload: dict):
+    """
+    Todas las lecturas del payload (cada resultado y sus 'candidates') como
+    [(PLACA, score), ...], sin repetidas (queda el mayor score) y de mayor a menor score.
+    """
+    mejores = {}
+    for res in (payload or {}).get("results", []) or []:
+        lecturas = [res] + list(res.get("candidates") or [])
+        for c in lecturas:
+            placa = (c.get("plate") or "").upper().replace(" ", "")
+            if not placa:
+                continue
+            score = c.get("score")
+            score = float(score) if score is not None else 0.0
+            if score > mejores.get(placa, -1.0):
+                mejores[placa] = score
+    return sorted(mejores.items(), key=lambda x: -x[1])
+
+# ---------------------------
+# Modo degradado (OCR caído)
+# ---------------------------
+def decision_degradada(plate_hint, now=None):
+    """
+    Con el OCR caído (error o circuito abierto) y PLATE_DEGRADED_MODE="recientes": si el
+    guardia (o un lector local) manda `plate_hint`, se deja pasar la placa solo si sigue
+    autorizada Y tuvo un ALLOW_* en las últimas PLATE_DEGRADED_HORAS horas.
+    Devuelve (decision, reason, vehiculo_id, visit_id, evento_previo_id) o None (= ERROR_OCR).
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+    from .models import AccessEvent
+    from .plate_index import buscar_autorizacion, normalizar_placa
+
+    if (getattr(settings, "PLATE_DEGRADED_MODE", "deny") or "deny").lower() != "recientes":
+        return None
+    placa = normalizar_placa(plate_hint or "")
+    if not placa:
+        return None
+    now = now or timezone.now()
+    previo = (
+        AccessEvent.objects.filter(
+            plate_norm=placa,
+            decision__in=("ALLOW_RESIDENT", "ALLOW_VISIT"),
+            created_at__gte=now - timedelta(hours=getattr(settings, "PLATE_DEGRADED_HORAS", 24)),
+        )
+        .order_by("-created_at")
+        .values_list("id", "created_at")
+        .first()
+    )
+    if previo is None:
+        return None
+    veh_id, propietario_id, visit_id = buscar_autorizacion(placa, now)
+    if not (veh_id or visit_id):
+        return None
+    visto = timezone.localtime(previo[1]).strftime("%d/%m %H:%M")
+    if veh_id:
+        return ("ALLOW_RESIDENT", f"Modo degradado (OCR no disponible): vehículo de usuario {propietario_id}, "
+                f"visto autorizado el {visto}.", veh_id, None, previo[0])
+    return ("ALLOW_VISIT", f"Modo degradado (OCR no disponible): visita id={visit_id}, "
+            f"vista autorizada el {visto}.", None, visit_id, previo[0])
@@ -0,0 +1,387 @@
+# smartcondominio/stream_garita.py
+"""
+Canal en vivo de la bitácora de garita para las consolas de guardia: cada AccessEvent /
+FaceAccessEvent nuevo sale por Server-Sent Events (GateEventStreamView, views_async.py) en
+cuanto se confirma su transacción, en vez de que cada consola consulte la lista cada pocos
+segundos.
+
+- Publicación: señal post_save (como plate_index). En Postgres, pg_notify() dentro de la
+  misma transacción: Postgres lo entrega al confirmar y a todos los procesos; cada proceso
+  con consolas conectadas escucha con LISTEN en un hilo propio y lo pasa a su hub. Con otras
+  bases (SQLite, runserver) se publica con on_commit en el hub del proceso que escribe: una
+  consola solo ve lo que escribe su mismo proceso (un solo worker, o nada de lo de otros).
+- Hub (uno por proceso): backlog acotado (GATE_STREAM_BACKLOG) con número de secuencia. Las
+  consolas (asyncio) se despiertan al publicar y leen del backlog lo que no vieron: una
+  consola lenta no frena a las demás; si el backlog la deja atrás recibe "desfase" (recargar
+  la lista por la API).
+- Reanudar: el id de cada mensaje es "<id access>.<id face>.<hub>.<seq>" (mayores ids vistos
+  y posición en el backlog del proceso). Al reconectar (Last-Event-ID, o ?last_id=) al mismo
+  proceso y con la posición todavía en el backlog, se sigue por seq: orden de commit, sin
+  huecos. Si no (otro worker, reinicio, corte largo), desde la BD por id, repitiendo los
+  últimos GATE_STREAM_VENTANA_IDS por debajo de la marca: los ids se toman al INSERT pero se
+  ven al COMMIT, y uno menor puede confirmarse después de uno mayor. Hasta
+  GATE_STREAM_BACKLOG filas por tabla (si había más, "desfase" como arriba). Puede repetir
+  eventos ya vistos: la consola descarta por id.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+
+log = logging.getLogger(__name__)
+
+TIPOS = ("access", "face")
+CANAL = "garita_eventos"
+_NOTIFY_MAX = 7900   # pg_notify admite hasta 8000 bytes
+
+
+def _modelo(tipo):
+    from .models import AccessEvent, FaceAccessEvent
+    return AccessEvent if tipo == "access" else FaceAccessEvent
+
+
+# ---------------------------
+# Mensajes
+# ---------------------------
+@dataclass(frozen=True)
+class Mensaje:
+    seq: int
+    tipo: str
+    id: int
+    camera_id: str
+    direction: str
+    texto: str   # JSON ya serializado (como la lista de la API): se arma una vez por evento
+
+
+def serializar(tipo, obj) -> str:
+    """El evento como en la lista de la API (payload resumido)."""
+    from rest_framework.renderers import JSONRenderer
+    from .serializers import AccessEventSerializer, FaceAccessEventSerializer
+
+    ser = AccessEventSerializer if tipo == "access" else FaceAccessEventSerializer
+    return JSONRenderer().render(ser(obj, context={"solo_resumen": True}).data).decode()
+
+
+@dataclass
+class Filtro:
+    tipos: tuple = TIPOS
+    camaras: frozenset = frozenset()   # en mayúsculas (camera_id__iexact, como la lista)
+    direction: str = ""
+
+    @classmethod
+    def desde_query(cls, params) -> "Filtro":
+        """?tipo=access|face  ?camera_id=gate-1[,gate-2]  ?direction=ENTRADA|SALIDA"""
+        tipo = (params.get("tipo") or "").strip().lower()
+        camaras = {c.strip().upper() for c in (params.get("camera_id") or "").split(",") if c.strip()}
+        return cls(
+            tipos=(tipo,) if tipo in TIPOS else TIPOS,
+            camaras=frozenset(camaras),
+            direction=(params.get("direction") or "").strip().upper(),
+        )
+
+    def acepta(self, m: Mensaje) -> bool:
+        if m.tipo not in self.tipos:
+            return False
+        if self.camaras and m.camera_id.upper() not in self.camaras:
+            return False
+        return not self.direction or m.direction.upper() == self.direction
+
+    def queryset(self, tipo):
+        qs = _modelo(tipo).objects.all()
+        if self.camaras:
+            q = Q()
+            for c in self.camaras:
+                q |= Q(camera_id__iexact=c)
+            qs = qs.filter(q)
+        if self.direction:
+            qs = qs.filter(direction__iexact=self.direction)
+        return qs
+
+
+# ---------------------------
+# Hub (por proceso)
+# ---------------------------
+class Suscripcion:
+    def __init__(self, hub, seq):
+        self.hub = hub
+        self.seq = seq
+        self.loop = asyncio.get_running_loop()
+        self.evento = asyncio.Event()
+
+    async def esperar(self, timeout):
+        """True si hay algo nuevo, False si pasó `timeout` (latido)."""
+        try:
+            await asyncio.wait_for(self.evento.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.evento.clear()
+        return True
+
+    def cerrar(self):
+        self.hub._quitar(self)
+
+
+@dataclass
+class Hub:
+    maximo: int | None = None   # None: GATE_STREAM_BACKLOG (se lee en cada uso)
+    epoca: str = field(default_factory=lambda: uuid.uuid4().hex[:8])   # distingue este hub (proceso) en los ids
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    _backlog: deque = field(default_factory=deque)
+    _claves: set = field(default_factory=set)
+    _seq: int = 0
+    _suscriptores: set = field(default_factory=set)
+
+    def publicar(self, tipo, id, camera_id, direction, texto) -> bool:
+        """Agrega al backlog y despierta a las consolas. False si ya estaba (NOTIFY + on_commit, reintentos)."""
+        with self._lock:
+            if (tipo, id) in self._claves:
+                return False
+            self._seq += 1
+            self._backlog.append(Mensaje(self._seq, tipo, id, camera_id or "", direction or "", texto))
+            self._claves.add((tipo, id))
+            maximo = self.limite()
+            while len(self._backlog) > maximo:
+                viejo = self._backlog.popleft()
+                self._claves.discard((viejo.tipo, viejo.id))
+            suscriptores = list(self._suscriptores)
+        for s in suscriptores:
+            try:
+                s.loop.call_soon_threadsafe(s.evento.set)
+            except RuntimeError:   # loop cerrado: la conexión ya se fue
+                self._quitar(s)
+        return True
+
+    def limite(self) -> int:
+        """Tamaño del backlog; también es el tope de filas al reanudar desde la BD."""
+        return self.maximo if self.maximo is not None else int(getattr(settings, "GATE_STREAM_BACKLOG", 1000))
+
+    def suscribir(self) -> Suscripcion:
+        """Desde el event loop de la consola. Lo publicado a partir de ahora le llega por desde()."""
+        _asegurar_listener()
+        with self._lock:
+            s = Suscripcion(self, self._seq)
+            self._suscriptores.add(s)
+        return s
+
+    def _quitar(self, s):
+        with self._lock:
+            self._suscriptores.discard(s)
+
+    def desde(self, seq) -> tuple[list, bool]:
+        """(mensajes con seq > `seq`, desfase): desfase si alguno ya salió del backlog."""
+        with self._lock:
+            if not self._backlog:
+                return [], False
+            primero = self._backlog[0].seq
+            desfase = seq + 1 < primero
+            inicio = max(0, seq + 1 - primero)
+            return [self._backlog[i] for i in range(inicio, len(self._backlog))], desfase
+
+    def retoma(self, epoca, seq) -> bool:
+        """¿Se puede seguir desde `seq` por el backlog? (mismo hub y nada posterior perdido)"""
+        with self._lock:
+            if epoca != self.epoca or seq > self._seq:
+                return False
+            return not self._backlog or seq + 1 >= self._backlog[0].seq
+
+    @property
+    def suscriptores(self) -> int:
+        return len(self._suscriptores)
+
+
+hub = Hub()
+
+
+# ---------------------------
+# Publicación (señales)
+# ---------------------------
+def _usa_notify(conn) -> bool:
+    return conn.vendor == "postgresql"
+
+
+def _publicar_local(tipo, instance):
+    hub.publicar(tipo, instance.pk, instance.camera_id, instance.direction, serializar(tipo, instance))
+
+
+def _on_evento_save(sender, instance, created=False, raw=False, **kwargs):
+    if not created or raw or not getattr(settings, "GATE_STREAM_ACTIVO", True):
+        return
+    tipo = "access" if sender is _modelo("access") else "face"
+    if not _usa_notify(connection):
+        transaction.on_commit(lambda: _publicar_local(tipo, instance))
+        return
+    msg = {"t": tipo, "id": instance.pk, "c": instance.camera_id or "", "d": instance.direction or "",
+           "x": serializar(tipo, instance)}
+    texto = json.dumps(msg, separators=(",", ":"))
+    if len(texto.encode()) > _NOTIFY_MAX:
+        del msg["x"]   # el que escucha lo lee de la BD
+        texto = json.dumps(msg, separators=(",", ":"))
+    # dentro de la transacción del INSERT: Postgres lo entrega solo si se confirma
+    with connection.cursor() as cur:
+        cur.execute("SELECT pg_notify(%s, %s)", [CANAL, texto])
+
+
+def conectar_senales():
+    for modelo in ("smartcondominio.AccessEvent", "smartcondominio.FaceAccessEvent"):
+        post_save.connect(_on_evento_save, sender=modelo, dispatch_uid=f"stream_garita_{modelo}")
+
+
+# ---------------------------
+# LISTEN (Postgres, un hilo por proceso)
+# ---------------------------
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _recibir(texto):
+    msg = json.loads(texto)
+    tipo, id_ = msg["t"], msg["id"]
+    cuerpo = msg.get("x")
+    if cuerpo is None:
+        obj = _modelo(tipo).objects.defer("payload").filter(pk=id_).first()
+        if obj is None:
+            return
+        cuerpo = serializar(tipo, obj)
+    hub.publicar(tipo, id_, msg.get("c", ""), msg.get("d", ""), cuerpo)
+
+
+def _escuchar():
+    """LISTEN en una conexión propia (fuera del pool de Django y de pgbouncer en modo transacción)."""
+    while True:
+        wrapper = connections.create_connection("default")
+        try:
+            wrapper.ensure_connection()
+            conn = wrapper.connection
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CANAL}")
+            while True:
+                if callable(getattr(conn, "notifies", None)):   # psycopg 3
+                    for n in conn.notifies(timeout=30):
+                        _recibir(n.payload)
+                    continue
+                if select.select([conn], [], [], 30) == ([], [], []):   # psycopg2
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    _recibir(conn.notifies.pop(0).payload)
+        except Exception:
+            log.exception("stream_garita: LISTEN caído, reintento en 5 s")
+            time.sleep(5)
+        finally:
+            try:
+                wrapper.close()
+            except Exception:
+                pass
+            connections.close_all()
+
+
+def _asegurar_listener():
+    global _listener
+    if not _usa_notify(connections["default"]) or _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = threading.Thread(target=_escuchar, name="garita-listen", daemon=True)
+            _listener.start()
+
+
+# ---------------------------
+# SSE
+# ---------------------------
+def leer_marcas(texto):
+    """
+    "120.45.<hub>.<seq>" -> {"access": 120, "face": 45, "hub": ("<hub>", seq)}; "120.45" (sin
+    posición en el backlog) -> solo los ids. None si no viene o no se entiende.
+    """
+    partes = (texto or "").strip().split(".")
+    if len(partes) not in (2, 4):
+        return None
+    try:
+        marcas = {"access": int(partes[0]), "face": int(partes[1])}
+        if len(partes) == 4:
+            marcas["hub"] = (partes[2], int(partes[3]))
+    except ValueError:
+        return None
+    return marcas
+
+
+def _ultimos_ids() -> dict:
+    return {t: _modelo(t).objects.order_by("-id").values_list("id", flat=True).first() or 0 for t in TIPOS}
+
+
+def _de_la_bd(filtro, tipo, marca) -> tuple[list, bool]:
+    """
+    (eventos de `tipo` posteriores a `marca`, truncado) para reanudar sin el backlog. Arranca
+    GATE_STREAM_VENTANA_IDS por debajo de la marca (commits fuera de orden de id). Trae hasta
+    hub.limite(); truncado=True si había más (la consola recibe "desfase").
+    """
+    rel = ("matched_user", "triggered_by") if tipo == "face" else ()
+    desde = max(0, marca - int(getattr(settings, "GATE_STREAM_VENTANA_IDS", 200)))
+    qs = filtro.queryset(tipo).filter(pk__gt=desde).defer("payload").select_related(*rel).order_by("pk")
+    limite = hub.limite()
+    filas = list(qs[:limite + 1])
+    return [
+        Mensaje(0, tipo, obj.pk, obj.camera_id or "", obj.direction or "", serializar(tipo, obj))
+        for obj in filas[:limite]
+    ], len(filas) > limite
+
+
+def _sse(m: Mensaje, marcas) -> str:
+    marcas[m.tipo] = max(marcas[m.tipo], m.id)
+    # lo que viene de la BD (seq 0) no lleva posición: reanudar desde ahí vuelve a la BD
+    posicion = f".{hub.epoca}.{m.seq}" if m.seq else ""
+    return f"id: {marcas['access']}.{marcas['face']}{posicion}\nevent: {m.tipo}\ndata: {m.texto}\n\n"
+
+
+async def eventos(filtro: Filtro, marcas=None):
+    """
+    Generador async de texto SSE para una consola. `marcas`: lo último que vio (reanudar) o
+    None para empezar desde ahora. Termina cuando Django lo cancela (la consola se desconecta).
+    """
+    latido = float(getattr(settings, "GATE_STREAM_HEARTBEAT_S", 15))
+    sus = hub.suscribir()
+    try:
+        yield f"retry: {int(getattr(settings, 'GATE_STREAM_RETRY_MS', 3000))}\n\n"
+        vistos = set()
+        if marcas is None:
+            marcas = await sync_to_async(_ultimos_ids)()
+        elif marcas.get("hub") and hub.retoma(*marcas["hub"]):
+            sus.seq = marcas["hub"][1]   # el resto sale del backlog, en orden de commit
+            marcas = {t: marcas[t] for t in TIPOS}
+        else:
+            marcas = {t: marcas[t] for t in TIPOS}
+            # lo confirmado hasta la consulta viene de la BD; lo posterior, del hub (seq > sus.seq)
+            for tipo in filtro.tipos:
+                faltan, truncado = await sync_to_async(_de_la_bd)(filtro, tipo, marcas[tipo])
+                for m in faltan:
+                    vistos.add((m.tipo, m.id))
+                    if filtro.acepta(m):
+                        yield _sse(m, marcas)
+                if truncado:
+                    # el corte fue más largo que el tope: lo que sigue hasta el vivo no se reenvía
+                    yield f"event: desfase\ndata: {json.dumps({'tipo': tipo})}\n\n"
+
+        while True:
+            nuevos, desfase = hub.desde(sus.seq)
+            if desfase:
+                yield "event: desfase\ndata: {}\n\n"
+            for m in nuevos:
+                sus.seq = m.seq
+                if (m.tipo, m.id) in vistos or not filtro.acepta(m):
+                    continue
+                yield _sse(m, marcas)
+            if not await sus.esperar(latido):
+                yield ": latido\n\n"
+    finally:
+        sus.cerrar()
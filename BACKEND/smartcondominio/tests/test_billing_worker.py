@@ -0,0 +1,146 @@
+# tests/test_billing_worker.py
+"""
+Worker de facturación (services_billing): la toma de un job por UPDATE condicional la gana
+un solo worker, un job de un worker caído se retoma desde su checkpoint sin duplicar cuotas,
+y un worker que perdió el job (LeaseLost) no confirma el lote que tenía a medias.
+"""
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from smartcondominio import services_billing
+from smartcondominio.models import BillingJob, Cuota, Unidad
+from smartcondominio.services_billing import STALE_AFTER, claim_next_job, run_job, submit_job
+
+LOGGER = "smartcondominio.services_billing"
+UNIDADES = 5
+ITEMS = [
+    {"periodo": "2099-01", "concepto": "GASTO_COMUN", "monto_base": Decimal("100.00"),
+     "usa_coeficiente": False, "vencimiento": date(2099, 1, 10)},
+    {"periodo": "2099-01", "concepto": "EXTRA", "monto_base": Decimal("20.00"),
+     "usa_coeficiente": False, "vencimiento": date(2099, 1, 10)},
+]
+
+
+class Caida(BaseException):
+    """El proceso del worker muere a mitad de un lote (no pasa por `except Exception`)."""
+
+
+def _crear_unidades():
+    for i in range(UNIDADES):
+        Unidad.objects.create(manzana="B", numero=str(i + 1))
+
+
+def _dejar_sin_latido(job):
+    BillingJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - STALE_AFTER - timedelta(seconds=1))
+
+
+class ClaimConcurrenteTests(TransactionTestCase):
+    HILOS = 8
+
+    def test_un_solo_worker_gana_el_job(self):
+        _crear_unidades()
+        job = submit_job(ITEMS, chunk_size=2)
+        barrera = threading.Barrier(self.HILOS)
+        ganadores, errores = [], []
+
+        def worker(n):
+            try:
+                barrera.wait()
+                for intento in range(50):
+                    try:
+                        tomado = claim_next_job(f"w{n}")
+                        break
+                    except OperationalError:   # SQLite: "database is locked"
+                        time.sleep(0.01 * (intento + 1))
+                else:
+                    raise AssertionError("sin lock tras 50 intentos")
+                if tomado is not None:
+                    ganadores.append((f"w{n}", tomado.pk))
+            except Exception as e:
+                errores.append(f"{e.__class__.__name__}: {e}")
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=worker, args=(n,)) for n in range(self.HILOS)]
+        for t in hilos:
+            t.start()
+        for t in hilos:
+            t.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(len(ganadores), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker_id), ("RUNNING", ganadores[0][0]))
+
+
+class BillingWorkerTests(TestCase):
+    def setUp(self):
+        _crear_unidades()
+        self.job = submit_job(ITEMS, chunk_size=2)
+
+    def test_claim_respeta_el_latido(self):
+        self.assertEqual(claim_next_job("w1").pk, self.job.pk)
+        self.assertIsNone(claim_next_job("w2"))   # RUNNING y con latido reciente
+        _dejar_sin_latido(self.job)
+        with self.assertLogs(LOGGER, "WARNING"):
+            self.assertEqual(claim_next_job("w2").pk, self.job.pk)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.worker_id, "w2")
+
+    def test_job_completo(self):
+        job = run_job(claim_next_job("w1"), "w1")
+        self.assertEqual(job.status, "DONE")
+        self.assertEqual((job.processed, job.total), (UNIDADES * len(ITEMS), UNIDADES * len(ITEMS)))
+        self.assertEqual(Cuota.objects.filter(periodo="2099-01").count(), UNIDADES * len(ITEMS))
+
+    def test_worker_caido_se_retoma_desde_el_checkpoint(self):
+        real, llamadas = services_billing.generar_cuotas, []
+
+        def cae_en_el_tercer_lote(*args, **kwargs):
+            llamadas.append(1)
+            if len(llamadas) == 3:
+                raise Caida()
+            return real(*args, **kwargs)
+
+        with mock.patch.object(services_billing, "generar_cuotas", side_effect=cae_en_el_tercer_lote):
+            with self.assertRaises(Caida):
+                run_job(claim_next_job("w1"), "w1")
+
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.cursor_item, self.job.processed), ("RUNNING", 0, 4))
+        self.assertIsNone(claim_next_job("w2"))   # todavía no se considera caído
+        _dejar_sin_latido(self.job)
+
+        with self.assertLogs(LOGGER, "WARNING"):
+            job = run_job(claim_next_job("w2"), "w2")
+        self.assertEqual(job.status, "DONE")
+        self.assertEqual(job.processed, UNIDADES * len(ITEMS))
+        self.assertEqual(job.cuotas_afectadas, UNIDADES * len(ITEMS))
+        repetidas = (Cuota.objects.filter(periodo="2099-01").values("unidad_id", "concepto")
+                     .annotate(n=Count("id")).filter(n__gt=1))
+        self.assertFalse(repetidas.exists())
+        self.assertEqual(Cuota.objects.filter(periodo="2099-01").count(), UNIDADES * len(ITEMS))
+
+    def test_lease_lost_no_confirma_el_lote(self):
+        job_w1 = claim_next_job("w1")
+        _dejar_sin_latido(self.job)
+        with self.assertLogs(LOGGER, "WARNING") as logs:
+            claim_next_job("w2")          # w1 quedó como caído: w2 se lo lleva
+            job = run_job(job_w1, "w1")   # el primer checkpoint de w1 falla con LeaseLost
+        self.assertIn("w1 perdió el job", logs.output[-1])
+        self.assertEqual((job.status, job.processed), ("RUNNING", 0))
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.worker_id, self.job.processed), ("RUNNING", "w2", 0))
+        self.assertFalse(Cuota.objects.filter(periodo="2099-01").exists())   # el lote se deshizo
+
+        job = run_job(BillingJob.objects.get(pk=self.job.pk), "w2")
+        self.assertEqual(job.status, "DONE")
+        self.assertEqual(Cuota.objects.filter(periodo="2099-01").count(), UNIDADES * len(ITEMS))
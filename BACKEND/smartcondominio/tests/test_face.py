@@ -0,0 +1,142 @@
+# tests/test_face.py
+"""
+Vistas de rostros contra FakeBackend (FACE_BACKEND=fake): mismo contrato que Rekognition
+(FaceRecords / Matches con Similarity y ExternalImageId) sin AWS ni modelo local.
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from smartcondominio.face_backends import FakeBackend, get_backend
+from smartcondominio.models import AccessEvent
+
+User = get_user_model()
+
+
+def foto(contenido=b"rostro-de-prueba"):
+    return SimpleUploadedFile("cara.jpg", contenido, content_type="image/jpeg")
+
+
+@override_settings(FACE_BACKEND="fake", FACE_PREPROCESS=False, FACE_ALLOW_THRESHOLD=0.85)
+class FaceViewsFakeBackendTests(TestCase):
+    def setUp(self):
+        get_backend().reset()
+        self.residente = User.objects.create_user("residente-face", password="x-no-usada")
+        self.guardia = User.objects.create_user("guardia-face", password="x-no-usada")
+        self.client = APIClient()
+        self.client.force_authenticate(self.guardia)
+
+    def registrar(self, contenido=b"rostro-de-prueba"):
+        return self.client.post(
+            "/api/face/register-aws/",
+            {"kind": "resident", "obj_id": self.residente.id, "image": foto(contenido)},
+            format="multipart",
+        )
+
+    def test_backend_fake_es_el_configurado(self):
+        self.assertIsInstance(get_backend(), FakeBackend)
+
+    def test_registro_devuelve_face_records(self):
+        resp = self.registrar()
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.data["ok"])
+        self.assertEqual(resp.data["person_id"], f"resident:{self.residente.id}")
+        record = resp.data["FaceRecords"][0]
+        self.assertEqual(record["ExternalImageId"], f"resident:{self.residente.id}")
+        self.assertTrue(record["FaceId"])
+
+    def test_registro_sin_campos_requeridos(self):
+        resp = self.client.post("/api/face/register-aws/", {"kind": "resident"}, format="multipart")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_identificar_conocido_abre_y_registra_evento(self):
+        self.registrar()
+        resp = self.client.post(
+            "/api/face/identify-and-log-aws/",
+            {"image": foto(), "camera_id": "gate-entrada"},
+            format="multipart",
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.data["match"])
+        best = resp.data["best"]
+        self.assertEqual(best["ExternalImageId"], f"resident:{self.residente.id}")
+        self.assertEqual(best["Similarity"], 100.0)
+        self.assertEqual(resp.data["candidates"][0], best)
+        self.assertEqual(resp.data["resident"]["id"], self.residente.id)
+
+        evt = AccessEvent.objects.get(pk=resp.data["event"]["id"])
+        self.assertEqual(evt.decision, "ALLOW_RESIDENT")
+        self.assertTrue(evt.opened)
+        self.assertEqual(evt.score, 1.0)
+        self.assertEqual(evt.camera_id, "gate-entrada")
+        self.assertEqual(evt.direction, "ENTRADA")   # settings.CAMERA_DIRECTIONS
+        self.assertEqual(evt.triggered_by, self.guardia)
+        self.assertEqual(evt.payload["matched_user_id"], self.residente.id)
+        self.assertEqual(evt.payload["backend"], "fake")
+
+    def test_identificar_desconocido_no_abre(self):
+        self.registrar()
+        resp = self.client.post(
+            "/api/face/identify-and-log-aws/",
+            {"image": foto(b"otra-persona"), "camera_id": "gate-salida", "direction": "salida"},
+            format="multipart",
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.data["match"])
+        self.assertEqual(resp.data["candidates"], [])
+        self.assertIsNone(resp.data["resident"])
+
+        evt = AccessEvent.objects.get(pk=resp.data["event"]["id"])
+        self.assertEqual(evt.decision, "DENY_UNKNOWN")
+        self.assertFalse(evt.opened)
+        self.assertIsNone(evt.score)
+        self.assertEqual(evt.reason, "no_match")
+        self.assertEqual(evt.direction, "SALIDA")
+
+    @override_settings(FACE_ALLOW_THRESHOLD=1.01)
+    def test_similitud_bajo_el_umbral_no_abre(self):
+        self.registrar()
+        resp = self.client.post("/api/face/identify-and-log-aws/", {"image": foto()}, format="multipart")
+        self.assertTrue(resp.data["match"])
+        evt = AccessEvent.objects.get(pk=resp.data["event"]["id"])
+        self.assertEqual(evt.decision, "DENY_UNKNOWN")
+        self.assertFalse(evt.opened)
+
+    def test_error_del_backend_registra_error(self):
+        with mock.patch.object(FakeBackend, "search_by_image", side_effect=RuntimeError("sin servicio")):
+            resp = self.client.post("/api/face/identify-and-log-aws/", {"image": foto()}, format="multipart")
+        self.assertEqual(resp.status_code, 502)
+        self.assertFalse(resp.data["ok"])
+        evt = AccessEvent.objects.get(pk=resp.data["event"]["id"])
+        self.assertEqual(evt.decision, "ERROR_OCR")
+        self.assertFalse(evt.opened)
+        self.assertIn("RuntimeError", evt.reason)
+
+    def test_identificar_sin_imagen(self):
+        resp = self.client.post("/api/face/identify-and-log-aws/", {"camera_id": "gate-entrada"}, format="multipart")
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(AccessEvent.objects.exists())
+
+    def test_dry_run_devuelve_matches_sin_registrar(self):
+        self.registrar()
+        resp = self.client.post("/api/face/identify-aws-dry/", {"image": foto()}, format="multipart")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.data["ok"])
+        match = resp.data["Matches"][0]
+        self.assertEqual(match["ExternalImageId"], f"resident:{self.residente.id}")
+        self.assertEqual(match["Similarity"], 100.0)
+        self.assertIn("SearchedFaceBoundingBox", resp.data)
+        self.assertFalse(AccessEvent.objects.exists())
+
+    def test_dry_run_sin_coincidencias(self):
+        resp = self.client.post("/api/face/identify-aws-dry/", {"image": foto(b"nadie")}, format="multipart")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["Matches"], [])
+
+    def test_requiere_autenticacion(self):
+        anonimo = APIClient()
+        resp = anonimo.post("/api/face/identify-and-log-aws/", {"image": foto()}, format="multipart")
+        self.assertEqual(resp.status_code, 401)
@@ -0,0 +1,69 @@
+# tests/test_libro.py
+"""
+Borrados contra el libro append-only: la cuota y el pago se pueden eliminar, sus asientos
+quedan (sin FK en la BD) y el borrado agrega el suyo, así saldo = libro = cuotas.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from smartcondominio.models import Cuota, MovimientoCuenta, Pago, Unidad, UnidadSaldo
+from smartcondominio.services_cuotas import generar_cuotas
+
+User = get_user_model()
+
+
+class BorradosEnElLibroTests(TestCase):
+    def setUp(self):
+        self.unidad = Unidad.objects.create(manzana="L", numero="1")
+        generar_cuotas("2099-11", "EXPENSA", Decimal("100.00"), False, date.today() + timedelta(days=30))
+        self.cuota = Cuota.objects.get(unidad=self.unidad, periodo="2099-11")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser("admin-libro", password="x-no-usada"))
+
+    def assert_cuadra(self, cargado, abonado):
+        libro = MovimientoCuenta.objects.filter(unidad=self.unidad).aggregate(c=Sum("cargo"), a=Sum("abono"))
+        saldo = UnidadSaldo.objects.get(unidad=self.unidad)
+        self.assertEqual((libro["c"], libro["a"]), (cargado, abonado))
+        self.assertEqual((saldo.total_cargado, saldo.total_abonado), (cargado, abonado))
+        self.assertEqual(saldo.saldo, cargado - abonado)
+
+    def test_borrar_cuota_sin_pagos_deja_ajuste(self):
+        self.assert_cuadra(Decimal("100.00"), Decimal("0.00"))
+        resp = self.client.delete(f"/api/cuotas/{self.cuota.id}/")
+        self.assertEqual(resp.status_code, 204)
+        self.assertFalse(Cuota.objects.filter(pk=self.cuota.pk).exists())
+        tipos = list(MovimientoCuenta.objects.filter(cuota_id=self.cuota.pk).values_list("tipo", flat=True))
+        self.assertEqual(tipos, ["CARGO", "AJUSTE"])
+        self.assert_cuadra(Decimal("0.00"), Decimal("0.00"))
+
+    def test_borrar_pago_valido_lo_revierte(self):
+        pago = Pago.objects.create(cuota=self.cuota, monto=Decimal("40.00"))
+        pago.aplicar()
+        self.assert_cuadra(Decimal("100.00"), Decimal("40.00"))
+
+        resp = self.client.delete(f"/api/pagos/{pago.id}/")
+        self.assertEqual(resp.status_code, 204)
+        self.cuota.refresh_from_db()
+        self.assertEqual(self.cuota.pagado, Decimal("0.00"))
+        tipos = list(MovimientoCuenta.objects.filter(pago_id=pago.pk).values_list("tipo", flat=True))
+        self.assertEqual(tipos, ["PAGO", "REVERSION"])
+        self.assert_cuadra(Decimal("100.00"), Decimal("0.00"))
+
+    def test_borrar_pago_ya_revertido_no_descuenta_dos_veces(self):
+        pago = Pago.objects.create(cuota=self.cuota, monto=Decimal("40.00"))
+        pago.aplicar()
+        pago.revertir()
+        Pago.objects.get(pk=pago.pk).delete()
+        self.assertEqual(MovimientoCuenta.objects.filter(pago_id=pago.pk, tipo="REVERSION").count(), 1)
+        self.assert_cuadra(Decimal("100.00"), Decimal("0.00"))
+
+    def test_cuota_con_pagos_no_se_borra(self):
+        Pago.objects.create(cuota=self.cuota, monto=Decimal("10.00")).aplicar()
+        resp = self.client.delete(f"/api/cuotas/{self.cuota.id}/")
+        self.assertEqual(resp.status_code, 409)
+        self.assert_cuadra(Decimal("100.00"), Decimal("10.00"))
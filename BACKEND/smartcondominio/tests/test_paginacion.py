@@ -0,0 +1,46 @@
+# tests/test_paginacion.py
+"""
+KeysetPagination (?cursor=) sobre /api/access/events/: recorre (created_at, id) sin
+repetir ni saltar filas, y rechaza los ?ordering= que el keyset no puede respetar.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from smartcondominio.models import AccessEvent
+
+User = get_user_model()
+URL = "/api/access/events/"
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.ids = [AccessEvent.objects.create(camera_id="gate-1", decision="DENY_UNKNOWN").id for _ in range(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser("admin-pag", password="x-no-usada"))
+
+    def recorrer(self, url):
+        vistos = []
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            self.assertNotIn("count", resp.data)
+            vistos += [e["id"] for e in resp.data["results"]]
+            url = resp.data["next"]
+        return vistos
+
+    def test_cursor_descendente_por_defecto(self):
+        self.assertEqual(self.recorrer(f"{URL}?cursor=&page_size=2"), sorted(self.ids, reverse=True))
+
+    def test_cursor_ascendente(self):
+        self.assertEqual(self.recorrer(f"{URL}?cursor=&page_size=2&ordering=created_at"), sorted(self.ids))
+
+    def test_cursor_con_otro_ordering_es_400(self):
+        for ordering in ("score", "created_at,score", "-camera_id"):
+            resp = self.client.get(URL, {"cursor": "", "ordering": ordering})
+            self.assertEqual(resp.status_code, 400, ordering)
+
+    def test_sin_cursor_el_ordering_sigue_libre(self):
+        resp = self.client.get(URL, {"ordering": "score"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["count"], 5)
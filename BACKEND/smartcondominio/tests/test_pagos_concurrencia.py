@@ -0,0 +1,92 @@
+# tests/test_pagos_concurrencia.py
+"""
+Concurrencia de Pago.aplicar / Pago.revertir: hilos con su propia conexión sobre una misma
+cuota. Lo aplicado tiene que cuadrar al final en la cuota, en UnidadSaldo y en el libro
+(MovimientoCuenta). En SQLite las escrituras se serializan ("database is locked"): cada
+operación es atómica y se reintenta entera.
+"""
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from django.test import TransactionTestCase
+
+from smartcondominio.models import Cuota, MovimientoCuenta, Pago, Unidad, UnidadSaldo
+
+HILOS = 8
+PAGOS_POR_HILO = 10
+MONTO = Decimal("1.00")
+
+
+def _con_reintentos(fn, intentos=50):
+    for intento in range(intentos):
+        try:
+            with transaction.atomic():   # reintento seguro: nada quedó a medias
+                return fn()
+        except OperationalError:
+            time.sleep(0.01 * (intento + 1))
+    raise AssertionError(f"sin lock tras {intentos} intentos")
+
+
+class PagosConcurrentesTests(TransactionTestCase):
+    def setUp(self):
+        total = MONTO * HILOS * PAGOS_POR_HILO
+        self.unidad = Unidad.objects.create(manzana="T", numero="1")
+        self.cuota = Cuota.objects.create(
+            unidad=self.unidad, periodo="2099-12", concepto="PRUEBA", usa_coeficiente=False,
+            monto_base=total, monto_calculado=total, total_a_pagar=total,
+            vencimiento=date.today() + timedelta(days=30),
+        )
+
+    def _en_paralelo(self, revertir_por_hilo=0):
+        errores = []
+
+        def trabajador():
+            try:
+                for i in range(PAGOS_POR_HILO):
+                    pago = _con_reintentos(lambda: Pago.objects.create(
+                        cuota_id=self.cuota.id, monto=MONTO, medio="OTRO", referencia="concurrencia",
+                    ))
+                    _con_reintentos(pago.aplicar)
+                    if i < revertir_por_hilo:
+                        # copia aún "válida" en memoria, como otra petición que revierte a la vez
+                        copia = _con_reintentos(lambda: Pago.objects.get(pk=pago.pk))
+                        _con_reintentos(lambda: Pago.objects.get(pk=pago.pk).revertir())
+                        _con_reintentos(copia.revertir)   # la segunda no descuenta de nuevo
+            except Exception as e:
+                errores.append(f"{e.__class__.__name__}: {e}")
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajador) for _ in range(HILOS)]
+        for t in hilos:
+            t.start()
+        for t in hilos:
+            t.join()
+        self.assertEqual(errores, [])
+
+    def _assert_cuadra(self, validos_esperados):
+        self.cuota.refresh_from_db()
+        validos = Pago.objects.filter(cuota=self.cuota, valido=True).count()
+        self.assertEqual(validos, validos_esperados)
+        self.assertEqual(self.cuota.pagado, MONTO * validos)
+
+        libro = MovimientoCuenta.objects.filter(unidad=self.unidad).aggregate(a=Sum("abono"))["a"]
+        self.assertEqual(libro, self.cuota.pagado)
+        self.assertEqual(UnidadSaldo.objects.get(unidad=self.unidad).total_abonado, self.cuota.pagado)
+
+    def test_pagos_en_paralelo_no_pierden_actualizaciones(self):
+        self._en_paralelo()
+        self._assert_cuadra(HILOS * PAGOS_POR_HILO)
+        self.assertEqual(self.cuota.estado, "PAGADA")
+
+    def test_pagos_y_reversiones_en_paralelo(self):
+        self._en_paralelo(revertir_por_hilo=3)
+        self._assert_cuadra(HILOS * (PAGOS_POR_HILO - 3))
+        self.assertEqual(self.cuota.estado, "PARCIAL")
+        self.assertEqual(
+            MovimientoCuenta.objects.filter(unidad=self.unidad, tipo="REVERSION").count(), HILOS * 3,
+        )
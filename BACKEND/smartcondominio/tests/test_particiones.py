@@ -0,0 +1,74 @@
+# tests/test_particiones.py
+"""
+particiones.py contra Postgres (se saltea en SQLite): conversión de la bitácora, inserción y
+continuidad de ids, particiones de meses siguientes y la retención por DROP de un mes.
+Correr con DATABASE_URL=postgres://... antes de `particionar_eventos --confirmar`.
+"""
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from smartcondominio import particiones
+from smartcondominio.models import AccessEvent, AccessEventArchivo
+from smartcondominio.services_archivo import aplicar_retencion, leer_frio
+
+TABLA = AccessEvent._meta.db_table
+
+
+@skipUnless(connection.vendor == "postgresql", "particiones: solo Postgres")
+class ParticionesPostgresTests(TransactionTestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+
+    def particionar(self):
+        for tabla in particiones.TABLAS:
+            particiones.particionar(connection, tabla, meses=2)
+        self.assertTrue(particiones.es_particionada(connection, TABLA))
+
+    def test_conversion_conserva_filas_y_continua_los_ids(self):
+        antes = AccessEvent.objects.create(camera_id="gate-1", decision="DENY_UNKNOWN")
+        self.particionar()
+        despues = AccessEvent.objects.create(camera_id="gate-1", decision="ALLOW_RESIDENT", opened=True)
+        self.assertGreater(despues.id, antes.id)
+        self.assertEqual(AccessEvent.objects.get(pk=antes.id).decision, "DENY_UNKNOWN")
+        self.assertEqual(AccessEvent.objects.count(), 2)
+
+        nombres = [p["nombre"] for p in particiones.particiones(connection, TABLA)]
+        self.assertIn(f"{TABLA}_legacy", nombres)
+        self.assertIn(f"{TABLA}_default", nombres)
+        self.assertFalse(particiones.particionar(connection, TABLA))   # idempotente
+
+    def test_asegurar_particiones_crea_los_meses_que_faltan(self):
+        self.particionar()
+        desde = particiones.sumar_meses(particiones.mes_de(timezone.now()), 24)
+        esperadas = [particiones.nombre_particion(TABLA, particiones.sumar_meses(desde, i)) for i in range(2)]
+        self.assertEqual(particiones.asegurar_particiones(connection, TABLA, meses=2, desde=desde), esperadas)
+        self.assertEqual(particiones.asegurar_particiones(connection, TABLA, meses=2, desde=desde), [])
+
+        evt = AccessEvent.objects.create(camera_id="gate-1", decision="DENY_UNKNOWN")
+        AccessEvent.objects.filter(pk=evt.pk).update(created_at=desde + timedelta(days=3))
+        with connection.cursor() as cur:
+            cur.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(esperadas[0])}")
+            self.assertEqual(cur.fetchone()[0], 1)
+
+    def test_retencion_archiva_y_borra_el_mes_con_drop(self):
+        self.particionar()
+        mes = particiones.sumar_meses(particiones.mes_de(timezone.now()), 36)
+        [nombre] = particiones.asegurar_particiones(connection, TABLA, meses=1, desde=mes)
+        evt = AccessEvent.objects.create(camera_id="gate-1", decision="DENY_UNKNOWN")
+        AccessEvent.objects.filter(pk=evt.pk).update(created_at=mes + timedelta(days=1))
+
+        with override_settings(MEDIA_ROOT=self.media):
+            out = aplicar_retencion(AccessEvent, AccessEventArchivo, particiones.sumar_meses(mes, 1))
+            drop = [r for r in out if r.get("drop") == nombre]
+            self.assertEqual(len(drop), 1)
+            self.assertEqual([f["id"] for f in leer_frio(drop[0]["archivo"])], [evt.id])
+
+        self.assertNotIn(nombre, [p["nombre"] for p in particiones.particiones(connection, TABLA)])
+        self.assertFalse(AccessEvent.objects.filter(pk=evt.pk).exists())
@@ -0,0 +1,59 @@
+# tests/test_plate_index.py
+"""
+Índice de placas en memoria: decide sin tocar la BD mientras PlacasVersion no cambie y
+se da por vencido cuando otro worker (aquí: otra instancia de PlateIndex, que no recibe
+las señales de este proceso) da de baja un vehículo.
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from smartcondominio import plate_index
+from smartcondominio.models import Vehiculo
+from smartcondominio.plate_index import PlateIndex
+
+User = get_user_model()
+
+
+def sin_recarga(idx):
+    """Sin el hilo de recarga: en TestCase no vería los datos de la transacción del test."""
+    return mock.patch.object(idx, "_cargar_en_segundo_plano")
+
+
+@override_settings(PLATE_INDEX_MISS_FALLBACK=False)
+class PlateIndexVersionTests(TestCase):
+    def setUp(self):
+        dueno = User.objects.create_user("dueno-placa", password="x-no-usada")
+        self.vehiculo = Vehiculo.objects.create(propietario=dueno, placa="1234ABC")
+        self.otro_worker = PlateIndex(ttl=3600)
+        self.otro_worker.cargar()
+
+    @override_settings(PLATE_INDEX_VERSION_MS=60_000)
+    def test_decide_en_memoria(self):
+        with self.assertNumQueries(0):
+            veh, _ = self.otro_worker.buscar("1234 abc")
+            self.assertEqual(veh, (self.vehiculo.id, self.vehiculo.propietario_id))
+            self.assertEqual(self.otro_worker.buscar("9999ZZZ"), (None, None))
+
+    @override_settings(PLATE_INDEX_VERSION_MS=0)
+    def test_cambio_en_otro_worker_lo_vence(self):
+        self.assertIsNotNone(self.otro_worker.buscar("1234ABC")[0])
+        self.vehiculo.activo = False
+        self.vehiculo.save()   # sube PlacasVersion en esta transacción
+        with sin_recarga(self.otro_worker):
+            self.assertIsNone(self.otro_worker.buscar("1234ABC"))
+        self.otro_worker.cargar()
+        self.assertEqual(self.otro_worker.buscar("1234ABC"), (None, None))
+
+    @override_settings(PLATE_INDEX_VERSION_MS=0)
+    def test_sin_cambios_una_lectura_de_version(self):
+        with self.assertNumQueries(1):
+            self.assertIsNotNone(self.otro_worker.buscar("1234ABC")[0])
+
+    def test_buscar_autorizacion_con_indice_frio_usa_la_bd(self):
+        plate_index.indice.limpiar()
+        with sin_recarga(plate_index.indice):
+            veh_id, propietario_id, visit_id = plate_index.buscar_autorizacion("1234abc")
+        self.assertEqual(veh_id, self.vehiculo.id)
+        self.assertIsNone(visit_id)
@@ -0,0 +1,111 @@
+# tests/test_rollups.py
+"""
+Cubos de analítica de garita (services_rollups.py): compactar y consultar da lo mismo que
+contar la bitácora, reconstruir deja lo mismo que lo incremental, y la cola en vivo usa el
+mismo rango (horas completas) que los rollups.
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from smartcondominio.models import AccessEvent, AccessRollupHora
+from smartcondominio.services_rollups import compactar, consultar, reconstruir
+
+User = get_user_model()
+
+
+def celdas():
+    return sorted(AccessRollupHora.objects.values_list("hora", "camera_id", "direction", "decision", "eventos", "abiertos"))
+
+
+@override_settings(ROLLUP_DEMORA_S=0, ROLLUP_VIVO_MAX_S=900)
+class RollupsTests(TestCase):
+    def setUp(self):
+        self.ahora = timezone.now()
+        datos = [
+            ("gate-1", "ENTRADA", "ALLOW_RESIDENT", True, 0.9, 30),
+            ("gate-1", "ENTRADA", "DENY_UNKNOWN", False, None, 30),
+            ("gate-1", "SALIDA", "ALLOW_RESIDENT", True, 0.8, 90),
+            ("gate-2", "ENTRADA", "ALLOW_VISIT", True, 0.7, 60 * 26),
+            ("gate-2", "ENTRADA", "DENY_UNKNOWN", False, 0.3, 60 * 26),
+        ]
+        for camera_id, direction, decision, opened, score, minutos in datos:
+            evt = AccessEvent.objects.create(
+                camera_id=camera_id, direction=direction, decision=decision, opened=opened, score=score,
+            )
+            AccessEvent.objects.filter(pk=evt.pk).update(created_at=self.ahora - timedelta(minutes=minutos))
+        self.rango = (self.ahora - timedelta(days=2), self.ahora + timedelta(hours=1))
+
+    def crudo(self, campo):
+        return dict(AccessEvent.objects.values_list(campo).annotate(n=Count("id")).order_by())
+
+    def test_compactar_y_consultar_cuenta_como_la_bitacora(self):
+        r = compactar()
+        self.assertEqual(r["eventos"], 5)
+        filas, totales, estado = consultar(*self.rango, agrupar=["camera_id"])
+        self.assertEqual({f["camera_id"]: f["eventos"] for f in filas}, self.crudo("camera_id"))
+        self.assertEqual((totales["eventos"], totales["abiertos"]), (5, 3))
+        self.assertEqual(totales["score_promedio"], round((0.9 + 0.8 + 0.7 + 0.3) / 4, 4))
+        self.assertEqual(estado, {"pendientes": 0, "al_dia": True, "sin_compactar_desde": None})
+        self.assertEqual(compactar()["eventos"], 0)
+
+    def test_cola_en_vivo_suma_lo_no_compactado(self):
+        compactar()
+        AccessEvent.objects.create(camera_id="gate-1", direction="ENTRADA", decision="DENY_UNKNOWN")
+        _, totales, estado = consultar(*self.rango)
+        self.assertEqual(totales["eventos"], 6)
+        self.assertEqual(estado["pendientes"], 1)
+        self.assertTrue(estado["al_dia"])
+
+    @override_settings(ROLLUP_VIVO_MAX_S=60)
+    def test_compactador_atrasado_se_informa_sin_agrupar_la_bitacora(self):
+        _, totales, estado = consultar(*self.rango)
+        self.assertEqual(totales["eventos"], 0)
+        self.assertFalse(estado["al_dia"])
+        self.assertIsNotNone(estado["sin_compactar_desde"])
+
+    def test_reconstruir_completo_igual_a_incremental(self):
+        compactar()
+        incremental = celdas()
+        AccessRollupHora.objects.all().delete()
+        r = reconstruir()
+        self.assertEqual(celdas(), incremental)
+        self.assertEqual(r["eventos"], 5)
+        self.assertEqual(r["ultimo_id"], AccessEvent.objects.order_by("-id").first().id)
+
+    def test_reconstruir_un_rango_respeta_la_marca(self):
+        compactar()
+        incremental = celdas()
+        nuevo = AccessEvent.objects.create(camera_id="gate-1", direction="ENTRADA", decision="DENY_UNKNOWN")
+        reconstruir(desde=self.ahora - timedelta(hours=3), hasta=self.ahora)
+        self.assertEqual(celdas(), incremental)   # `nuevo` pasa la marca: lo suma compactar()
+        self.assertEqual(compactar()["ultimo_id"], nuevo.id)
+
+    def test_mismo_rango_para_rollups_y_cola(self):
+        hora = self.ahora.replace(minute=0, second=0, microsecond=0)
+        AccessEvent.objects.all().delete()
+        compactado = AccessEvent.objects.create(camera_id="gate-1", decision="DENY_UNKNOWN")
+        AccessEvent.objects.filter(pk=compactado.pk).update(created_at=hora)
+        compactar()
+        en_vivo = AccessEvent.objects.create(camera_id="gate-1", decision="DENY_UNKNOWN")
+        # desde a mitad de la hora: vale la hora completa para los dos
+        _, totales, estado = consultar(en_vivo.created_at + timedelta(microseconds=1), self.ahora + timedelta(hours=1))
+        self.assertEqual(totales["eventos"], 2)
+        self.assertEqual(estado["pendientes"], 1)
+
+    def test_vista_de_analitica(self):
+        compactar()
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser("admin-rollups", password="x-no-usada"))
+        hoy = timezone.localdate()
+        resp = client.get("/api/access/analytics/", {
+            "from": (hoy - timedelta(days=3)).isoformat(), "to": hoy.isoformat(), "agrupar": "decision",
+        })
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual({f["decision"]: f["eventos"] for f in resp.data["filas"]}, self.crudo("decision"))
+        self.assertTrue(resp.data["al_dia"])
+        self.assertEqual(client.get("/api/access/analytics/", {"agrupar": "otra"}).status_code, 400)
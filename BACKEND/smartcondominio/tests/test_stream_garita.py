@@ -0,0 +1,149 @@
+# tests/test_stream_garita.py
+"""
+Canal SSE de la garita (stream_garita.py): filtro, hub con backlog acotado y "desfase", y
+los dos caminos para reanudar: por seq del hub (orden de commit, aunque un id menor se
+confirme después de uno mayor) y desde la BD con ventana de ids bajo la marca.
+"""
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+
+from smartcondominio import stream_garita
+from smartcondominio.models import AccessEvent
+from smartcondominio.stream_garita import Filtro, Hub, Mensaje, eventos, leer_marcas
+
+
+def mensajes(chunks):
+    """[(id, event, data)] de los chunks SSE (sin retry ni latidos)."""
+    out = []
+    for chunk in chunks:
+        campos = dict(linea.split(": ", 1) for linea in chunk.strip().split("\n") if ": " in linea)
+        if "event" in campos:
+            out.append((campos.get("id"), campos["event"], json.loads(campos["data"])))
+    return out
+
+
+def recoger(filtro, marcas, n, publicar=()):
+    """Los primeros `n` mensajes de eventos(); `publicar` va al hub ya con la consola suscrita."""
+    async def run():
+        gen = eventos(filtro, marcas)
+        chunks = [await gen.__anext__()]   # retry: ya suscrito
+        for args in publicar:
+            stream_garita.hub.publicar(*args)
+        try:
+            while len(mensajes(chunks)) < n:
+                chunks.append(await asyncio.wait_for(gen.__anext__(), 2))
+        finally:
+            await gen.aclose()
+        return mensajes(chunks)
+    return async_to_sync(run)()
+
+
+def publicado(id, camera_id="gate-1", direction="ENTRADA"):
+    return ("access", id, camera_id, direction, json.dumps({"id": id}))
+
+
+class FiltroTests(TestCase):
+    def test_desde_query(self):
+        f = Filtro.desde_query({"tipo": "access", "camera_id": "gate-1, Gate-2", "direction": "entrada"})
+        self.assertEqual(f.tipos, ("access",))
+        self.assertEqual(f.camaras, {"GATE-1", "GATE-2"})
+        self.assertTrue(f.acepta(Mensaje(1, "access", 1, "GATE-2", "Entrada", "{}")))
+        self.assertFalse(f.acepta(Mensaje(1, "face", 1, "gate-1", "ENTRADA", "{}")))
+        self.assertFalse(f.acepta(Mensaje(1, "access", 1, "gate-3", "ENTRADA", "{}")))
+        self.assertFalse(f.acepta(Mensaje(1, "access", 1, "gate-1", "SALIDA", "{}")))
+
+    def test_tipo_desconocido_son_todos(self):
+        self.assertEqual(Filtro.desde_query({"tipo": "otro"}).tipos, stream_garita.TIPOS)
+
+    def test_leer_marcas(self):
+        self.assertEqual(leer_marcas("12.3"), {"access": 12, "face": 3})
+        self.assertEqual(leer_marcas("12.3.ab12cd34.7"), {"access": 12, "face": 3, "hub": ("ab12cd34", 7)})
+        self.assertIsNone(leer_marcas("12"))
+        self.assertIsNone(leer_marcas("x.3"))
+        self.assertIsNone(leer_marcas(None))
+
+
+class HubTests(TestCase):
+    def test_backlog_acotado_y_desfase(self):
+        hub = Hub(maximo=3)
+        for i in range(1, 6):
+            self.assertTrue(hub.publicar(*publicado(i)))
+        self.assertFalse(hub.publicar(*publicado(5)))   # NOTIFY + on_commit: una vez
+        nuevos, desfase = hub.desde(0)
+        self.assertEqual([m.id for m in nuevos], [3, 4, 5])
+        self.assertTrue(desfase)
+        nuevos, desfase = hub.desde(3)
+        self.assertEqual([m.id for m in nuevos], [4, 5])
+        self.assertFalse(desfase)
+
+    @override_settings(GATE_STREAM_BACKLOG=2)
+    def test_limite_sale_de_settings(self):
+        self.assertEqual(Hub().limite(), 2)
+
+    def test_retoma(self):
+        hub = Hub(maximo=3)
+        for i in range(1, 6):
+            hub.publicar(*publicado(i))
+        self.assertTrue(hub.retoma(hub.epoca, 2))    # desde seq 3: todo en el backlog
+        self.assertFalse(hub.retoma(hub.epoca, 1))   # seq 2 ya salió
+        self.assertFalse(hub.retoma("otro-hub", 4))
+        self.assertFalse(hub.retoma(hub.epoca, 9))
+
+
+class EventosTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(stream_garita, "hub", Hub(maximo=50))
+        self.hub = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def evento(self, camera_id="gate-1"):
+        return AccessEvent.objects.create(camera_id=camera_id, direction="ENTRADA", decision="DENY_UNKNOWN")
+
+    def test_en_vivo_con_filtro(self):
+        recibidos = recoger(
+            Filtro.desde_query({"camera_id": "gate-1"}), None, 2,
+            publicar=[publicado(1), publicado(2, camera_id="gate-9"), publicado(3)],
+        )
+        self.assertEqual([d["id"] for _, _, d in recibidos], [1, 3])
+        ultimo_id = recibidos[-1][0]
+        self.assertEqual(leer_marcas(ultimo_id)["hub"], (self.hub.epoca, 3))
+
+    def test_reanudar_por_seq_no_salta_un_id_menor_confirmado_despues(self):
+        for i in (10, 12, 11):   # 11 se confirmó después de 12
+            self.hub.publicar(*publicado(i))
+        marcas = {"access": 12, "face": 0, "hub": (self.hub.epoca, 1)}   # la consola vio hasta el 10
+        recibidos = recoger(Filtro(), marcas, 2)
+        self.assertEqual([d["id"] for _, _, d in recibidos], [12, 11])
+        self.assertEqual(recibidos[-1][0], f"12.0.{self.hub.epoca}.3")
+
+    @override_settings(GATE_STREAM_VENTANA_IDS=1)
+    def test_reanudar_desde_la_bd_repite_la_ventana(self):
+        e1, e2, e3, e4 = (self.evento() for _ in range(4))
+        # otro worker (otra época): la posición no sirve, va a la BD desde e2 - 1
+        marcas = {"access": e2.id, "face": 0, "hub": ("otro-hub", 99)}
+        recibidos = recoger(Filtro(), marcas, 3)
+        self.assertEqual([d["id"] for _, _, d in recibidos], [e2.id, e3.id, e4.id])
+        self.assertEqual(recibidos[-1][0], f"{e4.id}.0")   # de la BD: sin posición de hub
+
+    @override_settings(GATE_STREAM_VENTANA_IDS=0, GATE_STREAM_BACKLOG=2)
+    def test_reanudar_desde_la_bd_con_tope_avisa_desfase(self):
+        self.hub.maximo = None   # GATE_STREAM_BACKLOG
+        primero = self.evento()
+        for _ in range(4):
+            self.evento()
+        recibidos = recoger(Filtro.desde_query({"tipo": "access"}), {"access": primero.id, "face": 0}, 3)
+        self.assertEqual([e for _, e, _ in recibidos], ["access", "access", "desfase"])
+        self.assertEqual(recibidos[-1][2], {"tipo": "access"})
+
+    def test_lo_de_la_bd_no_se_repite_por_el_hub(self):
+        evt = self.evento()
+        # publicado ya con la consola suscrita: llega por la BD y por el hub, sale una vez
+        recibidos = recoger(
+            Filtro(), {"access": evt.id - 1, "face": 0}, 2,
+            publicar=[publicado(evt.id), publicado(evt.id + 100)],
+        )
+        self.assertEqual([d["id"] for _, _, d in recibidos], [evt.id, evt.id + 100])
@@ -4,21 +4,25 @@ from .views_api import QRPayableCuotasView
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
 from .views_face_dry import FaceIdentifyAWSDryRunView
-from .views_face import FaceRegisterAWSView, FaceIdentifyAndLogAWSView
+from .views_face import FaceRegisterAWSView, FaceIdentifyAndLogAWSView, FaceHealthView
+from .views_metrics import MetricsView
+from .views_async import (
+    SnapshotCheckAsyncView, FaceIdentifyAndLogAsyncView, FaceIdentifyDryRunAsyncView, GateEventStreamView,
+)
 from .views_api import (
     # Auth / perfil
     RegisterView, me, me_update, change_password,
     # ViewSets
     AdminUserViewSet, RolViewSet, PermissionViewSet,
-    UnidadViewSet, CuotaViewSet, PagoViewSet, InfraccionViewSet,
+    UnidadViewSet, CuotaViewSet, PagoViewSet, InfraccionViewSet, BillingJobViewSet,
      TareaViewSet, AreaComunViewSet, StaffViewSet,
     VisitorViewSet, VisitViewSet, VehiculoViewSet, SolicitudVehiculoViewSet,
     # Vistas de Estado de cuenta
-    EstadoCuentaView, EstadoCuentaExportCSV,
+    EstadoCuentaView, EstadoCuentaExportCSV, EstadoCuentaExportAllView,
     # Mock pagos
     MockCheckoutView, MockUploadReceiptView, MockVerifyReceiptView, SnapshotCheckView, SnapshotPingView, MockPayView, MockIntentMineView, MockIntentDashboardView, MyCuotasConSaldoView,
     PagoComprobanteViewSet, AvisoAdminViewSet, AvisoPublicViewSet,
-    AccessEventViewSet, FaceAccessEventViewSet
+    AccessEventViewSet, FaceAccessEventViewSet, AccessAnalyticsView,
     
 )
 
@@ -29,6 +33,7 @@ router.register(r'permissions', PermissionViewSet, basename='permissions')
 router.register(r'unidades', UnidadViewSet, basename='unidades')
 router.register(r'cuotas', CuotaViewSet, basename='cuotas')
 router.register(r'pagos', PagoViewSet, basename='pagos')
+router.register(r'billing-jobs', BillingJobViewSet, basename='billing-jobs')
 router.register(r'infracciones', InfraccionViewSet, basename='infracciones')
 
 router.register(r'tareas', TareaViewSet, basename='tareas')
@@ -55,6 +60,7 @@ urlpatterns = [
     # Estado de cuenta
     path('estado-cuenta/', EstadoCuentaView.as_view(), name='estado-cuenta'),
     path('estado-cuenta/export/', EstadoCuentaExportCSV.as_view(), name='estado-cuenta-export'),
+    path('estado-cuenta/export-all/', EstadoCuentaExportAllView.as_view(), name='estado-cuenta-export-all'),
 
     # Mock pagos
      path("pagos/mock/checkout/", MockCheckoutView.as_view(), name="api-mock-checkout"),
@@ -68,7 +74,15 @@ urlpatterns = [
     #IA
     path("face/register-aws/", FaceRegisterAWSView.as_view(), name="face-register-aws"),
     path("face/identify-and-log-aws/", FaceIdentifyAndLogAWSView.as_view(), name="face-identify-and-log-aws"),
+    path("health/face/", FaceHealthView.as_view(), name="health-face"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
      path("face/identify-aws-dry/", FaceIdentifyAWSDryRunView.as_view(), name="face-identify-aws-dry"),
+    # garita async (servir con uvicorn, ver config/asgi.py)
+    path("access/async/snapshot-check/", SnapshotCheckAsyncView.as_view(), name="snapshot-check-async"),
+    path("face/async/identify-and-log-aws/", FaceIdentifyAndLogAsyncView.as_view(), name="face-identify-and-log-async"),
+    path("face/async/identify-aws-dry/", FaceIdentifyDryRunAsyncView.as_view(), name="face-identify-aws-dry-async"),
+    path("access/events/stream/", GateEventStreamView.as_view(), name="access-events-stream"),
+    path("access/analytics/", AccessAnalyticsView.as_view(), name="access-analytics"),
       path('pagos/mock/mis-cuotas-con-saldo/', MyCuotasConSaldoView.as_view(), name='mock-mis-cuotas-saldo'),
     path("pagos/qr/pendientes/", QRPayableCuotasView.as_view(), name="qr-cuotas-pendientes"),
     
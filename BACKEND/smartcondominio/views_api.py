@@ -17,17 +17,18 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
 from django.db import models, transaction, IntegrityError
-from django.db.models import Q, Sum, F, DecimalField, ExpressionWrapper
+from django.db.models import Q, Sum, F
 from django.db.models.deletion import ProtectedError, RestrictedError
-from django.http import HttpResponse
+from django.core.cache import caches
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
 
 # stdlib
-import csv
+import hashlib
 import uuid
 from datetime import date, datetime, timedelta, time
 from decimal import Decimal
@@ -44,7 +45,8 @@ from .models import (
     Aviso, AreaComun, AreaDisponibilidad, ReservaArea,
     Tarea, TareaComentario,
     # ⬇️ AÑADE el modelo nuevo del flujo de comprobantes
-    PagoComprobante, AccessEvent, FaceAccessEvent
+    PagoComprobante, AccessEvent, FaceAccessEvent,
+    BillingJob, UnidadSaldo,
 )
 
 # Permisos
@@ -83,9 +85,16 @@ from .serializers import (
     PagoComprobanteCreateSerializer, PagoComprobanteListSerializer, PagoComprobanteReviewSerializer, AvisoCreateUpdateSerializer, AvisoReadSerializer,
     SnapshotInSerializer, 
     AccessEventSerializer, FaceAccessEventSerializer,
-    
+    BillingJobCreateSerializer, BillingJobSerializer, UnidadSaldoSerializer,
 )
-from .services_snapshot import PlateRecognizerSnapshot, best_plate_from_result  # ⬅️ AÑADIR
+from .services_gate import procesar_snapshot
+from .plate_index import REASON_APROXIMADA
+from .services_cuotas import generar_cuotas
+from .services_billing import submit_job, cancel_job
+from .services_ledger import obtener_saldo
+from .services_rollups import DIMENSIONES as DIMENSIONES_ROLLUP, consultar as consultar_rollups
+from .exports import streaming_export, ITER_CHUNK
+from .pagination import KeysetPagination
 
 
 User = get_user_model()
@@ -102,6 +111,28 @@ def _cuota_es_del_usuario(cuota: Cuota, user: User) -> bool:
     u = cuota.unidad
     return (u and (u.propietario_id == user.id or u.residente_id == user.id))
 
+def _rango_de_dias(qs, desde, hasta, campo="created_at"):
+    """
+    ?from / ?to (YYYY-MM-DD, ambos inclusive) como rango sobre el timestamp: campo >= inicio
+    del día y < inicio del día siguiente, en la zona actual (igual que __date). Así la BD usa
+    el índice de created_at (y poda particiones) en vez de evaluar DATE(created_at) fila por fila.
+    """
+    inicio, fin = _limites_de_dias(desde, hasta)
+    if inicio:
+        qs = qs.filter(**{f"{campo}__gte": inicio})
+    if fin:
+        qs = qs.filter(**{f"{campo}__lt": fin})
+    return qs
+
+def _limites_de_dias(desde, hasta):
+    """(inicio del día `desde`, inicio del día siguiente a `hasta`) en la zona actual; None si falta o no parsea."""
+    tz = timezone.get_current_timezone()
+    d = parse_date(desde) if desde else None
+    inicio = datetime.combine(d, time.min, tzinfo=tz) if d else None
+    d = parse_date(hasta) if hasta else None
+    fin = datetime.combine(d + timedelta(days=1), time.min, tzinfo=tz) if d else None
+    return inicio, fin
+
 def _is_admin_or_staff(user: User) -> bool:
     return bool(getattr(user, "is_superuser", False) or user_role_code(user) in {"ADMIN", "STAFF"})
 
@@ -310,6 +341,25 @@ class UnidadViewSet(viewsets.ModelViewSet):
         obj = ser.save()
         return Response(self.get_serializer(obj).data)
 
+    @action(methods=["get"], detail=False, url_path="saldos")
+    def saldos(self, request):
+        """
+        Saldos materializados por unidad (UnidadSaldo), sin agregar cuotas.
+        ?con_deuda=1 solo las que deben; ordenado por saldo desc. Incluye totales.
+        """
+        qs = UnidadSaldo.objects.select_related("unidad").filter(unidad__in=self.filter_queryset(self.get_queryset()))
+        if request.query_params.get("con_deuda") in {"1", "true", "True"}:
+            qs = qs.filter(saldo__gt=0)
+        totales = qs.aggregate(saldo=Sum("saldo"), cargado=Sum("total_cargado"), abonado=Sum("total_abonado"))
+        qs = qs.order_by("-saldo", "unidad_id")
+        resumen = {k: str(Decimal(v or 0).quantize(Decimal("0.01"))) for k, v in totales.items()}
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            resp = self.get_paginated_response(UnidadSaldoSerializer(page, many=True).data)
+            resp.data["totales"] = resumen
+            return resp
+        return Response({"totales": resumen, "results": UnidadSaldoSerializer(qs, many=True).data})
+
 
 # ---------------------------
 # Cuotas / Pagos
@@ -354,30 +404,11 @@ class CuotaViewSet(viewsets.ModelViewSet):
         usa_coef = data["usa_coeficiente"]
         venc = data["vencimiento"]
 
-        afectadas = []
-        for u in Unidad.objects.filter(is_active=True).only("id", "coeficiente"):
-            c, _ = Cuota.objects.get_or_create(
-                unidad=u, periodo=periodo, concepto=concepto, is_active=True,
-                defaults={
-                    "monto_base": monto_base,
-                    "usa_coeficiente": usa_coef,
-                    "coeficiente_snapshot": u.coeficiente or 0,
-                    "vencimiento": venc,
-                }
-            )
-            c.monto_base = monto_base
-            c.usa_coeficiente = usa_coef
-            if usa_coef:
-                c.coeficiente_snapshot = u.coeficiente or 0
-            c.vencimiento = venc
-            c.recalc_importes()
-            c.recalc_estado()
-            c.save(update_fields=[
-                "monto_base", "usa_coeficiente", "coeficiente_snapshot",
-                "vencimiento", "monto_calculado", "total_a_pagar", "estado", "updated_at"
-            ])
-            afectadas.append(c.id)
+        if data.get("async_job"):
+            job = submit_job([data], user=request.user)
+            return Response(BillingJobSerializer(job).data, status=202)
 
+        afectadas = generar_cuotas(periodo, concepto, monto_base, usa_coef, venc)
         return Response({"ok": True, "cuotas_afectadas": afectadas, "total": len(afectadas)}, status=201)
 
     @action(detail=True, methods=["post"], url_path="pagos")
@@ -393,6 +424,12 @@ class CuotaViewSet(viewsets.ModelViewSet):
         pago = ser.save()
         return Response(PagoSerializer(pago).data, status=201)
 
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ProtectedError:
+            return Response({"detail": "No se puede eliminar: la cuota tiene pagos registrados."}, status=409)
+
 class PagoViewSet(viewsets.ModelViewSet):
     queryset = Pago.objects.select_related("cuota", "creado_por").all()
     authentication_classes = [TokenAuthentication]
@@ -400,6 +437,7 @@ class PagoViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ["cuota", "valido", "medio"]
     ordering = ["-created_at"]
+    pagination_class = KeysetPagination   # ?cursor= para paginar por (created_at, id)
 
     def get_serializer_class(self):
         return PagoCreateSerializer if self.action == "create" else PagoSerializer
@@ -412,6 +450,36 @@ class PagoViewSet(viewsets.ModelViewSet):
         return Response(ser_out.data, status=201)
 
 
+class BillingJobViewSet(CreateModelMixin, ListModelMixin, RetrieveModelMixin, GenericViewSet):
+    """
+    Generación de cuotas en segundo plano (la procesa `manage.py billing_worker`).
+    POST   /api/billing-jobs/              { "items": [{periodo, concepto, monto_base, usa_coeficiente, vencimiento}, ...] }
+    GET    /api/billing-jobs/{id}/         progreso (processed/total, progress %)
+    POST   /api/billing-jobs/{id}/cancel/
+    """
+    queryset = BillingJob.objects.all()
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminOrStaff]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["status"]
+
+    def get_serializer_class(self):
+        return BillingJobCreateSerializer if self.action == "create" else BillingJobSerializer
+
+    def create(self, request, *args, **kwargs):
+        ser = self.get_serializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        job = submit_job(ser.validated_data["items"], user=request.user, chunk_size=ser.validated_data["chunk_size"])
+        return Response(BillingJobSerializer(job).data, status=202)
+
+    @action(detail=True, methods=["post"])
+    def cancel(self, request, pk=None):
+        job = self.get_object()
+        if job.is_finished:
+            return Response({"detail": f"El job ya terminó ({job.status})."}, status=400)
+        return Response(BillingJobSerializer(cancel_job(job)).data)
+
+
 # ---------------------------
 # Infracciones
 # ---------------------------
@@ -573,6 +641,13 @@ class TareaViewSet(viewsets.ModelViewSet):
 # ---------------------------
 
 class EstadoCuentaView(APIView):
+    """
+    Estado de cuenta de una unidad del usuario. La respuesta se cachea (alias
+    "estado_cuenta") por unidad + versión de UnidadSaldo + fecha + unidades del
+    usuario, y se devuelve con ETag: If-None-Match coincidente => 304 sin cuerpo.
+    Cualquier cambio de cuotas/pagos/comprobantes sube la versión, así no hace
+    falta invalidar.
+    """
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
 
@@ -581,47 +656,61 @@ class EstadoCuentaView(APIView):
 
     def get(self, request):
         user = request.user
-        unidades = self.get_user_unidades(user)
-        if not unidades.exists():
+        # una sola consulta alcanza para autorizar y armar la clave (ids, updated_at, versión)
+        filas = list(self.get_user_unidades(user).values_list("id", "updated_at", "saldo_cuenta__version"))
+        if not filas:
             return Response({"detail": "No tiene unidades asociadas."}, status=404)
 
         unidad_id = request.query_params.get("unidad")
         if unidad_id:
-            unidad = unidades.filter(id=unidad_id).first()
-            if not unidad:
+            fila = next((f for f in filas if str(f[0]) == str(unidad_id)), None)
+            if not fila:
                 return Response({"detail": "Unidad inválida para este usuario."}, status=403)
         else:
-            unidad = unidades.first()
+            fila = filas[0]
+
+        hoy = date.today()
+        clave = hashlib.sha1(repr((fila[0], fila[2], hoy, filas)).encode()).hexdigest()
+        etag = f'"ec-{clave[:24]}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=304, headers=headers)
+
+        cache = caches["estado_cuenta"]
+        data = cache.get(f"ec:{clave}") if fila[2] is not None else None
+        if data is None:
+            data = self._construir(user, fila[0], hoy)
+            cache.set(f"ec:{clave}", data)
+        return Response(data, status=200, headers=headers)
+
+    def _construir(self, user, unidad_id, hoy):
+        unidades = self.get_user_unidades(user)
+        unidad = unidades.get(id=unidad_id)
 
         cuotas_qs = Cuota.objects.select_related("unidad").filter(unidad=unidad).order_by("-vencimiento", "-updated_at")
         pagos_qs = Pago.objects.select_related("cuota", "creado_por", "cuota__unidad").filter(cuota__unidad=unidad).order_by("-created_at")
 
-        saldo_expr = ExpressionWrapper(F("total_a_pagar") - F("pagado"), output_field=DecimalField(max_digits=12, decimal_places=2))
-        agg = cuotas_qs.aggregate(
-            saldo_pendiente=Sum(saldo_expr),
-            total_pagado=Sum("pagado"),
-            total_cobrado=Sum("total_a_pagar"),
-        )
+        saldo = obtener_saldo(unidad.id)   # materializado por el libro de movimientos
         cuotas_pendientes = cuotas_qs.filter(estado__in=["PENDIENTE", "VENCIDA", "PARCIAL"]).count()
         ultimo_pago = pagos_qs.first()
 
-        data = {
+        return {
             "unidades": UnidadBriefECSerializer(unidades, many=True).data,
             "unidad": UnidadBriefECSerializer(unidad).data,
             "resumen": {
-                "saldo_pendiente": str(agg.get("saldo_pendiente") or 0),
-                "total_pagado_historico": str(agg.get("total_pagado") or 0),
-                "total_cobrado_historico": str(agg.get("total_cobrado") or 0),
+                "saldo_pendiente": str(saldo.saldo),
+                "total_pagado_historico": str(saldo.total_abonado),
+                "total_cobrado_historico": str(saldo.total_cargado),
                 "cuotas_pendientes": cuotas_pendientes,
                 "ultimo_pago": PagoEstadoCuentaSerializer(ultimo_pago).data if ultimo_pago else None,
-                "fecha_corte": date.today().isoformat(),
+                "fecha_corte": hoy.isoformat(),
             },
             "cuotas": CuotaSerializer(cuotas_qs, many=True).data,
             "pagos": PagoEstadoCuentaSerializer(pagos_qs, many=True).data,
         }
-        return Response(data, status=200)
 
 class EstadoCuentaExportCSV(APIView):
+    """Estado de cuenta de una unidad del usuario, en streaming (?formato=csv|xlsx, ?gzip=1)."""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
 
@@ -642,31 +731,75 @@ class EstadoCuentaExportCSV(APIView):
         else:
             unidad = unidades.first()
 
-        cuotas_qs = Cuota.objects.select_related("unidad").filter(unidad=unidad).order_by("-vencimiento", "-updated_at")
-        pagos_qs = Pago.objects.select_related("cuota", "cuota__unidad").filter(cuota__unidad=unidad).order_by("-created_at")
-
-        resp = HttpResponse(content_type="text/csv")
-        filename = f"estado_cuenta_unidad_{unidad.id}_{date.today().isoformat()}.csv"
-        resp["Content-Disposition"] = f'attachment; filename="{filename}"'
-        writer = csv.writer(resp)
-
-        writer.writerow([f"Estado de cuenta - Unidad {str(unidad)} (ID {unidad.id})"])
-        writer.writerow(["Fecha de corte", date.today().isoformat()])
-        writer.writerow([])
+        cuotas = (
+            Cuota.objects.filter(unidad=unidad).order_by("-vencimiento", "-updated_at")
+            .values_list("id", "periodo", "concepto", "vencimiento", "total_a_pagar", "pagado", "estado")
+        )
+        pagos = (
+            Pago.objects.filter(cuota__unidad=unidad).order_by("-created_at")
+            .values_list("id", "fecha_pago", "monto", "medio", "referencia", "cuota__periodo", "cuota__concepto")
+        )
+        hoy = date.today().isoformat()
+        return streaming_export(request, f"estado_cuenta_unidad_{unidad.id}_{hoy}", [
+            (f"Estado de cuenta - Unidad {str(unidad)} (ID {unidad.id})", None, [["Fecha de corte", hoy]]),
+            ("CUOTAS", ["ID", "Periodo", "Concepto", "Vencimiento", "Total", "Pagado", "Saldo", "Estado"],
+             ((i, per, con, ven, tot, pag, (tot or 0) - (pag or 0), est)
+              for i, per, con, ven, tot, pag, est in cuotas.iterator(chunk_size=ITER_CHUNK))),
+            ("PAGOS", ["ID", "Fecha pago", "Monto", "Medio", "Referencia", "Cuota (Periodo)", "Concepto"],
+             pagos.iterator(chunk_size=ITER_CHUNK)),
+        ])
 
-        writer.writerow(["CUOTAS"])
-        writer.writerow(["ID", "Periodo", "Concepto", "Vencimiento", "Total", "Pagado", "Saldo", "Estado"])
-        for c in cuotas_qs:
-            saldo = (c.total_a_pagar or 0) - (c.pagado or 0)
-            writer.writerow([c.id, c.periodo, c.concepto, c.vencimiento, c.total_a_pagar, c.pagado, saldo, c.estado])
 
-        writer.writerow([])
-        writer.writerow(["PAGOS"])
-        writer.writerow(["ID", "Fecha pago", "Monto", "Medio", "Referencia", "Cuota (Periodo)", "Concepto"])
-        for p in pagos_qs:
-            writer.writerow([p.id, p.fecha_pago, p.monto, p.medio, p.referencia, getattr(p.cuota, "periodo", ""), getattr(p.cuota, "concepto", "")])
+class EstadoCuentaExportAllView(APIView):
+    """
+    Estado de cuenta de todas las unidades (admin/staff), en streaming.
+    Hojas/secciones: SALDOS (UnidadSaldo), CUOTAS y, con ?pagos=1, PAGOS.
+    Filtros: ?periodo_desde=YYYY-MM&periodo_hasta=YYYY-MM&solo_deuda=1
+    Formato: ?formato=csv|xlsx&gzip=1
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminOrStaff]
 
-        return resp
+    def get(self, request):
+        qp = request.query_params
+        solo_deuda = qp.get("solo_deuda") in {"1", "true", "True"}
+
+        saldos = UnidadSaldo.objects.order_by("unidad__manzana", "unidad__lote", "unidad__numero")
+        cuotas = Cuota.objects.all()
+        pagos = Pago.objects.filter(valido=True)
+        if qp.get("periodo_desde"):
+            cuotas = cuotas.filter(periodo__gte=qp["periodo_desde"])
+            pagos = pagos.filter(cuota__periodo__gte=qp["periodo_desde"])
+        if qp.get("periodo_hasta"):
+            cuotas = cuotas.filter(periodo__lte=qp["periodo_hasta"])
+            pagos = pagos.filter(cuota__periodo__lte=qp["periodo_hasta"])
+        if solo_deuda:
+            saldos = saldos.filter(saldo__gt=0)
+            cuotas = cuotas.filter(is_active=True, total_a_pagar__gt=F("pagado"))
+
+        unidad_cols = ["Unidad ID", "Manzana", "Lote", "Número"]
+        secciones = [
+            ("SALDOS", unidad_cols + ["Total cargado", "Total abonado", "Saldo"],
+             saldos.values_list(
+                 "unidad_id", "unidad__manzana", "unidad__lote", "unidad__numero",
+                 "total_cargado", "total_abonado", "saldo",
+             ).iterator(chunk_size=ITER_CHUNK)),
+            ("CUOTAS", unidad_cols + ["Cuota ID", "Periodo", "Concepto", "Vencimiento", "Total", "Pagado", "Saldo", "Estado"],
+             ((*fila[:8], fila[8], fila[9], (fila[8] or 0) - (fila[9] or 0), fila[10])
+              for fila in cuotas.order_by("unidad_id", "periodo", "concepto").values_list(
+                  "unidad_id", "unidad__manzana", "unidad__lote", "unidad__numero",
+                  "id", "periodo", "concepto", "vencimiento", "total_a_pagar", "pagado", "estado",
+              ).iterator(chunk_size=ITER_CHUNK))),
+        ]
+        if qp.get("pagos") in {"1", "true", "True"}:
+            secciones.append((
+                "PAGOS", unidad_cols + ["Pago ID", "Fecha pago", "Monto", "Medio", "Referencia", "Periodo", "Concepto"],
+                pagos.order_by("cuota__unidad_id", "created_at").values_list(
+                    "cuota__unidad_id", "cuota__unidad__manzana", "cuota__unidad__lote", "cuota__unidad__numero",
+                    "id", "fecha_pago", "monto", "medio", "referencia", "cuota__periodo", "cuota__concepto",
+                ).iterator(chunk_size=ITER_CHUNK),
+            ))
+        return streaming_export(request, f"estado_cuenta_unidades_{date.today().isoformat()}", secciones)
 
 
 # ---------------------------
@@ -1257,6 +1390,7 @@ class MockIntentMineView(APIView):
 class MockIntentDashboardView(APIView):
     """
     GET: dashboard básico para ADMIN/STAFF con pendientes
+    ?cursor= pagina por (created_at, id) (KeysetPagination); sin él, la lista completa.
     """
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
@@ -1269,6 +1403,10 @@ class MockIntentDashboardView(APIView):
               .filter(provider="MOCK")
               .exclude(status="PAID")
               .order_by("-created_at"))
+        paginator = KeysetPagination()
+        if paginator.es_keyset(request):
+            page = paginator.paginate_queryset(qs, request, view=self)
+            return paginator.get_paginated_response(OnlinePaymentIntentSerializer(page, many=True).data)
         return Response(OnlinePaymentIntentSerializer(qs, many=True).data, status=200)
 
 # ---------------------------
@@ -1361,111 +1499,23 @@ class SnapshotCheckView(APIView):
     consulta Plate Recognizer y decide:
       - ALLOW_RESIDENT | ALLOW_VISIT | DENY_UNKNOWN | ERROR_OCR
     También etiqueta el evento con direction según camera_id (ENTRADA/SALIDA).
+    Sin @transaction.atomic: el OCR corre fuera de transacción y solo el INSERT del
+    evento va en una transacción corta (services_gate.py).
     """
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated, IsStaffGuardOrAdmin]
 
-    @transaction.atomic
     def post(self, request):
         ser = SnapshotInSerializer(data=request.data)
         ser.is_valid(raise_exception=True)
-        camera_id = ser.validated_data.get("camera_id") or ""
-        img = ser.validated_data["image"]
-
-        # Dirección según la cámara (si no está mapeada, queda vacío)
-        direction = ser.validated_data.get("direction") or \
-            (getattr(settings, "CAMERA_DIRECTIONS", {}) or {}).get(camera_id, "")
-
-        # 1) OCR externo
-        try:
-            payload = PlateRecognizerSnapshot.read_image(
-                fileobj=img,
-                regions=getattr(settings, "PLATE_REGIONS", None),
-                camera_id=camera_id or None,
-                timeout=12,
-            )
-        except Exception as e:
-            ev = AccessEvent.objects.create(
-                camera_id=camera_id,
-                direction=direction,            # ⬅️ guardamos igual la dirección
-                decision="ERROR_OCR",
-                reason=f"OCR error: {e}",
-                opened=False,
-                payload={"error": str(e)},
-                triggered_by=request.user,
-            )
-            return Response(AccessEventSerializer(ev).data, status=502)
-
-        # 2) Mejor match de placa
-        plate_raw, score = best_plate_from_result(payload)
-        plate_norm = (plate_raw or "").strip().upper().replace(" ", "")
-
-        if not plate_norm:
-            ev = AccessEvent.objects.create(
-                camera_id=camera_id,
-                direction=direction,
-                plate_raw=plate_raw or "",
-                plate_norm="",
-                score=score,
-                decision="DENY_UNKNOWN",
-                reason="Sin placa confiable",
-                opened=False,
-                payload=payload,
-                triggered_by=request.user,
-            )
-            return Response(AccessEventSerializer(ev).data)
-
-        # 3) Matching con Vehiculo/Visit
-        now = timezone.now()
-        veh = Vehiculo.objects.filter(placa__iexact=plate_norm, activo=True).first()
-        visit = (
-            Visit.objects.filter(
-                vehicle_plate__iexact=plate_norm,
-                approval_status="APR",
-                status__in=["REGISTRADO", "INGRESADO"],
-            )
-            .filter(
-                # sin expiración o vigente
-                (Q(approval_expires_at__isnull=True) | Q(approval_expires_at__gte=now))
-            )
-            .order_by("-created_at")
-            .first()
-        )
-
-        decision, reason, opened = (
-            "DENY_UNKNOWN",
-            "No coincide con vehículo autorizado ni visita aprobada.",
-            False,
-        )
-        if veh:
-            decision, reason, opened = (
-                "ALLOW_RESIDENT",
-                f"Vehículo autorizado para usuario {veh.propietario_id}.",
-                True,
-            )
-        elif visit:
-            decision, reason, opened = (
-                "ALLOW_VISIT",
-                f"Visita aprobada (id={visit.id}).",
-                True,
-            )
-
-        ev = AccessEvent.objects.create(
-            camera_id=camera_id,
-            direction=direction,          # ⬅️ importante
-            plate_raw=plate_raw or "",
-            plate_norm=plate_norm,
-            score=score,
-            decision=decision,
-            reason=reason,
-            opened=opened,
-            vehicle=veh,
-            visit=visit,
-            payload=payload,
-            triggered_by=request.user,
-            
+        ev, status_code = procesar_snapshot(
+            ser.validated_data["image"],
+            camera_id=ser.validated_data.get("camera_id") or "",
+            direction=ser.validated_data.get("direction"),
+            plate_hint=ser.validated_data.get("plate_hint"),
+            user=request.user,
         )
-        return Response(AccessEventSerializer(ev).data)
+        return Response(AccessEventSerializer(ev).data, status=status_code)
 
 class MyCuotasConSaldoView(ListAPIView):
     authentication_classes = [TokenAuthentication]
@@ -1681,10 +1731,15 @@ class AccessEventViewSet(viewsets.ReadOnlyModelViewSet):
       &opened=true|false
       &plate=ABC
       &min_score=0.75
+      &aproximada=true|false        (abrió por coincidencia aproximada de placa: reason "[APROX] ...")
+    La lista trae `payload` resumido (la columna completa queda diferida);
+    GET /api/access/events/{id}/ trae la respuesta completa del OCR.
+    Paginación: ?page=N, o ?cursor= para keyset por (created_at, id) (KeysetPagination).
     """
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = AccessEventSerializer
+    pagination_class = KeysetPagination
 
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["plate_norm", "plate_raw", "reason", "camera_id", "direction"]
@@ -1698,6 +1753,8 @@ class AccessEventViewSet(viewsets.ReadOnlyModelViewSet):
             .all()
             .order_by("-created_at")
         )
+        if self.action == "list":
+            qs = qs.defer("payload")
 
         u = self.request.user
         # STAFF / ADMIN ven todo
@@ -1714,6 +1771,9 @@ class AccessEventViewSet(viewsets.ReadOnlyModelViewSet):
         qs = qs.filter(Q(vehicle_id__in=mis_vehiculos_ids) | Q(visit_id__in=mis_visitas_ids))
         return self._apply_query_params(qs)
 
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "solo_resumen": self.action == "list"}
+
     def _apply_query_params(self, qs):
         req = self.request
         f = req.query_params.get("from")
@@ -1725,13 +1785,9 @@ class AccessEventViewSet(viewsets.ReadOnlyModelViewSet):
         plate = req.query_params.get("plate")
         direction = req.query_params.get("direction")          # ENTRADA|SALIDA
         min_score = req.query_params.get("min_score")
+        aproximada = req.query_params.get("aproximada")
 
-        if f:
-            d = parse_date(f)
-            if d: qs = qs.filter(created_at__date__gte=d)
-        if t:
-            d = parse_date(t)
-            if d: qs = qs.filter(created_at__date__lte=d)
+        qs = _rango_de_dias(qs, f, t)
         if cam:
             qs = qs.filter(camera_id__iexact=cam)
         if dec:
@@ -1751,55 +1807,47 @@ class AccessEventViewSet(viewsets.ReadOnlyModelViewSet):
                 qs = qs.filter(score__gte=float(min_score))
             except ValueError:
                 pass
+        if aproximada in {"true", "false", "1", "0"}:
+            q = Q(reason__startswith=REASON_APROXIMADA)
+            qs = qs.filter(q) if aproximada in {"true", "1"} else qs.exclude(q)
         return qs
 
     @action(detail=False, methods=["get"], url_path="export")
     def export_csv(self, request):
         """
-        Exporta CSV con los mismos filtros que la lista.
+        Exporta con los mismos filtros que la lista, en streaming (?formato=csv|xlsx, ?gzip=1).
         """
-        import csv
-        from django.http import HttpResponse
-
-        qs = self.get_queryset()
-        resp = HttpResponse(content_type="text/csv; charset=utf-8")
-        resp["Content-Disposition"] = 'attachment; filename="access_events.csv"'
-        w = csv.writer(resp)
-        w.writerow([
-            "id","created_at","camera_id","direction",
-            "plate_raw","plate_norm","score",
-            "decision","opened","reason",
-            "vehicle_id","visit_id","triggered_by_id",
-        ])
-        for e in qs.iterator():
-            w.writerow([
-                e.id,
-                e.created_at.isoformat(),
-                e.camera_id,
-                getattr(e, "direction", "") or "",
-                e.plate_raw,
-                e.plate_norm,
-                e.score if e.score is not None else "",
-                e.decision,
-                e.opened,
-                e.reason,
-                e.vehicle_id,
-                e.visit_id,
-                e.triggered_by_id,
-            ])
-        return resp
-    
-    
+        filas = self.get_queryset().values_list(
+            "id", "created_at", "camera_id", "direction",
+            "plate_raw", "plate_norm", "score",
+            "decision", "opened", "reason",
+            "vehicle_id", "visit_id", "triggered_by_id",
+        )
+        return streaming_export(request, "access_events", [(
+            "access_events",
+            [
+                "id","created_at","camera_id","direction",
+                "plate_raw","plate_norm","score",
+                "decision","opened","reason",
+                "vehicle_id","visit_id","triggered_by_id",
+            ],
+            filas.iterator(chunk_size=ITER_CHUNK),
+        )])
+
+
 class FaceAccessEventViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Bitácora de reconocimientos faciales.
     - ADMIN/STAFF: ven todo.
     - RESIDENT: solo sus propios eventos (matched_user = él/ella).
     Filtros: ?from=YYYY-MM-DD&to=YYYY-MM-DD&camera_id=&decision=&direction=&user=<id>
+    Como AccessEventViewSet: `payload` resumido en la lista, completo en el detalle, y
+    ?cursor= para paginar por (created_at, id).
     """
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = FaceAccessEventSerializer
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["camera_id", "reason"]
     ordering_fields = ["created_at", "score", "camera_id", "decision", "opened"]
@@ -1807,12 +1855,17 @@ class FaceAccessEventViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         qs = FaceAccessEvent.objects.select_related("matched_user", "triggered_by").all()
+        if self.action == "list":
+            qs = qs.defer("payload")
         u = self.request.user
         if getattr(u, "is_superuser", False) or user_role_code(u) in {"ADMIN", "STAFF"}:
             return self._apply_filters(qs)
         # residente: solo sus eventos
         return self._apply_filters(qs.filter(matched_user=u))
 
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "solo_resumen": self.action == "list"}
+
     def _apply_filters(self, qs):
         req = self.request
         f = req.query_params.get("from")
@@ -1822,14 +1875,7 @@ class FaceAccessEventViewSet(viewsets.ReadOnlyModelViewSet):
         direction = req.query_params.get("direction")
         user_id = req.query_params.get("user")
 
-        if f:
-            d = parse_date(f)
-            if d:
-                qs = qs.filter(created_at__date__gte=d)
-        if t:
-            d = parse_date(t)
-            if d:
-                qs = qs.filter(created_at__date__lte=d)
+        qs = _rango_de_dias(qs, f, t)
         if cam:
             qs = qs.filter(camera_id__iexact=cam)
         if dec:
@@ -1845,25 +1891,72 @@ class FaceAccessEventViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=["get"], url_path="export")
     def export_csv(self, request):
-        qs = self.get_queryset()
-        import csv
-        from django.http import HttpResponse
-        resp = HttpResponse(content_type="text/csv")
-        resp["Content-Disposition"] = 'attachment; filename="face_access_events.csv"'
-        w = csv.writer(resp)
-        w.writerow([
-            "id","created_at","camera_id","direction",
-            "decision","score","opened",
-            "matched_user_id","triggered_by_id",
-            "snapshot","reason"
-        ])
-        for e in qs.iterator():
-            w.writerow([
-                e.id, e.created_at.isoformat(), e.camera_id, e.direction,
-                e.decision, e.score, e.opened,
-                getattr(e.matched_user, "id", None),
-                getattr(e.triggered_by, "id", None),
-                e.snapshot.url if getattr(e, "snapshot", None) else "",
-                e.reason.replace("\n"," ").strip() if e.reason else "",
-            ])
-        return resp
\ No newline at end of file
+        """Exporta con los mismos filtros que la lista, en streaming (?formato=csv|xlsx, ?gzip=1)."""
+        storage = FaceAccessEvent._meta.get_field("snapshot").storage
+        filas = self.get_queryset().values_list(
+            "id", "created_at", "camera_id", "direction",
+            "decision", "score", "opened",
+            "matched_user_id", "triggered_by_id",
+            "snapshot", "reason",
+        )
+        return streaming_export(request, "face_access_events", [(
+            "face_access_events",
+            [
+                "id","created_at","camera_id","direction",
+                "decision","score","opened",
+                "matched_user_id","triggered_by_id",
+                "snapshot","reason"
+            ],
+            (
+                (*fila[:9], storage.url(fila[9]) if fila[9] else "", fila[10].replace("\n", " ").strip() if fila[10] else "")
+                for fila in filas.iterator(chunk_size=ITER_CHUNK)
+            ),
+        )])
+
+
+
+class AccessAnalyticsView(APIView):
+    """
+    Analítica de garita desde los cubos pre-agregados (AccessRollupHora, services_rollups.py);
+    no agrupa la bitácora cruda. Solo ADMIN/STAFF.
+      GET /api/access/analytics/?from=YYYY-MM-DD&to=YYYY-MM-DD   (por defecto los últimos 7 días)
+        &agrupar=camera_id,hora_del_dia,decision   (por defecto; también direction, hora, dia, dia_semana)
+        &camera_id=gate-1&direction=ENTRADA&decision=ALLOW_RESIDENT
+    Respuesta: {"from", "to", "agrupar", "filas": [{<dimensiones>, eventos, abiertos, score_promedio}],
+                "totales", "pendientes", "al_dia", "sin_compactar_desde"}; `pendientes` = eventos
+    aún sin compactar sumados en vivo (últimos ROLLUP_VIVO_MAX_S). al_dia=false: el compactador
+    va atrasado desde `sin_compactar_desde` y lo anterior a la ventana todavía no cuenta.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminOrStaff]
+    agrupar_por_defecto = "camera_id,hora_del_dia,decision"
+
+    def get(self, request):
+        qp = request.query_params
+        hoy = timezone.localdate()
+        desde = qp.get("from") or (hoy - timedelta(days=6)).isoformat()
+        hasta = qp.get("to") or hoy.isoformat()
+        try:
+            inicio, fin = _limites_de_dias(desde, hasta)
+        except ValueError:
+            inicio = fin = None
+        if not inicio or not fin:
+            return Response({"detail": "from/to deben tener formato YYYY-MM-DD."}, status=400)
+        if inicio >= fin:
+            return Response({"detail": "from no puede ser posterior a to."}, status=400)
+
+        agrupar = [d.strip() for d in qp.get("agrupar", self.agrupar_por_defecto).split(",") if d.strip()]
+        invalidas = [d for d in agrupar if d not in DIMENSIONES_ROLLUP]
+        if invalidas or len(set(agrupar)) != len(agrupar):
+            return Response(
+                {"detail": f"agrupar admite: {', '.join(DIMENSIONES_ROLLUP)} (sin repetir)."}, status=400,
+            )
+
+        filas, totales, estado = consultar_rollups(
+            inicio, fin, agrupar,
+            camera_id=qp.get("camera_id"), direction=qp.get("direction"), decision=qp.get("decision"),
+        )
+        return Response({
+            "from": desde, "to": hasta, "agrupar": agrupar,
+            "filas": filas, "totales": totales, **estado,
+        })
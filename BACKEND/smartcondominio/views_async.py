@@ -0,0 +1,221 @@
+# views_async.py
+"""
+Versiones async (ASGI) de las vistas de garita, para servir con workers de uvicorn:
+
+  access/async/snapshot-check/       ≈ SnapshotCheckView
+  face/async/identify-and-log-aws/   ≈ FaceIdentifyAndLogAWSView
+  face/async/identify-aws-dry/       ≈ FaceIdentifyAWSDryRunView
+  access/events/stream/              eventos nuevos en vivo (SSE, stream_garita.py)
+
+Mismo contrato (multipart, Token, respuestas y códigos de estado). Mientras una cámara
+espera al OCR o a Rekognition, el worker sigue atendiendo a las demás:
+  - Plate Recognizer con httpx.AsyncClient (PlateRecognizerSnapshot.aread_image);
+  - Rekognition / modelo local (boto3 y OpenCV no tienen API async) en un pool de hilos
+    acotado (GATE_ASYNC_HILOS), fuera del event loop;
+  - la BD (token, rol, INSERT del evento) con sync_to_async, solo en tramos cortos.
+
+Bajo WSGI también responden (Django las corre con async_to_sync), pero sin ganancia.
+Despliegue: ver config/asgi.py.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+
+from . import metrics, stream_garita
+from .permissions import IsStaffGuardOrAdmin
+from .serializers import AccessEventSerializer, SnapshotInSerializer
+from .services_gate import aprocesar_snapshot
+from .views_face import buscar_rostro, garita_de, preparar_imagen, registrar_error_rostro, registrar_rostro
+
+
+# ---------------------------
+# Hilos para lo bloqueante
+# ---------------------------
+@functools.lru_cache(maxsize=1)
+def _pool():
+    return ThreadPoolExecutor(
+        max_workers=int(getattr(settings, "GATE_ASYNC_HILOS", 32)),
+        thread_name_prefix="garita-async",
+    )
+
+
+async def en_hilo(fn, *args, **kwargs):
+    """fn bloqueante (boto3, OpenCV) en el pool, con los contextvars del request (metrics.evento)."""
+    ctx = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool(), functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+# ---------------------------
+# Auth / permisos (como un APIView)
+# ---------------------------
+class TokenQueryAuthentication(TokenAuthentication):
+    """Token en ?token= (EventSource del navegador no puede mandar Authorization)."""
+
+    def authenticate(self, request):
+        key = request.query_params.get("token")
+        return self.authenticate_credentials(key) if key else None
+
+
+def _autorizar(request, permisos, serializer_class=None, autenticadores=(TokenAuthentication,)):
+    """
+    TokenAuthentication + permisos (+ validación del serializer) con la maquinaria de DRF.
+    Consulta la BD (token, rol): se llama con sync_to_async.
+    Devuelve (request DRF, validated_data) o levanta una APIException.
+    """
+    req = Request(request, parsers=[MultiPartParser(), FormParser()], authenticators=[a() for a in autenticadores])
+    for permiso in permisos:
+        if not permiso().has_permission(req, None):
+            if not req.successful_authenticator:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied()
+    if serializer_class is None:
+        req.data  # parsea el multipart acá, fuera del event loop
+        return req, None
+    ser = serializer_class(data=req.data)
+    ser.is_valid(raise_exception=True)
+    return req, ser.validated_data
+
+
+def _error(exc: exceptions.APIException) -> JsonResponse:
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+    resp = JsonResponse(data, status=exc.status_code, safe=False)
+    if exc.status_code == 401:
+        resp["WWW-Authenticate"] = TokenAuthentication.keyword
+    return resp
+
+
+class _GateAsyncView(View):
+    http_method_names = ["post", "options"]
+    permisos = [IsAuthenticated]
+    autenticadores = (TokenAuthentication,)
+    serializer_class = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # como APIView: autenticación por Token, sin CSRF
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def autorizar(self, request):
+        return await sync_to_async(_autorizar)(request, self.permisos, self.serializer_class, self.autenticadores)
+
+
+# ---------------------------
+# Placas
+# ---------------------------
+class SnapshotCheckAsyncView(_GateAsyncView):
+    """SnapshotCheckView async: el OCR se espera en el event loop (httpx), la BD por sync_to_async."""
+    permisos = [IsAuthenticated, IsStaffGuardOrAdmin]
+    serializer_class = SnapshotInSerializer
+
+    async def post(self, request):
+        try:
+            req, datos = await self.autorizar(request)
+        except exceptions.APIException as e:
+            return _error(e)
+        ev, status_code = await aprocesar_snapshot(
+            datos["image"],
+            camera_id=datos.get("camera_id") or "",
+            direction=datos.get("direction"),
+            plate_hint=datos.get("plate_hint"),
+            user=req.user,
+        )
+        return JsonResponse(AccessEventSerializer(ev).data, status=status_code)
+
+
+# ---------------------------
+# Rostros
+# ---------------------------
+class FaceIdentifyAndLogAsyncView(_GateAsyncView):
+    """FaceIdentifyAndLogAWSView async: la búsqueda en el pool de hilos, el evento por sync_to_async."""
+
+    @metrics.por_evento("face_gate")
+    async def post(self, request):
+        try:
+            req, _ = await self.autorizar(request)
+        except exceptions.APIException as e:
+            return _error(e)
+        img = req.data.get("image")
+        camera_id, direction = garita_de(req.data)
+        if not img:
+            return JsonResponse({"ok": False, "detail": "image es requerido"}, status=400)
+
+        img_bytes = img.read()
+        prep = await en_hilo(preparar_imagen, img_bytes)
+        try:
+            result, prep = await en_hilo(buscar_rostro, img_bytes, prep, max_faces=5)
+        except Exception as e:
+            data = await sync_to_async(registrar_error_rostro)(e, prep, img_bytes, camera_id, direction, req.user)
+            return JsonResponse(data, status=502)
+        data = await sync_to_async(registrar_rostro)(result, prep, img_bytes, camera_id, direction, req.user)
+        return JsonResponse(data)
+
+
+class FaceIdentifyDryRunAsyncView(_GateAsyncView):
+    """FaceIdentifyAWSDryRunView async (no escribe en la BD)."""
+
+    @metrics.por_evento("face_dry")
+    async def post(self, request):
+        try:
+            req, _ = await self.autorizar(request)
+        except exceptions.APIException as e:
+            return _error(e)
+        img = req.data.get("image")
+        if not img:
+            return JsonResponse({"ok": False, "detail": "image es requerido"}, status=400)
+        img_bytes = img.read()
+        try:
+            prep = await en_hilo(preparar_imagen, img_bytes)
+            result, prep = await en_hilo(buscar_rostro, img_bytes, prep, max_faces=5)
+            return JsonResponse({"ok": True, **result, "preprocess": prep.resumen() if prep else None})
+        except Exception as e:
+            return JsonResponse({"ok": False, "detail": f"rekognition_error: {e.__class__.__name__}: {e}"}, status=502)
+
+
+# ---------------------------
+# Eventos en vivo (SSE)
+# ---------------------------
+class GateEventStreamView(_GateAsyncView):
+    """
+    GET access/events/stream/ (text/event-stream): cada AccessEvent / FaceAccessEvent nuevo en
+    cuanto se confirma, en lugar de consultar access/events/ cada pocos segundos.
+      ?tipo=access|face  ?camera_id=gate-1[,gate-2]  ?direction=ENTRADA|SALIDA
+      ?token=<token>     (o Authorization: Token ...)
+      Last-Event-ID / ?last_id=   reanudar desde el último id recibido
+    Mensajes "access" / "face" con el evento como en la lista (payload resumido), "desfase"
+    si hay que recargar la lista, y un comentario de latido cada GATE_STREAM_HEARTBEAT_S.
+    Al reanudar puede repetir eventos ya enviados: la consola descarta por id.
+    Solo bajo ASGI: con WSGI ocuparía un worker por consola. Los eventos de otros procesos
+    llegan por LISTEN/NOTIFY de Postgres; con otra base solo se ven los que escribe el mismo
+    proceso ASGI (la garita en otros workers no aparece: usar la lista).
+    """
+    http_method_names = ["get", "options"]
+    permisos = [IsAuthenticated, IsStaffGuardOrAdmin]
+    autenticadores = (TokenAuthentication, TokenQueryAuthentication)
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({"detail": "El stream de eventos requiere el servidor ASGI (config/asgi.py) y, con varios procesos, Postgres (LISTEN/NOTIFY)."}, status=501)
+        try:
+            await self.autorizar(request)
+        except exceptions.APIException as e:
+            return _error(e)
+        filtro = stream_garita.Filtro.desde_query(request.GET)
+        marcas = stream_garita.leer_marcas(request.headers.get("Last-Event-ID") or request.GET.get("last_id"))
+        resp = StreamingHttpResponse(stream_garita.eventos(filtro, marcas), content_type="text/event-stream")
+        resp["Cache-Control"] = "no-cache"
+        resp["X-Accel-Buffering"] = "no"   # nginx: no acumular
+        return resp
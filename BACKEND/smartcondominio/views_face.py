@@ -3,21 +3,62 @@ import re
 from django.conf import settings
 from django.core.files.base import ContentFile
 from django.utils import timezone
-from django.db import transaction
 from django.contrib.auth import get_user_model
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.authentication import TokenAuthentication
 
-from .rekognition_client import index_face, search_by_image
+from .face_backends import get_backend
+from . import metrics, payloads
+from .ai import warmup
 from .models import AccessEvent  # reutilizas tu modelo existente
 from .serializers import AccessEventSerializer
 
 User = get_user_model()
 
+def preparar_imagen(img_bytes: bytes):
+    """
+    Preprocesado de ai/preprocess.py (decodificación reducida + recorte del rostro), o
+    None si está apagado (o el backend no lo usa), falta OpenCV o la imagen no se puede
+    leer: se usan los bytes tal cual.
+    """
+    if not getattr(settings, "FACE_PREPROCESS", True) or not get_backend().preprocesar:
+        return None
+    try:
+        from .ai import preprocess
+    except ImportError:
+        return None
+    try:
+        return preprocess.preparar(img_bytes)
+    except Exception:
+        return None
+
+
+def buscar_rostro(img_bytes: bytes, prep, max_faces: int = 5):
+    """
+    search_by_image del backend (face_backends.py) con el JPEG preparado (el recorte del
+    rostro). Si no ve una cara en el recorte, reintenta con el cuadro completo achicado y
+    recorta con la caja que devuelve. Devuelve (result, prep) — prep es lo que se guarda de snapshot.
+    """
+    search_by_image = get_backend().search_by_image
+    if prep is None:
+        return search_by_image(img_bytes, max_faces=max_faces), None
+    try:
+        return search_by_image(prep.jpeg(), max_faces=max_faces), prep
+    except Exception as e:
+        codigo = (getattr(e, "response", None) or {}).get("Error", {}).get("Code")
+        if not prep.recortada or codigo != "InvalidParameterException":
+            raise
+    prep = prep.sin_recorte()
+    result = search_by_image(prep.jpeg(), max_faces=max_faces)
+    if result.get("SearchedFaceBoundingBox"):
+        prep = prep.recortar_con(result["SearchedFaceBoundingBox"])
+    return result, prep
+
+
 def build_person_id(kind: str, obj_id: int | str) -> str:
     k = (kind or "").lower()
     if k not in ("resident", "visitor", "staff"):
@@ -38,7 +79,7 @@ class FaceRegisterAWSView(APIView):
             return Response({"detail": "kind, obj_id, image son requeridos"}, status=400)
 
         person_id = build_person_id(kind, obj_id)
-        data = index_face(img.read(), external_id=person_id)
+        data = get_backend().index_face(img.read(), external_id=person_id)
         return Response({"ok": True, "person_id": person_id, **data})
 
 
@@ -53,128 +94,175 @@ class FaceIdentifyAndLogAWSView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser]
 
-    @transaction.atomic
+    # sin @transaction.atomic: la búsqueda externa no debe tener una transacción abierta;
+    # el único acceso de escritura es un INSERT (atómico por sí solo)
+    @metrics.por_evento("face_gate")
     def post(self, request):
         img = request.data.get("image")
-        camera_id = (request.data.get("camera_id") or "").strip()
-        # Permite forzar ENTRADA/SALIDA desde el FE; si no llega, toma del mapping
-        direction = (request.data.get("direction") or "").strip().upper()
-        if not direction:
-            direction = (getattr(settings, "CAMERA_DIRECTIONS", {}) or {}).get(camera_id, "")  # "ENTRADA"/"SALIDA"/""
-
+        camera_id, direction = garita_de(request.data)
         if not img:
             return Response({"ok": False, "detail": "image es requerido"}, status=400)
 
         img_bytes = img.read()
+        # decodifica una vez: el recorte del rostro se compara y se guarda como snapshot
+        prep = preparar_imagen(img_bytes)
 
-        # --- 1) Buscar coincidencias en Rekognition
+        # --- 1) Buscar coincidencias (Rekognition o el backend de settings.FACE_BACKEND)
         try:
-            result = search_by_image(img_bytes, max_faces=5)
+            result, prep = buscar_rostro(img_bytes, prep, max_faces=5)
         except Exception as e:
-            # registra evento de error (tipo facial, no OCR de placas, pero aprovechamos el mismo modelo)
-            evt = AccessEvent.objects.create(
-                camera_id=camera_id,
-                # plate_* vacíos porque esto es facial
-                plate_raw="",
-                plate_norm="",
-                score=None,
-                decision="ERROR_OCR",
-                reason=f"rekognition_error: {e.__class__.__name__}: {e}",
-                vehicle=None,
-                visit=None,
-                payload={"error": str(e)},
-                triggered_by=getattr(request, "user", None),
-                # si tu modelo tiene estos campos, se guardan; si no, se ignoran abajo
-                **({"direction": direction} if hasattr(AccessEvent, "direction") else {}),
-                **({"opened": False} if hasattr(AccessEvent, "opened") else {}),
-            )
-            # snapshot opcional
-            if hasattr(evt, "snapshot"):
-                try:
-                    evt.snapshot.save(f"face_{evt.id}.jpg", ContentFile(img_bytes), save=True)
-                except Exception:
-                    pass
-            return Response({"ok": False, "event": AccessEventSerializer(evt).data}, status=502)
-
-        matches = result.get("Matches", []) or []
-        match = bool(matches)
-        best = matches[0] if match else None
-
-        # --- 2) Decidir (umbral configurable)
-        # si result devuelve Similarity en % (0..100), lo pasamos a 0..1
-        score = (best["Similarity"] / 100.0) if match else None
-        threshold = float(getattr(settings, "FACE_ALLOW_THRESHOLD", 0.85))
-        allow = bool(match and score is not None and score >= threshold)
-
-        # intentar resolver usuario: ExternalImageId puede venir "resident:31" o "31"
-        external_id = (best.get("ExternalImageId") if match else "") or ""
-        user_id = None
-        m = re.search(r"(\d+)", str(external_id))
-        if m:
-            try:
-                user_id = int(m.group(1))
-            except Exception:
-                user_id = None
-
-        matched_user = None
-        if user_id:
-            matched_user = User.objects.filter(id=user_id).first()
-
-        decision = "ALLOW_RESIDENT" if allow and matched_user else "DENY_UNKNOWN"
-        reason = (
-            f"match {external_id} (id={getattr(matched_user, 'id', None)})"
-            if match else "no_match"
-        )
-        opened = bool(decision == "ALLOW_RESIDENT")
-
-        # --- 3) Registrar evento (reutilizando AccessEvent)
-        extra_kwargs = {}
-        if hasattr(AccessEvent, "direction"):
-            extra_kwargs["direction"] = direction
-        if hasattr(AccessEvent, "opened"):
-            extra_kwargs["opened"] = opened
-
-        evt = AccessEvent.objects.create(
-            camera_id=camera_id,
-            plate_raw="",
-            plate_norm="",
-            score=score,
-            decision=decision,
-            reason=reason,
-            vehicle=None,
-            visit=None,
-            payload={
-                "rekognition": result,
-                "best": best,
-                "external_id": external_id,
-                "matched_user_id": getattr(matched_user, "id", None),
-                "threshold": threshold,
-            },
-            triggered_by=getattr(request, "user", None),
-            **extra_kwargs,
-        )
-        # snapshot si tu modelo lo soporta
-        if hasattr(evt, "snapshot"):
-            try:
-                evt.snapshot.save(f"face_{evt.id}.jpg", ContentFile(img_bytes), save=True)
-            except Exception:
-                pass
-
-        # --- 4) Respuesta (con tarjetita mínima del usuario si lo encontramos)
-        resident = None
-        if matched_user:
-            resident = {
-                "id": matched_user.id,
-                "username": getattr(matched_user, "username", ""),
-                "email": getattr(matched_user, "email", ""),
-                "name": f"{getattr(matched_user,'first_name','') or ''} {getattr(matched_user,'last_name','') or ''}".strip() or getattr(matched_user,"username",""),
-            }
-
-        return Response({
-            "ok": True,
-            "match": match,
+            data = registrar_error_rostro(e, prep, img_bytes, camera_id, direction, getattr(request, "user", None))
+            return Response(data, status=502)
+
+        # --- 2) a 4) decidir, registrar y responder
+        data = registrar_rostro(result, prep, img_bytes, camera_id, direction, getattr(request, "user", None))
+        return Response(data)
+
+
+def garita_de(data):
+    """(camera_id, direction) del POST; sin direction se mapea con settings.CAMERA_DIRECTIONS."""
+    camera_id = (data.get("camera_id") or "").strip()
+    # Permite forzar ENTRADA/SALIDA desde el FE; si no llega, toma del mapping
+    direction = (data.get("direction") or "").strip().upper()
+    if not direction:
+        direction = (getattr(settings, "CAMERA_DIRECTIONS", {}) or {}).get(camera_id, "")  # "ENTRADA"/"SALIDA"/""
+    return camera_id, direction
+
+
+def _guardar_snapshot(evt, prep, img_bytes):
+    # snapshot si tu modelo lo soporta
+    if hasattr(evt, "snapshot"):
+        try:
+            evt.snapshot.save(f"face_{evt.id}.jpg", ContentFile(prep.jpeg() if prep else img_bytes), save=True)
+        except Exception:
+            pass
+
+
+def registrar_error_rostro(e, prep, img_bytes, camera_id, direction, user) -> dict:
+    """Evento ERROR_OCR cuando falla la búsqueda. Solo BD (las vistas async lo llaman con sync_to_async)."""
+    # registra evento de error (tipo facial, no OCR de placas, pero aprovechamos el mismo modelo)
+    evt = payloads.crear(
+        AccessEvent,
+        camera_id=camera_id,
+        # plate_* vacíos porque esto es facial
+        plate_raw="",
+        plate_norm="",
+        score=None,
+        decision="ERROR_OCR",
+        reason=f"rekognition_error: {e.__class__.__name__}: {e}",
+        vehicle=None,
+        visit=None,
+        payload={
+            "error": str(e),
+            "backend": getattr(settings, "FACE_BACKEND", "aws"),
+            "preprocess": prep.resumen() if prep else None,
+            "aws_llamadas": (metrics.evento_actual() or {}).get("aws"),
+        },
+        triggered_by=user,
+        # si tu modelo tiene estos campos, se guardan; si no, se ignoran abajo
+        **({"direction": direction} if hasattr(AccessEvent, "direction") else {}),
+        **({"opened": False} if hasattr(AccessEvent, "opened") else {}),
+    )
+    _guardar_snapshot(evt, prep, img_bytes)
+    return {"ok": False, "event": AccessEventSerializer(evt).data}
+
+
+def registrar_rostro(result, prep, img_bytes, camera_id, direction, user) -> dict:
+    """Decide con el resultado de la búsqueda, registra el AccessEvent y arma la respuesta. Solo BD."""
+    matches = result.get("Matches", []) or []
+    match = bool(matches)
+    best = matches[0] if match else None
+
+    # --- 2) Decidir (umbral configurable)
+    # si result devuelve Similarity en % (0..100), lo pasamos a 0..1
+    score = (best["Similarity"] / 100.0) if match else None
+    threshold = float(getattr(settings, "FACE_ALLOW_THRESHOLD", 0.85))
+    allow = bool(match and score is not None and score >= threshold)
+
+    # intentar resolver usuario: ExternalImageId puede venir "resident:31" o "31"
+    external_id = (best.get("ExternalImageId") if match else "") or ""
+    user_id = None
+    m = re.search(r"(\d+)", str(external_id))
+    if m:
+        try:
+            user_id = int(m.group(1))
+        except Exception:
+            user_id = None
+
+    matched_user = None
+    if user_id:
+        matched_user = User.objects.filter(id=user_id).first()
+
+    decision = "ALLOW_RESIDENT" if allow and matched_user else "DENY_UNKNOWN"
+    reason = (
+        f"match {external_id} (id={getattr(matched_user, 'id', None)})"
+        if match else "no_match"
+    )
+    opened = bool(decision == "ALLOW_RESIDENT")
+
+    # --- 3) Registrar evento (reutilizando AccessEvent)
+    extra_kwargs = {}
+    if hasattr(AccessEvent, "direction"):
+        extra_kwargs["direction"] = direction
+    if hasattr(AccessEvent, "opened"):
+        extra_kwargs["opened"] = opened
+
+    evt = payloads.crear(
+        AccessEvent,
+        camera_id=camera_id,
+        plate_raw="",
+        plate_norm="",
+        score=score,
+        decision=decision,
+        reason=reason,
+        vehicle=None,
+        visit=None,
+        payload={
+            "rekognition": result,
+            "backend": getattr(settings, "FACE_BACKEND", "aws"),
             "best": best,
-            "candidates": matches,
-            "resident": resident,
-            "event": AccessEventSerializer(evt).data
-        })
+            "external_id": external_id,
+            "matched_user_id": getattr(matched_user, "id", None),
+            "threshold": threshold,
+            "preprocess": prep.resumen() if prep else None,
+            "aws_llamadas": (metrics.evento_actual() or {}).get("aws"),
+        },
+        triggered_by=user,
+        **extra_kwargs,
+    )
+    _guardar_snapshot(evt, prep, img_bytes)
+
+    # --- 4) Respuesta (con tarjetita mínima del usuario si lo encontramos)
+    resident = None
+    if matched_user:
+        resident = {
+            "id": matched_user.id,
+            "username": getattr(matched_user, "username", ""),
+            "email": getattr(matched_user, "email", ""),
+            "name": f"{getattr(matched_user,'first_name','') or ''} {getattr(matched_user,'last_name','') or ''}".strip() or getattr(matched_user,"username",""),
+        }
+
+    return {
+        "ok": True,
+        "match": match,
+        "best": best,
+        "candidates": matches,
+        "resident": resident,
+        "event": AccessEventSerializer(evt).data
+    }
+
+
+class FaceHealthView(APIView):
+    """
+    Readiness del pipeline de rostros en ESTE worker (para el health check del balanceador):
+    estado del warm-up (ai/warmup.py) y cuánto tardó cada etapa.
+    200 si está listo (o si FACE_WARMUP=off, salvo ?estricto=1); 503 mientras carga o si falló.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        info = warmup.estado()
+        estricto = str(request.query_params.get("estricto", "")).lower() in {"1", "true", "si", "sí"}
+        listo = info["listo"] or (info["modo"] == "off" and not estricto)
+        return Response(info, status=200 if listo else 503, headers={"Cache-Control": "no-store"})
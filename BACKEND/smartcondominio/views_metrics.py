@@ -0,0 +1,26 @@
+# views_metrics.py
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.authentication import TokenAuthentication
+
+from .permissions import IsAdmin
+from . import metrics, circuit
+
+
+class MetricsView(APIView):
+    """
+    GET: métricas en memoria de ESTE worker (metrics.py): llamadas a AWS por operación,
+    intentos (con reintentos), llamadas por evento de garita (aws_llamadas_por_evento) y
+    estado / aperturas de los circuit breakers (circuit.py).
+    DELETE: las reinicia (para medir desde cero).
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        data = {**metrics.snapshot(), "circuitos": circuit.estados()}
+        return Response(data, headers={"Cache-Control": "no-store"})
+
+    def delete(self, request):
+        metrics.reset()
+        return Response(status=204)